@@ -34,6 +34,14 @@ class Settings(BaseSettings):
     docling_max_file_size_mb: int = 50
     docling_ocr_enabled: bool = True
     docling_ocr_lang: str = "por"
+    docling_pool_size: int = 2  # worker processes with a warm DocumentConverter (0 = thread fallback)
+    docling_pool_queue_size: int = 8  # jobs allowed to wait for a free worker
+    docling_job_timeout: int = 600  # seconds — worker is killed and replaced
+    docling_shard_pages: int = 50  # pages per shard for large PDFs
+    docling_shard_min_pages: int = 100  # PDFs below this are converted in one job
+    docling_cache_enabled: bool = True  # content-addressed Markdown cache
+    docling_cache_max_mb: int = 2048  # LRU eviction above this size
+    docling_cache_compress: bool = True  # gzip entries on disk
 
     # --- Solar (Defensoria Pública - DPEBA) ---
     solar_username: str = ""
@@ -56,8 +64,20 @@ class Settings(BaseSettings):
     openai_api_key: str = ""
     whisper_model: str = "whisper-1"  # OpenAI Whisper API model
     whisper_max_file_size_mb: int = 25  # OpenAI limit
+    whisper_max_concurrency: int = 8  # parallel chunk requests for long recordings
+    whisper_rpm: int = 50  # OpenAI audio requests/min; caps chunks per file (with retry headroom)
+    whisper_chunk_min_seconds: int = 300
+    whisper_chunk_max_seconds: int = 1200  # ~4.7MB at 32kbps mono
+    whisper_chunk_overlap_seconds: float = 2.0  # only at cuts with no silence nearby
+    whisper_timeout_seconds: int = 300  # per Whisper request (upload + transcription), retried as transient
     hf_token: str = ""  # HuggingFace token for pyannote (speaker diarization)
     diarization_enabled: bool = True  # Enable speaker diarization by default
+    diarization_pool_size: int = 1  # worker processes with a warm pyannote pipeline (0 = thread fallback)
+    diarization_pool_queue_size: int = 4  # jobs allowed to wait; beyond that transcripts ship without speakers
+    diarization_job_timeout: int = 1800  # base seconds per job — worker is killed and replaced, transcript ships without speakers
+    diarization_timeout_per_audio_second: float = 0.5  # added to the base per second of audio (6h hearing → 1800 + 10800s)
+    diarization_warmup: bool = True  # start diarization workers (and load pyannote) at app startup
+    diarization_split_min_seconds: float = 0.0  # opt-in: split a Whisper segment at a speaker change when each side lasts this long; words are divided by time, not word timestamps, so cuts can land mid-sentence (0 = never)
     transcription_language: str = "pt"  # ISO 639-1 language code
 
     # --- Anthropic (Claude) ---
@@ -76,7 +96,23 @@ class Settings(BaseSettings):
     embedding_dimensions: int = 768
     chunk_max_tokens: int = 500
     chunk_overlap_tokens: int = 50
+    embedding_batch_size: int = 100  # texts per embed_content call (API max 100)
+    embedding_concurrency: int = 4  # embedding batches in flight per document
+    embedding_cache_enabled: bool = True  # on-disk cache keyed by (model, dims, text hash)
+    embedding_cache_max_mb: int = 1024
+    embedding_cache_memory_items: int = 4096  # in-process LRU front (hot queries)
     search_default_limit: int = 20
+    vector_index_enabled: bool = True  # in-process ANN fast path for per-assistido search
+    vector_index_max_partitions: int = 256  # assistidos kept warm (LRU)
+    vector_index_max_mb: int = 1024  # memory cap across partitions (LRU); larger partitions use the RPC
+    vector_index_refresh_seconds: int = 60  # incremental resync interval per partition
+    vector_index_ivf_min_rows: int = 20_000  # below this, exact search (one matmul)
+    vector_index_nprobe: int = 8
+    hybrid_rrf_k: int = 60  # reciprocal rank fusion constant
+    hybrid_candidate_depth: int = 50  # top-N per ranker fed into RRF
+    backfill_page_size: int = 200  # entities per page / bulk RPC
+    backfill_requests_per_minute: int = 1500  # global embedding API budget for backfill
+    backfill_tokens_per_minute: int = 1_000_000
 
     # --- PJe Scraper (CDP — connect to existing Chrome) ---
     pje_cdp_url: str = "http://127.0.0.1:9222"
@@ -91,8 +127,38 @@ class Settings(BaseSettings):
     siga_scrape_rate_limit_seconds: float = 1.5
     siga_scrape_timeout: int = 20_000
 
+    # --- LLM gateway (shared limits across all services) ---
+    llm_gemini_rpm: int | None = None  # defaults to gemini_rate_limit
+    llm_gemini_tpm: int = 1_000_000
+    llm_anthropic_rpm: int = 50
+    llm_anthropic_tpm: int = 400_000
+    llm_openai_rpm: int = 500
+    llm_openai_tpm: int = 200_000
+    llm_model_limits: dict[str, dict[str, int]] = {}  # per-model override, e.g. {"claude-haiku-4-5-20251001": {"rpm": 200}}
+    llm_max_concurrency: int = 8  # in-flight requests per provider
+    llm_batch_max_concurrency: int = 5  # slots batch jobs may hold (rest reserved for interactive)
+    llm_max_retries: int = 4
+    llm_retry_base_seconds: float = 1.0
+    llm_retry_max_seconds: float = 30.0
+    llm_cache_enabled: bool = True  # deterministic extraction responses keyed by (model, prompt, context, config)
+    llm_cache_max_mb: int = 512
+    llm_cache_ttl_hours: int = 24 * 7
+    batch_poll_seconds: float = 60.0  # offline provider batches (Anthropic Message Batches / Gemini batch)
+    llm_telemetry_buffer: int = 2000  # last N calls kept in memory for GET /metrics/llm
+    llm_ledger_path: str = ""  # optional SQLite ledger of every call, e.g. /tmp/ombuds-cache/llm_ledger.db
+    llm_model_prices: dict[str, list[float]] = {}  # USD per 1M tokens [input, output] by model prefix
+
+    # --- Local caches ---
+    cache_dir: str = "/tmp/ombuds-cache"
+
     # --- Limites ---
     max_text_length: int = 100_000  # chars
+    extraction_map_reduce: bool = True  # split longer inputs on headings instead of truncating
+    cross_analysis_max_input_chars: int = 150_000  # per cross-analysis call; larger cases are merged in steps
+    cross_analysis_incremental: bool = True  # auto-trigger merges only new depoimentos into the stored result
+    consolidation_context_tokens: int = 20_000  # /consolidate context budget, ranked sections past it are omitted
+    enrichment_single_pass: bool = True  # local pre-classifier + one extraction call per document
+    local_classifier_min_confidence: float = 0.75  # below this, fall back to the LLM classifier
     rate_limit_per_minute: int = 100
 
     model_config = {
@@ -3,16 +3,24 @@ OMBUDS Enrichment Engine — Sistema Nervoso Defensivo
 FastAPI service: Docling (parsing) + Gemini Flash (semântica) + Supabase (storage)
 """
 
+import asyncio
 import logging
 import os
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 from auth import ApiKeyMiddleware
 from config import get_settings
+from services.docling_service import get_docling_service, shutdown_docling_service
+from services.embedding_cache import get_embedding_cache
+from services.llm_cache import get_llm_cache
+from services.download_service import close_http_client
+from services.transcription_service import get_transcription_service, shutdown_transcription_service
+from services.llm_telemetry import close_llm_telemetry, llm_route
 from routers.health import router as health_router
+from routers.metrics import router as metrics_router
 from routers.document import router as document_router
 from routers.pje import router as pje_router
 from routers.transcript import router as transcript_router
@@ -52,6 +60,13 @@ logging.basicConfig(
 logger = logging.getLogger("enrichment-engine")
 
 
+def _open_caches() -> None:
+    """Cria os DiskCache (mkdir + varredura do diretório) — roda numa thread."""
+    get_docling_service().open_cache()
+    get_embedding_cache()
+    get_llm_cache()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup/shutdown events."""
@@ -76,9 +91,20 @@ async def lifespan(app: FastAPI):
     if not settings.anthropic_api_key:
         logger.warning("ANTHROPIC_API_KEY not set — Claude review/improve disabled")
 
+    # pyannote leva dezenas de segundos para carregar: workers sobem já no startup
+    if settings.diarization_enabled and settings.hf_token and settings.diarization_warmup:
+        get_transcription_service().warm_up_diarization()
+
+    # Abrir os caches de disco fora do event loop, antes da primeira request
+    await asyncio.to_thread(_open_caches)
+
     yield
 
     logger.info("Shutting down Enrichment Engine")
+    shutdown_docling_service()
+    shutdown_transcription_service()
+    await close_http_client()
+    close_llm_telemetry()
 
 
 def create_app() -> FastAPI:
@@ -102,8 +128,15 @@ def create_app() -> FastAPI:
     )
     app.add_middleware(ApiKeyMiddleware)
 
+    @app.middleware("http")
+    async def llm_route_context(request: Request, call_next):
+        # Chamadas de LLM da request (e das background tasks dela) levam a rota na telemetria
+        with llm_route(f"{request.method} {request.url.path}"):
+            return await call_next(request)
+
     # --- Routers ---
     app.include_router(health_router, tags=["Health"])
+    app.include_router(metrics_router, tags=["Health"])
     app.include_router(document_router, prefix="/enrich", tags=["Enrich"])
     app.include_router(pje_router, prefix="/enrich", tags=["Enrich"])
     app.include_router(transcript_router, prefix="/enrich", tags=["Enrich"])
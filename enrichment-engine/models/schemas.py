@@ -798,6 +798,13 @@ class AnalyzeInput(BaseModel):
     file_name: str = Field("transcricao", description="Nome do arquivo (para contexto)")
     speakers: list[str] | None = Field(None, description="Lista de speakers identificados")
     assistido_nome: str | None = Field(None, description="Nome do assistido (para contexto)")
+    case_context: str | None = Field(
+        None,
+        description=(
+            "Dossiê do caso, igual entre depoimentos do mesmo processo (prefixo com prompt caching). "
+            "Em /api/analyze-async, se omitido, é montado a partir do processo e dos fatos do drive_file"
+        ),
+    )
 
 
 class AnalyzeAsyncInput(AnalyzeInput):
@@ -994,3 +1001,7 @@ class HealthResponse(BaseModel):
     supabase_configured: bool
     solar_configured: bool = False
     transcription_configured: bool = False
+    docling_cache: dict | None = None
+    embedding_cache: dict | None = None
+    vector_index: dict | None = None
+    llm_cache: dict | None = None
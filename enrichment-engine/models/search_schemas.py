@@ -2,6 +2,8 @@
 Schemas para busca semântica via pgvector.
 """
 
+from typing import Literal
+
 from pydantic import BaseModel, Field
 
 
@@ -9,6 +11,15 @@ class SemanticSearchInput(BaseModel):
     query: str = Field(..., min_length=2, max_length=1000)
     filters: dict = Field(default_factory=dict, description="assistido_id, processo_id, entity_types")
     limit: int = Field(20, ge=1, le=100)
+    mode: Literal["vector", "hybrid"] = Field(
+        "vector",
+        description=(
+            "vector = score é a similaridade de cosseno; hybrid = BM25 + vetor (RRF), "
+            "score é o valor RRF e o cosseno vem em vector_score; requer filters.assistido_id"
+        ),
+    )
+    vector_weight: float = Field(1.0, ge=0.0, le=10.0)
+    text_weight: float = Field(1.0, ge=0.0, le=10.0)
 
 
 class SearchResultItem(BaseModel):
@@ -19,6 +30,8 @@ class SearchResultItem(BaseModel):
     chunk_index: int = 0
     content_text: str
     score: float
+    vector_score: float | None = None
+    text_score: float | None = None
     metadata: dict = Field(default_factory=dict)
 
 
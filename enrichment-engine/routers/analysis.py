@@ -8,6 +8,7 @@ from datetime import datetime, timezone
 
 from fastapi import APIRouter, BackgroundTasks, HTTPException, status
 
+from config import get_settings
 from models.schemas import AnalyzeAsyncInput
 from services.analysis_service import get_analysis_service
 
@@ -94,14 +95,33 @@ async def _maybe_trigger_cross_analysis(client, db_record_id: int, analysis: dic
         assistido_nome = assistido_row.data.get("nome") if assistido_row.data else None
 
         # Fire cross-analysis
-        from services.cross_analysis_service import get_cross_analysis_service
+        from services.cross_analysis_service import RESULT_KEYS, get_cross_analysis_service
         svc = get_cross_analysis_service()
         if not svc.available:
             return
 
+        existing = client.table("cross_analyses").select(
+            "id, source_file_ids, " + ", ".join(RESULT_KEYS)
+        ).eq(
+            "assistido_id", assistido_id
+        ).order("created_at", desc=True).limit(1).execute()
+
+        # Incremental: merge only the new depoimentos into the stored result,
+        # unless a previously covered file is gone (then re-run from scratch)
+        previous = None
+        current_ids = {f["file_id"] for f in analyzed_files}
+        if existing.data and get_settings().cross_analysis_incremental:
+            covered_ids = set(existing.data[0].get("source_file_ids") or [])
+            if covered_ids and covered_ids <= current_ids:
+                if covered_ids == current_ids:
+                    logger.info("Cross-analysis up to date | assistido_id=%d", assistido_id)
+                    return
+                previous = existing.data[0]
+
         result = await svc.cross_analyze(
             analyses=analyzed_files,
             assistido_nome=assistido_nome,
+            previous=previous,
         )
 
         if not result:
@@ -110,11 +130,7 @@ async def _maybe_trigger_cross_analysis(client, db_record_id: int, analysis: dic
 
         # Save to cross_analyses table
         from datetime import datetime, timezone as tz
-        source_file_ids = [f["file_id"] for f in analyzed_files]
-
-        existing = client.table("cross_analyses").select("id").eq(
-            "assistido_id", assistido_id
-        ).order("created_at", desc=True).limit(1).execute()
+        source_file_ids = result.get("source_file_ids") or [f["file_id"] for f in analyzed_files]
 
         row_data = {
             "assistido_id": assistido_id,
@@ -124,7 +140,7 @@ async def _maybe_trigger_cross_analysis(client, db_record_id: int, analysis: dic
             "mapa_atores": result.get("mapa_atores", []),
             "providencias_agregadas": result.get("providencias_agregadas", []),
             "source_file_ids": source_file_ids,
-            "analysis_count": len(analyzed_files),
+            "analysis_count": len(source_file_ids),
             "model_version": "sonnet-cross-v1",
             "updated_at": datetime.now(tz.utc).isoformat(),
         }
@@ -302,11 +318,17 @@ async def _process_analysis_background(input_data: AnalyzeAsyncInput):
 
         _update_progress(db_record_id, "analyzing", 30, "Analisando com Claude Sonnet...")
 
+        case_context = input_data.case_context
+        if case_context is None:
+            from services.supabase_service import get_supabase_service
+            case_context = await get_supabase_service().get_case_context(db_record_id)
+
         analysis = await analysis_svc.analyze_deposition(
             transcript=input_data.transcript,
             file_name=input_data.file_name,
             speakers=input_data.speakers,
             assistido_nome=input_data.assistido_nome,
+            case_context=case_context,
         )
 
         if not analysis:
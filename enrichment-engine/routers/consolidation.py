@@ -3,12 +3,14 @@ POST /consolidate — Consolida dados enriquecidos de multiplos documentos
 de um caso em uma visao sintetica unificada.
 """
 
-import json
+import asyncio
 import logging
 
 from fastapi import APIRouter, HTTPException, status
 
+from config import get_settings
 from models.schemas import ConsolidationInput, ConsolidationOutput
+from services.context_budget import BudgetedContext, build_case_sections, fit_sections, get_token_counter
 from services.gemini_service import get_gemini_service
 from prompts.case_synthesis import CASE_SYNTHESIS_PROMPT
 
@@ -16,55 +18,28 @@ logger = logging.getLogger("enrichment-engine.consolidation")
 router = APIRouter()
 
 
-def _build_context(input_data: ConsolidationInput) -> str:
-    """Monta o contexto textual a partir dos enrichments agregados."""
-    parts: list[str] = []
-
-    # Documentos enriquecidos
-    if input_data.documents:
-        parts.append("=== DOCUMENTOS ENRIQUECIDOS ===\n")
-        for i, doc in enumerate(input_data.documents):
-            parts.append(f"--- Documento #{i+1}: {doc.get('nome', 'Sem nome')} ---")
-            parts.append(f"Tipo: {doc.get('document_type', 'desconhecido')}")
-            if doc.get("extracted_data"):
-                parts.append(f"Dados extraidos: {json.dumps(doc['extracted_data'], ensure_ascii=False, indent=2)}")
-            if doc.get("markdown_preview"):
-                # Truncar preview para economizar tokens
-                preview = doc["markdown_preview"][:2000]
-                parts.append(f"Preview:\n{preview}")
-            parts.append("")
-
-    # Transcricoes de atendimento
-    if input_data.transcripts:
-        parts.append("=== TRANSCRICOES DE ATENDIMENTO ===\n")
-        for i, t in enumerate(input_data.transcripts):
-            parts.append(f"--- Atendimento #{i+1} ---")
-            if t.get("key_points"):
-                parts.append(f"Pontos-chave: {json.dumps(t['key_points'], ensure_ascii=False)}")
-            if t.get("facts"):
-                parts.append(f"Fatos: {json.dumps(t['facts'], ensure_ascii=False)}")
-            if t.get("persons_mentioned"):
-                parts.append(f"Pessoas: {json.dumps(t['persons_mentioned'], ensure_ascii=False)}")
-            if t.get("contradictions"):
-                parts.append(f"Contradicoes: {json.dumps(t['contradictions'], ensure_ascii=False)}")
-            if t.get("teses_possiveis"):
-                parts.append(f"Teses: {json.dumps(t['teses_possiveis'], ensure_ascii=False)}")
-            parts.append("")
-
-    # Demandas enriquecidas
-    if input_data.demandas:
-        parts.append("=== DEMANDAS/INTIMACOES ===\n")
-        for i, d in enumerate(input_data.demandas):
-            parts.append(f"--- Demanda #{i+1} ---")
-            parts.append(json.dumps(d, ensure_ascii=False, indent=2))
-            parts.append("")
-
-    # Contexto adicional
-    if input_data.context:
-        parts.append("=== CONTEXTO ADICIONAL ===\n")
-        parts.append(json.dumps(input_data.context, ensure_ascii=False, indent=2))
-
-    return "\n".join(parts)
+def _build_context(input_data: ConsolidationInput) -> BudgetedContext:
+    """
+    Monta o contexto a partir dos enrichments agregados, compacto e dentro do
+    orçamento de tokens (pessoas/fatos deduplicados, seções mais relevantes primeiro).
+    """
+    settings = get_settings()
+    sections, dedup = build_case_sections(
+        input_data.documents or [],
+        input_data.transcripts or [],
+        input_data.demandas or [],
+        input_data.context,
+    )
+    budgeted = fit_sections(
+        sections,
+        settings.consolidation_context_tokens,
+        get_token_counter(settings.gemini_model),
+    )
+    logger.info(
+        "Consolidation context | %s persons=%d duplicate_facts=%d",
+        budgeted.stats(), dedup["persons"], dedup["duplicate_facts"],
+    )
+    return budgeted
 
 
 @router.post("/consolidate", response_model=ConsolidationOutput)
@@ -73,7 +48,7 @@ async def consolidate_case(input_data: ConsolidationInput) -> ConsolidationOutpu
     Consolida enrichments de multiplos documentos em uma analise sintetica.
 
     1. Recebe dados ja enriquecidos de documentos, transcricoes e demandas
-    2. Monta contexto textual concatenado
+    2. Monta contexto compacto dentro do orçamento de tokens
     3. Gemini Pro sintetiza em visao unificada
     4. Retorna dados estruturados para persistencia no OMBUDS
     """
@@ -97,9 +72,10 @@ async def consolidate_case(input_data: ConsolidationInput) -> ConsolidationOutpu
         )
 
     try:
-        context = _build_context(input_data)
+        # Tokenizer local é CPU-bound (e baixa o modelo na primeira chamada)
+        context = await asyncio.to_thread(_build_context, input_data)
         gemini = get_gemini_service()
-        result = await gemini.extract(CASE_SYNTHESIS_PROMPT, context)
+        result = await gemini.extract(CASE_SYNTHESIS_PROMPT, context.text)
 
         return ConsolidationOutput(
             resumo=result.get("resumo", ""),
@@ -1,12 +1,18 @@
 """
 POST /api/cross-analyze — Análise cruzada de múltiplos depoimentos com Claude Sonnet.
 Compara análises individuais para encontrar contradições, corroborações e lacunas.
+
+POST /api/cross-analyze/stream — Mesma análise via Server-Sent Events: cada
+item (entrada da contradiction_matrix, ator, tese...) é enviado assim que o
+modelo o completa, e o resultado final é salvo como no fluxo async.
 """
 
+import json
 import logging
 from datetime import datetime, timezone
 
 from fastapi import APIRouter, BackgroundTasks, HTTPException, status
+from fastapi.responses import StreamingResponse
 
 from models.schemas import CrossAnalyzeInput
 from services.cross_analysis_service import get_cross_analysis_service
@@ -39,6 +45,61 @@ def _update_cross_progress(assistido_id: int, step: str, progress: int, detail:
         )
 
 
+def _save_cross_analysis(
+    input_data: CrossAnalyzeInput,
+    result: dict,
+    source_file_ids: list[int] | None = None,
+) -> None:
+    """Upsert do resultado na tabela cross_analyses via Supabase."""
+    assistido_id = input_data.assistido_id
+
+    from services.supabase_service import get_supabase_service
+    supa = get_supabase_service()
+    client = supa._get_client()
+
+    # Depoimentos efetivamente cobertos (uma etapa incremental pode ter falhado)
+    source_file_ids = (
+        source_file_ids
+        or result.get("source_file_ids")
+        or [a.file_id for a in input_data.analyses]
+    )
+
+    # Upsert: update existing or create new
+    existing = client.table("cross_analyses").select("id").eq(
+        "assistido_id", assistido_id
+    ).order("created_at", desc=True).limit(1).execute()
+
+    row_data = {
+        "assistido_id": assistido_id,
+        "contradiction_matrix": result.get("contradiction_matrix", []),
+        "tese_consolidada": result.get("tese_consolidada", {}),
+        "timeline_fatos": result.get("timeline_fatos", []),
+        "mapa_atores": result.get("mapa_atores", []),
+        "providencias_agregadas": result.get("providencias_agregadas", []),
+        "source_file_ids": source_file_ids,
+        "analysis_count": len(source_file_ids),
+        "model_version": "sonnet-cross-v1",
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+    if existing.data:
+        client.table("cross_analyses").update(row_data).eq(
+            "id", existing.data[0]["id"]
+        ).execute()
+        logger.info("Cross-analysis UPDATED | assistido_id=%d | id=%d", assistido_id, existing.data[0]["id"])
+    else:
+        row_data["created_at"] = datetime.now(timezone.utc).isoformat()
+        client.table("cross_analyses").insert(row_data).execute()
+        logger.info("Cross-analysis CREATED | assistido_id=%d", assistido_id)
+
+    logger.info(
+        "Cross-analysis COMPLETED | assistido_id=%d | contradictions=%d | timeline=%d",
+        assistido_id,
+        len(result.get("contradiction_matrix", [])),
+        len(result.get("timeline_fatos", [])),
+    )
+
+
 async def _process_cross_analysis_background(input_data: CrossAnalyzeInput):
     """Background task: executa cross-analysis e salva resultado no Supabase."""
     assistido_id = input_data.assistido_id
@@ -64,47 +125,7 @@ async def _process_cross_analysis_background(input_data: CrossAnalyzeInput):
             logger.warning("Cross-analysis returned None for assistido_id=%d", assistido_id)
             return
 
-        # Save to cross_analyses table via Supabase
-        from services.supabase_service import get_supabase_service
-        supa = get_supabase_service()
-        client = supa._get_client()
-
-        source_file_ids = [a.file_id for a in input_data.analyses]
-
-        # Upsert: update existing or create new
-        existing = client.table("cross_analyses").select("id").eq(
-            "assistido_id", assistido_id
-        ).order("created_at", desc=True).limit(1).execute()
-
-        row_data = {
-            "assistido_id": assistido_id,
-            "contradiction_matrix": result.get("contradiction_matrix", []),
-            "tese_consolidada": result.get("tese_consolidada", {}),
-            "timeline_fatos": result.get("timeline_fatos", []),
-            "mapa_atores": result.get("mapa_atores", []),
-            "providencias_agregadas": result.get("providencias_agregadas", []),
-            "source_file_ids": source_file_ids,
-            "analysis_count": len(input_data.analyses),
-            "model_version": "sonnet-cross-v1",
-            "updated_at": datetime.now(timezone.utc).isoformat(),
-        }
-
-        if existing.data:
-            client.table("cross_analyses").update(row_data).eq(
-                "id", existing.data[0]["id"]
-            ).execute()
-            logger.info("Cross-analysis UPDATED | assistido_id=%d | id=%d", assistido_id, existing.data[0]["id"])
-        else:
-            row_data["created_at"] = datetime.now(timezone.utc).isoformat()
-            client.table("cross_analyses").insert(row_data).execute()
-            logger.info("Cross-analysis CREATED | assistido_id=%d", assistido_id)
-
-        logger.info(
-            "Cross-analysis COMPLETED | assistido_id=%d | contradictions=%d | timeline=%d",
-            assistido_id,
-            len(result.get("contradiction_matrix", [])),
-            len(result.get("timeline_fatos", [])),
-        )
+        _save_cross_analysis(input_data, result)
 
     except Exception as e:
         logger.error("Cross-analysis FAILED | assistido_id=%d | error=%s", assistido_id, str(e))
@@ -154,3 +175,74 @@ async def cross_analyze_async(
         "message": f"Cross-analysis de {len(input_data.analyses)} depoimentos iniciada",
         "assistido_id": input_data.assistido_id,
     }
+
+
+def _sse(event: str, data) -> str:
+    """Formata um evento Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/cross-analyze/stream")
+async def cross_analyze_stream(input_data: CrossAnalyzeInput):
+    """
+    Análise cruzada em streaming (text/event-stream).
+
+    Eventos:
+    - item: {"path": ["contradiction_matrix", 0], "data": {...}} por item completo
+    - progress: {"covered": 12, "total": 30} — casos grandes, processados em etapas
+    - result: {"data": {...}, "truncated": bool} — resultado final, também salvo em cross_analyses
+    - error: {"detail": "..."}
+    """
+    if len(input_data.analyses) < 2:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cross-analysis requer pelo menos 2 análises individuais",
+        )
+
+    svc = get_cross_analysis_service()
+    if not svc.available:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Cross-analysis service not available",
+        )
+
+    logger.info(
+        "Cross-analysis stream | assistido_id=%d | num_analyses=%d",
+        input_data.assistido_id,
+        len(input_data.analyses),
+    )
+
+    async def events():
+        try:
+            async for event in svc.cross_analyze_stream(
+                analyses=[a.model_dump() for a in input_data.analyses],
+                assistido_nome=input_data.assistido_nome,
+            ):
+                if event["event"] == "item":
+                    yield _sse("item", {"path": event["path"], "data": event["data"]})
+                    continue
+                if event["event"] == "progress":
+                    yield _sse("progress", {"covered": event["covered"], "total": event["total"]})
+                    continue
+                result = event["data"]
+                if result:
+                    try:
+                        _save_cross_analysis(input_data, result, event["source_file_ids"])
+                    except Exception as e:
+                        logger.error(
+                            "Cross-analysis save FAILED | assistido_id=%d | error=%s",
+                            input_data.assistido_id, str(e),
+                        )
+                yield _sse("result", {"data": result, "truncated": event["truncated"]})
+        except Exception as e:
+            logger.error(
+                "Cross-analysis stream FAILED | assistido_id=%d | error=%s",
+                input_data.assistido_id, str(e),
+            )
+            yield _sse("error", {"detail": str(e)[:300]})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
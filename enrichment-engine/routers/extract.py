@@ -12,6 +12,8 @@ import httpx
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
+from services.docling_pool import DoclingPoolFullError
+
 logger = logging.getLogger("enrichment-engine.extract")
 router = APIRouter()
 
@@ -44,7 +46,10 @@ def _split_markdown_to_pages(markdown: str) -> list[ExtractPage]:
     import re
 
     # Try to split by page markers that Docling sometimes inserts
-    page_texts = re.split(r'\n---\n|\n## Page \d+\n', markdown)
+    # ("## Page N" is also emitted by DoclingService sharded parsing)
+    page_texts = re.split(r'\n---\n|(?:^|\n)## Page \d+\n', markdown)
+    if len(page_texts) > 1 and not page_texts[0].strip():
+        page_texts = page_texts[1:]
 
     if len(page_texts) <= 1:
         # No page markers — split by approximate chunk size (~3000 chars per page)
@@ -92,34 +97,36 @@ async def extract_text_endpoint(request: ExtractTextRequest):
             detail=f"Docling service unavailable: {e}",
         )
 
-    # Download file
-    try:
-        if request.file_url.startswith("drive://"):
-            raise HTTPException(
-                status_code=400,
-                detail="Google Drive URLs not supported. Provide a direct/signed URL.",
-            )
-
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            resp = await client.get(request.file_url)
-            resp.raise_for_status()
-            pdf_bytes = resp.content
+    # Download file (streamed to disk, size-bounded)
+    if request.file_url.startswith("drive://"):
+        raise HTTPException(
+            status_code=400,
+            detail="Google Drive URLs not supported. Provide a direct/signed URL.",
+        )
 
+    try:
+        file_path, _mime = await docling.download_file(request.file_url)
         logger.info(
             "Downloaded file for extraction | size=%.1fKB | url=%s",
-            len(pdf_bytes) / 1024,
+            file_path.stat().st_size / 1024,
             request.file_url[:80],
         )
     except httpx.HTTPStatusError as e:
         raise HTTPException(status_code=502, detail=f"Failed to download: {e}")
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
-    # Parse with Docling
+    # Parse with Docling (worker pool — keeps the event loop free)
     try:
-        markdown = docling.parse_from_bytes(pdf_bytes)
+        markdown = await docling.parse_to_markdown_async(file_path)
         ocr_applied = get_docling_service().settings.docling_ocr_enabled
+    except DoclingPoolFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error("Docling extraction failed: %s", e)
         raise HTTPException(status_code=500, detail=f"Extraction failed: {e}")
+    finally:
+        file_path.unlink(missing_ok=True)
 
     # Split into pages
     pages = _split_markdown_to_pages(markdown)
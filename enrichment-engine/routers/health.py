@@ -9,6 +9,10 @@ from fastapi import APIRouter
 
 from config import get_settings
 from models.schemas import HealthResponse
+from services.docling_service import peek_docling_service
+from services.embedding_cache import peek_embedding_cache
+from services.llm_cache import peek_llm_cache
+from services.vector_index import get_vector_index
 
 logger = logging.getLogger("enrichment-engine.health")
 router = APIRouter()
@@ -27,6 +31,12 @@ async def health_check() -> HealthResponse:
     except ImportError:
         logger.warning("Docling not available — document parsing will fail")
 
+    # Healthcheck do Railway (timeout 30s): só lê caches já abertos — criar um
+    # DiskCache aqui faria mkdir + stat de cada arquivo dentro do event loop
+    docling = peek_docling_service()
+    embedding_cache = peek_embedding_cache()
+    llm_cache = peek_llm_cache()
+
     return HealthResponse(
         status="ok",
         version=settings.app_version,
@@ -35,4 +45,8 @@ async def health_check() -> HealthResponse:
         supabase_configured=bool(settings.supabase_url and settings.supabase_service_role_key),
         solar_configured=bool(settings.solar_username and settings.solar_password),
         transcription_configured=bool(settings.openai_api_key or settings.gemini_api_key),
+        docling_cache=docling.cache_stats() if docling is not None else None,
+        embedding_cache=embedding_cache.stats() if embedding_cache is not None else None,
+        vector_index=get_vector_index().stats(),
+        llm_cache=llm_cache.stats() if llm_cache is not None else None,
     )
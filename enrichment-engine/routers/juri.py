@@ -5,11 +5,11 @@ Flow: Download file -> OCR if needed -> Claude extraction -> structured JSON
 """
 from __future__ import annotations
 
+import asyncio
 import base64
-import json
 import logging
-import re
 import time
+from pathlib import Path
 from typing import Any, Literal
 
 import httpx
@@ -18,6 +18,8 @@ from pydantic import BaseModel
 
 from config import get_settings
 from prompts.juri_extraction import PROMPT_ATA, PROMPT_QUESITOS, PROMPT_SENTENCA
+from services.download_service import DownloadedFile, download_to_tempfile
+from services.llm_telemetry import llm_prompt
 
 logger = logging.getLogger("enrichment-engine.juri")
 
@@ -92,20 +94,17 @@ def _detect_file_type(url: str, content_type: str | None) -> Literal["pdf", "ima
     return "pdf"
 
 
-async def _download_file(url: str) -> tuple[bytes, str | None]:
-    """Download file from URL, return (bytes, content_type)."""
-    async with httpx.AsyncClient(timeout=120.0, follow_redirects=True) as client:
-        resp = await client.get(url)
-        resp.raise_for_status()
-        content_type = resp.headers.get("content-type")
-        return resp.content, content_type
+async def _download_file(url: str) -> DownloadedFile:
+    """Download file from URL (streamed to disk, size-bounded). Caller removes the file."""
+    max_bytes = get_settings().docling_max_file_size_mb * 1024 * 1024
+    return await download_to_tempfile(url, max_bytes=max_bytes)
 
 
-async def _ocr_pdf(pdf_bytes: bytes) -> str:
+async def _ocr_pdf(pdf_path: Path) -> str:
     """Extract text from PDF using existing OCR service."""
     from services.ocr_service import extract_text_with_ocr
 
-    result = await extract_text_with_ocr(pdf_bytes, language="por", dpi=300)
+    result = await extract_text_with_ocr(pdf_path, language="por", dpi=300)
 
     if result.get("error"):
         logger.warning("OCR completed with error: %s", result["error"])
@@ -118,15 +117,17 @@ async def _ocr_pdf(pdf_bytes: bytes) -> str:
     return "\n\n".join(p["text"] for p in pages if p.get("text"))
 
 
-async def _ocr_image(image_bytes: bytes) -> str:
+async def _ocr_image(image_path: Path) -> str:
     """Extract text from an image using Tesseract directly."""
     try:
         import pytesseract
         from PIL import Image
-        import io
 
-        img = Image.open(io.BytesIO(image_bytes))
-        text = pytesseract.image_to_string(img, lang="por")
+        def _run() -> str:
+            with Image.open(image_path) as img:
+                return pytesseract.image_to_string(img, lang="por")
+
+        text = await asyncio.to_thread(_run)
         return text.strip()
     except ImportError as e:
         logger.warning("Image OCR dependencies missing: %s", e)
@@ -149,8 +150,9 @@ def _image_media_type(url: str, content_type: str | None) -> str:
     return "image/jpeg"  # safe default
 
 
+@llm_prompt("juri.vision")
 async def _extract_with_claude_vision(
-    image_bytes: bytes,
+    image_path: Path,
     media_type: str,
     system_prompt: str,
 ) -> dict[str, Any]:
@@ -159,16 +161,16 @@ async def _extract_with_claude_vision(
     if not settings.anthropic_api_key:
         raise ValueError("ANTHROPIC_API_KEY not configured")
 
-    import anthropic
-
-    client = anthropic.AsyncAnthropic(api_key=settings.anthropic_api_key)
+    from services.llm_gateway import cache_block, get_llm_gateway
 
+    # The API takes the image inline: read it only here (bounded by docling_max_file_size_mb)
+    image_bytes = await asyncio.to_thread(image_path.read_bytes)
     b64_image = base64.b64encode(image_bytes).decode("utf-8")
 
-    message = await client.messages.create(
+    message = await get_llm_gateway().anthropic_messages(
         model=settings.claude_sonnet_model,
         max_tokens=settings.claude_max_tokens,
-        system=system_prompt,
+        system=[cache_block(system_prompt)],
         messages=[
             {
                 "role": "user",
@@ -194,6 +196,7 @@ async def _extract_with_claude_vision(
     return _parse_json_response(response_text)
 
 
+@llm_prompt("juri.text")
 async def _extract_with_claude_text(
     text: str,
     system_prompt: str,
@@ -203,9 +206,7 @@ async def _extract_with_claude_text(
     if not settings.anthropic_api_key:
         raise ValueError("ANTHROPIC_API_KEY not configured")
 
-    import anthropic
-
-    client = anthropic.AsyncAnthropic(api_key=settings.anthropic_api_key)
+    from services.llm_gateway import cache_block, get_llm_gateway
 
     # Truncate if too long
     max_chars = 150_000
@@ -213,10 +214,10 @@ async def _extract_with_claude_text(
         text = text[:max_chars] + "\n\n[... TEXTO TRUNCADO POR LIMITE ...]"
         logger.warning("Text truncated from %d to %d chars", len(text), max_chars)
 
-    message = await client.messages.create(
+    message = await get_llm_gateway().anthropic_messages(
         model=settings.claude_sonnet_model,
         max_tokens=settings.claude_max_tokens,
-        system=system_prompt,
+        system=[cache_block(system_prompt)],
         messages=[
             {
                 "role": "user",
@@ -230,32 +231,14 @@ async def _extract_with_claude_text(
 
 
 def _parse_json_response(response_text: str) -> dict[str, Any]:
-    """Parse JSON from Claude response, handling markdown code blocks."""
-    # Try direct parse
-    try:
-        return json.loads(response_text.strip())
-    except json.JSONDecodeError:
-        pass
-
-    # Try extracting from markdown code block
-    json_match = re.search(r"```(?:json)?\s*\n?(.*?)\n?```", response_text, re.DOTALL)
-    if json_match:
-        try:
-            return json.loads(json_match.group(1).strip())
-        except json.JSONDecodeError:
-            pass
-
-    # Try finding first { to last }
-    first_brace = response_text.find("{")
-    last_brace = response_text.rfind("}")
-    if first_brace != -1 and last_brace > first_brace:
-        try:
-            return json.loads(response_text[first_brace : last_brace + 1])
-        except json.JSONDecodeError:
-            pass
-
-    logger.warning("Failed to parse Claude JSON response")
-    raise ValueError("Could not parse structured data from Claude response")
+    """Parse JSON from Claude response (code fences, prose and truncated tails tolerated)."""
+    from services.json_stream import parse_json_lenient
+
+    result = parse_json_lenient(response_text, root="{")
+    if not result:
+        logger.warning("Failed to parse Claude JSON response")
+        raise ValueError("Could not parse structured data from Claude response")
+    return result
 
 
 # ---------------------------------------------------------------------------
@@ -288,11 +271,13 @@ async def juri_extraction_endpoint(request: JuriExtractionRequest):
     prompt = PROMPT_MAP[request.tipo]
     ocr_text: str | None = None
 
+    downloaded: DownloadedFile | None = None
     try:
-        # 1. Download file
+        # 1. Download file (stays on disk; removed in finally)
         logger.info("Downloading file | tipo=%s | url=%s", request.tipo, request.file_url[:100])
-        file_bytes, content_type = await _download_file(request.file_url)
-        logger.info("Downloaded %d bytes | content_type=%s", len(file_bytes), content_type)
+        downloaded = await _download_file(request.file_url)
+        file_path, content_type = downloaded.path, downloaded.content_type
+        logger.info("Downloaded %d bytes | content_type=%s", downloaded.size, content_type)
 
         # 2. Detect file type
         file_type = _detect_file_type(request.file_url, content_type)
@@ -302,7 +287,7 @@ async def juri_extraction_endpoint(request: JuriExtractionRequest):
         if file_type == "pdf":
             # PDF -> OCR -> Claude text extraction
             logger.info("Processing PDF with OCR...")
-            ocr_text = await _ocr_pdf(file_bytes)
+            ocr_text = await _ocr_pdf(file_path)
 
             if not ocr_text or len(ocr_text.strip()) < 20:
                 raise ValueError("OCR produced insufficient text from PDF")
@@ -321,17 +306,17 @@ async def juri_extraction_endpoint(request: JuriExtractionRequest):
             if vision_supported:
                 try:
                     logger.info("Using Claude vision for image extraction (media_type=%s)", media_type)
-                    dados = await _extract_with_claude_vision(file_bytes, media_type, prompt)
+                    dados = await _extract_with_claude_vision(file_path, media_type, prompt)
                 except Exception as e:
                     logger.warning("Claude vision failed, falling back to OCR: %s", str(e))
-                    ocr_text = await _ocr_image(file_bytes)
+                    ocr_text = await _ocr_image(file_path)
                     if not ocr_text or len(ocr_text.strip()) < 20:
                         raise ValueError("OCR produced insufficient text from image") from e
                     dados = await _extract_with_claude_text(ocr_text, prompt)
             else:
                 # Unsupported vision format (e.g. TIFF) — use OCR
                 logger.info("Vision not supported for %s, using OCR", media_type)
-                ocr_text = await _ocr_image(file_bytes)
+                ocr_text = await _ocr_image(file_path)
                 if not ocr_text or len(ocr_text.strip()) < 20:
                     raise ValueError("OCR produced insufficient text from image")
                 dados = await _extract_with_claude_text(ocr_text, prompt)
@@ -372,3 +357,6 @@ async def juri_extraction_endpoint(request: JuriExtractionRequest):
             status_code=500,
             detail=f"Extraction error: {str(e)[:300]}",
         )
+    finally:
+        if downloaded is not None:
+            downloaded.path.unlink(missing_ok=True)
@@ -0,0 +1,31 @@
+"""
+GET /metrics/llm — Telemetria das chamadas de LLM (ring buffer em memória).
+Agrega latência, tokens, retries, cache e custo estimado por prompt, rota ou modelo.
+"""
+
+import logging
+from typing import Literal
+
+from fastapi import APIRouter, Query
+
+from services.llm_gateway import get_llm_gateway
+from services.llm_telemetry import get_llm_telemetry
+
+logger = logging.getLogger("enrichment-engine.metrics")
+router = APIRouter()
+
+
+@router.get("/metrics/llm")
+async def llm_metrics(
+    by: Literal["prompt_id", "route", "model", "provider"] = "prompt_id",
+    recent: int = Query(50, ge=0, le=5000, description="Últimas N chamadas a incluir"),
+):
+    """Resumo agregado + chamadas recentes; o histórico completo fica no ledger SQLite."""
+    telemetry = get_llm_telemetry()
+    return {
+        "by": by,
+        "summary": telemetry.summary(by=by),
+        "recent": telemetry.recent(recent) if recent else [],
+        "telemetry": telemetry.stats(),
+        "gateway": get_llm_gateway().stats(),
+    }
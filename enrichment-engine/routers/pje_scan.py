@@ -21,6 +21,7 @@ from fastapi import APIRouter, HTTPException, status
 from pydantic import BaseModel
 
 from config import get_settings
+from services.llm_telemetry import llm_prompt
 from services.pje_scraper_service import get_pje_scraper_service
 
 logger = logging.getLogger("enrichment-engine.pje-scan")
@@ -176,6 +177,7 @@ JS_EXTRACT_INTIMACAO = """() => {
 # Gemini analysis helper
 # ---------------------------------------------------------------------------
 
+@llm_prompt("pje_scan.intimacao")
 async def _analyze_with_gemini(content: str) -> dict[str, Any]:
     """Analyze intimacao content using Gemini Flash to identify required actions."""
     settings = get_settings()
@@ -185,10 +187,9 @@ async def _analyze_with_gemini(content: str) -> dict[str, Any]:
         return {}
 
     try:
-        from google import genai
         from google.genai import types
 
-        client = genai.Client(api_key=settings.gemini_api_key)
+        from services.llm_gateway import get_llm_gateway
 
         prompt = f"""Analise o conteúdo desta intimação judicial e responda em JSON:
 {{
@@ -203,7 +204,7 @@ async def _analyze_with_gemini(content: str) -> dict[str, Any]:
 Conteúdo da intimação:
 {content}"""
 
-        response = await client.aio.models.generate_content(
+        response = await get_llm_gateway().gemini_generate(
             model="gemini-2.0-flash",
             contents=prompt,
             config=types.GenerateContentConfig(
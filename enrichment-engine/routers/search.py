@@ -1,5 +1,5 @@
 """
-POST /search/semantic — Busca semântica via pgvector.
+POST /search/semantic — Busca semântica (vetorial ou híbrida BM25 + vetor).
 POST /search/index — Indexa entidade no pgvector.
 """
 
@@ -30,10 +30,11 @@ def get_embedding_service():
 async def semantic_search(input_data: SemanticSearchInput):
     """Busca semântica via pgvector em todas as entidades."""
     logger.info(
-        "Semantic search | query='%s' filters=%s limit=%d",
+        "Semantic search | query='%s' filters=%s limit=%d mode=%s",
         input_data.query[:50],
         input_data.filters,
         input_data.limit,
+        input_data.mode,
     )
 
     try:
@@ -42,6 +43,9 @@ async def semantic_search(input_data: SemanticSearchInput):
             query=input_data.query,
             filters=input_data.filters,
             limit=input_data.limit,
+            mode=input_data.mode,
+            vector_weight=input_data.vector_weight,
+            text_weight=input_data.text_weight,
         )
 
         return SemanticSearchOutput(
@@ -79,11 +79,9 @@ async def summarize_chat(input_data: SummarizeChatInput) -> SummarizeChatOutput:
     )
 
     try:
-        import anthropic
+        from services.llm_gateway import get_llm_gateway
 
-        client = anthropic.Anthropic(api_key=settings.anthropic_api_key)
-
-        message = client.messages.create(
+        message = await get_llm_gateway().anthropic_messages(
             model=settings.claude_sonnet_model,
             max_tokens=settings.claude_max_tokens,
             system=SYSTEM_PROMPT,
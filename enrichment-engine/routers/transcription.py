@@ -180,10 +180,13 @@ async def _process_transcription_background(input_data: TranscribeAsyncInput):
                     )
                     _update_progress("analyzing", 70, "Analisando depoimento com Claude Sonnet...")
 
+                    from services.supabase_service import get_supabase_service
+
                     analysis = await analysis_svc.analyze_deposition(
                         transcript=transcript_text,
                         file_name=input_data.file_name,
                         speakers=result.get("speakers"),
+                        case_context=await get_supabase_service().get_case_context(db_record_id),
                     )
                     if analysis:
                         logger.info(
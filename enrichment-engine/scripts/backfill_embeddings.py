@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Backfill de embeddings — (re)indexa o corpus inteiro em lote.
+
+Fontes: documentos (conteudo_completo), anotacoes, case_facts → embeddings;
+drive_files (transcrições) → document_embeddings. Progresso em checkpoint:
+rodar de novo após um crash retoma da última página gravada, e as entidades
+que falharam (failed_ids) são reprocessadas antes de seguir.
+
+Cada escopo tem seu checkpoint: checkpoint.json para o corpus inteiro e
+checkpoint-assistido-<id>.json com --assistido-id, para que um onboarding
+não marque fontes como concluídas para o backfill completo.
+
+Usage:
+  .venv/bin/python scripts/backfill_embeddings.py
+  .venv/bin/python scripts/backfill_embeddings.py --sources documentos anotacoes
+  .venv/bin/python scripts/backfill_embeddings.py --assistido-id 42      # onboarding
+  .venv/bin/python scripts/backfill_embeddings.py --reset --report out.json  # migração de modelo
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from pathlib import Path
+
+# Add parent dir to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import get_settings
+from services.backfill_indexer import SOURCES, BackfillCheckpoint, BackfillIndexer, backfill_scope
+from services.document_embedding_service import get_document_embedding_service
+from services.embedding_service import EmbeddingService
+from services.rate_limiter import RateLimiter
+from services.supabase_service import get_supabase_service
+
+
+def parse_args() -> argparse.Namespace:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Bulk backfill of embedding tables")
+    parser.add_argument("--sources", nargs="+", choices=list(SOURCES), default=list(SOURCES))
+    parser.add_argument("--assistido-id", type=int, default=None, help="Only one assistido")
+    parser.add_argument("--page-size", type=int, default=settings.backfill_page_size)
+    parser.add_argument("--batch-size", type=int, default=settings.embedding_batch_size)
+    parser.add_argument("--concurrency", type=int, default=settings.embedding_concurrency)
+    parser.add_argument("--rpm", type=int, default=settings.backfill_requests_per_minute)
+    parser.add_argument("--tpm", type=int, default=settings.backfill_tokens_per_minute)
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        default=None,
+        help="Default: <cache_dir>/backfill/checkpoint[-assistido-<id>].json",
+    )
+    parser.add_argument("--reset", action="store_true", help="Ignore and overwrite the checkpoint")
+    parser.add_argument("--report", type=Path, default=None, help="Write JSON report here")
+    args = parser.parse_args()
+    if args.checkpoint is None:
+        name = "checkpoint.json" if args.assistido_id is None else f"checkpoint-assistido-{args.assistido_id}.json"
+        args.checkpoint = Path(settings.cache_dir) / "backfill" / name
+    return args
+
+
+async def main() -> int:
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    if args.reset and args.checkpoint.exists():
+        args.checkpoint.unlink()
+    checkpoint = BackfillCheckpoint(args.checkpoint, scope=backfill_scope(args.assistido_id))
+
+    supabase = get_supabase_service().client
+    indexer = BackfillIndexer(
+        supabase=supabase,
+        embedding_service=EmbeddingService(supabase),
+        document_service=get_document_embedding_service(),
+        checkpoint=checkpoint,
+        limiter=RateLimiter(args.rpm, args.tpm),
+        page_size=args.page_size,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        assistido_id=args.assistido_id,
+    )
+
+    try:
+        report = await indexer.run(args.sources)
+        exit_code = 0
+    except Exception as e:
+        logging.getLogger("enrichment-engine.backfill").error(
+            "Backfill aborted (resume with the same --checkpoint): %s", e
+        )
+        report = indexer.report()
+        exit_code = 1
+
+    print(json.dumps(report, indent=2))
+    if args.report:
+        args.report.write_text(json.dumps(report, indent=2))
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark da atribuição de speakers (Whisper × pyannote).
+
+Gera audiências sintéticas (segmentos de 2–10s, turnos de 1–40s com
+sobreposições ocasionais) e compara a varredura ordenada de
+services.speaker_merge com a comparação segmento × turno anterior.
+
+Usage:
+  .venv/bin/python scripts/bench_speaker_merge.py                 # 1h, 3h e 6h
+  .venv/bin/python scripts/bench_speaker_merge.py --hours 3 --speakers 6 --repeat 5
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add parent dir to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.speaker_merge import DEFAULT_SPEAKER, assign_speakers
+
+
+def synthetic_hearing(hours: float, speakers: int, seed: int = 0) -> tuple[list[dict], list[dict]]:
+    """(segmentos Whisper, turnos pyannote) cobrindo `hours` horas."""
+    rng = random.Random(seed)
+    duration = hours * 3600
+
+    segments, t = [], 0.0
+    while t < duration:
+        length = rng.uniform(2, 10)
+        words = " ".join(f"w{rng.randrange(1000)}" for _ in range(int(length * 2.5)))
+        segments.append({"start": t, "end": min(t + length, duration), "text": words})
+        t += length + rng.uniform(0, 0.8)
+
+    turns, t = [], 0.0
+    while t < duration:
+        length = rng.uniform(1, 40)
+        turns.append({"start": t, "end": min(t + length, duration), "speaker": f"SPEAKER_{rng.randrange(speakers):02d}"})
+        # ~10% dos turnos começam antes do anterior terminar (fala sobreposta)
+        t += length - (rng.uniform(0, 1) if rng.random() < 0.1 else -rng.uniform(0, 0.5))
+
+    return segments, turns
+
+
+def legacy_assign(segments: list[dict], turns: list[dict]) -> list[dict]:
+    """Algoritmo anterior: cada segmento contra cada turno, melhor turno único."""
+    out = []
+    for seg in segments:
+        best_speaker, best_overlap = DEFAULT_SPEAKER, 0
+        for sp in turns:
+            overlap = max(0, min(seg["end"], sp["end"]) - max(seg["start"], sp["start"]))
+            if overlap > best_overlap:
+                best_overlap, best_speaker = overlap, sp["speaker"]
+        out.append({**seg, "speaker": best_speaker})
+    return out
+
+
+def timed(fn, repeat: int) -> tuple[float, list[dict]]:
+    best, result = float("inf"), []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark Whisper/pyannote speaker assignment")
+    parser.add_argument("--hours", type=float, nargs="+", default=[1, 3, 6])
+    parser.add_argument("--speakers", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3, help="Best of N runs")
+    parser.add_argument("--split-min-seconds", type=float, default=1.0)
+    parser.add_argument("--skip-legacy", action="store_true", help="Only time the sweep (legacy is quadratic)")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    header = f"{'hours':>5}  {'segments':>8}  {'turns':>6}  {'legacy_ms':>10}  {'sweep_ms':>9}  {'split_ms':>9}  {'speedup':>8}  {'agree':>6}  {'splits':>6}"
+    print(header)
+    print("-" * len(header))
+
+    for hours in args.hours:
+        segments, turns = synthetic_hearing(hours, args.speakers)
+        sweep_ms, swept = timed(lambda: assign_speakers(segments, turns), args.repeat)
+        split_ms, split = timed(lambda: assign_speakers(segments, turns, args.split_min_seconds), args.repeat)
+
+        legacy_cell = speedup_cell = agree_cell = "-"
+        if not args.skip_legacy:
+            legacy_ms, legacy = timed(lambda: legacy_assign(segments, turns), 1)
+            agree = sum(a["speaker"] == b["speaker"] for a, b in zip(legacy, swept)) / len(segments)
+            legacy_cell, speedup_cell, agree_cell = f"{legacy_ms:.0f}", f"{legacy_ms / sweep_ms:.0f}x", f"{agree:.1%}"
+
+        print(
+            f"{hours:>5g}  {len(segments):>8}  {len(turns):>6}  {legacy_cell:>10}  {sweep_ms:>9.1f}  "
+            f"{split_ms:>9.1f}  {speedup_cell:>8}  {agree_cell:>6}  {len(split) - len(segments):>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
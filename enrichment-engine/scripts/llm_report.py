@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Relatório de chamadas de LLM a partir do ledger SQLite (LLM_LEDGER_PATH).
+
+Agrega latência (p50/p95), time-to-first-token, tokens, retries, hits de
+cache e custo estimado por prompt, rota, modelo ou provedor.
+
+Usage:
+  .venv/bin/python scripts/llm_report.py                         # por prompt, últimas 24h
+  .venv/bin/python scripts/llm_report.py --by route --hours 168
+  .venv/bin/python scripts/llm_report.py --ledger /tmp/ombuds-cache/llm_ledger.db --json
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add parent dir to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import get_settings
+from services.llm_telemetry import LLMLedger, summarize
+
+COLUMNS = [
+    ("calls", "calls"),
+    ("errors", "err"),
+    ("cache_hits", "cache"),
+    ("retries", "retry"),
+    ("input_tokens", "tok_in"),
+    ("output_tokens", "tok_out"),
+    ("latency_p50_ms", "p50_ms"),
+    ("latency_p95_ms", "p95_ms"),
+    ("ttft_p50_ms", "ttft_ms"),
+    ("latency_total_s", "total_s"),
+    ("cost_usd", "usd"),
+]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Aggregate the LLM call ledger")
+    parser.add_argument("--ledger", default=None, help="SQLite ledger path (default: LLM_LEDGER_PATH)")
+    parser.add_argument("--by", choices=["prompt_id", "route", "model", "provider"], default="prompt_id")
+    parser.add_argument("--hours", type=float, default=24.0, help="Window size; 0 = whole ledger")
+    parser.add_argument("--json", action="store_true", help="Print rows as JSON")
+    return parser.parse_args()
+
+
+def print_table(rows: list[dict], by: str) -> None:
+    width = max([len(by)] + [len(str(r[by])) for r in rows])
+    header = f"{by:<{width}}  " + "  ".join(f"{label:>9}" for _, label in COLUMNS)
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        cells = []
+        for key, _ in COLUMNS:
+            value = row[key]
+            cells.append(f"{'-' if value is None else value:>9}")
+        print(f"{str(row[by]):<{width}}  " + "  ".join(cells))
+
+
+def main() -> int:
+    args = parse_args()
+    path = args.ledger or get_settings().llm_ledger_path
+    if not path or not Path(path).exists():
+        print("Ledger not found — set LLM_LEDGER_PATH or pass --ledger", file=sys.stderr)
+        return 1
+
+    ledger = LLMLedger(path)
+    since = time.time() - args.hours * 3600 if args.hours else 0.0
+    records = ledger.read(since=since)
+    ledger.close()
+
+    rows = summarize(records, by=args.by)
+    if args.json:
+        print(json.dumps(rows, indent=2, ensure_ascii=False))
+        return 0
+
+    print(f"{len(records)} records | by {args.by} | {path}")
+    if rows:
+        print_table(rows, args.by)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Extração offline do Radar — notícias pendentes via Anthropic Message Batches.
+
+Cada execução avança o job: submete o lote (se não houver um em andamento),
+consulta o status e, quando o provedor termina, aplica os resultados em
+radar_noticias. Estado em <cache_dir>/batch_jobs/<job-id>.json.
+
+Usage:
+  .venv/bin/python scripts/radar_batch_extract.py                  # submete e espera terminar
+  .venv/bin/python scripts/radar_batch_extract.py --max-wait 0     # cron: um passo por execução
+  .venv/bin/python scripts/radar_batch_extract.py --limit 5000 --job-id radar-noite
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from pathlib import Path
+
+# Add parent dir to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.radar_extraction_service import get_radar_extraction_service
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline batch extraction of pending Radar news")
+    parser.add_argument("--limit", type=int, default=1000, help="Pending news per submitted batch")
+    parser.add_argument("--job-id", default="radar-extraction")
+    parser.add_argument(
+        "--max-wait",
+        type=float,
+        default=None,
+        help="Seconds to wait for the provider before exiting (resume later); default waits",
+    )
+    return parser.parse_args()
+
+
+async def main() -> int:
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    report = await get_radar_extraction_service().extract_batch_offline(
+        limit=args.limit,
+        job_id=args.job_id,
+        max_wait_seconds=args.max_wait,
+    )
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
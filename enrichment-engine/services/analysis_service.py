@@ -17,6 +17,8 @@ import logging
 from typing import Any
 
 from config import get_settings
+from services.llm_gateway import cache_block, get_llm_gateway
+from services.llm_telemetry import llm_prompt
 
 logger = logging.getLogger("enrichment-engine.analysis")
 
@@ -178,16 +180,22 @@ class AnalysisService:
     def available(self) -> bool:
         return bool(self.api_key)
 
+    @llm_prompt("analysis.deposition")
     async def analyze_deposition(
         self,
         transcript: str,
         file_name: str = "",
         speakers: list[str] | None = None,
         assistido_nome: str | None = None,
+        case_context: str | None = None,
     ) -> dict[str, Any] | None:
         """
         Analisa transcrição de depoimento com Claude Sonnet.
         Retorna análise estruturada ou None se indisponível.
+
+        O system prompt e o `case_context` (dossiê do caso, igual para todos
+        os depoimentos do mesmo processo) vão com breakpoints de prompt
+        caching: em lote, só a transcrição é processada como input novo.
         """
         if not self.available:
             logger.warning("Análise Sonnet indisponível — ANTHROPIC_API_KEY não configurada")
@@ -217,19 +225,17 @@ class AnalysisService:
             transcript = transcript[:max_chars] + "\n\n[... TRANSCRIÇÃO TRUNCADA POR LIMITE ...]"
             logger.warning("Transcrição truncada de %d para %d chars", len(transcript), max_chars)
 
-        try:
-            client = anthropic.AsyncAnthropic(api_key=self.api_key)
+        content: list[dict[str, Any]] = []
+        if case_context:
+            content.append(cache_block(f"DOSSIÊ DO CASO:\n{case_context}"))
+        content.append({"type": "text", "text": f"{context}\n\nTRANSCRIÇÃO:\n{transcript}"})
 
-            message = await client.messages.create(
+        try:
+            message = await get_llm_gateway().anthropic_messages(
                 model=self.model,
                 max_tokens=self.max_tokens,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": f"{context}\n\nTRANSCRIÇÃO:\n{transcript}",
-                    }
-                ],
-                system=DEPOSITION_ANALYSIS_PROMPT,
+                messages=[{"role": "user", "content": content}],
+                system=[cache_block(DEPOSITION_ANALYSIS_PROMPT)],
             )
 
             response_text = message.content[0].text
@@ -11,6 +11,9 @@ import logging
 from typing import Any
 
 from config import get_settings
+from services.llm_cache import get_llm_cache
+from services.llm_gateway import get_llm_gateway
+from services.llm_telemetry import llm_prompt
 
 logger = logging.getLogger("enrichment-engine.anthropic")
 
@@ -20,38 +23,38 @@ citar artigos de lei e jurisprudência quando pertinente, e ser direto e objetiv
 
 
 class AnthropicService:
-    """Wrapper para Anthropic Claude com lazy init."""
+    """Wrapper para Anthropic Claude (chamadas via LLMGateway)."""
 
     def __init__(self):
         self.settings = get_settings()
-        self._client = None
-
-    def _get_client(self):
-        if self._client is None:
-            try:
-                import anthropic
-                self._client = anthropic.Anthropic(api_key=self.settings.anthropic_api_key)
-                logger.info("Anthropic client initialized")
-            except ImportError as e:
-                logger.error("anthropic not installed: %s", e)
-                raise RuntimeError("Anthropic library not available") from e
-        return self._client
 
     def is_available(self) -> bool:
         return bool(self.settings.anthropic_api_key)
 
+    def _cache_key(self, system: str, prompt: str) -> str:
+        return get_llm_cache().key(
+            "anthropic",
+            self.settings.claude_sonnet_model,
+            system,
+            prompt,
+            {"max_tokens": self.settings.claude_max_tokens},
+        )
+
+    @llm_prompt("oficios.revisar")
     async def revisar_oficio(
         self,
         conteudo: str,
         tipo_oficio: str,
         destinatario: str,
         contexto_adicional: str = "",
+        bypass_cache: bool = False,
     ) -> dict[str, Any]:
         """
         Revisa um ofício com Claude Sonnet 4.6.
         Retorna: { score, sugestoes[], tomAdequado, formalidadeOk, dadosCorretos, conteudoRevisado? }
+        Revisões com JSON válido ficam no LLMResponseCache.
         """
-        client = self._get_client()
+        gateway = get_llm_gateway()
 
         prompt = f"""## TAREFA
 Revise o ofício abaixo com rigor profissional. Avalie cada aspecto e retorne JSON.
@@ -89,7 +92,13 @@ Revise o ofício abaixo com rigor profissional. Avalie cada aspecto e retorne JS
   "conteudoRevisado": "versão melhorada (se score < 80)"
 }}"""
 
-        message = client.messages.create(
+        cache = get_llm_cache()
+        key = self._cache_key(CONTEXTO_JURIDICO, prompt)
+        cached = await cache.lookup(key, bypass=bypass_cache)
+        if cached is not None:
+            return cached
+
+        message = await gateway.anthropic_messages(
             model=self.settings.claude_sonnet_model,
             max_tokens=self.settings.claude_max_tokens,
             system=CONTEXTO_JURIDICO,
@@ -108,22 +117,28 @@ Revise o ofício abaixo com rigor profissional. Avalie cada aspecto e retorne JS
             elif "```" in text:
                 json_str = text.split("```")[1].split("```")[0].strip()
             parsed = json.loads(json_str)
+            parsed_ok = True
         except (json.JSONDecodeError, IndexError):
             logger.warning("Failed to parse Claude response as JSON")
             parsed = {"score": 50, "sugestoes": [{"tipo": "alerta", "sugestao": text[:500], "prioridade": "media"}]}
+            parsed_ok = False
 
-        return {
+        result = {
             **parsed,
             "modelo": self.settings.claude_sonnet_model,
             "tokens_entrada": tokens_in,
             "tokens_saida": tokens_out,
         }
+        if parsed_ok:
+            await cache.set(key, result)
+        return result
 
+    @llm_prompt("oficios.melhorar")
     async def melhorar_texto(self, conteudo: str, instrucao: str) -> dict[str, Any]:
         """Melhora texto com Claude Sonnet. Retorna texto melhorado."""
-        client = self._get_client()
+        gateway = get_llm_gateway()
 
-        message = client.messages.create(
+        message = await gateway.anthropic_messages(
             model=self.settings.claude_sonnet_model,
             max_tokens=self.settings.claude_max_tokens,
             system=CONTEXTO_JURIDICO,
@@ -146,14 +161,17 @@ Retorne APENAS o texto melhorado, sem explicações.""",
             "tokens_saida": message.usage.output_tokens,
         }
 
+    @llm_prompt("anthropic.dados_estruturados")
     async def analisar_dados_estruturados(
         self,
         dados: dict[str, Any],
         pergunta: str,
+        bypass_cache: bool = False,
     ) -> dict[str, Any]:
         """
         Sonnet 4.6 — Análise de dados JÁ ESTRUTURADOS.
         Input DEVE ser JSON depurado, NÃO texto livre.
+        Análises com JSON válido ficam no LLMResponseCache.
         """
         input_size = len(json.dumps(dados))
         if input_size > 100000:
@@ -162,15 +180,9 @@ Retorne APENAS o texto melhorado, sem explicações.""",
                 "Use Gemini para processar grandes volumes primeiro."
             )
 
-        client = self._get_client()
-
-        message = client.messages.create(
-            model=self.settings.claude_sonnet_model,
-            max_tokens=self.settings.claude_max_tokens,
-            system=f"{CONTEXTO_JURIDICO}\n\nVocê analisa dados ESTRUTURADOS com raciocínio profundo.",
-            messages=[{
-                "role": "user",
-                "content": f"""## PERGUNTA
+        gateway = get_llm_gateway()
+        system = f"{CONTEXTO_JURIDICO}\n\nVocê analisa dados ESTRUTURADOS com raciocínio profundo."
+        prompt = f"""## PERGUNTA
 {pergunta}
 
 ## DADOS
@@ -181,8 +193,19 @@ Retorne APENAS o texto melhorado, sem explicações.""",
   "insights": [{{"categoria": "...", "descricao": "...", "confianca": 0.0-1.0, "acaoRecomendada": "..."}}],
   "padroesIdentificados": ["..."],
   "recomendacoes": ["..."]
-}}""",
-            }],
+}}"""
+
+        cache = get_llm_cache()
+        key = self._cache_key(system, prompt)
+        cached = await cache.lookup(key, bypass=bypass_cache)
+        if cached is not None:
+            return cached
+
+        message = await gateway.anthropic_messages(
+            model=self.settings.claude_sonnet_model,
+            max_tokens=self.settings.claude_max_tokens,
+            system=system,
+            messages=[{"role": "user", "content": prompt}],
         )
 
         text = message.content[0].text if message.content else ""
@@ -191,15 +214,20 @@ Retorne APENAS o texto melhorado, sem explicações.""",
             if "```json" in text:
                 json_str = text.split("```json")[1].split("```")[0].strip()
             parsed = json.loads(json_str)
+            parsed_ok = True
         except (json.JSONDecodeError, IndexError):
             parsed = {"insights": [], "recomendacoes": [text[:500]]}
+            parsed_ok = False
 
-        return {
+        result = {
             **parsed,
             "modelo": self.settings.claude_sonnet_model,
             "tokens_entrada": message.usage.input_tokens,
             "tokens_saida": message.usage.output_tokens,
         }
+        if parsed_ok:
+            await cache.set(key, result)
+        return result
 
 
 # Singleton
@@ -0,0 +1,257 @@
+"""
+Audio Segmenter — Extração e segmentação de áudio via ffmpeg, em streaming.
+
+Substitui o pydub (`AudioSegment.from_file` decodifica a gravação inteira
+para PCM em RAM — vários GB numa audiência de 4h). Aqui o ffmpeg lê e
+escreve em fluxo, com memória constante qualquer que seja a duração:
+
+- `probe`: duração/codec/canais lidos dos metadados do container (ffprobe)
+- `extract_audio`: qualquer áudio/vídeo → MP3 mono 16kHz 32kbps (voz)
+- `plan_chunks`: cortes perto de cada N segundos, encaixados no silêncio
+  mais longo da janela (energia por frame com NumPy, decodificando só as
+  janelas em volta dos cortes); sem silêncio, o corte é forçado e os chunks
+  vizinhos se sobrepõem para a costura deduplicar
+- `segment_audio`: escreve todos os chunks numa única passada — stream-copy
+  se a origem já é MP3 mono de baixo bitrate, senão re-encode para voz
+"""
+from __future__ import annotations
+
+import json
+import logging
+import math
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger("enrichment-engine.audio-segmenter")
+
+SPEECH_SAMPLE_RATE = 16_000
+SPEECH_BITRATE = "32k"
+# Acima disso um MP3 mono é re-encodado ao segmentar (Whisper não ganha nada)
+COPY_MAX_BITRATE = 64_000
+_SPEECH_ARGS = ["-vn", "-ac", "1", "-ar", str(SPEECH_SAMPLE_RATE), "-c:a", "libmp3lame", "-b:a", SPEECH_BITRATE]
+
+# Análise de energia: PCM 8kHz mono, frames de 50ms
+ENERGY_SAMPLE_RATE = 8_000
+FRAME_SECONDS = 0.05
+SILENCE_MARGIN_DB = 8.0  # até isso acima do piso de ruído da janela ainda é silêncio
+MIN_SILENCE_SECONDS = 0.3
+
+
+@dataclass(frozen=True)
+class AudioInfo:
+    duration: float
+    codec: str = ""
+    channels: int = 0
+    sample_rate: int = 0
+    bit_rate: int = 0
+
+
+@dataclass(frozen=True)
+class ChunkPlan:
+    """Trecho a extrair [start, end) e a parte que ele "possui" na costura."""
+    index: int
+    start: float
+    end: float
+    own_start: float
+    own_end: float
+
+
+@dataclass(frozen=True)
+class AudioChunk:
+    index: int
+    path: Path
+    offset: float  # segundos desde o início da gravação
+    duration: float
+    own_start: float = 0.0
+    own_end: float = math.inf
+
+
+def _run(cmd: list[str], timeout: float | None = None, text: bool = True) -> subprocess.CompletedProcess:
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=text, timeout=timeout, check=False)
+    except FileNotFoundError:
+        raise RuntimeError(f"{cmd[0]} não encontrado no PATH — instale o ffmpeg")
+    if proc.returncode != 0:
+        stderr = proc.stderr if text else proc.stderr.decode(errors="replace")
+        raise RuntimeError(f"{cmd[0]} falhou ({proc.returncode}): {stderr.strip()[-500:]}")
+    return proc
+
+
+def probe(path: Path) -> AudioInfo:
+    """Metadados do primeiro stream de áudio, sem decodificar o arquivo."""
+    proc = _run([
+        "ffprobe", "-v", "error", "-select_streams", "a:0",
+        "-show_entries", "format=duration,bit_rate:stream=codec_name,channels,sample_rate,bit_rate,duration",
+        "-of", "json", str(path),
+    ], timeout=60)
+    data = json.loads(proc.stdout or "{}")
+    fmt = data.get("format") or {}
+    stream = (data.get("streams") or [{}])[0]
+
+    def _num(*values, cast=float):
+        for value in values:
+            try:
+                return cast(float(value))
+            except (TypeError, ValueError):
+                continue
+        return cast(0)
+
+    return AudioInfo(
+        duration=_num(fmt.get("duration"), stream.get("duration")),
+        codec=stream.get("codec_name") or "",
+        channels=_num(stream.get("channels"), cast=int),
+        sample_rate=_num(stream.get("sample_rate"), cast=int),
+        bit_rate=_num(stream.get("bit_rate"), fmt.get("bit_rate"), cast=int),
+    )
+
+
+def extract_audio(src: Path, dst: Path) -> Path:
+    """Extrai o áudio de `src` para MP3 mono 16kHz 32kbps em `dst` (uma passada)."""
+    _run(["ffmpeg", "-nostdin", "-v", "error", "-y", "-i", str(src), *_SPEECH_ARGS, str(dst)])
+    return dst
+
+
+def can_stream_copy(info: AudioInfo) -> bool:
+    """Origem já está no formato de voz: segmentar sem re-encode."""
+    return info.codec == "mp3" and info.channels == 1 and 0 < info.bit_rate <= COPY_MAX_BITRATE
+
+
+# ----------------------------------------------------------------------
+# Fronteiras em silêncio
+# ----------------------------------------------------------------------
+
+def frame_energies(src: Path, start: float, duration: float) -> np.ndarray:
+    """Energia (dB) por frame de 50ms de um trecho — só a janela é decodificada."""
+    proc = _run([
+        "ffmpeg", "-nostdin", "-v", "error", "-ss", f"{start:.3f}", "-t", f"{duration:.3f}",
+        "-i", str(src), "-vn", "-ac", "1", "-ar", str(ENERGY_SAMPLE_RATE), "-f", "s16le", "-",
+    ], timeout=120, text=False)
+    samples = np.frombuffer(proc.stdout, dtype=np.int16).astype(np.float32)
+    frame = int(ENERGY_SAMPLE_RATE * FRAME_SECONDS)
+    n = len(samples) // frame
+    if n == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = samples[: n * frame].reshape(n, frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1.0))
+
+
+def find_silences(
+    energies_db: np.ndarray,
+    frame_seconds: float = FRAME_SECONDS,
+    min_silence: float = MIN_SILENCE_SECONDS,
+) -> list[tuple[float, float]]:
+    """
+    Trechos (início, fim) em segundos perto do piso de ruído da janela.
+    Sem queda clara em relação à mediana (fala contínua, ruído constante),
+    não há silêncio.
+    """
+    if energies_db.size == 0:
+        return []
+    floor, median = float(energies_db.min()), float(np.median(energies_db))
+    if median - floor < SILENCE_MARGIN_DB:
+        return []
+    threshold = floor + min(SILENCE_MARGIN_DB, (median - floor) / 2)
+    quiet = np.concatenate(([False], energies_db <= threshold, [False]))
+    edges = np.flatnonzero(np.diff(quiet.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+    keep = (ends - starts) * frame_seconds >= min_silence
+    return [(float(s * frame_seconds), float(e * frame_seconds)) for s, e in zip(starts[keep], ends[keep])]
+
+
+def chunk_seconds_for(
+    duration: float,
+    concurrency: int,
+    rpm: int,
+    min_seconds: float,
+    max_seconds: float,
+) -> float:
+    """
+    Tamanho de chunk adaptado à folga de rate limit: com concorrência
+    sobrando, mais chunks menores (uma única leva); nunca mais chunks do que
+    metade do RPM (folga para retries) nem menores que `min_seconds`.
+    """
+    target = duration / max(concurrency, 1)
+    target = max(target, duration / max(rpm // 2, 1))
+    return min(max(target, min_seconds), max_seconds)
+
+
+def plan_chunks(
+    src: Path,
+    duration: float,
+    chunk_seconds: float,
+    overlap: float,
+    window: float | None = None,
+) -> list[ChunkPlan]:
+    """
+    Cortes equiespaçados (chunks de até ~`chunk_seconds`), cada um movido
+    para o meio do silêncio mais longo em ±`window`. Cortes sem silêncio
+    ficam no ponto ideal e os dois chunks se estendem `overlap` segundos
+    além dele.
+    """
+    if duration <= chunk_seconds:
+        return [ChunkPlan(0, 0.0, duration, 0.0, duration)]
+    window = window if window is not None else min(60.0, chunk_seconds / 5)
+
+    cuts: list[tuple[float, bool]] = []  # (tempo, encaixado em silêncio)
+    n = math.ceil(duration / chunk_seconds)
+    for k in range(1, n):
+        ideal = duration * k / n
+        w_start = max(ideal - window, 0.0)
+        silences = find_silences(frame_energies(src, w_start, 2 * window))
+        if silences:
+            s, e = max(silences, key=lambda se: (se[1] - se[0], -abs(w_start + (se[0] + se[1]) / 2 - ideal)))
+            cuts.append((w_start + (s + e) / 2, True))
+        else:
+            cuts.append((ideal, False))
+
+    bounds = [(0.0, True), *cuts, (duration, True)]
+    plans = []
+    for i in range(len(bounds) - 1):
+        (a, a_snapped), (b, b_snapped) = bounds[i], bounds[i + 1]
+        start = a if a_snapped else max(a - overlap, 0.0)
+        end = b if b_snapped else min(b + overlap, duration)
+        plans.append(ChunkPlan(i, start, end, a, b))
+
+    forced = sum(1 for _, snapped in cuts if not snapped)
+    logger.info(
+        "Plano de chunks | duration=%.0fs | chunks=%d | alvo=%.0fs | cortes forçados=%d",
+        duration, len(plans), chunk_seconds, forced,
+    )
+    return plans
+
+
+def segment_audio(
+    src: Path,
+    out_dir: Path,
+    plans: list[ChunkPlan],
+    info: AudioInfo | None = None,
+) -> list[AudioChunk]:
+    """
+    Escreve os trechos planejados em `out_dir` numa única passada do ffmpeg
+    (uma saída por chunk, com -ss/-t por saída — trechos podem se sobrepor).
+    Em stream-copy o corte cai na fronteira do frame MP3 (≤ 72ms).
+    """
+    info = info or probe(src)
+    copy = can_stream_copy(info)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    codec_args = ["-vn", "-c:a", "copy"] if copy else _SPEECH_ARGS
+
+    cmd = ["ffmpeg", "-nostdin", "-v", "error", "-y", "-i", str(src)]
+    chunks = []
+    for plan in plans:
+        path = out_dir / f"chunk_{plan.index:04d}.mp3"
+        cmd += ["-ss", f"{plan.start:.3f}", "-t", f"{plan.end - plan.start:.3f}", *codec_args, str(path)]
+        chunks.append(AudioChunk(
+            plan.index, path, plan.start, plan.end - plan.start, plan.own_start, plan.own_end,
+        ))
+    _run(cmd)
+
+    logger.info(
+        "Segmentado %s | duration=%.0fs | chunks=%d | mode=%s",
+        src.name, info.duration, len(chunks), "copy" if copy else "encode",
+    )
+    return chunks
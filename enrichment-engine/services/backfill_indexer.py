@@ -0,0 +1,438 @@
+"""
+Backfill Indexer — (Re)indexação em massa das tabelas de embeddings.
+
+Percorre documentos.conteudo_completo, anotacoes, case_facts e drive_files
+em páginas por id (keyset), embeda em lotes grandes e concorrentes sob um
+RateLimiter global e grava uma página inteira por RPC
+(replace_embeddings_bulk). O progresso vai para um checkpoint JSON após cada
+página gravada, então uma execução interrompida retoma de onde parou — e os
+chunks já embedados saem do EmbeddingCache. Entidades que falharam ficam em
+failed_ids e são reprocessadas no início da execução seguinte.
+
+drive_files vai para document_embeddings via DocumentEmbeddingService
+(modelo e chunker próprios daquela tabela).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from config import get_settings
+from services.chunking import chunk_fingerprint, chunk_paragraphs
+from services.embedding_cache import get_embedding_cache
+from services.rate_limiter import RateLimiter
+
+logger = logging.getLogger("enrichment-engine.backfill")
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 caracteres por token (suficiente para orçamento de cota)."""
+    return len(text) // 4 + 1
+
+
+def _case_fact_text(row: dict) -> str:
+    return "\n\n".join(part for part in (row.get("titulo"), row.get("descricao")) if part)
+
+
+def _drive_file_text(row: dict) -> str:
+    data = row.get("enrichment_data") or {}
+    return data.get("transcript_plain") or data.get("transcript") or ""
+
+
+@dataclass(frozen=True)
+class BackfillSource:
+    """Tabela de origem e como extrair o texto de cada linha."""
+    name: str
+    columns: str
+    text: Callable[[dict], str]
+    entity_type: Optional[str] = None  # None = document_embeddings
+    required_column: Optional[str] = None  # filtro IS NOT NULL
+    chunked: bool = False  # chunk_paragraphs vs. chunk único (como index_entity)
+
+
+SOURCES: dict[str, BackfillSource] = {
+    "documentos": BackfillSource(
+        name="documentos",
+        columns="id, assistido_id, processo_id, conteudo_completo",
+        text=lambda row: row.get("conteudo_completo") or "",
+        entity_type="documento",
+        required_column="conteudo_completo",
+        chunked=True,
+    ),
+    "anotacoes": BackfillSource(
+        name="anotacoes",
+        columns="id, assistido_id, processo_id, conteudo",
+        text=lambda row: row.get("conteudo") or "",
+        entity_type="anotacao",
+    ),
+    "case_facts": BackfillSource(
+        name="case_facts",
+        columns="id, assistido_id, processo_id, titulo, descricao",
+        text=_case_fact_text,
+        entity_type="case_fact",
+    ),
+    "drive_files": BackfillSource(
+        name="drive_files",
+        columns="id, assistido_id, enrichment_data",
+        text=_drive_file_text,
+        required_column="enrichment_data",
+    ),
+}
+
+
+@dataclass
+class BackfillStats:
+    """Contadores de throughput de uma execução."""
+    entities: int = 0
+    skipped: int = 0
+    failed: int = 0
+    chunks: int = 0
+    tokens: int = 0
+    api_calls: int = 0
+    api_errors: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    def report(self) -> dict:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return {
+            "entities": self.entities,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "chunks": self.chunks,
+            "tokens": self.tokens,
+            "api_calls": self.api_calls,
+            "api_errors": self.api_errors,
+            "elapsed_s": round(elapsed, 2),
+            "chunks_per_s": round(self.chunks / elapsed, 2),
+            "tokens_per_s": round(self.tokens / elapsed, 1),
+        }
+
+
+def backfill_scope(assistido_id: Optional[int] = None) -> str:
+    """Escopo gravado no checkpoint: "all" ou "assistido-<id>"."""
+    return "all" if assistido_id is None else f"assistido-{assistido_id}"
+
+
+class BackfillCheckpoint:
+    """
+    Progresso por fonte ({last_id, done, failed_ids}) num arquivo JSON.
+
+    O escopo da execução fica em state["scope"]: um checkpoint de
+    --assistido-id marca fontes como done só para aquele assistido, então
+    reaproveitá-lo num backfill completo (ou vice-versa) pularia o resto do
+    corpus. Escopo divergente → ValueError. Checkpoints antigos, sem escopo,
+    valem como "all".
+    """
+
+    def __init__(self, path: Path, scope: str = "all"):
+        self.path = Path(path)
+        self.scope = scope
+        self.state: dict[str, Any] = {"scope": scope}
+        if self.path.exists():
+            state = json.loads(self.path.read_text())
+            stored = state.setdefault("scope", "all")
+            if stored != scope:
+                raise ValueError(
+                    f"Checkpoint {self.path} belongs to scope {stored!r}, not {scope!r} "
+                    "(use another checkpoint file or reset it)"
+                )
+            self.state = state
+
+    def source(self, name: str) -> dict:
+        return self.state.setdefault(name, {"last_id": 0, "done": False, "failed_ids": []})
+
+    def advance(self, name: str, last_id: int, failed_ids: list[int]) -> None:
+        entry = self.source(name)
+        entry["last_id"] = last_id
+        entry["failed_ids"] = sorted(set(entry["failed_ids"]) | set(failed_ids))
+        self.save()
+
+    def resolve(self, name: str, attempted: list[int], still_failed: list[int]) -> None:
+        """Tira de failed_ids os ids reprocessados, mantendo os que falharam de novo."""
+        entry = self.source(name)
+        entry["failed_ids"] = sorted((set(entry["failed_ids"]) - set(attempted)) | set(still_failed))
+        self.save()
+
+    def finish(self, name: str) -> None:
+        self.source(name)["done"] = True
+        self.save()
+
+    def save(self) -> None:
+        """Escrita atômica (tmp + rename): um crash nunca corrompe o checkpoint."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.state, indent=2))
+        os.replace(tmp, self.path)
+
+
+class BackfillIndexer:
+    """Indexa fontes inteiras em páginas, com checkpoint e limite global de cota."""
+
+    def __init__(
+        self,
+        supabase,
+        embedding_service,
+        checkpoint: BackfillCheckpoint,
+        document_service=None,
+        limiter: Optional[RateLimiter] = None,
+        page_size: int = 200,
+        batch_size: int = 100,
+        concurrency: int = 4,
+        assistido_id: Optional[int] = None,
+    ):
+        if checkpoint.scope != backfill_scope(assistido_id):
+            raise ValueError(
+                f"Checkpoint scope {checkpoint.scope!r} does not match "
+                f"assistido_id={assistido_id!r}"
+            )
+        settings = get_settings()
+        self.supabase = supabase
+        self.embedding_service = embedding_service
+        self.document_service = document_service
+        self.checkpoint = checkpoint
+        self.limiter = limiter or RateLimiter(
+            settings.backfill_requests_per_minute, settings.backfill_tokens_per_minute
+        )
+        self.page_size = page_size
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.assistido_id = assistido_id
+        self.stats: dict[str, BackfillStats] = {}
+
+    async def run(self, sources: list[str]) -> dict:
+        """Processa as fontes em ordem; retorna o relatório de throughput."""
+        for name in sources:
+            if name not in SOURCES:
+                raise ValueError(f"Unknown backfill source: {name}")
+        for name in sources:
+            if self.checkpoint.source(name)["failed_ids"]:
+                await self._retry_failed(SOURCES[name])
+            if self.checkpoint.source(name)["done"]:
+                logger.info("Backfill %s already complete (checkpoint) — skipping", name)
+                continue
+            await self._run_source(SOURCES[name])
+        return self.report()
+
+    def report(self) -> dict:
+        per_source = {name: stats.report() for name, stats in self.stats.items()}
+        totals = BackfillStats(started=min((s.started for s in self.stats.values()), default=time.monotonic()))
+        for stats in self.stats.values():
+            for attr in ("entities", "skipped", "failed", "chunks", "tokens", "api_calls", "api_errors"):
+                setattr(totals, attr, getattr(totals, attr) + getattr(stats, attr))
+        return {"sources": per_source, "total": totals.report()}
+
+    # ------------------------------------------------------------------
+    # Paginação
+    # ------------------------------------------------------------------
+
+    def _fetch_page(self, source: BackfillSource, after_id: int) -> list[dict]:
+        query = (
+            self.supabase.table(source.name)
+            .select(source.columns)
+            .gt("id", after_id)
+        )
+        if source.required_column:
+            query = query.not_.is_(source.required_column, "null")
+        if self.assistido_id is not None:
+            query = query.eq("assistido_id", self.assistido_id)
+        return query.order("id").limit(self.page_size).execute().data or []
+
+    def _fetch_ids(self, source: BackfillSource, ids: list[int]) -> list[dict]:
+        return (
+            self.supabase.table(source.name)
+            .select(source.columns)
+            .in_("id", ids)
+            .order("id")
+            .execute()
+            .data
+            or []
+        )
+
+    def _can_index(self, source: BackfillSource) -> bool:
+        if source.entity_type is None and not (
+            self.document_service and self.document_service.available
+        ):
+            logger.warning("Backfill %s skipped: document embedding service not configured", source.name)
+            return False
+        return True
+
+    async def _index_page(self, source: BackfillSource, page: list[dict], stats: BackfillStats) -> list[int]:
+        if source.entity_type is None:
+            return await self._index_document_page(page, stats)
+        return await self._index_entity_page(source, page, stats)
+
+    async def _retry_failed(self, source: BackfillSource) -> None:
+        """Reprocessa os failed_ids do checkpoint (ids que sumiram da tabela saem da lista)."""
+        if not self._can_index(source):
+            return
+        stats = self.stats.setdefault(source.name, BackfillStats())
+        failed = list(self.checkpoint.source(source.name)["failed_ids"])
+        logger.info("Backfill %s retrying %d failed ids", source.name, len(failed))
+        for start in range(0, len(failed), self.page_size):
+            attempted = failed[start:start + self.page_size]
+            page = await asyncio.to_thread(self._fetch_ids, source, attempted)
+            still_failed = await self._index_page(source, page, stats) if page else []
+            self.checkpoint.resolve(source.name, attempted, still_failed)
+
+    async def _run_source(self, source: BackfillSource) -> None:
+        if not self._can_index(source):
+            return
+
+        stats = self.stats.setdefault(source.name, BackfillStats())
+        after_id = self.checkpoint.source(source.name)["last_id"]
+        logger.info("Backfill %s starting after id %d", source.name, after_id)
+
+        page = await asyncio.to_thread(self._fetch_page, source, after_id)
+        while page:
+            last_id = page[-1]["id"]
+            # Pré-busca da próxima página enquanto esta é embedada
+            next_page = asyncio.create_task(asyncio.to_thread(self._fetch_page, source, last_id))
+            try:
+                failed_ids = await self._index_page(source, page, stats)
+            except BaseException:
+                next_page.cancel()
+                raise
+            self.checkpoint.advance(source.name, last_id, failed_ids)
+            logger.info("Backfill %s | up to id %d | %s", source.name, last_id, stats.report())
+            page = await next_page
+
+        self.checkpoint.finish(source.name)
+        logger.info("Backfill %s complete | %s", source.name, stats.report())
+
+    # ------------------------------------------------------------------
+    # Tabela embeddings (Gemini)
+    # ------------------------------------------------------------------
+
+    async def _embed(self, texts: list[str], stats: BackfillStats) -> list[Optional[list[float]]]:
+        """Lotes concorrentes; só chamadas reais à API passam pelo limiter."""
+        settings = get_settings()
+        cache = get_embedding_cache()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        vectors: list[Optional[list[float]]] = [None] * len(texts)
+
+        async def _call_api(batch: list[str]) -> list[list[float]]:
+            stats.api_calls += 1
+            await self.limiter.acquire(sum(estimate_tokens(t) for t in batch))
+            try:
+                return await self.embedding_service._embed_uncached(batch)
+            except Exception:
+                stats.api_errors += 1
+                raise
+
+        async def _run(start: int) -> None:
+            batch = texts[start:start + self.batch_size]
+            async with semaphore:
+                try:
+                    embedded = await cache.get_or_embed(
+                        settings.embedding_model, settings.embedding_dimensions, batch, _call_api
+                    )
+                except Exception as e:
+                    logger.error("Backfill batch %d-%d failed: %s", start, start + len(batch) - 1, e)
+                    return
+            vectors[start:start + len(embedded)] = embedded
+
+        await asyncio.gather(*[_run(i) for i in range(0, len(texts), self.batch_size)])
+        return vectors
+
+    async def _index_entity_page(
+        self, source: BackfillSource, page: list[dict], stats: BackfillStats
+    ) -> list[int]:
+        # (entity row, chunks) para entidades com texto indexável
+        entities: list[tuple[dict, list[str]]] = []
+        for row in page:
+            text = source.text(row)
+            if not text or len(text.strip()) < 10:
+                stats.skipped += 1
+                continue
+            chunks = (
+                [c[:5000] for c in chunk_paragraphs(text)] if source.chunked else [text[:5000]]
+            )
+            entities.append((row, chunks))
+
+        flat = [chunk for _, chunks in entities for chunk in chunks]
+        vectors = await self._embed(flat, stats)
+
+        rows: list[dict] = []
+        ok_ids: list[int] = []
+        failed_ids: list[int] = []
+        offset = 0
+        for entity, chunks in entities:
+            entity_vectors = vectors[offset:offset + len(chunks)]
+            offset += len(chunks)
+            if any(v is None for v in entity_vectors):
+                # Entidade incompleta: mantém o índice anterior dela
+                failed_ids.append(entity["id"])
+                continue
+            ok_ids.append(entity["id"])
+            rows.extend(
+                {
+                    "entity_id": entity["id"],
+                    "assistido_id": entity.get("assistido_id"),
+                    "processo_id": entity.get("processo_id"),
+                    "chunk_index": i,
+                    "content_text": chunk,
+                    "content_hash": chunk_fingerprint(chunk),
+                    "embedding": vector,
+                    "metadata": {},
+                }
+                for i, (chunk, vector) in enumerate(zip(chunks, entity_vectors))
+            )
+
+        if ok_ids:
+            await asyncio.to_thread(
+                lambda: self.supabase.rpc("replace_embeddings_bulk", {
+                    "p_entity_type": source.entity_type,
+                    "p_entity_ids": ok_ids,
+                    "p_rows": rows,
+                }).execute()
+            )
+
+        stats.entities += len(ok_ids)
+        stats.failed += len(failed_ids)
+        stats.chunks += len(rows)
+        stats.tokens += sum(estimate_tokens(r["content_text"]) for r in rows)
+        return failed_ids
+
+    # ------------------------------------------------------------------
+    # drive_files → document_embeddings (OpenAI)
+    # ------------------------------------------------------------------
+
+    async def _index_document_page(self, page: list[dict], stats: BackfillStats) -> list[int]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        failed_ids: list[int] = []
+
+        async def _run(row: dict) -> None:
+            text = _drive_file_text(row)
+            if len(text.strip()) < 20:
+                stats.skipped += 1
+                return
+            async with semaphore:
+                tokens = estimate_tokens(text)
+                stats.api_calls += 1
+                await self.limiter.acquire(tokens)
+                try:
+                    count = await self.document_service.embed_document(
+                        file_id=row["id"],
+                        assistido_id=row.get("assistido_id"),
+                        text=text,
+                    )
+                except Exception as e:
+                    logger.error("Backfill drive_file %d failed: %s", row["id"], e)
+                    stats.api_errors += 1
+                    count = 0
+            if count:
+                stats.entities += 1
+                stats.chunks += count
+                stats.tokens += tokens
+            else:
+                stats.failed += 1
+                failed_ids.append(row["id"])
+
+        await asyncio.gather(*[_run(row) for row in page])
+        return failed_ids
@@ -0,0 +1,289 @@
+"""
+Batch Jobs — Submissão offline de chamadas de LLM em lote.
+
+Fluxos em massa (extração do Radar, rodadas noturnas) não precisam de
+resposta imediata. Em vez de milhares de chamadas síncronas disputando o
+rate limit das rotas interativas, os pedidos viram um lote no provedor
+(Anthropic Message Batches / Gemini batch mode), que processa em até 24h
+com custo reduzido e cota própria.
+
+BatchRunner.run(job_id, items, handler):
+  1. submete o lote (uma vez — o batch_id fica no estado em disco)
+  2. consulta o status a cada `poll_seconds`
+  3. entrega cada resultado (sucesso ou erro) ao `handler`, pulando os
+     já entregues
+
+O estado ({batch_id, status, handled, failed}) é gravado atomicamente a
+cada passo: rodar de novo com o mesmo job_id após um crash retoma de onde
+parou, sem re-submeter nem reprocessar resultados.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+from config import get_settings
+
+logger = logging.getLogger("enrichment-engine.batch-jobs")
+
+_GEMINI_DONE = {
+    "JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED", "JOB_STATE_CANCELLED",
+    "JOB_STATE_EXPIRED", "JOB_STATE_PARTIALLY_SUCCEEDED",
+}
+
+
+@dataclass
+class BatchItem:
+    """Um pedido do lote: `params` no formato nativo do provedor."""
+    custom_id: str
+    params: dict[str, Any]
+
+
+@dataclass
+class BatchOutcome:
+    """Resultado de um pedido: `text` quando deu certo, `error` caso contrário."""
+    custom_id: str
+    text: Optional[str] = None
+    error: Optional[str] = None
+    usage: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class AnthropicBatchBackend:
+    """Message Batches API (params = kwargs de messages.create)."""
+
+    provider = "anthropic"
+
+    def __init__(self, client):
+        self.client = client
+
+    async def submit(self, items: list[BatchItem]) -> str:
+        batch = await self.client.messages.batches.create(
+            requests=[{"custom_id": item.custom_id, "params": item.params} for item in items]
+        )
+        return batch.id
+
+    async def poll(self, batch_id: str) -> tuple[bool, dict[str, Any]]:
+        batch = await self.client.messages.batches.retrieve(batch_id)
+        counts = batch.request_counts.model_dump() if batch.request_counts else {}
+        return batch.processing_status == "ended", {"status": batch.processing_status, **counts}
+
+    async def results(self, batch_id: str, custom_ids: list[str]) -> AsyncIterator[BatchOutcome]:
+        async for entry in await self.client.messages.batches.results(batch_id):
+            result = entry.result
+            if result.type == "succeeded":
+                message = result.message
+                text = "".join(getattr(block, "text", "") for block in message.content)
+                usage = {
+                    "input_tokens": message.usage.input_tokens,
+                    "output_tokens": message.usage.output_tokens,
+                }
+                yield BatchOutcome(entry.custom_id, text=text, usage=usage)
+            else:
+                detail = getattr(getattr(result, "error", None), "error", None)
+                message = getattr(detail, "message", "") if detail else ""
+                yield BatchOutcome(entry.custom_id, error=f"{result.type}: {message}".rstrip(": "))
+
+
+class GeminiBatchBackend:
+    """Gemini batch mode com pedidos inline (params = {contents, config})."""
+
+    provider = "gemini"
+
+    def __init__(self, client, model: str):
+        self.client = client
+        self.model = model
+
+    async def submit(self, items: list[BatchItem]) -> str:
+        job = await self.client.aio.batches.create(
+            model=self.model,
+            src=[{**item.params, "metadata": {"custom_id": item.custom_id}} for item in items],
+        )
+        return job.name
+
+    async def poll(self, batch_id: str) -> tuple[bool, dict[str, Any]]:
+        job = await self.client.aio.batches.get(name=batch_id)
+        state = getattr(job.state, "name", str(job.state))
+        return state in _GEMINI_DONE, {"status": state}
+
+    async def results(self, batch_id: str, custom_ids: list[str]) -> AsyncIterator[BatchOutcome]:
+        job = await self.client.aio.batches.get(name=batch_id)
+        responses = (job.dest.inlined_responses if job.dest else None) or []
+        for index, item in enumerate(responses):
+            # metadata volta com o custom_id; a ordem do envio é o fallback
+            custom_id = (item.metadata or {}).get("custom_id") or custom_ids[index]
+            if item.error is not None:
+                yield BatchOutcome(custom_id, error=str(item.error.message or item.error))
+            else:
+                yield BatchOutcome(custom_id, text=item.response.text)
+
+
+class BatchJobState:
+    """Estado persistente de um job: arquivo JSON por job_id."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.data: dict[str, Any] = {}
+        if self.path.exists():
+            self.data = json.loads(self.path.read_text())
+
+    @property
+    def batch_id(self) -> Optional[str]:
+        return self.data.get("batch_id")
+
+    def reset(self, job_id: str, provider: str) -> None:
+        self.data = {
+            "job_id": job_id,
+            "provider": provider,
+            "batch_id": None,
+            "status": "new",
+            "custom_ids": [],
+            "handled": [],
+            "failed": {},
+        }
+
+    def save(self) -> None:
+        """Escrita atômica (tmp + rename): um crash nunca corrompe o estado."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.data, indent=2, ensure_ascii=False))
+        os.replace(tmp, self.path)
+
+
+Handler = Callable[[BatchOutcome], Awaitable[None]]
+
+
+class BatchRunner:
+    """Submete, acompanha e distribui os resultados de um lote, com retomada."""
+
+    def __init__(
+        self,
+        backend,
+        state_dir: str | Path,
+        poll_seconds: float = 60.0,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        self.backend = backend
+        self.state_dir = Path(state_dir)
+        self.poll_seconds = poll_seconds
+        self._sleep = sleep
+
+    def state(self, job_id: str) -> BatchJobState:
+        return BatchJobState(self.state_dir / f"{job_id}.json")
+
+    def idle(self, job_id: str) -> bool:
+        """True se não há lote em andamento: a próxima run() submete itens novos."""
+        state = self.state(job_id)
+        return state.batch_id is None or state.data.get("status") == "done"
+
+    async def run(
+        self,
+        job_id: str,
+        items: list[BatchItem],
+        handler: Handler,
+        max_wait_seconds: Optional[float] = None,
+    ) -> dict[str, Any]:
+        """
+        Executa (ou retoma) o job. `items` só é usado se ainda não houver
+        lote em andamento. Com `max_wait_seconds`, retorna status "in_progress"
+        se o provedor não terminar a tempo — chamar de novo retoma o polling.
+        """
+        state = self.state(job_id)
+        if state.data.get("status") in (None, "done"):
+            state.reset(job_id, self.backend.provider)
+
+        if state.batch_id is None:
+            if not items:
+                return self._report(state)
+            state.data["batch_id"] = await self.backend.submit(items)
+            state.data["custom_ids"] = [item.custom_id for item in items]
+            state.data["status"] = "submitted"
+            state.data["submitted_at"] = time.time()
+            state.save()
+            logger.info(
+                "Batch submitted | job=%s provider=%s batch=%s requests=%d",
+                job_id, self.backend.provider, state.batch_id, len(items),
+            )
+        elif items:
+            logger.info("Resuming job %s (batch=%s); new items ignored", job_id, state.batch_id)
+
+        if state.data["status"] != "collecting":
+            started = time.monotonic()
+            while True:
+                done, progress = await self.backend.poll(state.batch_id)
+                state.data["progress"] = progress
+                if done:
+                    break
+                state.data["status"] = "in_progress"
+                state.save()
+                if max_wait_seconds is not None and time.monotonic() - started >= max_wait_seconds:
+                    logger.info("Batch %s still running: %s", state.batch_id, progress)
+                    return self._report(state)
+                await self._sleep(self.poll_seconds)
+            state.data["status"] = "collecting"
+            state.save()
+
+        handled = set(state.data["handled"])
+        async for outcome in self.backend.results(state.batch_id, state.data["custom_ids"]):
+            if outcome.custom_id in handled:
+                continue
+            if not outcome.ok:
+                state.data["failed"][outcome.custom_id] = outcome.error
+            try:
+                await handler(outcome)
+            except Exception as e:
+                logger.warning("Batch handler failed for %s: %s", outcome.custom_id, e)
+                state.data["failed"][outcome.custom_id] = f"handler: {e}"
+            handled.add(outcome.custom_id)
+            state.data["handled"].append(outcome.custom_id)
+            # Um resultado aplicado nunca é reaplicado após um crash: os
+            # handlers (ex.: contador de erros do Radar) não são idempotentes
+            state.save()
+
+        state.data["status"] = "done"
+        state.data["completed_at"] = time.time()
+        state.save()
+        report = self._report(state)
+        logger.info("Batch job done | %s", report)
+        return report
+
+    @staticmethod
+    def _report(state: BatchJobState) -> dict[str, Any]:
+        data = state.data
+        return {
+            "job_id": data.get("job_id"),
+            "batch_id": data.get("batch_id"),
+            "status": data.get("status", "new"),
+            "requests": len(data.get("custom_ids", [])),
+            "handled": len(data.get("handled", [])),
+            "failed": len(data.get("failed", {})),
+            "progress": data.get("progress", {}),
+        }
+
+
+def get_batch_runner(provider: str, model: Optional[str] = None) -> BatchRunner:
+    """BatchRunner com o cliente em pool do LLMGateway e estado em cache_dir."""
+    from services.llm_gateway import get_llm_gateway
+
+    settings = get_settings()
+    client = get_llm_gateway().client(provider)
+    if provider == "anthropic":
+        backend = AnthropicBatchBackend(client)
+    elif provider == "gemini":
+        backend = GeminiBatchBackend(client, model or settings.gemini_model)
+    else:
+        raise ValueError(f"Batch mode not supported for provider: {provider}")
+    return BatchRunner(
+        backend,
+        state_dir=Path(settings.cache_dir) / "batch_jobs",
+        poll_seconds=settings.batch_poll_seconds,
+    )
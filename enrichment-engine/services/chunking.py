@@ -0,0 +1,145 @@
+"""
+Chunking — Divisão de texto em chunks, fingerprints e diff para
+re-indexação incremental.
+
+chunk_paragraphs é o chunker compartilhado da tabela embeddings (indexação
+online e backfill). Dado o chunking determinístico de um documento e as
+linhas já gravadas (id + content_hash), diff_chunks decide quais chunks
+reaproveitar, quais embedar e quais linhas remover.
+
+split_sections divide documentos longos em trechos de até N caracteres
+respeitando os headings Markdown do Docling (extração map-reduce).
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import unicodedata
+from dataclasses import dataclass, field
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_HEADING_RE = re.compile(r"^#{1,6}\s", re.MULTILINE)
+
+
+def normalize_text(text: str) -> str:
+    """NFC + espaços colapsados — variações triviais caem na mesma chave."""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def chunk_paragraphs(text: str, max_tokens: int = 500, overlap: int = 50) -> list[str]:
+    """Split texto em chunks por parágrafos, respeitando max_tokens."""
+    paragraphs = text.split("\n\n")
+    chunks = []
+    current_chunk = []
+    current_len = 0
+
+    for para in paragraphs:
+        para = para.strip()
+        if not para:
+            continue
+        para_tokens = len(para.split())
+
+        if current_len + para_tokens > max_tokens and current_chunk:
+            chunks.append("\n\n".join(current_chunk))
+            # Overlap: keep last paragraph
+            if overlap > 0 and current_chunk:
+                last = current_chunk[-1]
+                current_chunk = [last]
+                current_len = len(last.split())
+            else:
+                current_chunk = []
+                current_len = 0
+
+        current_chunk.append(para)
+        current_len += para_tokens
+
+    if current_chunk:
+        chunks.append("\n\n".join(current_chunk))
+
+    return chunks if chunks else [text[:2000]]
+
+
+def _split_oversized(text: str, max_chars: int) -> list[str]:
+    """Quebra um bloco maior que max_chars em parágrafos, depois linhas, depois corte seco."""
+    for separator in ("\n\n", "\n"):
+        parts = text.split(separator)
+        if len(parts) > 1:
+            return _pack(parts, max_chars, separator)
+    return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+
+def _pack(blocks: list[str], max_chars: int, separator: str) -> list[str]:
+    """Agrupa blocos consecutivos em trechos de até max_chars."""
+    packed: list[str] = []
+    current = ""
+    pieces: list[str] = []
+    for block in blocks:
+        if len(block) > max_chars:
+            pieces.extend(_split_oversized(block, max_chars))
+        elif block.strip():
+            pieces.append(block)
+    for block in pieces:
+        candidate = f"{current}{separator}{block}" if current else block
+        if len(candidate) > max_chars:
+            packed.append(current)
+            current = block
+        else:
+            current = candidate
+    if current:
+        packed.append(current)
+    return packed
+
+
+def split_sections(markdown: str, max_chars: int) -> list[str]:
+    """
+    Divide o texto em trechos de até max_chars cortando nos headings
+    Markdown (# a ######). Seções pequenas vizinhas são agrupadas; seções
+    maiores que o limite caem para parágrafos/linhas. Nenhum caractere
+    não-branco é descartado.
+    """
+    if len(markdown) <= max_chars:
+        return [markdown]
+    starts = [m.start() for m in _HEADING_RE.finditer(markdown)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    sections = [markdown[a:b].strip("\n") for a, b in zip(starts, starts[1:] + [len(markdown)])]
+    return _pack(sections, max_chars, "\n\n")
+
+
+def chunk_fingerprint(text: str) -> str:
+    """SHA-256 do texto normalizado do chunk (gravado em content_hash)."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class ChunkDiff:
+    """Plano de sincronização entre chunks novos e linhas existentes."""
+    keep: list[dict] = field(default_factory=list)  # {"id": row_id, "chunk_index": novo índice}
+    new: list[int] = field(default_factory=list)  # índices dos chunks a embedar
+    stale_ids: list[int] = field(default_factory=list)  # linhas a remover
+
+
+def diff_chunks(new_hashes: list[str], existing: list[dict], reuse: bool = True) -> ChunkDiff:
+    """
+    Casa cada chunk novo com uma linha existente de mesmo content_hash.
+    Hashes repetidos são consumidos um a um; linhas legadas sem hash
+    nunca casam e são substituídas. reuse=False força re-embed de tudo.
+    """
+    available: dict[str, list[dict]] = {}
+    for row in sorted(existing, key=lambda r: (r.get("chunk_index") or 0, r["id"])):
+        if reuse and row.get("content_hash"):
+            available.setdefault(row["content_hash"], []).append(row)
+
+    diff = ChunkDiff()
+    used: set[int] = set()
+    for index, fingerprint in enumerate(new_hashes):
+        candidates = available.get(fingerprint)
+        if candidates:
+            row = candidates.pop(0)
+            used.add(row["id"])
+            diff.keep.append({"id": row["id"], "chunk_index": index})
+        else:
+            diff.new.append(index)
+
+    diff.stale_ids = [row["id"] for row in existing if row["id"] not in used]
+    return diff
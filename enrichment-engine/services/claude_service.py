@@ -1,18 +1,22 @@
 """
 Claude Service — Extração semântica via Anthropic Claude Sonnet.
-Wrapper com retry, rate limiting e response JSON.
+Wrapper com response JSON; rate limiting, retry e cliente em pool ficam
+no LLMGateway.
 
 Usa o pacote `anthropic` (SDK oficial da Anthropic).
 """
 from __future__ import annotations
 
-import asyncio
 import json
 import logging
 import time
 from typing import Any
 
 from config import get_settings
+from services.llm_cache import get_llm_cache
+from services.llm_gateway import get_llm_gateway
+from services.llm_telemetry import llm_prompt
+from services.map_reduce_extraction import map_reduce_extract
 
 logger = logging.getLogger("enrichment-engine.claude")
 
@@ -22,55 +26,45 @@ class ClaudeService:
 
     def __init__(self):
         self.settings = get_settings()
-        self._client = None
-        self._request_times: list[float] = []
 
-    def _get_client(self):
-        """Lazy init do cliente Anthropic."""
-        if self._client is None:
-            try:
-                import anthropic
-
-                self._client = anthropic.AsyncAnthropic(
-                    api_key=self.settings.anthropic_api_key
-                )
-                logger.info(
-                    "Claude client initialized: model=%s", self.settings.claude_sonnet_model
-                )
-            except ImportError as e:
-                logger.error("anthropic not installed: %s", e)
-                raise RuntimeError("Anthropic library not available") from e
-
-        return self._client
-
-    async def _check_rate_limit(self):
-        """Rate limiting simples — sliding window de 1 minuto."""
-        now = time.time()
-        window = 60
-        self._request_times = [t for t in self._request_times if now - t < window]
-
-        # Claude Sonnet: ~50 req/min no tier padrão
-        if len(self._request_times) >= 50:
-            wait_time = window - (now - self._request_times[0])
-            logger.warning("Rate limit hit, waiting %.1fs", wait_time)
-            await asyncio.sleep(wait_time)
-
-        self._request_times.append(now)
-
-    async def extract(self, system_prompt: str, context: str) -> dict[str, Any]:
+    @llm_prompt("claude.extract")
+    async def extract(
+        self, system_prompt: str, context: str, bypass_cache: bool = False
+    ) -> dict[str, Any]:
         """
         Envia system_prompt + contexto para Claude e retorna JSON estruturado.
+        Respostas ficam no LLMResponseCache: mesma entrada, mesmo JSON.
+        Contextos maiores que max_text_length seguem para map-reduce por seção.
 
         Args:
             system_prompt: Prompt com instruções de extração (do prompts/)
             context: Texto/dados a serem analisados
+            bypass_cache: Ignora o cache e força nova chamada (o resultado é regravado)
 
         Returns:
             dict com dados extraídos conforme prompt
         """
-        client = self._get_client()
-        await self._check_rate_limit()
+        if self.settings.extraction_map_reduce and len(context) > self.settings.max_text_length:
+            return await map_reduce_extract(
+                lambda section: self.extract(system_prompt, section, bypass_cache=bypass_cache),
+                context,
+                self.settings.max_text_length,
+            )
 
+        cache = get_llm_cache()
+        key = cache.key(
+            "anthropic",
+            self.settings.claude_sonnet_model,
+            system_prompt,
+            context,
+            {"max_tokens": 4096, "max_chars": self.settings.max_text_length},
+        )
+        return await cache.get_or_call(
+            key, lambda: self._extract_uncached(system_prompt, context), bypass=bypass_cache
+        )
+
+    def request_params(self, system_prompt: str, context: str) -> dict[str, Any]:
+        """kwargs de messages.create para extração (também usado em lotes offline)."""
         # Truncar contexto se muito longo
         max_chars = self.settings.max_text_length
         if len(context) > max_chars:
@@ -78,19 +72,34 @@ class ClaudeService:
                 "Context truncated from %d to %d chars", len(context), max_chars
             )
             context = context[:max_chars]
+        return {
+            "model": self.settings.claude_sonnet_model,
+            "max_tokens": 4096,
+            "system": system_prompt,
+            "messages": [{"role": "user", "content": context}],
+        }
 
+    @staticmethod
+    def parse_json_text(text: str) -> Any:
+        """JSON da resposta, extraído de bloco markdown se presente."""
+        text = text.strip()
+        if "```json" in text:
+            text = text.split("```json")[1].split("```")[0].strip()
+        elif "```" in text:
+            text = text.split("```")[1].split("```")[0].strip()
+        return json.loads(text)
+
+    async def _extract_uncached(self, system_prompt: str, context: str) -> dict[str, Any]:
+        params = self.request_params(system_prompt, context)
+        gateway = get_llm_gateway()
         last_error = None
         max_retries = self.settings.gemini_max_retries  # reutiliza configuração
 
+        # Erros transitórios já são re-tentados no gateway; aqui só JSON inválido
         for attempt in range(1, max_retries + 1):
             try:
                 start = time.time()
-                response = await client.messages.create(
-                    model=self.settings.claude_sonnet_model,
-                    max_tokens=4096,
-                    system=system_prompt,
-                    messages=[{"role": "user", "content": context}],
-                )
+                response = await gateway.anthropic_messages(**params)
                 elapsed = time.time() - start
 
                 logger.info(
@@ -101,16 +110,8 @@ class ClaudeService:
                     response.usage.output_tokens,
                 )
 
-                text = response.content[0].text.strip()
-
-                # Extrair JSON de bloco markdown se presente
-                if "```json" in text:
-                    text = text.split("```json")[1].split("```")[0].strip()
-                elif "```" in text:
-                    text = text.split("```")[1].split("```")[0].strip()
-
-                result = json.loads(text)
-                return result
+                text = response.content[0].text
+                return self.parse_json_text(text)
 
             except json.JSONDecodeError as e:
                 raw = locals().get("text", "")
@@ -123,15 +124,8 @@ class ClaudeService:
                 last_error = e
 
             except Exception as e:
-                logger.warning(
-                    "Claude request failed (attempt %d): %s", attempt, str(e)
-                )
-                last_error = e
-
-                if attempt < max_retries:
-                    wait = 2 ** attempt
-                    logger.info("Retrying in %ds...", wait)
-                    await asyncio.sleep(wait)
+                logger.warning("Claude request failed: %s", str(e))
+                raise RuntimeError(f"Claude failed: {e}") from e
 
         raise RuntimeError(
             f"Claude failed after {max_retries} attempts: {last_error}"
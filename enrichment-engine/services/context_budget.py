@@ -0,0 +1,373 @@
+"""
+Context Budget — Monta contextos de LLM compactos que cabem num orçamento de tokens.
+
+Usado na consolidação do caso (/enrich/consolidate), onde dezenas de
+documentos enriquecidos viram um único prompt:
+
+1. Serialização compacta: JSON sem indentação, sem nulos/vazios.
+2. Deduplicação entre documentos: pessoas (por nome normalizado, com papéis e
+   fontes unidos) e fatos repetidos em fatos/pontos-chave/teses.
+3. Ranking das seções por prioridade do tipo (denúncia > sentença > ... >
+   certidão) e data mais recente.
+4. Encaixe no orçamento medido com o tokenizer local do Gemini
+   (google-genai[local-tokenizer]); sem ele, ~4 caracteres por token.
+   Seções que não cabem perdem primeiro o preview em markdown e, se ainda
+   não couberem, são listadas como omitidas — o modelo sabe o que faltou.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from services.llm_gateway import estimate_tokens
+
+logger = logging.getLogger("enrichment-engine.context-budget")
+
+# Listas de pessoas nos schemas de extração → papel implícito
+PERSON_KEYS: dict[str, Optional[str]] = {
+    "pessoas": None,
+    "pessoas_mencionadas": None,
+    "persons_mentioned": None,
+    "envolvidos": None,
+    "depoentes": None,
+    "reus": "reu",
+    "correus": "correu",
+    "vitimas": "vitima",
+    "testemunhas": "testemunha",
+    "testemunhas_acusacao": "testemunha",
+    "testemunhas_defesa": "testemunha",
+    "peritos": "perito",
+}
+# Listas de fatos/pontos que se repetem entre documentos do mesmo caso
+FACT_KEYS = {
+    "fatos", "facts", "fatos_narrados", "key_points", "pontos_chave",
+    "trechos_chave", "pontos_criticos", "observacoes_defesa",
+    "contradictions", "contradicoes_internas", "teses_possiveis",
+}
+# Maior prioridade entra primeiro quando o orçamento aperta
+TYPE_PRIORITY = {
+    "contexto": 100,
+    "pessoas": 90,
+    "denuncia": 80,
+    "sentenca": 75,
+    "decisao": 70,
+    "depoimento": 65,
+    "transcricao": 65,
+    "laudo": 60,
+    "demanda": 55,
+    "certidao": 30,
+}
+DEFAULT_PRIORITY = 40
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}")
+
+
+# ----------------------------------------------------------------------
+# Serialização compacta
+# ----------------------------------------------------------------------
+
+def drop_empty(value: Any) -> Any:
+    """Remove recursivamente None, "", [] e {} (mantém False e 0)."""
+    if isinstance(value, dict):
+        cleaned = {k: drop_empty(v) for k, v in value.items()}
+        return {k: v for k, v in cleaned.items() if v not in (None, "", [], {})}
+    if isinstance(value, list):
+        cleaned = [drop_empty(v) for v in value]
+        return [v for v in cleaned if v not in (None, "", [], {})]
+    return value
+
+
+def compact_json(value: Any) -> str:
+    return json.dumps(drop_empty(value), ensure_ascii=False, separators=(",", ":"))
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"[\W_]+", " ", text).strip().casefold()
+
+
+# ----------------------------------------------------------------------
+# Tokenizer
+# ----------------------------------------------------------------------
+
+class TokenCounter:
+    """Tokenizer local do Gemini quando disponível; senão estimativa por caracteres."""
+
+    def __init__(self, model: str):
+        self.model = model
+        self._tokenizer = None
+        try:
+            from google.genai.local_tokenizer import LocalTokenizer
+
+            self._tokenizer = LocalTokenizer(model_name=model)
+        except Exception as e:
+            # sem sentencepiece, modelo sem tokenizer local ou sem rede para baixá-lo
+            logger.info("Local tokenizer unavailable for %s (%s) — estimating ~4 chars/token", model, e)
+
+    @property
+    def exact(self) -> bool:
+        return self._tokenizer is not None
+
+    def count(self, text: str) -> int:
+        if self._tokenizer is not None:
+            try:
+                return self._tokenizer.count_tokens(text).total_tokens
+            except Exception as e:
+                logger.warning("Local tokenizer failed, estimating: %s", e)
+        return estimate_tokens(text)
+
+
+_token_counters: dict[str, TokenCounter] = {}
+
+
+def get_token_counter(model: str) -> TokenCounter:
+    """TokenCounter por modelo (o tokenizer local é carregado uma vez)."""
+    if model not in _token_counters:
+        _token_counters[model] = TokenCounter(model)
+    return _token_counters[model]
+
+
+# ----------------------------------------------------------------------
+# Seções e orçamento
+# ----------------------------------------------------------------------
+
+@dataclass
+class ContextSection:
+    """Bloco do contexto: dados estruturados + texto livre opcional (descartável)."""
+    group: str  # cabeçalho do grupo (=== DOCUMENTOS ENRIQUECIDOS ===)
+    label: str
+    kind: str
+    data: Any = None
+    preview: str = ""
+    date: str = ""
+    order: int = 0
+
+    @property
+    def priority(self) -> int:
+        return TYPE_PRIORITY.get(self.kind, DEFAULT_PRIORITY)
+
+    def render(self, with_preview: bool = True) -> str:
+        lines = [f"--- {self.label} ---"]
+        if self.data:
+            lines.append(compact_json(self.data))
+        if with_preview and self.preview:
+            lines.append(f"Preview:\n{self.preview}")
+        return "\n".join(lines)
+
+
+@dataclass
+class BudgetedContext:
+    text: str
+    tokens: int
+    budget: int
+    included: list[str] = field(default_factory=list)
+    trimmed: list[str] = field(default_factory=list)
+    omitted: list[str] = field(default_factory=list)
+    exact_tokens: bool = False
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "tokens": self.tokens,
+            "budget": self.budget,
+            "sections": len(self.included),
+            "trimmed": len(self.trimmed),
+            "omitted": len(self.omitted),
+            "tokenizer": "local" if self.exact_tokens else "estimate",
+        }
+
+
+def _rank_key(section: ContextSection) -> tuple:
+    # Prioridade do tipo, depois o mais recente, depois a ordem original
+    return (-section.priority, _invert_date(section.date), section.order)
+
+
+def _invert_date(date: str) -> str:
+    digits = re.sub(r"\D", "", date)[:8]
+    if len(digits) < 8:
+        return "99999999"  # sem data: depois dos datados
+    return "".join(str(9 - int(d)) for d in digits)
+
+
+def fit_sections(
+    sections: list[ContextSection],
+    budget_tokens: int,
+    counter: TokenCounter,
+) -> BudgetedContext:
+    """Escolhe as seções por ranking até o orçamento e renderiza na ordem original."""
+    chosen: dict[int, str] = {}
+    result = BudgetedContext(text="", tokens=0, budget=budget_tokens, exact_tokens=counter.exact)
+    headers = {s.group for s in sections}
+    used = sum(counter.count(h) for h in headers)
+
+    for section in sorted(sections, key=_rank_key):
+        full = section.render()
+        cost = counter.count(full)
+        trimmed = False
+        if used + cost > budget_tokens and section.preview:
+            full = section.render(with_preview=False)
+            cost = counter.count(full)
+            trimmed = True
+        if used + cost > budget_tokens:
+            result.omitted.append(f"{section.label} ({section.kind})")
+            continue
+        chosen[id(section)] = full
+        used += cost
+        result.included.append(section.label)
+        if trimmed:
+            result.trimmed.append(section.label)
+
+    parts: list[str] = []
+    current_group = None
+    for section in sorted(sections, key=lambda s: s.order):
+        rendered = chosen.get(id(section))
+        if rendered is None:
+            continue
+        if section.group != current_group:
+            current_group = section.group
+            parts.append(f"{section.group}\n")
+        parts.append(rendered)
+        parts.append("")
+    if result.omitted:
+        note = "[Omitidos por limite de contexto: " + "; ".join(result.omitted) + "]"
+        parts.append(note)
+        used += counter.count(note)
+
+    result.text = "\n".join(parts).strip()
+    result.tokens = used
+    return result
+
+
+# ----------------------------------------------------------------------
+# Consolidação do caso
+# ----------------------------------------------------------------------
+
+def _section_date(data: dict[str, Any]) -> str:
+    for key in ("data_documento", "data", "data_sentenca", "data_decisao", "data_laudo", "data_expedicao", "created_at"):
+        value = data.get(key)
+        if isinstance(value, str) and _DATE_RE.match(value):
+            return value
+    for key, value in data.items():
+        if key.startswith("data") and isinstance(value, str) and _DATE_RE.match(value):
+            return value
+    return ""
+
+
+class _CaseDeduplicator:
+    """Extrai pessoas e descarta fatos repetidos entre as seções do caso."""
+
+    def __init__(self):
+        self.persons: dict[str, dict[str, Any]] = {}
+        self.seen_facts: set[str] = set()
+        self.duplicate_facts = 0
+
+    def person(self, item: Any, role: Optional[str], source: str) -> bool:
+        if isinstance(item, str):
+            item = {"nome": item}
+        if not isinstance(item, dict) or not isinstance(item.get("nome"), str) or not item["nome"].strip():
+            return False
+        key = _normalize(item["nome"])
+        merged = self.persons.setdefault(key, {"nome": item["nome"].strip(), "papeis": [], "fontes": []})
+        for papel in (role, item.get("papel"), item.get("tipo")):
+            if isinstance(papel, str) and papel and papel not in merged["papeis"]:
+                merged["papeis"].append(papel)
+        for k, v in drop_empty(item).items():
+            if k not in ("nome", "papel", "tipo"):
+                merged.setdefault(k, v)
+        if source not in merged["fontes"]:
+            merged["fontes"].append(source)
+        return True
+
+    def strip(self, value: Any, source: str) -> Any:
+        """Copia `value` sem listas de pessoas (vão para o registro) e sem fatos já vistos."""
+        if isinstance(value, list):
+            return [self.strip(v, source) for v in value]
+        if not isinstance(value, dict):
+            return value
+        out = {}
+        for k, v in value.items():
+            if k in PERSON_KEYS and isinstance(v, list):
+                leftovers = [p for p in v if not self.person(p, PERSON_KEYS[k], source)]
+                if leftovers:
+                    out[k] = leftovers
+            elif k in FACT_KEYS and isinstance(v, list):
+                out[k] = self._unique_facts(v)
+            else:
+                out[k] = self.strip(v, source)
+        return out
+
+    def _unique_facts(self, items: list) -> list:
+        kept = []
+        for item in items:
+            text = item if isinstance(item, str) else json.dumps(item, ensure_ascii=False, sort_keys=True)
+            key = _normalize(text)
+            if key in self.seen_facts:
+                self.duplicate_facts += 1
+                continue
+            self.seen_facts.add(key)
+            kept.append(item)
+        return kept
+
+    def persons_data(self) -> list[dict[str, Any]]:
+        rows = []
+        for p in self.persons.values():
+            row = dict(p)
+            if not row["papeis"]:
+                row.pop("papeis")
+            rows.append(row)
+        return rows
+
+
+def build_case_sections(
+    documents: list[dict],
+    transcripts: list[dict],
+    demandas: list[dict],
+    context: Optional[dict] = None,
+    preview_chars: int = 2000,
+) -> tuple[list[ContextSection], dict[str, int]]:
+    """Seções da consolidação com pessoas e fatos deduplicados entre documentos."""
+    dedup = _CaseDeduplicator()
+    raw: list[tuple[str, str, str, Any, str, str]] = []
+
+    for i, doc in enumerate(documents):
+        label = f"Documento #{i+1}: {doc.get('nome', 'Sem nome')}"
+        kind = doc.get("document_type") or "outro"
+        data = doc.get("extracted_data") or {}
+        body = {"tipo": kind, **data} if isinstance(data, dict) else {"tipo": kind, "dados": data}
+        date = _section_date(data) if isinstance(data, dict) else ""
+        preview = (doc.get("markdown_preview") or "")[:preview_chars]
+        raw.append(("=== DOCUMENTOS ENRIQUECIDOS ===", label, kind, body, preview, date or _section_date(doc)))
+
+    transcript_keys = ("key_points", "facts", "persons_mentioned", "contradictions", "teses_possiveis")
+    for i, t in enumerate(transcripts):
+        body = {k: t[k] for k in transcript_keys if t.get(k)}
+        raw.append(("=== TRANSCRICOES DE ATENDIMENTO ===", f"Atendimento #{i+1}", "transcricao", body, "", _section_date(t)))
+
+    for i, d in enumerate(demandas):
+        raw.append(("=== DEMANDAS/INTIMACOES ===", f"Demanda #{i+1}", "demanda", d, "", _section_date(d)))
+
+    # Dedup na ordem de ranking: a cópia mantida fica na seção mais importante
+    ranked = sorted(
+        range(len(raw)),
+        key=lambda i: (-TYPE_PRIORITY.get(raw[i][2], DEFAULT_PRIORITY), _invert_date(raw[i][5]), i),
+    )
+    bodies: dict[int, Any] = {}
+    for i in ranked:
+        group, label, kind, body, _, _ = raw[i]
+        bodies[i] = dedup.strip(body, label.split(":")[0])
+
+    sections: list[ContextSection] = []
+    if context:
+        sections.append(ContextSection("=== CONTEXTO ADICIONAL ===", "Contexto", "contexto", data=context, order=-2))
+    if dedup.persons:
+        sections.append(ContextSection(
+            "=== PESSOAS DO CASO (consolidado) ===", "Pessoas", "pessoas", data=dedup.persons_data(), order=-1,
+        ))
+    for i, (group, label, kind, _, preview, date) in enumerate(raw):
+        sections.append(ContextSection(group, label, kind, data=bodies[i], preview=preview, date=date, order=i))
+
+    stats = {"persons": len(dedup.persons), "duplicate_facts": dedup.duplicate_facts}
+    return sections, stats
@@ -7,14 +7,22 @@ Compara múltiplas análises individuais de depoimentos para encontrar:
 - Tese consolidada de defesa
 - Timeline unificada dos fatos
 - Mapa de atores
+
+Casos grandes e novos depoimentos de um caso já analisado são tratados de
+forma incremental: cada etapa envia o resultado acumulado, resumos compactos
+dos fatos dos depoimentos já cobertos e as análises completas só dos novos,
+e o modelo devolve apenas o delta — o custo por caso cresce linearmente.
 """
 from __future__ import annotations
 
-import json
+import copy
 import logging
-from typing import Any
+from typing import Any, AsyncIterator
 
 from config import get_settings
+from services.context_budget import compact_json, drop_empty
+from services.json_stream import JSONStreamParser
+from services.llm_gateway import cache_block, get_llm_gateway
 
 logger = logging.getLogger("enrichment-engine.cross-analysis")
 
@@ -113,6 +121,129 @@ REGRAS IMPORTANTES:
 - NÃO invente fatos — analise APENAS o que está nas análises individuais."""
 
 
+CROSS_MERGE_PROMPT = """Você é um analista forense sênior especializado em Defensoria Pública Criminal no Brasil.
+Vai receber uma ANÁLISE CRUZADA JÁ CONSOLIDADA de depoimentos de um caso, RESUMOS dos fatos de cada depoimento já coberto e as análises individuais de NOVOS depoimentos do MESMO CASO.
+
+OBJETIVO: Incorporar os NOVOS depoimentos à análise cruzada existente, sem refazê-la.
+
+INSTRUÇÕES ESTRITAS:
+1. Compare o que cada novo depoente disse com os fatos dos depoimentos já cobertos e com os demais novos.
+2. Identifique TODAS as novas contradições, corroborações e lacunas — elas são OURO para a defesa.
+3. Responda APENAS com as ALTERAÇÕES (delta), nos mesmos campos e formato de itens da análise atual:
+   - contradiction_matrix: itens novos ou itens existentes que mudaram. Para atualizar um item existente, repita o "fato" EXATAMENTE como está na análise atual, inclua em "depoimentos" apenas as afirmações NOVAS e dê "tipo" e "analise" já atualizados.
+   - timeline_fatos: mesma regra (identificado por "fato"; em "fontes" apenas as novas).
+   - mapa_atores: mesma regra (identificado por "nome"; em "mencionado_por" e "relacoes" apenas os novos).
+   - tese_consolidada: a tese COMPLETA atualizada se os novos depoimentos a alteram; null se não mudou.
+   - providencias_agregadas: apenas providências novas.
+4. NÃO repita itens que não mudaram.
+
+FORMATO DE SAÍDA — responda APENAS com JSON válido:
+{
+  "contradiction_matrix": [],
+  "tese_consolidada": null,
+  "timeline_fatos": [],
+  "mapa_atores": [],
+  "providencias_agregadas": []
+}
+
+REGRAS IMPORTANTES:
+- source_file_id/file_id/fontes referenciam os source_file_id fornecidos.
+- NÃO invente fatos — analise APENAS o que está nas análises e resumos fornecidos."""
+
+RESULT_KEYS = (
+    "contradiction_matrix", "tese_consolidada", "timeline_fatos",
+    "mapa_atores", "providencias_agregadas",
+)
+# Itens de lista identificados por um campo; as listas internas acumulam
+_ITEM_MERGE = {
+    "contradiction_matrix": ("fato", ("depoimentos",)),
+    "timeline_fatos": ("fato", ("fontes",)),
+    "mapa_atores": ("nome", ("mencionado_por", "relacoes")),
+}
+# Análise individual acima disso vai truncada para o prompt
+_MAX_ANALYSIS_CHARS = 15_000
+
+
+def _item_key(value: Any) -> str:
+    return " ".join(str(value).casefold().split()) if value else ""
+
+
+def _pluck(items: Any, *fields: str) -> list:
+    """Campos de uma lista de dicts do schema de análise (tolerante a strings soltas)."""
+    out = []
+    for item in items or []:
+        if isinstance(item, dict):
+            values = [item.get(f) for f in fields if item.get(f)]
+            if values:
+                out.append(" | ".join(str(v) for v in values))
+        elif item:
+            out.append(item)
+    return out
+
+
+def fact_digest(entry: dict[str, Any]) -> dict[str, Any]:
+    """
+    Resumo compacto dos fatos de um depoimento (sem LLM), a partir da análise
+    individual: o que viu, ouviu dizer, pessoas, datas, contradições e pontos.
+    É o que as etapas incrementais recebem dos depoimentos já cobertos.
+    """
+    analysis = entry.get("analysis") or {}
+    percepcao = analysis.get("percepcao") or {}
+    entidades = analysis.get("entidades") or {}
+    depoente = analysis.get("depoente") if isinstance(analysis.get("depoente"), dict) else {}
+    return drop_empty({
+        "source_file_id": entry.get("file_id"),
+        "depoente": entry.get("depoente") or depoente.get("nome"),
+        "relacao_com_fatos": depoente.get("relacao_com_fatos"),
+        "resumo": analysis.get("resumo_defesa"),
+        "viu": _pluck(percepcao.get("viu_diretamente"), "fato", "timestamp_ref"),
+        "ouviu_dizer": _pluck(
+            (percepcao.get("ouviu_dizer_especifico") or []) + (percepcao.get("ouviu_dizer_boato") or []),
+            "fato", "fonte",
+        ),
+        "pessoas": _pluck(entidades.get("pessoas"), "nome", "papel"),
+        "datas": _pluck(entidades.get("datas_horarios"), "referencia", "contexto"),
+        "contradicoes_internas": _pluck(analysis.get("contradicoes"), "analise"),
+        "pontos_favoraveis": _pluck(analysis.get("pontos_favoraveis"), "ponto"),
+        "pontos_desfavoraveis": _pluck(analysis.get("pontos_desfavoraveis"), "ponto"),
+    })
+
+
+def merge_cross_results(base: dict[str, Any], delta: dict[str, Any]) -> dict[str, Any]:
+    """
+    Aplica o delta de uma etapa incremental sobre a análise cruzada atual:
+    itens com o mesmo fato/nome são atualizados (listas internas acumulam),
+    os demais são acrescentados; tese substituída só se veio no delta.
+    """
+    merged = {k: copy.deepcopy(base.get(k)) for k in RESULT_KEYS}
+    for key, (ident, nested) in _ITEM_MERGE.items():
+        items = list(merged.get(key) or [])
+        index = {_item_key(i.get(ident)): i for i in items if isinstance(i, dict) and i.get(ident)}
+        for item in delta.get(key) or []:
+            if not isinstance(item, dict):
+                continue
+            current = index.get(_item_key(item.get(ident)))
+            if current is None:
+                items.append(item)
+                if item.get(ident):
+                    index[_item_key(item[ident])] = item
+                continue
+            for field, value in item.items():
+                if field in nested and isinstance(value, list):
+                    existing = current.setdefault(field, [])
+                    existing.extend(v for v in value if v not in existing)
+                elif field != ident and value not in (None, "", [], {}):
+                    current[field] = value
+        merged[key] = items
+
+    if delta.get("tese_consolidada"):
+        merged["tese_consolidada"] = delta["tese_consolidada"]
+    providencias = list(merged.get("providencias_agregadas") or [])
+    providencias.extend(p for p in delta.get("providencias_agregadas") or [] if p not in providencias)
+    merged["providencias_agregadas"] = providencias
+    return merged
+
+
 class CrossAnalysisService:
     """Análise cruzada de depoimentos com Claude Sonnet."""
 
@@ -122,6 +253,7 @@ class CrossAnalysisService:
         self.model = settings.claude_sonnet_model
         self.max_tokens = 8192
         self.timeout = settings.claude_timeout
+        self.max_input_chars = settings.cross_analysis_max_input_chars
 
         if not self.api_key:
             logger.warning("ANTHROPIC_API_KEY não configurada — cross-analysis indisponível")
@@ -134,6 +266,7 @@ class CrossAnalysisService:
         self,
         analyses: list[dict[str, Any]],
         assistido_nome: str | None = None,
+        previous: dict[str, Any] | None = None,
     ) -> dict[str, Any] | None:
         """
         Compara múltiplas análises individuais e gera análise cruzada.
@@ -141,9 +274,13 @@ class CrossAnalysisService:
         Args:
             analyses: Lista de dicts com {file_id, file_name, depoente, analysis}
             assistido_nome: Nome do assistido (réu) para contexto
+            previous: Linha atual de cross_analyses (resultado + source_file_ids).
+                Se informada, só os depoimentos fora de source_file_ids são
+                incorporados, em modo incremental.
 
         Returns:
-            Dict com contradiction_matrix, tese_consolidada, timeline_fatos, mapa_atores, providencias_agregadas
+            Dict com contradiction_matrix, tese_consolidada, timeline_fatos, mapa_atores,
+            providencias_agregadas e source_file_ids (depoimentos efetivamente cobertos)
         """
         if not self.available:
             logger.warning("Cross-analysis indisponível — ANTHROPIC_API_KEY não configurada")
@@ -155,69 +292,11 @@ class CrossAnalysisService:
 
         import anthropic
 
-        logger.info(
-            "Iniciando cross-analysis | assistido=%s | num_analyses=%d",
-            assistido_nome, len(analyses),
-        )
-
-        # Construir conteúdo para o prompt
-        context_parts = []
-        if assistido_nome:
-            context_parts.append(f"ASSISTIDO (RÉU): {assistido_nome}")
-        context_parts.append(f"TOTAL DE DEPOIMENTOS: {len(analyses)}")
-
-        analyses_text = []
-        for i, a in enumerate(analyses, 1):
-            analysis_json = json.dumps(a.get("analysis", {}), ensure_ascii=False, indent=2)
-            # Truncar análises muito longas
-            if len(analysis_json) > 15_000:
-                analysis_json = analysis_json[:15_000] + "\n... [TRUNCADO]"
-
-            analyses_text.append(
-                f"--- DEPOIMENTO {i} ---\n"
-                f"source_file_id: {a.get('file_id')}\n"
-                f"Arquivo: {a.get('file_name', 'desconhecido')}\n"
-                f"Depoente: {a.get('depoente', 'não identificado')}\n"
-                f"Análise individual:\n{analysis_json}\n"
-            )
-
-        context = "\n".join(context_parts)
-        all_analyses = "\n\n".join(analyses_text)
-
-        # Truncar se muito longo
-        max_chars = 150_000
-        if len(all_analyses) > max_chars:
-            all_analyses = all_analyses[:max_chars] + "\n\n[... TRUNCADO POR LIMITE ...]"
-            logger.warning("Cross-analysis input truncado para %d chars", max_chars)
-
+        result = None
         try:
-            client = anthropic.AsyncAnthropic(api_key=self.api_key)
-
-            message = await client.messages.create(
-                model=self.model,
-                max_tokens=self.max_tokens,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": f"{context}\n\n{all_analyses}",
-                    }
-                ],
-                system=CROSS_ANALYSIS_PROMPT,
-            )
-
-            response_text = message.content[0].text
-            result = self._parse_response(response_text)
-
-            if result:
-                logger.info(
-                    "Cross-analysis concluída | contradictions=%d | timeline=%d | atores=%d",
-                    len(result.get("contradiction_matrix", [])),
-                    len(result.get("timeline_fatos", [])),
-                    len(result.get("mapa_atores", [])),
-                )
-            else:
-                logger.warning("Cross-analysis retornou resposta não-parseável")
-
+            async for event in self.cross_analyze_stream(analyses, assistido_nome, previous):
+                if event["event"] == "result" and event["data"]:
+                    result = {**event["data"], "source_file_ids": event["source_file_ids"]}
             return result
 
         except anthropic.APIError as e:
@@ -227,32 +306,168 @@ class CrossAnalysisService:
             logger.error("Cross-analysis falhou: %s", str(e))
             return None
 
-    def _parse_response(self, response_text: str) -> dict[str, Any] | None:
-        """Parse da resposta JSON do Sonnet."""
-        import re as _re
+    async def cross_analyze_stream(
+        self,
+        analyses: list[dict[str, Any]],
+        assistido_nome: str | None = None,
+        previous: dict[str, Any] | None = None,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """
+        Versão em streaming de cross_analyze: gera {"event": "item", "path", "data"}
+        para cada item completo (cada entrada de contradiction_matrix, cada
+        ator, a tese...) assim que o modelo o termina, e por fim
+        {"event": "result", "data", "truncated", "source_file_ids"} com o
+        resultado montado. Erros da API sobem para o chamador.
+
+        Casos que não cabem num prompt (ou com `previous`) são processados em
+        etapas: análise completa do primeiro grupo e, depois, cada grupo
+        seguinte incorporado via delta contra o resultado acumulado e os
+        resumos de fatos dos depoimentos já cobertos. Nesse modo, em vez de
+        itens são emitidos {"event": "progress", "covered", "total"}.
+        """
+        logger.info(
+            "Iniciando cross-analysis | assistido=%s | num_analyses=%d | incremental=%s",
+            assistido_nome, len(analyses), previous is not None,
+        )
 
-        try:
-            return json.loads(response_text.strip())
-        except json.JSONDecodeError:
-            pass
-
-        json_match = _re.search(r"```(?:json)?\s*\n?(.*?)\n?```", response_text, _re.DOTALL)
-        if json_match:
-            try:
-                return json.loads(json_match.group(1).strip())
-            except json.JSONDecodeError:
-                pass
-
-        first_brace = response_text.find("{")
-        last_brace = response_text.rfind("}")
-        if first_brace != -1 and last_brace > first_brace:
-            try:
-                return json.loads(response_text[first_brace : last_brace + 1])
-            except json.JSONDecodeError:
-                pass
-
-        logger.warning("Não foi possível parsear resposta da cross-analysis")
-        return None
+        covered_ids = set(previous.get("source_file_ids") or []) if previous else set()
+        if covered_ids:
+            covered = [a for a in analyses if a.get("file_id") in covered_ids]
+            pending = [a for a in analyses if a.get("file_id") not in covered_ids]
+            result = {k: previous.get(k) for k in RESULT_KEYS}
+            truncated = False
+        else:
+            groups = self._group(analyses, self.max_input_chars)
+            covered, pending = groups[0], [a for g in groups[1:] for a in g]
+            parser = JSONStreamParser(root="{")
+            async for chunk in self._stream(
+                CROSS_ANALYSIS_PROMPT, self._build_user_content(covered, assistido_nome), "cross_analysis"
+            ):
+                for path, value in parser.feed(chunk):
+                    if not pending:
+                        yield {"event": "item", "path": list(path), "data": value}
+            result, truncated = parser.result(), parser.truncated
+            if not result:
+                logger.warning("Cross-analysis retornou resposta não-parseável")
+                yield {"event": "result", "data": None, "truncated": truncated, "source_file_ids": []}
+                return
+            if truncated:
+                logger.warning(
+                    "Cross-analysis com resposta truncada — aproveitando itens completos (%s)",
+                    ", ".join(result),
+                )
+            if pending:
+                yield {"event": "progress", "covered": len(covered), "total": len(analyses)}
+
+        while pending:
+            digests = [fact_digest(a) for a in covered]
+            room = self.max_input_chars - len(compact_json(result)) - len(compact_json(digests))
+            if room < self.max_input_chars // 4:
+                logger.warning(
+                    "Cross-analysis incremental com pouco espaço | base+resumos=%d chars",
+                    self.max_input_chars - room,
+                )
+            batch = self._group(pending, max(room, 1))[0]
+            delta, step_truncated = await self._merge_step(result, digests, batch, assistido_nome)
+            if delta is None:
+                logger.warning(
+                    "Cross-analysis incremental sem delta parseável — %d depoimentos ficam para a próxima",
+                    len(pending),
+                )
+                truncated = True
+                break
+            result = merge_cross_results(result, delta)
+            truncated = truncated or step_truncated
+            covered = covered + batch
+            pending = pending[len(batch):]
+            yield {"event": "progress", "covered": len(covered), "total": len(analyses)}
+
+        logger.info(
+            "Cross-analysis concluída | contradictions=%d | timeline=%d | atores=%d | cobertos=%d/%d",
+            len(result.get("contradiction_matrix") or []),
+            len(result.get("timeline_fatos") or []),
+            len(result.get("mapa_atores") or []),
+            len(covered), len(analyses),
+        )
+        yield {
+            "event": "result",
+            "data": result,
+            "truncated": truncated,
+            "source_file_ids": [a.get("file_id") for a in covered],
+        }
+
+    def _stream(self, system: str, content: str, prompt_id: str) -> AsyncIterator[str]:
+        return get_llm_gateway().anthropic_stream(
+            prompt_id=prompt_id,
+            model=self.model,
+            max_tokens=self.max_tokens,
+            messages=[{"role": "user", "content": content}],
+            system=[cache_block(system)],
+        )
+
+    async def _merge_step(
+        self,
+        current: dict[str, Any],
+        digests: list[dict[str, Any]],
+        new: list[dict[str, Any]],
+        assistido_nome: str | None,
+    ) -> tuple[dict[str, Any] | None, bool]:
+        """Pede ao modelo só o delta dos novos depoimentos contra o resultado atual."""
+        content = "\n\n".join([
+            *([f"ASSISTIDO (RÉU): {assistido_nome}"] if assistido_nome else []),
+            f"ANÁLISE CRUZADA ATUAL:\n{compact_json(current)}",
+            "RESUMOS DOS DEPOIMENTOS JÁ COBERTOS:\n" + "\n".join(compact_json(d) for d in digests),
+            f"NOVOS DEPOIMENTOS: {len(new)}",
+            *(self._analysis_block(i, a) for i, a in enumerate(new, len(digests) + 1)),
+        ])
+        parser = JSONStreamParser(root="{")
+        async for chunk in self._stream(CROSS_MERGE_PROMPT, content, "cross_analysis.merge"):
+            parser.feed(chunk)
+        return parser.result(), parser.truncated
+
+    @staticmethod
+    def _analysis_block(i: int, a: dict[str, Any]) -> str:
+        analysis_json = compact_json(a.get("analysis", {}))
+        # Truncar análises muito longas
+        if len(analysis_json) > _MAX_ANALYSIS_CHARS:
+            analysis_json = analysis_json[:_MAX_ANALYSIS_CHARS] + "\n... [TRUNCADO]"
+        return (
+            f"--- DEPOIMENTO {i} ---\n"
+            f"source_file_id: {a.get('file_id')}\n"
+            f"Arquivo: {a.get('file_name', 'desconhecido')}\n"
+            f"Depoente: {a.get('depoente', 'não identificado')}\n"
+            f"Análise individual:\n{analysis_json}\n"
+        )
+
+    @classmethod
+    def _group(cls, analyses: list[dict[str, Any]], max_chars: int) -> list[list[dict[str, Any]]]:
+        """Divide em grupos consecutivos cujos blocos cabem em `max_chars` (mínimo 1 por grupo)."""
+        groups: list[list[dict[str, Any]]] = [[]]
+        size = 0
+        for i, a in enumerate(analyses, 1):
+            block = len(cls._analysis_block(i, a))
+            if groups[-1] and size + block > max_chars:
+                groups.append([])
+                size = 0
+            groups[-1].append(a)
+            size += block
+        return groups
+
+    @classmethod
+    def _build_user_content(
+        cls,
+        analyses: list[dict[str, Any]],
+        assistido_nome: str | None,
+    ) -> str:
+        """Monta o conteúdo do prompt a partir das análises individuais."""
+        context_parts = []
+        if assistido_nome:
+            context_parts.append(f"ASSISTIDO (RÉU): {assistido_nome}")
+        context_parts.append(f"TOTAL DE DEPOIMENTOS: {len(analyses)}")
+
+        context = "\n".join(context_parts)
+        all_analyses = "\n\n".join(cls._analysis_block(i, a) for i, a in enumerate(analyses, 1))
+        return f"{context}\n\n{all_analyses}"
 
 
 # Singleton
@@ -0,0 +1,96 @@
+"""
+Diarization Worker Pool — pyannote em processos dedicados, em paralelo ao Whisper.
+
+A diarização é CPU-bound (minutos numa audiência longa) e segurava o event
+loop depois da transcrição. Aqui cada worker carrega a pipeline pyannote uma
+única vez (≈1GB) e roda uma inferência curta de aquecimento; o serviço de
+transcrição dispara o job assim que o áudio está pronto, e a latência total
+passa a ser max(Whisper, diarização). Timeout por job e fila limitada vêm de
+services.worker_pool; o timeout cresce com a duração do áudio.
+"""
+from __future__ import annotations
+
+import logging
+import os
+from pathlib import Path
+from typing import Any, Callable
+
+from services.worker_pool import ProcessWorkerPool, WorkerPoolFullError
+
+logger = logging.getLogger("enrichment-engine.diarization.pool")
+
+PYANNOTE_MODEL = "pyannote/speaker-diarization-3.1"
+WARMUP_SECONDS = 2
+DiarizerFactory = Callable[..., Callable[[str, int | None], list[dict]]]
+
+
+class DiarizationPoolFullError(WorkerPoolFullError):
+    """Fila de diarização cheia — a transcrição segue sem speakers."""
+
+
+def load_pipeline(hf_token: str) -> Any:
+    """Carrega a pipeline pyannote (pesada — baixa/lê ~1GB de modelos)."""
+    from pyannote.audio import Pipeline
+
+    return Pipeline.from_pretrained(PYANNOTE_MODEL, use_auth_token=hf_token)
+
+
+def diarize_with(pipeline: Any, audio: Any, num_speakers: int | None = None) -> list[dict]:
+    """Roda a pipeline e devolve os turnos [{"start", "end", "speaker"}]."""
+    kwargs = {"num_speakers": num_speakers} if num_speakers else {}
+    diarization = pipeline(audio, **kwargs)
+    return [
+        {"start": turn.start, "end": turn.end, "speaker": speaker}
+        for turn, _, speaker in diarization.itertracks(yield_label=True)
+    ]
+
+
+def _pyannote_diarizer(hf_token: str, pool_size: int = 1) -> Callable[[str, int | None], list[dict]]:
+    """Factory padrão: roda no processo worker e mantém a pipeline quente."""
+    import torch
+
+    # Workers dividem os núcleos em vez de disputá-los
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // max(pool_size, 1)))
+    pipeline = load_pipeline(hf_token)
+    try:
+        # Primeira inferência paga inicialização de kernels/caches — fora do 1º job
+        silence = torch.zeros(1, 16_000 * WARMUP_SECONDS)
+        diarize_with(pipeline, {"waveform": silence, "sample_rate": 16_000})
+    except Exception as e:  # noqa: BLE001 — aquecimento é opcional
+        logger.warning("pyannote warm-up falhou: %s", e)
+
+    def diarize(path: str, num_speakers: int | None = None) -> list[dict]:
+        return diarize_with(pipeline, path, num_speakers)
+
+    return diarize
+
+
+class DiarizationWorkerPool(ProcessWorkerPool):
+    """Pool de processos com pipelines pyannote pré-carregadas, timeout e backpressure."""
+
+    name = "diarization"
+    job_label = "Diarization"
+    full_error = DiarizationPoolFullError
+
+    def __init__(
+        self,
+        size: int,
+        queue_size: int,
+        job_timeout: float,
+        diarizer_factory: DiarizerFactory = _pyannote_diarizer,
+        factory_args: tuple = (),
+    ):
+        super().__init__(size, queue_size, job_timeout, diarizer_factory, factory_args)
+
+    async def diarize(
+        self, audio_path: Path, num_speakers: int | None = None, timeout: float | None = None
+    ) -> list[dict]:
+        """
+        Diariza o arquivo num worker livre. `timeout` (segundos) substitui o
+        job_timeout do pool — o chamador escala pela duração do áudio.
+
+        Raises:
+            DiarizationPoolFullError: todos os workers ocupados e fila cheia.
+            RuntimeError: timeout, worker morto ou falha do pyannote.
+        """
+        return await self.submit((str(audio_path), num_speakers), timeout=timeout)
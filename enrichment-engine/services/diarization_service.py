@@ -5,10 +5,12 @@ Usa o output da transcricao existente + Claude Sonnet para inferir identidade.
 
 import json
 import logging
-import os
 from typing import Optional
 
-import anthropic
+from config import get_settings
+from services.json_stream import JSONStreamParser
+from services.llm_gateway import get_llm_gateway
+from services.llm_telemetry import llm_prompt
 
 logger = logging.getLogger("enrichment-engine.diarization")
 
@@ -17,13 +19,13 @@ class DiarizationService:
     """Identifica speakers em transcricoes juridicas usando Claude Sonnet."""
 
     def __init__(self):
-        api_key = os.getenv("ANTHROPIC_API_KEY", "")
-        self.client = anthropic.AsyncAnthropic(api_key=api_key) if api_key else None
+        self.api_key = get_settings().anthropic_api_key
 
     @property
     def available(self) -> bool:
-        return self.client is not None
+        return bool(self.api_key)
 
+    @llm_prompt("diarization.speakers")
     async def identify_speakers(
         self,
         transcription_text: str,
@@ -43,7 +45,7 @@ class DiarizationService:
             }
         ]
         """
-        if not self.client:
+        if not self.available:
             logger.warning("[diarization] Anthropic client not configured")
             return []
 
@@ -87,21 +89,20 @@ Responda APENAS com JSON array:
 [{{"speaker_key": "Speaker 1", "label": "...", "role": "...", "confidence": 0.95, "reasoning": "..."}}]"""
 
         try:
-            response = await self.client.messages.create(
+            # Streaming: cada speaker fecha no parser assim que chega; se a
+            # resposta for cortada, os speakers completos são aproveitados
+            parser = JSONStreamParser(root="[")
+            async for chunk in get_llm_gateway().anthropic_stream(
                 model="claude-sonnet-4-20250514",
                 max_tokens=2000,
                 messages=[{"role": "user", "content": prompt}],
-            )
+            ):
+                parser.feed(chunk)
 
-            text = response.content[0].text.strip()
-            # Extract JSON from response
-            if "```" in text:
-                text = text.split("```")[1]
-                if text.startswith("json"):
-                    text = text[4:]
-                text = text.strip()
-
-            return json.loads(text)
+            speakers = [s for s in (parser.result() or []) if isinstance(s, dict) and s.get("speaker_key")]
+            if parser.truncated:
+                logger.warning("[diarization] Resposta truncada — %d speakers aproveitados", len(speakers))
+            return speakers
         except Exception as e:
             logger.error("[diarization] Error identifying speakers: %s", str(e))
             return []
@@ -0,0 +1,165 @@
+"""
+Disk Cache — Key/value em disco local com compressão opcional e evicção LRU.
+
+Chaves são hashes hex (conteúdo endereçado). Cada entrada é um arquivo:
+o mtime marca a escrita (TTL) e o atime, atualizado a cada leitura, é o relógio do LRU.
+"""
+from __future__ import annotations
+
+import gzip
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger("enrichment-engine.cache")
+
+
+class DiskCache:
+    """Cache em disco com limite de tamanho (LRU), TTL opcional e métricas."""
+
+    def __init__(
+        self,
+        directory: str | Path,
+        max_bytes: int,
+        compress: bool = False,
+        ttl_seconds: float | None = None,
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        entries = self._entries()
+        self._total_bytes = sum(p.stat().st_size for p in entries)
+        self._count = len(entries)
+
+    def _entries(self) -> list[Path]:
+        return [p for p in self.directory.glob("*/*") if p.is_file() and not p.name.startswith(".")]
+
+    def _path(self, key: str) -> Path:
+        suffix = ".gz" if self.compress else ".bin"
+        return self.directory / key[:2] / f"{key}{suffix}"
+
+    def _find(self, key: str) -> Path | None:
+        """Procura a entrada em qualquer formato (compress pode ter mudado)."""
+        for suffix in (".gz", ".bin"):
+            path = self.directory / key[:2] / f"{key}{suffix}"
+            if path.exists():
+                return path
+        return None
+
+    def get(self, key: str) -> bytes | None:
+        """Retorna o valor ou None (miss, expirado ou corrompido)."""
+        path = self._find(key)
+        if path is None:
+            self.misses += 1
+            return None
+
+        try:
+            if self.ttl_seconds is not None and time.time() - path.stat().st_mtime > self.ttl_seconds:
+                self._remove(path)
+                self.misses += 1
+                return None
+            raw = path.read_bytes()
+            value = gzip.decompress(raw) if path.suffix == ".gz" else raw
+        except (OSError, EOFError, gzip.BadGzipFile) as e:
+            logger.warning("Cache entry unreadable, dropping %s: %s", path.name, e)
+            self._remove(path)
+            self.misses += 1
+            return None
+
+        # TTL conta a partir da escrita; LRU usa o atime
+        try:
+            st = path.stat()
+            os.utime(path, (time.time(), st.st_mtime))
+        except OSError:
+            pass
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: bytes) -> None:
+        """Grava atomicamente e aplica o limite de tamanho."""
+        path = self._path(key)
+        payload = gzip.compress(value, compresslevel=6) if self.compress else value
+        if len(payload) > self.max_bytes:
+            return
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            with self._lock:
+                old = self._find(key)
+                if old is not None:
+                    self._total_bytes -= old.stat().st_size
+                    self._count -= 1
+                    old.unlink(missing_ok=True)
+                os.replace(tmp_name, path)
+                self._total_bytes += len(payload)
+                self._count += 1
+        except OSError as e:
+            logger.warning("Cache write failed for %s: %s", key[:12], e)
+            Path(tmp_name).unlink(missing_ok=True)
+            return
+
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+
+    def get_text(self, key: str) -> str | None:
+        value = self.get(key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set_text(self, key: str, value: str) -> None:
+        self.set(key, value.encode("utf-8"))
+
+    def _remove(self, path: Path) -> None:
+        with self._lock:
+            try:
+                size = path.stat().st_size
+                path.unlink()
+                self._total_bytes -= size
+                self._count -= 1
+            except OSError:
+                pass
+
+    def _evict(self) -> None:
+        """Remove entradas menos recentemente usadas até caber em 90% do limite."""
+        target = int(self.max_bytes * 0.9)
+        entries = []
+        for p in self._entries():
+            try:
+                entries.append((p.stat().st_atime, p))
+            except OSError:
+                continue
+        entries.sort()
+
+        evicted = 0
+        for _, path in entries:
+            if self._total_bytes <= target:
+                break
+            self._remove(path)
+            evicted += 1
+        if evicted:
+            logger.info("Cache eviction | dir=%s removed=%d", self.directory.name, evicted)
+
+    def clear(self) -> None:
+        for path in self._entries():
+            self._remove(path)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": self._count,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+        }
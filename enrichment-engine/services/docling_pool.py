@@ -0,0 +1,72 @@
+"""
+Docling Worker Pool — Parsing de documentos fora do event loop.
+
+Cada worker é um processo dedicado que carrega o DocumentConverter uma única vez
+(modelos de layout/OCR ficam quentes) e recebe jobs por um Pipe próprio.
+Um worker que estoura o timeout é morto e substituído sem afetar os demais.
+Mecânica de processos/fila/timeout em services.worker_pool.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Callable
+
+from services.worker_pool import ProcessWorkerPool, WorkerPoolFullError
+
+PageRange = tuple[int, int]
+ParserFactory = Callable[..., Callable[[str, PageRange | None], str]]
+
+
+class DoclingPoolFullError(WorkerPoolFullError):
+    """Fila de parsing cheia — o chamador deve tentar novamente mais tarde."""
+
+
+def _docling_parser(ocr_enabled: bool, ocr_lang: str) -> Callable[[str, PageRange | None], str]:
+    """Factory padrão: roda no processo worker e mantém o converter quente."""
+    from services.docling_service import build_converter, export_pages_markdown
+
+    converter = build_converter(ocr_enabled, ocr_lang)
+
+    def parse(path: str, page_range: PageRange | None = None) -> str:
+        if page_range is None:
+            result = converter.convert(path)
+            return result.document.export_to_markdown()
+        result = converter.convert(path, page_range=page_range)
+        return export_pages_markdown(result.document)
+
+    return parse
+
+
+class DoclingWorkerPool(ProcessWorkerPool):
+    """Pool de processos com converters pré-carregados, timeout e backpressure."""
+
+    name = "docling"
+    job_label = "Document parsing"
+    full_error = DoclingPoolFullError
+
+    def __init__(
+        self,
+        size: int,
+        queue_size: int,
+        job_timeout: float,
+        parser_factory: ParserFactory = _docling_parser,
+        factory_args: tuple = (),
+    ):
+        super().__init__(size, queue_size, job_timeout, parser_factory, factory_args)
+
+    async def parse(
+        self,
+        file_path: Path,
+        page_range: PageRange | None = None,
+        admitted: bool = False,
+    ) -> str:
+        """
+        Envia o arquivo (ou um intervalo de páginas, 1-based inclusivo) para um
+        worker livre e aguarda o Markdown. `admitted=True` pula a checagem de fila
+        — usado pelos shards de um documento já admitido.
+
+        Raises:
+            DoclingPoolFullError: todos os workers ocupados e fila cheia.
+            RuntimeError: timeout, worker morto ou falha do Docling.
+        """
+        return await self.submit((str(file_path), page_range), admitted=admitted)
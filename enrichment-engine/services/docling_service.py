@@ -4,44 +4,118 @@ Usa IBM Docling para extração com alta fidelidade de layout, tabelas e OCR.
 """
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import logging
 import tempfile
+import time
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-
-import httpx
+from typing import AsyncIterator
 
 from config import get_settings
+from services.disk_cache import DiskCache
+from services.download_service import download_to_tempfile
+from services.docling_pool import DoclingWorkerPool, PageRange
 
 logger = logging.getLogger("enrichment-engine.docling")
 
 
+def build_converter(ocr_enabled: bool, ocr_lang: str):
+    """Instancia o DocumentConverter (pesado — carrega modelos de layout/OCR)."""
+    from docling.document_converter import DocumentConverter, PdfFormatOption
+    from docling.datamodel.pipeline_options import PdfPipelineOptions
+    from docling.datamodel.base_models import InputFormat
+
+    pipeline_options = PdfPipelineOptions()
+    pipeline_options.do_ocr = ocr_enabled
+    pipeline_options.ocr_options = {
+        "lang": [ocr_lang],
+    }
+
+    return DocumentConverter(
+        format_options={
+            InputFormat.PDF: PdfFormatOption(
+                pipeline_options=pipeline_options
+            )
+        }
+    )
+
+
+def export_pages_markdown(document) -> str:
+    """
+    Exporta Markdown página a página com marcador `## Page N` (numeração do
+    PDF original), reconhecido por `_split_markdown_to_pages` em routers/extract.py.
+    """
+    parts = []
+    for page_no in sorted(document.pages):
+        page_md = document.export_to_markdown(page_no=page_no)
+        parts.append(f"## Page {page_no}\n\n{page_md}")
+    return "\n\n".join(parts)
+
+
+def count_pdf_pages(file_path: Path) -> int | None:
+    """Número de páginas via pypdfium2 (dependência do Docling); None se indisponível."""
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        return None
+    try:
+        pdf = pdfium.PdfDocument(str(file_path))
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    except Exception as e:
+        logger.warning("Could not count pages of %s: %s", file_path.name, e)
+        return None
+
+
+def plan_shards(total_pages: int, shard_pages: int) -> list[PageRange]:
+    """Divide [1, total_pages] em intervalos contíguos de até shard_pages páginas."""
+    shard_pages = max(1, shard_pages)
+    return [
+        (start, min(start + shard_pages - 1, total_pages))
+        for start in range(1, total_pages + 1, shard_pages)
+    ]
+
+
+@dataclass
+class DoclingShard:
+    """Markdown de um intervalo de páginas (1-based, inclusivo)."""
+    index: int
+    first_page: int
+    last_page: int
+    markdown: str
+
+
+@lru_cache
+def _docling_version() -> str:
+    try:
+        from importlib.metadata import version
+
+        return version("docling")
+    except Exception:
+        return "unknown"
+
+
 class DoclingService:
     """Wrapper para IBM Docling — converte documentos em Markdown estruturado."""
 
     def __init__(self):
         self.settings = get_settings()
         self._converter = None
+        self._pool: DoclingWorkerPool | None = None
+        self._cache: DiskCache | None = None
 
     def _get_converter(self):
         """Lazy init do DocumentConverter (pesado, carrega modelos)."""
         if self._converter is None:
             try:
-                from docling.document_converter import DocumentConverter, PdfFormatOption
-                from docling.datamodel.pipeline_options import PdfPipelineOptions
-                from docling.datamodel.base_models import InputFormat
-
-                pipeline_options = PdfPipelineOptions()
-                pipeline_options.do_ocr = self.settings.docling_ocr_enabled
-                pipeline_options.ocr_options = {
-                    "lang": [self.settings.docling_ocr_lang],
-                }
-
-                self._converter = DocumentConverter(
-                    format_options={
-                        InputFormat.PDF: PdfFormatOption(
-                            pipeline_options=pipeline_options
-                        )
-                    }
+                self._converter = build_converter(
+                    self.settings.docling_ocr_enabled,
+                    self.settings.docling_ocr_lang,
                 )
                 logger.info("Docling DocumentConverter initialized successfully")
             except ImportError as e:
@@ -55,51 +129,93 @@ class DoclingService:
 
     async def download_file(self, url: str) -> tuple[Path, str]:
         """
-        Baixa arquivo via URL signed.
+        Baixa arquivo via URL signed, em streaming direto para disco.
         Retorna (path_local, mime_type_detectado).
         """
-        max_size = self.settings.docling_max_file_size_mb * 1024 * 1024
+        downloaded = await download_to_tempfile(
+            url, max_bytes=self.settings.docling_max_file_size_mb * 1024 * 1024
+        )
 
-        async with httpx.AsyncClient(timeout=60) as client:
-            response = await client.get(url)
-            response.raise_for_status()
+        path = downloaded.path
+        if not path.suffix:
+            # MIME desconhecido — Docling decide o formato pela extensão
+            path = path.rename(path.with_suffix(self._mime_to_ext(downloaded.content_type)))
 
-            content_length = len(response.content)
-            if content_length > max_size:
-                raise ValueError(
-                    f"File too large: {content_length / 1024 / 1024:.1f}MB "
-                    f"(max: {self.settings.docling_max_file_size_mb}MB)"
-                )
+        return path, downloaded.content_type
 
-            # Detectar extensão pelo content-type
-            content_type = response.headers.get("content-type", "")
-            ext = self._mime_to_ext(content_type)
+    def _get_cache(self) -> DiskCache | None:
+        """Lazy init do cache de parsing (None quando desabilitado)."""
+        if not self.settings.docling_cache_enabled:
+            return None
+        if self._cache is None:
+            self._cache = DiskCache(
+                Path(self.settings.cache_dir) / "docling",
+                max_bytes=self.settings.docling_cache_max_mb * 1024 * 1024,
+                compress=self.settings.docling_cache_compress,
+            )
+        return self._cache
 
-            # Salvar em arquivo temporário
-            tmp = tempfile.NamedTemporaryFile(suffix=ext, delete=False)
-            tmp.write(response.content)
-            tmp.close()
+    def cache_key(self, file_path: Path, variant: str = "") -> str:
+        """
+        SHA-256 dos bytes do arquivo + configuração que afeta o Markdown
+        (OCR on/off, idioma do OCR, versão do Docling, modo de exportação).
+        """
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        digest.update(
+            f"|ocr={self.settings.docling_ocr_enabled}"
+            f"|lang={self.settings.docling_ocr_lang}"
+            f"|docling={_docling_version()}"
+            f"|variant={variant}".encode()
+        )
+        return digest.hexdigest()
 
-            logger.info(
-                "Downloaded file | size=%.1fKB mime=%s path=%s",
-                content_length / 1024,
-                content_type,
-                tmp.name,
-            )
-            return Path(tmp.name), content_type
+    def open_cache(self) -> None:
+        """Abre o cache de parsing (varre o diretório): chamar fora do event loop."""
+        self._get_cache()
+
+    def cache_stats(self) -> dict:
+        """Contadores hit/miss e ocupação do cache de parsing (sem abri-lo)."""
+        if not self.settings.docling_cache_enabled:
+            return {"enabled": False}
+        if self._cache is None:
+            return {"enabled": True, "initialized": False}
+        return self._cache.stats()
 
     def parse_to_markdown(self, file_path: Path) -> str:
         """
         Converte documento para Markdown usando Docling.
         Preserva layout, tabelas (como Markdown tables) e texto OCR.
+        Resultados ficam no cache de parsing (chave = conteúdo do arquivo).
         """
+        cache = self._get_cache()
+        key = self.cache_key(file_path) if cache is not None else None
+        if cache is not None:
+            cached = cache.get_text(key)
+            if cached is not None:
+                logger.info("Parse cache hit: %s | chars=%d", file_path.name, len(cached))
+                return cached
+
+        markdown = self._convert(file_path)
+        if cache is not None:
+            cache.set_text(key, markdown)
+        return markdown
+
+    def _convert(self, file_path: Path, page_range: PageRange | None = None) -> str:
+        """Conversão Docling sem cache, no processo atual."""
         converter = self._get_converter()
 
-        logger.info("Parsing document: %s", file_path.name)
+        logger.info("Parsing document: %s | pages=%s", file_path.name, page_range or "all")
 
         try:
-            result = converter.convert(str(file_path))
-            markdown = result.document.export_to_markdown()
+            if page_range is None:
+                result = converter.convert(str(file_path))
+                markdown = result.document.export_to_markdown()
+            else:
+                result = converter.convert(str(file_path), page_range=page_range)
+                markdown = export_pages_markdown(result.document)
 
             logger.info(
                 "Parsed successfully | chars=%d pages=%s",
@@ -112,6 +228,168 @@ class DoclingService:
             logger.error("Docling parse failed for %s: %s", file_path.name, e)
             raise RuntimeError(f"Document parsing failed: {e}") from e
 
+    def _get_pool(self) -> DoclingWorkerPool | None:
+        """Lazy init do pool de workers (None quando docling_pool_size=0)."""
+        if self.settings.docling_pool_size <= 0:
+            return None
+        if self._pool is None:
+            self._pool = DoclingWorkerPool(
+                size=self.settings.docling_pool_size,
+                queue_size=self.settings.docling_pool_queue_size,
+                job_timeout=self.settings.docling_job_timeout,
+                factory_args=(
+                    self.settings.docling_ocr_enabled,
+                    self.settings.docling_ocr_lang,
+                ),
+            )
+        return self._pool
+
+    async def parse_to_markdown_async(self, file_path: Path) -> str:
+        """
+        Versão async de parse_to_markdown — o parsing roda no pool de processos
+        e o event loop segue livre. Sem pool configurado, usa uma thread.
+
+        PDFs com docling_shard_min_pages páginas ou mais são convertidos em
+        shards paralelos (ver parse_to_markdown_sharded).
+
+        Raises:
+            DoclingPoolFullError: pool saturado (mapear para 503).
+        """
+        plan = await asyncio.to_thread(self.shard_plan, file_path)
+        if len(plan) > 1:
+            return await self.parse_to_markdown_sharded(file_path, plan)
+
+        cache = self._get_cache()
+        key = None
+        if cache is not None:
+            key = await asyncio.to_thread(self.cache_key, file_path)
+            cached = await asyncio.to_thread(cache.get_text, key)
+            if cached is not None:
+                logger.info("Parse cache hit: %s | chars=%d", file_path.name, len(cached))
+                return cached
+
+        pool = self._get_pool()
+        if pool is None:
+            markdown = await asyncio.to_thread(self._convert, file_path)
+        else:
+            logger.info(
+                "Parsing document in worker pool: %s | busy=%d waiting=%d",
+                file_path.name,
+                pool.busy,
+                pool.waiting,
+            )
+            markdown = await pool.parse(file_path)
+            logger.info("Parsed successfully | chars=%d", len(markdown))
+
+        if cache is not None:
+            await asyncio.to_thread(cache.set_text, key, markdown)
+        return markdown
+
+    def shard_plan(self, file_path: Path) -> list[PageRange]:
+        """Intervalos de páginas para conversão paralela ([] = não fragmentar)."""
+        if self._get_pool() is None or file_path.suffix.lower() != ".pdf":
+            return []
+        total = count_pdf_pages(file_path)
+        if not total or total < self.settings.docling_shard_min_pages:
+            return []
+        return plan_shards(total, self.settings.docling_shard_pages)
+
+    async def iter_shards(
+        self, file_path: Path, plan: list[PageRange] | None = None
+    ) -> AsyncIterator[DoclingShard]:
+        """
+        Converte os shards concorrentemente e emite cada um assim que termina
+        (ordem de conclusão — use `DoclingShard.index` para reordenar).
+        Interromper a iteração cancela os shards pendentes.
+        """
+        if plan is None:
+            plan = await asyncio.to_thread(self.shard_plan, file_path)
+        if not plan:
+            total = await asyncio.to_thread(count_pdf_pages, file_path)
+            if not total:
+                markdown = await self.parse_to_markdown_async(file_path)
+                yield DoclingShard(index=0, first_page=1, last_page=1, markdown=markdown)
+                return
+            plan = [(1, total)]
+
+        pool = self._get_pool()
+        if pool is not None:
+            pool.admit()
+        semaphore = asyncio.Semaphore(pool.size if pool is not None else 1)
+
+        async def _run(index: int, page_range: PageRange) -> DoclingShard:
+            async with semaphore:
+                if pool is not None:
+                    markdown = await pool.parse(file_path, page_range, admitted=True)
+                else:
+                    markdown = await asyncio.to_thread(self._convert, file_path, page_range)
+            return DoclingShard(index, page_range[0], page_range[1], markdown)
+
+        logger.info(
+            "Sharded parse: %s | shards=%d pages=%d",
+            file_path.name,
+            len(plan),
+            plan[-1][1],
+        )
+        tasks = [asyncio.create_task(_run(i, r)) for i, r in enumerate(plan)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def parse_to_markdown_sharded(
+        self, file_path: Path, plan: list[PageRange] | None = None
+    ) -> str:
+        """
+        Converte um PDF grande em shards de páginas paralelos e costura o
+        Markdown na ordem original, com marcadores `## Page N` preservados.
+        """
+        cache = self._get_cache()
+        key = None
+        if cache is not None:
+            key = await asyncio.to_thread(self.cache_key, file_path, "pages")
+            cached = await asyncio.to_thread(cache.get_text, key)
+            if cached is not None:
+                logger.info("Parse cache hit (sharded): %s | chars=%d", file_path.name, len(cached))
+                return cached
+
+        start = time.time()
+        shards = [shard async for shard in self.iter_shards(file_path, plan)]
+        shards.sort(key=lambda shard: shard.index)
+        markdown = "\n\n".join(shard.markdown for shard in shards)
+        logger.info(
+            "Sharded parse complete | shards=%d chars=%d time=%.1fs",
+            len(shards),
+            len(markdown),
+            time.time() - start,
+        )
+
+        if cache is not None:
+            await asyncio.to_thread(cache.set_text, key, markdown)
+        return markdown
+
+    async def parse_from_bytes_async(
+        self, content: bytes, filename: str = "document.pdf"
+    ) -> str:
+        """Versão async de parse_from_bytes (via pool de processos)."""
+        ext = Path(filename).suffix or ".pdf"
+        tmp = tempfile.NamedTemporaryFile(suffix=ext, delete=False)
+        tmp.write(content)
+        tmp.close()
+
+        try:
+            return await self.parse_to_markdown_async(Path(tmp.name))
+        finally:
+            Path(tmp.name).unlink(missing_ok=True)
+
+    def shutdown(self) -> None:
+        """Encerra os workers do pool (chamado no shutdown da app)."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
     def parse_from_bytes(self, content: bytes, filename: str = "document.pdf") -> str:
         """
         Converte bytes de documento para Markdown.
@@ -162,3 +440,14 @@ def get_docling_service() -> DoclingService:
     if _docling_service is None:
         _docling_service = DoclingService()
     return _docling_service
+
+
+def peek_docling_service() -> DoclingService | None:
+    """Singleton só se já criado."""
+    return _docling_service
+
+
+def shutdown_docling_service() -> None:
+    """Encerra o pool de workers se o singleton já foi criado."""
+    if _docling_service is not None:
+        _docling_service.shutdown()
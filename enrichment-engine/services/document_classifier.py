@@ -0,0 +1,165 @@
+"""
+Document Classifier — Pré-classificação local (sem LLM) de peças processuais.
+
+Olha só o começo do documento e os headings Markdown do Docling, procurando
+marcadores típicos de sentença, decisão, laudo, certidão, depoimento e
+denúncia. O atalho (pular o CLASSIFIER_PROMPT e ir direto ao prompt
+especializado) só vale para SINGLE_PASS_TYPES — sentença e denúncia, que os
+marcadores separam com segurança e que têm o mesmo rótulo na taxonomia do
+LLM. Os demais tipos pontuam apenas para disputar com esses dois; laudos,
+certidões e depoimentos têm subtipos (laudo_necroscopico, certidão de
+prazo = burocracia...) que só o LLM distingue.
+
+Vetos: pronúncia/impronúncia ("sentença de pronúncia", "decido
+PRONUNCIAR") e decisão de recebimento da denúncia têm os mesmos marcadores
+de sentença/denúncia, mas outro tipo na taxonomia — vão sempre ao LLM.
+
+Pontuação: cada marcador encontrado soma seu peso uma vez; marcadores em
+headings valem o triplo. confidence = top / (top + segundo), zerada quando
+o tipo vencedor não atinge MIN_SCORE.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from services.text_search import fold_accents
+
+MIN_SCORE = 4.0
+HEADING_WEIGHT = 3.0
+
+# Tipos que o atalho pode emitir (mesmo rótulo do CLASSIFIER_PROMPT)
+SINGLE_PASS_TYPES = ("sentenca", "denuncia")
+
+_HEADING_RE = re.compile(r"^\s*(?:#{1,6}\s+(.+)|([A-Z][A-Z\s\-–ÇÃÕÁÉÍÓÚÂÊÔ]{6,}))\s*$", re.MULTILINE)
+
+# (regex sobre texto sem acentos e minúsculo, peso)
+MARKERS: dict[str, list[tuple[re.Pattern, float]]] = {
+    "sentenca": [
+        (re.compile(r"\bsentenca\b"), 2.0),
+        (re.compile(r"\bjulgo (?:parcialmente )?(?:procedente|improcedente)"), 3.0),
+        (re.compile(r"\b(?:condeno|absolvo)\b"), 3.0),
+        (re.compile(r"\bdosimetria\b"), 2.0),
+        (re.compile(r"\bisto posto\b|\bante o exposto\b"), 1.0),
+        (re.compile(r"\bpublique-se\b.{0,20}\bregistre-se\b"), 1.0),
+    ],
+    "decisao": [
+        (re.compile(r"\bdecisao\b"), 2.0),
+        (re.compile(r"\bdecido\b"), 2.0),
+        (re.compile(r"\b(?:defiro|indefiro)\b"), 2.0),
+        (re.compile(r"\bprisao preventiva\b|\bliberdade provisoria\b"), 1.5),
+        (re.compile(r"\bmedidas? cautelar"), 1.5),
+    ],
+    "laudo": [
+        (re.compile(r"\blaudo\b"), 3.0),
+        (re.compile(r"\bperit[oa]s?\b|\bpericia\b"), 2.0),
+        (re.compile(r"\bquesitos?\b"), 2.0),
+        (re.compile(r"\bexame de corpo de delito\b|\bnecroscopic"), 2.0),
+    ],
+    "certidao": [
+        (re.compile(r"\bcertidao\b"), 3.0),
+        (re.compile(r"\bcertifico\b"), 3.0),
+        (re.compile(r"\bdou fe\b|\bo referido e verdade\b"), 2.0),
+    ],
+    "depoimento": [
+        (re.compile(r"\btermo de (?:depoimento|declaracoes|oitiva)\b"), 4.0),
+        (re.compile(r"\bdepoente\b|\bdeclarante\b"), 3.0),
+        (re.compile(r"\bcompromissad[oa]\b|\baos costumes\b"), 2.0),
+        (re.compile(r"\binquirid[oa]\b|\boitiva\b"), 1.5),
+    ],
+    "denuncia": [
+        (re.compile(r"\bdenuncia\b"), 2.0),
+        (re.compile(r"\boferece(?:r)? (?:a presente )?denuncia\b"), 4.0),
+        (re.compile(r"\bincurs[oa] nas? (?:penas|sancoes)\b"), 3.0),
+        (re.compile(r"\brol de testemunhas\b"), 2.0),
+        (re.compile(r"\brecebimento da (?:presente )?denuncia\b"), 2.0),
+    ],
+}
+
+# Casos parecidos com sentença/denúncia que o LLM classifica de outro jeito
+VETO_MARKERS: list[re.Pattern] = [
+    re.compile(r"\b(?:im)?pronuncia\b|\b(?:im)?pronunci(?:o|ar|a-se|ado|ada)\b"),
+    re.compile(r"\brecebo a (?:presente )?denuncia\b|\bdenuncia recebida\b"),
+]
+
+# sub_type e relevância no formato do CLASSIFIER_SCHEMA
+_SUB_TYPES: dict[str, list[tuple[str, re.Pattern]]] = {
+    "sentenca": [
+        ("condenatória", re.compile(r"\bcondeno\b|\bjulgo procedente\b")),
+        ("absolutória", re.compile(r"\babsolvo\b|\bjulgo improcedente\b")),
+        ("extintiva", re.compile(r"\bextinta a punibilidade\b|\bextincao da punibilidade\b")),
+    ],
+}
+_RELEVANCIA = {"sentenca": "critico", "denuncia": "critico"}
+
+AREA_MARKERS: list[tuple[str, re.Pattern]] = [
+    ("JURI", re.compile(r"\btribunal do juri\b|\bpronuncia\b|\bconselho de sentenca\b")),
+    ("VD", re.compile(r"\bmaria da penha\b|\bviolencia domestica\b|\b11\.?340\b")),
+    ("EP", re.compile(r"\bexecucao penal\b|\bprogressao de regime\b|\blivramento condicional\b")),
+    ("INFANCIA", re.compile(r"\bato infracional\b|\badolescente\b|\bestatuto da crianca\b")),
+]
+
+
+@dataclass
+class LocalClassification:
+    """Resultado do classificador local."""
+    document_type: str
+    confidence: float
+    area: Optional[str] = None
+    sub_type: Optional[str] = None
+    scores: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def single_pass(self) -> bool:
+        """True se o tipo pode pular o CLASSIFIER_PROMPT."""
+        return self.document_type in SINGLE_PASS_TYPES
+
+    def as_dict(self) -> dict[str, Any]:
+        """Mesmos campos do CLASSIFIER_SCHEMA (+ "classifier")."""
+        return {
+            "document_type": self.document_type,
+            "sub_type": self.sub_type,
+            "area": self.area,
+            "confidence": self.confidence,
+            "relevancia": _RELEVANCIA.get(self.document_type),
+            "classifier": "local",
+        }
+
+
+def _headings(markdown: str) -> str:
+    return "\n".join((m.group(1) or m.group(2)) for m in _HEADING_RE.finditer(markdown))
+
+
+def classify_document_locally(markdown: str, head_chars: int = 8000) -> LocalClassification:
+    """
+    Classifica pelo início do texto + headings; 'outro' com confiança 0 se
+    nada domina ou se um marcador de veto aparece.
+    """
+    head = fold_accents(markdown[:head_chars])
+    headings = fold_accents(_headings(markdown))
+
+    scores: dict[str, float] = {}
+    for doc_type, markers in MARKERS.items():
+        score = 0.0
+        for pattern, weight in markers:
+            if pattern.search(headings):
+                score += weight * HEADING_WEIGHT
+            elif pattern.search(head):
+                score += weight
+        scores[doc_type] = score
+
+    ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+    (best, top), (_, second) = ranked[0], ranked[1]
+    if top < MIN_SCORE or any(pattern.search(head) for pattern in VETO_MARKERS):
+        return LocalClassification("outro", 0.0, scores=scores)
+
+    area = next((name for name, pattern in AREA_MARKERS if pattern.search(head)), None)
+    sub_type = next((name for name, pattern in _SUB_TYPES.get(best, []) if pattern.search(head)), None)
+    return LocalClassification(
+        document_type=best,
+        confidence=round(top / (top + second), 3),
+        area=area,
+        sub_type=sub_type,
+        scores=scores,
+    )
@@ -13,6 +13,8 @@ from typing import Optional
 import httpx
 
 from config import get_settings
+from services.chunking import chunk_fingerprint, diff_chunks
+from services.embedding_cache import get_embedding_cache
 
 logger = logging.getLogger("enrichment-engine.document-embedding")
 settings = get_settings()
@@ -91,10 +93,20 @@ class DocumentEmbeddingService:
     # ── OpenAI Embeddings ───────────────────────────────────────
 
     async def generate_embeddings(self, texts: list[str]) -> list[list[float]]:
-        """Generate embeddings for a batch of texts using OpenAI API."""
+        """Generate embeddings for a batch of texts, served from EmbeddingCache when possible."""
         if not self.openai_api_key:
             raise ValueError("OPENAI_API_KEY not set")
 
+        return await get_embedding_cache().get_or_embed(
+            EMBEDDING_MODEL,
+            EMBEDDING_DIMENSIONS,
+            texts,
+            self._embed_uncached,
+        )
+
+    async def _embed_uncached(self, texts: list[str]) -> list[list[float]]:
+        """Generate embeddings for a batch of texts using OpenAI API."""
+
         # Truncate very long texts (model limit ~8191 tokens)
         truncated = [t[:15000] for t in texts]
 
@@ -129,8 +141,15 @@ class DocumentEmbeddingService:
         assistido_id: Optional[int],
         text: str,
         metadata: Optional[dict] = None,
+        incremental: bool = True,
     ) -> int:
-        """Chunk a document, generate embeddings, and store in database."""
+        """
+        Chunk a document, generate embeddings, and store in database.
+
+        Incremental mode (default) compares per-chunk content_hash with the
+        stored rows and only embeds new/changed chunks; kept rows are
+        re-indexed and stale rows removed atomically (sync_document_embeddings).
+        """
         if not self.available:
             raise ValueError("Document embedding service not configured")
 
@@ -139,16 +158,7 @@ class DocumentEmbeddingService:
         if not chunks:
             logger.info("No chunks generated for file %d", file_id)
             return 0
-
-        # Generate embeddings in batches of 50
-        all_embeddings: list[list[float]] = []
-        texts = [c["text"] for c in chunks]
-
-        batch_size = 50
-        for i in range(0, len(texts), batch_size):
-            batch_texts = texts[i : i + batch_size]
-            batch_embeddings = await self.generate_embeddings(batch_texts)
-            all_embeddings.extend(batch_embeddings)
+        hashes = [chunk_fingerprint(c["text"]) for c in chunks]
 
         headers = {
             "apikey": self.supabase_key,
@@ -158,44 +168,66 @@ class DocumentEmbeddingService:
         }
 
         async with httpx.AsyncClient(timeout=30.0) as client:
-            # Delete existing embeddings for this file
-            await client.delete(
-                f"{self.supabase_url}/rest/v1/document_embeddings?file_id=eq.{file_id}",
+            resp = await client.get(
+                f"{self.supabase_url}/rest/v1/document_embeddings"
+                f"?file_id=eq.{file_id}&select=id,chunk_index,content_hash",
                 headers=headers,
             )
-
-            # Insert new embeddings in batches of 10
-            inserted = 0
-            rows = []
-            for chunk, embedding in zip(chunks, all_embeddings):
-                row = {
-                    "file_id": file_id,
-                    "assistido_id": assistido_id,
-                    "chunk_index": chunk["index"],
-                    "chunk_text": chunk["text"],
-                    "embedding": json.dumps(embedding),
-                    "metadata": json.dumps(metadata or {}),
-                }
-                rows.append(row)
-
-            for i in range(0, len(rows), 10):
-                batch = rows[i : i + 10]
-                resp = await client.post(
-                    f"{self.supabase_url}/rest/v1/document_embeddings",
-                    headers=headers,
-                    json=batch,
+            if resp.status_code >= 400:
+                raise Exception(
+                    f"Loading existing chunks failed: {resp.status_code} {resp.text[:300]}"
                 )
-                if resp.status_code >= 400:
-                    logger.error(
-                        "Batch insert error: %d %s",
-                        resp.status_code,
-                        resp.text[:300],
-                    )
-                else:
-                    inserted += len(batch)
+            diff = diff_chunks(hashes, resp.json(), reuse=incremental)
+
+            # Generate embeddings in batches of 50 (new/changed chunks only)
+            texts = [chunks[i]["text"] for i in diff.new]
+            all_embeddings: list[list[float]] = []
+            batch_size = 50
+            for i in range(0, len(texts), batch_size):
+                batch_texts = texts[i : i + batch_size]
+                batch_embeddings = await self.generate_embeddings(batch_texts)
+                all_embeddings.extend(batch_embeddings)
+
+            rows = [
+                {
+                    "chunk_index": chunks[i]["index"],
+                    "chunk_text": chunks[i]["text"],
+                    "content_hash": hashes[i],
+                    "embedding": embedding,
+                }
+                for i, embedding in zip(diff.new, all_embeddings)
+            ]
 
-        logger.info("Stored %d chunks for file %d", inserted, file_id)
-        return inserted
+            resp = await client.post(
+                f"{self.supabase_url}/rest/v1/rpc/sync_document_embeddings",
+                headers=headers,
+                json={
+                    "p_file_id": file_id,
+                    "p_assistido_id": assistido_id,
+                    "p_metadata": metadata or {},
+                    "p_keep": diff.keep,
+                    "p_rows": rows,
+                    "p_delete_ids": diff.stale_ids,
+                },
+            )
+            if resp.status_code >= 400:
+                logger.error(
+                    "Embedding sync error for file %d: %d %s",
+                    file_id,
+                    resp.status_code,
+                    resp.text[:300],
+                )
+                return 0
+
+        logger.info(
+            "Stored chunks for file %d | total=%d kept=%d embedded=%d deleted=%d",
+            file_id,
+            len(chunks),
+            len(diff.keep),
+            len(rows),
+            len(diff.stale_ids),
+        )
+        return len(diff.keep) + len(rows)
 
     # ── Hybrid Search ───────────────────────────────────────────
 
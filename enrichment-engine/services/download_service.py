@@ -0,0 +1,161 @@
+"""
+Download Service — Download em streaming direto para disco, com limite de tamanho.
+
+Um único httpx.AsyncClient (pool de conexões) é compartilhado pelos routers e
+serviços que baixam documentos. RAM constante: o corpo nunca fica inteiro em memória.
+"""
+from __future__ import annotations
+
+import logging
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+import httpx
+
+logger = logging.getLogger("enrichment-engine.download")
+
+CHUNK_SIZE = 64 * 1024
+
+# Assinaturas (magic bytes) → MIME type
+_MAGIC_SIGNATURES: list[tuple[bytes, str]] = [
+    (b"%PDF-", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "application/msword"),
+]
+
+_MIME_EXTENSIONS = {
+    "application/pdf": ".pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": ".docx",
+    "application/msword": ".doc",
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/tiff": ".tiff",
+    "image/gif": ".gif",
+    "image/bmp": ".bmp",
+    "image/webp": ".webp",
+}
+
+_http_client: httpx.AsyncClient | None = None
+
+
+@dataclass
+class DownloadedFile:
+    """Arquivo baixado em disco (temporário — o chamador remove)."""
+    path: Path
+    size: int
+    content_type: str
+
+    @property
+    def extension(self) -> str:
+        return _MIME_EXTENSIONS.get(self.content_type, self.path.suffix)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Retorna o AsyncClient compartilhado (recriado se foi fechado)."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(120.0, connect=15.0),
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=8),
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Fecha o AsyncClient compartilhado (shutdown da app)."""
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
+
+
+def sniff_mime_type(head: bytes, declared: str = "") -> str:
+    """
+    Detecta o MIME type pelos primeiros bytes; cai no Content-Type declarado.
+    ZIP (PK..) é tratado como DOCX quando não há declaração mais específica.
+    """
+    for signature, mime in _MAGIC_SIGNATURES:
+        if head.startswith(signature):
+            return mime
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+
+    base_declared = declared.split(";")[0].strip().lower()
+    if head.startswith(b"PK\x03\x04"):
+        if base_declared and base_declared != "application/octet-stream":
+            return base_declared
+        return "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    return base_declared or "application/octet-stream"
+
+
+async def download_to_tempfile(
+    url: str,
+    max_bytes: int,
+    headers: dict[str, str] | None = None,
+) -> DownloadedFile:
+    """
+    Baixa `url` em chunks direto para um arquivo temporário.
+
+    O limite é aplicado pelo Content-Length (antes de baixar) e durante o
+    streaming (servidores que mentem ou omitem o header).
+
+    Raises:
+        ValueError: arquivo excede max_bytes.
+        httpx.HTTPStatusError: resposta não-2xx.
+    """
+    client = get_http_client()
+    max_mb = max_bytes / 1024 / 1024
+
+    tmp = tempfile.NamedTemporaryFile(delete=False)
+    tmp_path = Path(tmp.name)
+    downloaded = 0
+    head = b""
+
+    try:
+        async with client.stream("GET", url, headers=headers) as response:
+            response.raise_for_status()
+
+            declared_raw = response.headers.get("content-length", "").strip()
+            if declared_raw.isdigit() and int(declared_raw) > max_bytes:
+                raise ValueError(
+                    f"File too large: {int(declared_raw) / 1024 / 1024:.1f}MB "
+                    f"(max: {max_mb:.0f}MB)"
+                )
+
+            async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                downloaded += len(chunk)
+                if downloaded > max_bytes:
+                    raise ValueError(f"File too large: exceeded {max_mb:.0f}MB while streaming")
+                if len(head) < 16:
+                    head += chunk[: 16 - len(head)]
+                tmp.write(chunk)
+
+            declared_type = response.headers.get("content-type", "")
+        tmp.close()
+    except BaseException:
+        tmp.close()
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    content_type = sniff_mime_type(head, declared_type)
+    ext = _MIME_EXTENSIONS.get(content_type, "")
+    if ext:
+        final_path = tmp_path.with_suffix(ext)
+        tmp_path.rename(final_path)
+        tmp_path = final_path
+
+    logger.info(
+        "Streamed download | size=%.1fKB mime=%s path=%s",
+        downloaded / 1024,
+        content_type,
+        tmp_path.name,
+    )
+    return DownloadedFile(path=tmp_path, size=downloaded, content_type=content_type)
@@ -0,0 +1,147 @@
+"""
+Embedding Cache — Evita re-embedar textos já vistos.
+
+Chave: (modelo, dimensões, hash do texto normalizado). Duas camadas:
+LRU em memória (queries quentes como "legítima defesa") na frente de um
+DiskCache local (chunks de documentos re-indexados). Vetores são gravados
+como float32.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from config import get_settings
+from services.chunking import normalize_text
+from services.disk_cache import DiskCache
+
+logger = logging.getLogger("enrichment-engine.embedding-cache")
+
+EmbedFn = Callable[[list[str]], Awaitable[list[list[float]]]]
+
+
+class EmbeddingCache:
+    """Cache de embeddings em duas camadas (LRU em memória + disco)."""
+
+    def __init__(self, disk: Optional[DiskCache], memory_items: int = 4096):
+        self.disk = disk
+        self.memory_items = memory_items
+        self._memory: OrderedDict[str, list[float]] = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model: str, dimensions: int, text: str) -> str:
+        payload = f"{model}|{dimensions}|{normalize_text(text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: list[float]) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _disk_get_many(self, keys: list[str]) -> list[Optional[list[float]]]:
+        found: list[Optional[list[float]]] = []
+        for key in keys:
+            raw = self.disk.get(key) if self.disk is not None else None
+            found.append(array("f", raw).tolist() if raw is not None else None)
+        return found
+
+    def _disk_put_many(self, items: list[tuple[str, list[float]]]) -> None:
+        if self.disk is None:
+            return
+        for key, vector in items:
+            self.disk.set(key, array("f", vector).tobytes())
+
+    async def get_or_embed(
+        self,
+        model: str,
+        dimensions: int,
+        texts: list[str],
+        embed_fn: EmbedFn,
+    ) -> list[list[float]]:
+        """
+        Retorna embeddings na ordem de `texts`, chamando `embed_fn` apenas
+        para os textos ausentes do cache (textos repetidos são embedados uma vez).
+        """
+        keys = [self.key(model, dimensions, t) for t in texts]
+        vectors: list[Optional[list[float]]] = [None] * len(texts)
+
+        disk_lookup: list[int] = []
+        for i, key in enumerate(keys):
+            cached = self._memory.get(key)
+            if cached is not None:
+                self._memory.move_to_end(key)
+                vectors[i] = cached
+                self.memory_hits += 1
+            else:
+                disk_lookup.append(i)
+
+        if disk_lookup and self.disk is not None:
+            found = await asyncio.to_thread(self._disk_get_many, [keys[i] for i in disk_lookup])
+            for i, vector in zip(disk_lookup, found):
+                if vector is not None:
+                    vectors[i] = vector
+                    self._remember(keys[i], vector)
+                    self.disk_hits += 1
+
+        # Deduplica textos ausentes pela chave
+        missing: dict[str, list[int]] = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(keys[i], []).append(i)
+
+        if missing:
+            self.misses += len(missing)
+            miss_keys = list(missing)
+            embedded = await embed_fn([texts[missing[k][0]] for k in miss_keys])
+            for key, vector in zip(miss_keys, embedded):
+                self._remember(key, vector)
+                for i in missing[key]:
+                    vectors[i] = vector
+            await asyncio.to_thread(self._disk_put_many, list(zip(miss_keys, embedded)))
+
+        return vectors  # type: ignore[return-value]
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        hits = self.memory_hits + self.disk_hits
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk": self.disk.stats() if self.disk is not None else None,
+        }
+
+
+# Singleton
+_embedding_cache: EmbeddingCache | None = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Retorna singleton do EmbeddingCache (disco desabilitado via settings)."""
+    global _embedding_cache
+    if _embedding_cache is None:
+        settings = get_settings()
+        disk = None
+        if settings.embedding_cache_enabled:
+            disk = DiskCache(
+                Path(settings.cache_dir) / "embeddings",
+                max_bytes=settings.embedding_cache_max_mb * 1024 * 1024,
+            )
+        _embedding_cache = EmbeddingCache(disk, memory_items=settings.embedding_cache_memory_items)
+    return _embedding_cache
+
+
+def peek_embedding_cache() -> EmbeddingCache | None:
+    """Singleton só se já criado — não abre (nem varre) o diretório do cache."""
+    return _embedding_cache
@@ -2,14 +2,28 @@
 Serviço de embeddings vetoriais para busca semântica.
 Usa text-embedding-004 (Gemini) com 768 dimensões.
 Armazena em pgvector via Supabase.
+
+Indexação em lotes: vários chunks por chamada embed_content (cliente async),
+lotes concorrentes limitados por semáforo. Re-indexação incremental por
+content_hash (sync_entity_embeddings) ou troca completa
+(replace_entity_embeddings) — ambas atômicas numa transação.
+
+Busca filtrada por assistido usa o VectorIndex local (fast path) quando
+habilitado — vetorial ou híbrida (BM25 + vetor via RRF) — com fallback para
+o RPC search_embeddings.
 """
 
+import asyncio
 import logging
 from typing import Optional
 
 from config import get_settings
 from google import genai
 
+from services.chunking import chunk_fingerprint, chunk_paragraphs, diff_chunks
+from services.embedding_cache import get_embedding_cache
+from services.vector_index import get_vector_index
+
 logger = logging.getLogger("enrichment-engine.embedding")
 settings = get_settings()
 
@@ -36,47 +50,92 @@ class EmbeddingService:
         if not text or not text.strip():
             raise ValueError("Text cannot be empty")
 
+        embeddings = await self.generate_embeddings([text])
+        return embeddings[0]
+
+    async def generate_embeddings(self, texts: list[str]) -> list[list[float]]:
+        """
+        Gera embeddings para vários textos — textos já vistos vêm do
+        EmbeddingCache; só os ausentes vão para a API.
+        """
+        return await get_embedding_cache().get_or_embed(
+            settings.embedding_model,
+            settings.embedding_dimensions,
+            texts,
+            self._embed_uncached,
+        )
+
+    async def _embed_uncached(self, texts: list[str]) -> list[list[float]]:
+        """
+        Uma chamada embed_content para vários textos (cliente async).
+        Retry com backoff exponencial em falhas transitórias.
+        """
         # Truncar texto longo (embedding model tem limite)
-        truncated = text[:8000]
+        truncated = [t[:8000] for t in texts]
 
         client = self._get_client()
-        result = client.models.embed_content(
-            model=f"models/{settings.embedding_model}",
-            contents=[truncated],
+        last_error = None
+        for attempt in range(1, settings.gemini_max_retries + 1):
+            try:
+                result = await client.aio.models.embed_content(
+                    model=f"models/{settings.embedding_model}",
+                    contents=truncated,
+                )
+                return [e.values for e in result.embeddings]
+            except Exception as e:
+                last_error = e
+                logger.warning(
+                    "Embedding batch failed (attempt %d, size=%d): %s",
+                    attempt,
+                    len(texts),
+                    e,
+                )
+                if attempt < settings.gemini_max_retries:
+                    await asyncio.sleep(2 ** attempt)
+
+        raise RuntimeError(f"Embedding failed after retries: {last_error}")
+
+    async def _embed_in_batches(self, texts: list[str]) -> list[Optional[list[float]]]:
+        """
+        Embeda textos em lotes de embedding_batch_size, com até
+        embedding_concurrency lotes em voo. Lotes que falham ficam como None.
+        """
+        batch_size = max(1, settings.embedding_batch_size)
+        semaphore = asyncio.Semaphore(max(1, settings.embedding_concurrency))
+        vectors: list[Optional[list[float]]] = [None] * len(texts)
+
+        async def _run(start: int):
+            batch = texts[start:start + batch_size]
+            async with semaphore:
+                try:
+                    embedded = await self.generate_embeddings(batch)
+                except Exception as e:
+                    logger.error(
+                        "Failed to embed chunks %d-%d: %s",
+                        start,
+                        start + len(batch) - 1,
+                        e,
+                    )
+                    return
+            vectors[start:start + len(embedded)] = embedded
+
+        await asyncio.gather(*[_run(i) for i in range(0, len(texts), batch_size)])
+        return vectors
+
+    async def _replace_rows(self, entity_type: str, entity_id: int, rows: list[dict]) -> int:
+        """Troca atômica dos chunks da entidade (RPC replace_entity_embeddings)."""
+        result = await asyncio.to_thread(
+            lambda: self.supabase.rpc("replace_entity_embeddings", {
+                "p_entity_type": entity_type,
+                "p_entity_id": entity_id,
+                "p_rows": rows,
+            }).execute()
         )
-        return result.embeddings[0].values
+        return result.data if isinstance(result.data, int) else len(rows)
 
     def _chunk_text(self, text: str, max_tokens: int = 500, overlap: int = 50) -> list[str]:
-        """Split texto em chunks por parágrafos, respeitando max_tokens."""
-        paragraphs = text.split("\n\n")
-        chunks = []
-        current_chunk = []
-        current_len = 0
-
-        for para in paragraphs:
-            para = para.strip()
-            if not para:
-                continue
-            para_tokens = len(para.split())
-
-            if current_len + para_tokens > max_tokens and current_chunk:
-                chunks.append("\n\n".join(current_chunk))
-                # Overlap: keep last paragraph
-                if overlap > 0 and current_chunk:
-                    last = current_chunk[-1]
-                    current_chunk = [last]
-                    current_len = len(last.split())
-                else:
-                    current_chunk = []
-                    current_len = 0
-
-            current_chunk.append(para)
-            current_len += para_tokens
-
-        if current_chunk:
-            chunks.append("\n\n".join(current_chunk))
-
-        return chunks if chunks else [text[:2000]]
+        """Split texto em chunks por parágrafos (chunker compartilhado)."""
+        return chunk_paragraphs(text, max_tokens=max_tokens, overlap=overlap)
 
     async def index_document(
         self,
@@ -85,35 +144,104 @@ class EmbeddingService:
         assistido_id: Optional[int] = None,
         processo_id: Optional[int] = None,
         metadata: Optional[dict] = None,
+        incremental: bool = True,
     ) -> int:
-        """Indexa um documento em chunks com embeddings."""
-        chunks = self._chunk_text(markdown)
-        count = 0
+        """
+        Indexa um documento em chunks com embeddings (lotes concorrentes).
 
-        # Limpar embeddings anteriores deste documento
-        self.supabase.table("embeddings").delete().match(
-            {"entity_type": "documento", "entity_id": doc_id}
-        ).execute()
+        Modo incremental (padrão): compara o content_hash de cada chunk com as
+        linhas gravadas e só embeda chunks novos/alterados; a sincronização
+        (update de índices, insert, delete de obsoletos) é atômica via RPC.
+        Com incremental=False, todos os chunks são re-embedados e trocados.
+        """
+        chunks = [chunk[:5000] for chunk in self._chunk_text(markdown)]
+        hashes = [chunk_fingerprint(chunk) for chunk in chunks]
 
-        for i, chunk in enumerate(chunks):
-            try:
-                embedding = await self.generate_embedding(chunk)
-                self.supabase.table("embeddings").insert({
-                    "entity_type": "documento",
-                    "entity_id": doc_id,
+        if not incremental:
+            vectors = await self._embed_in_batches(chunks)
+            missing = sum(1 for v in vectors if v is None)
+            if missing:
+                # Índice parcial não substitui um completo: mantém o anterior
+                # (lotes que deram certo ficam no EmbeddingCache para a próxima tentativa)
+                logger.error(
+                    "%d/%d chunks failed to embed for documento %d — index left unchanged",
+                    missing, len(chunks), doc_id,
+                )
+                return 0
+            rows = [
+                {
                     "assistido_id": assistido_id,
                     "processo_id": processo_id,
                     "chunk_index": i,
-                    "content_text": chunk[:5000],
+                    "content_text": chunk,
+                    "content_hash": hashes[i],
                     "embedding": embedding,
                     "metadata": metadata or {},
-                }).execute()
-                count += 1
-            except Exception as e:
-                logger.error("Failed to index chunk %d of doc %d: %s", i, doc_id, e)
+                }
+                for i, (chunk, embedding) in enumerate(zip(chunks, vectors))
+            ]
+            if not rows:
+                return 0
+
+            count = await self._replace_rows("documento", doc_id, rows)
+            get_vector_index().mark_stale(assistido_id)
+            logger.info("Indexed %d/%d chunks for documento %d", count, len(chunks), doc_id)
+            return count
 
-        logger.info("Indexed %d chunks for documento %d", count, doc_id)
-        return count
+        existing = await asyncio.to_thread(
+            lambda: self.supabase.table("embeddings")
+            .select("id, chunk_index, content_hash")
+            .match({"entity_type": "documento", "entity_id": doc_id})
+            .execute()
+        )
+        diff = diff_chunks(hashes, existing.data or [])
+
+        vectors = await self._embed_in_batches([chunks[i] for i in diff.new])
+        missing = sum(1 for v in vectors if v is None)
+        if missing:
+            # Sem os chunks novos, apagar os obsoletos deixaria buracos no índice
+            logger.error(
+                "%d/%d new chunks failed to embed for documento %d — index left unchanged",
+                missing, len(diff.new), doc_id,
+            )
+            return 0
+        rows = [
+            {
+                "chunk_index": i,
+                "content_text": chunks[i],
+                "content_hash": hashes[i],
+                "embedding": embedding,
+            }
+            for i, embedding in zip(diff.new, vectors)
+        ]
+
+        result = await asyncio.to_thread(
+            lambda: self.supabase.rpc("sync_entity_embeddings", {
+                "p_entity_type": "documento",
+                "p_entity_id": doc_id,
+                "p_assistido_id": assistido_id,
+                "p_processo_id": processo_id,
+                "p_metadata": metadata or {},
+                "p_keep": diff.keep,
+                "p_rows": rows,
+                "p_delete_ids": diff.stale_ids,
+            }).execute()
+        )
+        if result.data != len(rows):
+            raise RuntimeError(
+                f"sync_entity_embeddings inserted {result.data!r} rows for documento "
+                f"{doc_id}, expected {len(rows)}"
+            )
+        get_vector_index().mark_stale(assistido_id)
+        logger.info(
+            "Incremental index documento %d | chunks=%d kept=%d embedded=%d deleted=%d",
+            doc_id,
+            len(chunks),
+            len(diff.keep),
+            len(rows),
+            len(diff.stale_ids),
+        )
+        return len(diff.keep) + len(rows)
 
     async def index_entity(
         self,
@@ -131,21 +259,17 @@ class EmbeddingService:
         try:
             embedding = await self.generate_embedding(text)
 
-            # Upsert: limpar anterior
-            self.supabase.table("embeddings").delete().match(
-                {"entity_type": entity_type, "entity_id": entity_id}
-            ).execute()
-
-            self.supabase.table("embeddings").insert({
-                "entity_type": entity_type,
-                "entity_id": entity_id,
+            # Upsert: troca atômica do chunk anterior
+            await self._replace_rows(entity_type, entity_id, [{
                 "assistido_id": assistido_id,
                 "processo_id": processo_id,
                 "chunk_index": 0,
                 "content_text": text[:5000],
+                "content_hash": chunk_fingerprint(text[:5000]),
                 "embedding": embedding,
                 "metadata": metadata or {},
-            }).execute()
+            }])
+            get_vector_index().mark_stale(assistido_id)
             return True
         except Exception as e:
             logger.error("Failed to index %s %d: %s", entity_type, entity_id, e)
@@ -156,11 +280,28 @@ class EmbeddingService:
         query: str,
         filters: Optional[dict] = None,
         limit: int = 20,
+        mode: str = "vector",
+        vector_weight: float = 1.0,
+        text_weight: float = 1.0,
     ) -> list[dict]:
-        """Busca semântica via pgvector RPC."""
+        """
+        Busca semântica. Com filtro assistido_id, tenta o VectorIndex local
+        (partição sincronizada incrementalmente); senão, ou em falha, pgvector RPC.
+
+        mode="hybrid" funde ranking vetorial e BM25 (RRF, pesos ajustáveis) —
+        melhor para números CNJ, artigos e nomes. Sem assistido_id a busca
+        híbrida cai no RPC vetorial.
+        """
         query_embedding = await self.generate_embedding(query)
         filters = filters or {}
 
+        if settings.vector_index_enabled and filters.get("assistido_id"):
+            results = await self._search_local(
+                query, query_embedding, filters, limit, mode, vector_weight, text_weight
+            )
+            if results is not None:
+                return results
+
         rpc_params = {
             "query_embedding": query_embedding,
             "match_limit": limit,
@@ -173,5 +314,45 @@ class EmbeddingService:
         if filters.get("entity_types"):
             rpc_params["filter_entity_types"] = filters["entity_types"]
 
-        result = self.supabase.rpc("search_embeddings", rpc_params).execute()
+        result = await asyncio.to_thread(
+            lambda: self.supabase.rpc("search_embeddings", rpc_params).execute()
+        )
         return result.data or []
+
+    async def _search_local(
+        self,
+        query: str,
+        query_embedding: list[float],
+        filters: dict,
+        limit: int,
+        mode: str,
+        vector_weight: float,
+        text_weight: float,
+    ) -> Optional[list[dict]]:
+        """Fast path no VectorIndex. None = usar o RPC."""
+        index = get_vector_index()
+        try:
+            await index.ensure_partition(self.supabase, filters["assistido_id"])
+            if mode == "hybrid":
+                return index.hybrid_search(
+                    filters["assistido_id"],
+                    query,
+                    query_embedding,
+                    limit=limit,
+                    processo_id=filters.get("processo_id") or None,
+                    entity_types=filters.get("entity_types") or None,
+                    vector_weight=vector_weight,
+                    text_weight=text_weight,
+                    rrf_k=settings.hybrid_rrf_k,
+                    depth=settings.hybrid_candidate_depth,
+                )
+            return index.search(
+                filters["assistido_id"],
+                query_embedding,
+                limit=limit,
+                processo_id=filters.get("processo_id") or None,
+                entity_types=filters.get("entity_types") or None,
+            )
+        except Exception as e:
+            logger.warning("Vector index fast path failed, falling back to RPC: %s", e)
+            return None
@@ -11,7 +11,9 @@ from typing import Any
 
 from config import get_settings
 from services.docling_service import get_docling_service
+from services.document_classifier import classify_document_locally
 from services.gemini_service import get_gemini_service
+from services.llm_telemetry import llm_prompt
 from services.supabase_service import get_supabase_service
 from prompts.document_classifier import CLASSIFIER_PROMPT
 from prompts.document_sentenca import SENTENCA_PROMPT
@@ -45,6 +47,7 @@ class EnrichmentOrchestrator:
     """Orquestra o fluxo completo de enriquecimento."""
 
     def __init__(self):
+        self.settings = get_settings()
         self.docling = get_docling_service()
         self.gemini = get_gemini_service()
         self.supabase = get_supabase_service()
@@ -73,25 +76,38 @@ class EnrichmentOrchestrator:
             logger.info("Downloaded file: %s", file_path.name)
 
             # 2. Docling: parse para Markdown
-            markdown = self.docling.parse_to_markdown(file_path)
+            markdown = await self.docling.parse_to_markdown_async(file_path)
             logger.info("Parsed to Markdown: %d chars", len(markdown))
 
             # 3. Classificar tipo de documento
-            classification = await self.gemini.extract(CLASSIFIER_PROMPT, markdown)
+            # Pré-classificador local; se não for conclusivo, chamada ao LLM
+            classification = None
+            if self.settings.enrichment_single_pass:
+                local = classify_document_locally(markdown)
+                if (
+                    local.single_pass
+                    and local.confidence >= self.settings.local_classifier_min_confidence
+                ):
+                    classification = local.as_dict()
+            if classification is None:
+                with llm_prompt("enrichment.classifier"):
+                    classification = await self.gemini.extract(CLASSIFIER_PROMPT, markdown)
             doc_type = classification.get("document_type", "outro")
             area = classification.get("area")
             logger.info(
-                "Classified as: %s (area=%s, confidence=%.2f)",
+                "Classified as: %s (area=%s, confidence=%.2f, classifier=%s)",
                 doc_type,
                 area,
                 classification.get("confidence", 0),
+                classification.get("classifier", "llm"),
             )
 
             # 4. Extrair dados com prompt especializado
             specific_prompt = DOCUMENT_PROMPTS.get(doc_type)
             extracted_data = {}
             if specific_prompt:
-                extracted_data = await self.gemini.extract(specific_prompt, markdown)
+                with llm_prompt(f"enrichment.{doc_type}"):
+                    extracted_data = await self.gemini.extract(specific_prompt, markdown)
             else:
                 # Documento genérico — usar classificação como dados
                 extracted_data = classification
@@ -246,6 +262,7 @@ class EnrichmentOrchestrator:
 
     # === Ficha Generation ===
 
+    @llm_prompt("enrichment.ficha")
     async def generate_ficha(
         self,
         section_text: str,
@@ -288,6 +305,7 @@ class EnrichmentOrchestrator:
 
     # === PJe Enrichment ===
 
+    @llm_prompt("enrichment.pje")
     async def enrich_pje_text(
         self,
         raw_text: str,
@@ -329,6 +347,7 @@ class EnrichmentOrchestrator:
 
     # === Transcript Enrichment ===
 
+    @llm_prompt("enrichment.transcript")
     async def enrich_transcript(
         self,
         transcript: str,
@@ -412,6 +431,7 @@ class EnrichmentOrchestrator:
 
     # === Audiência Enrichment ===
 
+    @llm_prompt("enrichment.audiencia")
     async def enrich_audiencia(
         self,
         pauta_text: str,
@@ -450,6 +470,7 @@ class EnrichmentOrchestrator:
 
     # === WhatsApp Enrichment ===
 
+    @llm_prompt("enrichment.whatsapp")
     async def enrich_whatsapp(
         self,
         message: str,
@@ -1,87 +1,80 @@
 """
 Gemini Service — Extração semântica via Google Gemini Flash.
-Wrapper com retry, rate limiting e response JSON.
+Wrapper com response JSON; rate limiting, retry e cliente em pool ficam
+no LLMGateway.
 
 Usa o pacote `google-genai` (novo SDK unificado do Google).
 """
 from __future__ import annotations
 
-import asyncio
 import json
 import logging
 import time
 from typing import Any
 
 from config import get_settings
+from services.llm_cache import get_llm_cache
+from services.llm_gateway import get_llm_gateway
+from services.llm_telemetry import llm_prompt
+from services.map_reduce_extraction import map_reduce_extract
 
 logger = logging.getLogger("enrichment-engine.gemini")
 
+CONTEXT_SEPARATOR = "\n\n---\n\nTEXTO PARA ANÁLISE:\n\n"
+
+GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "temperature": 0.1,  # Baixa — extração precisa
+    "max_output_tokens": 8192,
+}
+
 
 class GeminiService:
-    """Wrapper para Google Gemini Flash com retry e rate limiting."""
+    """Wrapper para Google Gemini Flash (chamadas via LLMGateway)."""
 
     def __init__(self):
         self.settings = get_settings()
-        self._client = None
-        self._async_client = None
-        self._request_times: list[float] = []
-
-    def _get_client(self):
-        """Lazy init do Gemini client (sync — fallback)."""
-        if self._client is None:
-            try:
-                from google import genai
-
-                self._client = genai.Client(api_key=self.settings.gemini_api_key)
-                logger.info("Gemini sync client initialized: model=%s", self.settings.gemini_model)
-            except ImportError as e:
-                logger.error("google-genai not installed: %s", e)
-                raise RuntimeError("Google GenAI library not available") from e
-
-        return self._client
-
-    def _get_async_client(self):
-        """Lazy init do Gemini async client."""
-        if self._async_client is None:
-            try:
-                from google import genai
-
-                self._async_client = genai.Client(api_key=self.settings.gemini_api_key)
-                logger.info("Gemini async client initialized: model=%s", self.settings.gemini_model)
-            except ImportError as e:
-                logger.error("google-genai not installed: %s", e)
-                raise RuntimeError("Google GenAI library not available") from e
-
-        return self._async_client
-
-    async def _check_rate_limit(self):
-        """Rate limiting simples — sliding window (async-safe)."""
-        now = time.time()
-        window = 60  # 1 minuto
-        self._request_times = [t for t in self._request_times if now - t < window]
-
-        if len(self._request_times) >= self.settings.gemini_rate_limit:
-            wait_time = window - (now - self._request_times[0])
-            logger.warning("Rate limit hit, waiting %.1fs", wait_time)
-            await asyncio.sleep(wait_time)
-
-        self._request_times.append(now)
 
-    async def extract(self, prompt: str, context: str) -> dict[str, Any]:
+    @llm_prompt("gemini.extract")
+    async def extract(
+        self, prompt: str, context: str, bypass_cache: bool = False
+    ) -> dict[str, Any]:
         """
         Envia prompt + contexto para Gemini e retorna JSON estruturado.
+        Respostas ficam no LLMResponseCache: mesma entrada, mesmo JSON.
+        Contextos que não cabem em max_text_length seguem para map-reduce
+        por seção (ver services/map_reduce_extraction.py).
 
         Args:
             prompt: Prompt com instruções de extração (do prompts/)
             context: Texto/dados a serem analisados
+            bypass_cache: Ignora o cache e força nova chamada (o resultado é regravado)
 
         Returns:
             dict com dados extraídos conforme prompt
         """
-        client = self._get_async_client()
-        await self._check_rate_limit()
+        budget = self.settings.max_text_length - len(prompt) - len(CONTEXT_SEPARATOR)
+        if self.settings.extraction_map_reduce and len(context) > budget > 0:
+            return await map_reduce_extract(
+                lambda section: self.extract(prompt, section, bypass_cache=bypass_cache),
+                context,
+                budget,
+            )
+
+        cache = get_llm_cache()
+        key = cache.key(
+            "gemini",
+            self.settings.gemini_model,
+            prompt,
+            context,
+            {**GENERATION_CONFIG, "max_chars": self.settings.max_text_length},
+        )
+        return await cache.get_or_call(
+            key, lambda: self._extract_uncached(prompt, context), bypass=bypass_cache
+        )
 
-        full_prompt = f"{prompt}\n\n---\n\nTEXTO PARA ANÁLISE:\n\n{context}"
+    async def _extract_uncached(self, prompt: str, context: str) -> dict[str, Any]:
+        full_prompt = f"{prompt}{CONTEXT_SEPARATOR}{context}"
 
         # Truncar se muito longo
         max_chars = self.settings.max_text_length
@@ -93,20 +86,19 @@ class GeminiService:
             )
             full_prompt = full_prompt[:max_chars]
 
+        from google.genai import types
+
+        gateway = get_llm_gateway()
         last_error = None
+        response = None
+        # Erros transitórios já são re-tentados no gateway; aqui só JSON inválido
         for attempt in range(1, self.settings.gemini_max_retries + 1):
             try:
-                from google.genai import types
-
                 start = time.time()
-                response = await client.aio.models.generate_content(
+                response = await gateway.gemini_generate(
                     model=self.settings.gemini_model,
                     contents=full_prompt,
-                    config=types.GenerateContentConfig(
-                        response_mime_type="application/json",
-                        temperature=0.1,  # Baixa — extração precisa
-                        max_output_tokens=8192,
-                    ),
+                    config=types.GenerateContentConfig(**GENERATION_CONFIG),
                 )
                 elapsed = time.time() - start
 
@@ -131,25 +123,15 @@ class GeminiService:
                 last_error = e
 
             except Exception as e:
-                logger.warning(
-                    "Gemini request failed (attempt %d): %s",
-                    attempt,
-                    str(e),
-                )
-                last_error = e
-
-                # Backoff exponencial (async)
-                if attempt < self.settings.gemini_max_retries:
-                    wait = 2 ** attempt
-                    logger.info("Retrying in %ds...", wait)
-                    await asyncio.sleep(wait)
+                logger.warning("Gemini request failed: %s", str(e))
+                raise RuntimeError(f"Gemini failed: {e}") from e
 
         raise RuntimeError(
             f"Gemini failed after {self.settings.gemini_max_retries} attempts: {last_error}"
         )
 
     async def extract_with_schema(
-        self, prompt: str, context: str, json_schema: dict
+        self, prompt: str, context: str, json_schema: dict, bypass_cache: bool = False
     ) -> dict[str, Any]:
         """
         Extrai dados com schema JSON explícito no prompt.
@@ -162,7 +144,7 @@ class GeminiService:
             f"Confidence score: 0.0 = não encontrou, 1.0 = certeza absoluta."
         )
 
-        return await self.extract(prompt + schema_instruction, context)
+        return await self.extract(prompt + schema_instruction, context, bypass_cache=bypass_cache)
 
     @staticmethod
     def is_configured() -> bool:
@@ -0,0 +1,205 @@
+"""
+JSON Stream — Parser incremental para respostas JSON de LLMs em streaming.
+
+Alimentado trecho a trecho (`feed`), o parser acompanha strings, escapes e
+aninhamento e devolve cada item assim que ele fecha:
+
+- raiz objeto: cada valor de topo completo, com path (chave,); listas de
+  topo são entregues elemento a elemento, com path (chave, índice)
+  — ex.: cada entrada de `contradiction_matrix`
+- raiz lista: cada elemento completo, com path (índice,)
+
+Texto antes da raiz (```json, "Segue a análise:") e depois dela é ignorado.
+Se a resposta vier truncada ou com cauda malformada, `result()` devolve o
+que já estava completo em vez de descartar tudo.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, NamedTuple, Optional, Union
+
+logger = logging.getLogger("enrichment-engine.json-stream")
+
+_WHITESPACE = " \t\r\n"
+
+
+class JSONEvent(NamedTuple):
+    """Item completo: `path` a partir da raiz e o valor já decodificado."""
+    path: tuple[Union[str, int], ...]
+    value: Any
+
+
+@dataclass
+class _Frame:
+    kind: str  # "{" ou "["
+    path: tuple = ()
+    emit: bool = False  # entrega os filhos deste container
+    expect_key: bool = True
+    key: Optional[str] = None
+    key_start: Optional[int] = None
+    value_start: Optional[int] = None
+    index: int = 0
+    values: Any = None
+
+    def __post_init__(self):
+        if self.emit:
+            self.values = {} if self.kind == "{" else []
+
+
+class JSONStreamParser:
+    """Parser incremental; `root` restringe a raiz a "{" ou "[" ("" aceita ambas)."""
+
+    def __init__(self, root: str = "{"):
+        self.roots = root or "{["
+        self.text = ""
+        self.malformed = 0
+        self._pos = 0
+        self._root_start: Optional[int] = None
+        self._root_end: Optional[int] = None
+        self._stack: list[_Frame] = []
+        self._root: Optional[_Frame] = None
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def done(self) -> bool:
+        return self._root_end is not None
+
+    @property
+    def truncated(self) -> bool:
+        """A raiz abriu mas não fechou (resposta cortada por max_tokens, erro etc.)."""
+        return self._root is not None and not self.done
+
+    def feed(self, chunk: str) -> list[JSONEvent]:
+        """Acrescenta um trecho e retorna os itens que completaram com ele."""
+        if self.done or not chunk:
+            return []
+        self.text += chunk
+        events: list[JSONEvent] = []
+        text = self.text
+        i = self._pos
+        while i < len(text) and not self.done:
+            self._step(text, i, text[i], events)
+            i += 1
+        self._pos = i
+        return events
+
+    def _step(self, text: str, i: int, c: str, events: list[JSONEvent]) -> None:
+        if self._root is None:
+            if c in self.roots:
+                self._root = _Frame(c, emit=True)
+                self._stack.append(self._root)
+                self._root_start = i
+            return
+
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif c == "\\":
+                self._escape = True
+            elif c == '"':
+                self._in_string = False
+                top = self._stack[-1]
+                if top.key_start is not None:
+                    try:
+                        top.key = json.loads(text[top.key_start:i + 1])
+                    except ValueError:
+                        top.key = text[top.key_start + 1:i]
+                    top.key_start = None
+            return
+
+        top = self._stack[-1]
+        if c == '"':
+            self._in_string = True
+            if top.emit:
+                if top.kind == "{" and top.expect_key:
+                    top.key_start = i
+                elif top.value_start is None:
+                    top.value_start = i
+        elif c in "{[":
+            if top.emit and top.value_start is None:
+                top.value_start = i
+            # Listas de topo de um objeto raiz entregam cada elemento
+            emit = top is self._root and top.kind == "{" and c == "["
+            self._stack.append(_Frame(c, path=(top.key,), emit=emit))
+        elif c in "}]":
+            frame = self._stack.pop()
+            if frame.emit:
+                self._finish_value(frame, text, i, events)
+            if not self._stack:
+                self._root_end = i
+        elif c == ",":
+            if top.emit:
+                self._finish_value(top, text, i, events)
+        elif c == ":":
+            if top.emit and top.kind == "{":
+                top.expect_key = False
+                top.value_start = None
+        elif c not in _WHITESPACE:
+            # número, true/false/null
+            if top.emit and top.value_start is None and not (top.kind == "{" and top.expect_key):
+                top.value_start = i
+
+    def _finish_value(self, frame: _Frame, text: str, end: int, events: list[JSONEvent]) -> None:
+        start = frame.value_start
+        frame.value_start = None
+        if frame.kind == "{":
+            frame.expect_key = True
+        if start is None:
+            return  # container vazio ou vírgula sobrando
+        raw = text[start:end].strip()
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            self.malformed += 1
+            logger.debug("Item JSON malformado ignorado: %.80s", raw)
+            return
+
+        if frame.kind == "{":
+            key = frame.key
+            frame.values[key] = value
+            frame.key = None
+            # Listas já foram entregues elemento a elemento
+            if not (frame is self._root and isinstance(value, list)):
+                events.append(JSONEvent(frame.path + (key,), value))
+        else:
+            frame.values.append(value)
+            events.append(JSONEvent(frame.path + (frame.index,), value))
+            frame.index += 1
+
+    def result(self) -> Any:
+        """
+        Valor final. Com a raiz fechada, o JSON completo; se truncada, os itens
+        completos montados na estrutura da raiz. None se nada foi aproveitado.
+        """
+        if self._root is None:
+            return None
+        if self.done:
+            try:
+                return json.loads(self.text[self._root_start:self._root_end + 1])
+            except ValueError:
+                pass
+        partial = self._root.values
+        if self._root.kind == "{":
+            partial = dict(partial)
+            for frame in self._stack[1:2]:
+                if frame.emit and frame.path[0] is not None and frame.values:
+                    partial[frame.path[0]] = list(frame.values)
+        else:
+            partial = list(partial)
+        return partial or None
+
+
+def parse_json_lenient(text: str, root: str = "{") -> Any:
+    """Parse de uma resposta completa com o mesmo aproveitamento do streaming."""
+    parser = JSONStreamParser(root=root)
+    parser.feed(text)
+    result = parser.result()
+    if result is not None and (parser.truncated or parser.malformed):
+        logger.warning(
+            "JSON incompleto aproveitado | truncated=%s malformed=%d",
+            parser.truncated, parser.malformed,
+        )
+    return result
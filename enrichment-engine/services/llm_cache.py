@@ -0,0 +1,143 @@
+"""
+LLM Response Cache — Respostas determinísticas de extração reaproveitadas.
+
+Chave: (provedor, modelo, hash do prompt, hash do contexto, config de geração).
+Re-enriquecer um documento, re-sincronizar uma movimentação do Solar ou
+re-rodar /enrich/consolidate com as mesmas entradas devolve o JSON já
+extraído sem chamar a API. Só respostas válidas (JSON parseado) são gravadas.
+
+O armazenamento é um DiskCache (TTL + evicção LRU por tamanho). `bypass=True`
+ignora a leitura mas grava o resultado novo — serve para forçar re-extração.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+from config import get_settings
+from services.disk_cache import DiskCache
+from services.llm_telemetry import get_llm_telemetry
+
+logger = logging.getLogger("enrichment-engine.llm-cache")
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """Cache em disco de respostas JSON de LLM, com métricas."""
+
+    def __init__(self, disk: Optional[DiskCache]):
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    @staticmethod
+    def key(
+        provider: str,
+        model: str,
+        prompt: str,
+        context: str,
+        config: Optional[dict[str, Any]] = None,
+    ) -> str:
+        payload = json.dumps(
+            {
+                "provider": provider,
+                "model": model,
+                "prompt": _sha256(prompt),
+                "context": _sha256(context),
+                "config": config or {},
+            },
+            sort_keys=True,
+        )
+        return _sha256(payload)
+
+    async def get(self, key: str) -> Optional[Any]:
+        if self.disk is None:
+            return None
+        raw = await asyncio.to_thread(self.disk.get_text, key)
+        if raw is None:
+            return None
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            return None
+
+    async def set(self, key: str, value: Any) -> None:
+        if self.disk is None:
+            return
+        raw = json.dumps(value, ensure_ascii=False)
+        await asyncio.to_thread(self.disk.set_text, key, raw)
+
+    async def lookup(self, key: str, bypass: bool = False) -> Optional[Any]:
+        """get() com métricas; com `bypass` conta a chamada e não lê o cache."""
+        if self.disk is None:
+            return None
+        if bypass:
+            self.bypassed += 1
+            return None
+        cached = await self.get(key)
+        if cached is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        get_llm_telemetry().record_cache_hit()
+        logger.debug("LLM cache hit | key=%s", key[:12])
+        return cached
+
+    async def get_or_call(
+        self,
+        key: str,
+        call: Callable[[], Awaitable[Any]],
+        bypass: bool = False,
+    ) -> Any:
+        """Retorna a resposta em cache ou executa `call()` e grava o resultado."""
+        cached = await self.lookup(key, bypass=bypass)
+        if cached is not None:
+            return cached
+        result = await call()
+        await self.set(key, result)
+        return result
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.disk is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "disk": self.disk.stats() if self.disk is not None else None,
+        }
+
+
+# Singleton
+_llm_cache: LLMResponseCache | None = None
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """Retorna singleton do LLMResponseCache (desabilitado via settings)."""
+    global _llm_cache
+    if _llm_cache is None:
+        settings = get_settings()
+        disk = None
+        if settings.llm_cache_enabled:
+            disk = DiskCache(
+                Path(settings.cache_dir) / "llm",
+                max_bytes=settings.llm_cache_max_mb * 1024 * 1024,
+                compress=True,
+                ttl_seconds=settings.llm_cache_ttl_hours * 3600,
+            )
+        _llm_cache = LLMResponseCache(disk)
+    return _llm_cache
+
+
+def peek_llm_cache() -> LLMResponseCache | None:
+    """Singleton só se já criado — não abre (nem varre) o diretório do cache."""
+    return _llm_cache
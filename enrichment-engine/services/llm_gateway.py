@@ -0,0 +1,503 @@
+"""
+LLM Gateway — Ponto único de saída para Gemini, Anthropic e OpenAI.
+
+- Clientes async em pool (um por provedor, reutilizados entre chamadas).
+- RateLimiter por (provedor, modelo): requisições e tokens por minuto,
+  reservados com estimativa e acertados com o uso real da resposta.
+- Prioridades: INTERACTIVE (padrão) passa na frente de BATCH na fila de
+  concorrência, e BATCH nunca ocupa todas as vagas do provedor. Jobs em lote
+  marcam o contexto com `batch_priority()` e tudo que rodar dentro herda.
+- Retry com backoff exponencial + jitter em 429/5xx/timeouts, respeitando
+  Retry-After quando o provedor envia.
+- Prompt caching da Anthropic: `cache_block()` marca o fim de um prefixo
+  estático (system prompt, dossiê do caso); tokens lidos/gravados no cache
+  aparecem nos logs e em stats().
+- Streaming da Anthropic: `anthropic_stream()` gera o texto conforme chega,
+  sob o mesmo gate e rate limit (retry só antes do primeiro trecho).
+- Telemetria: cada chamada vira um registro em `llm_telemetry` (latência,
+  time-to-first-token, tokens, retries, custo estimado).
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import random
+import time
+from contextlib import contextmanager
+from enum import IntEnum
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+import httpx
+
+from config import get_settings
+from services.llm_telemetry import get_llm_telemetry
+from services.rate_limiter import RateLimiter
+
+logger = logging.getLogger("enrichment-engine.llm-gateway")
+
+_RETRYABLE_STATUS = {408, 409, 429}
+_RETRYABLE_NAMES = {"APIConnectionError", "APITimeoutError"}
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+_priority: contextvars.ContextVar[Priority] = contextvars.ContextVar(
+    "llm_priority", default=Priority.INTERACTIVE
+)
+
+
+@contextmanager
+def batch_priority():
+    """Chamadas ao gateway dentro do bloco (e tasks criadas nele) usam BATCH."""
+    token = _priority.set(Priority.BATCH)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> Priority:
+    return _priority.get()
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 caracteres por token."""
+    return len(text) // 4 + 1
+
+
+# Custo fixo por imagem/PDF (~teto da Anthropic para uma imagem de 1,15 MP):
+# o base64 do bloco não diz nada sobre os tokens cobrados
+_ANTHROPIC_MEDIA_TOKENS = 1600
+
+
+def _anthropic_content_tokens(content: Any) -> int:
+    """Tokens estimados de um `content` (string ou lista de blocos) — só texto conta por caractere."""
+    if isinstance(content, str):
+        return len(content) // 4
+    if not isinstance(content, list):
+        return 0
+    total = 0
+    for block in content:
+        if isinstance(block, str):
+            total += len(block) // 4
+        elif not isinstance(block, dict):
+            continue
+        elif block.get("type") in ("image", "document"):
+            total += _ANTHROPIC_MEDIA_TOKENS
+        elif block.get("type") == "tool_result":
+            total += _anthropic_content_tokens(block.get("content"))
+        elif block.get("type") == "tool_use":
+            total += len(str(block.get("input", ""))) // 4
+        else:
+            total += len(block.get("text") or "") // 4
+    return total
+
+
+def _elapsed_ms(since: float) -> float:
+    return round((time.perf_counter() - since) * 1000, 1)
+
+
+def cache_block(text: str) -> dict[str, Any]:
+    """Bloco de texto com breakpoint de prompt caching (Anthropic, TTL 5 min)."""
+    return {"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    for attr in ("status_code", "code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """429, 5xx, timeouts e falhas de conexão são transitórios."""
+    status = _status_code(exc)
+    if status is not None:
+        return status in _RETRYABLE_STATUS or status >= 500
+    return isinstance(
+        exc, (httpx.TransportError, asyncio.TimeoutError, TimeoutError, ConnectionError)
+    ) or type(exc).__name__ in _RETRYABLE_NAMES
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class _PriorityGate:
+    """Semáforo com fila por prioridade e teto de vagas para BATCH."""
+
+    def __init__(self, limit: int, batch_limit: int):
+        self.limit = max(1, limit)
+        self.batch_limit = max(1, min(batch_limit, self.limit))
+        self.active = 0
+        self.active_batch = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+    def _can_enter(self, priority: Priority) -> bool:
+        if self.active >= self.limit:
+            return False
+        return priority == Priority.INTERACTIVE or self.active_batch < self.batch_limit
+
+    def _enter(self, priority: Priority) -> None:
+        self.active += 1
+        if priority == Priority.BATCH:
+            self.active_batch += 1
+
+    async def acquire(self, priority: Priority) -> None:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._seq), future))
+        # Uma chamada interativa não fica atrás de lotes bloqueados pelo teto BATCH
+        self._wake()
+        if future.done():
+            return
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(priority)  # vaga concedida junto com o cancelamento
+            raise
+
+    def release(self, priority: Priority) -> None:
+        self.active -= 1
+        if priority == Priority.BATCH:
+            self.active_batch -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.cancelled():
+                heapq.heappop(self._waiters)
+                continue
+            if not self._can_enter(Priority(priority)):
+                return
+            heapq.heappop(self._waiters)
+            self._enter(Priority(priority))
+            future.set_result(None)
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, f in self._waiters if not f.done())
+
+
+class LLMGateway:
+    """Clientes em pool + limites compartilhados para todos os serviços de LLM."""
+
+    def __init__(self, settings=None, sleep: Callable[[float], Awaitable[None]] = asyncio.sleep):
+        self.settings = settings or get_settings()
+        self._sleep = sleep
+        self._clients: dict[str, Any] = {}
+        self._limiters: dict[tuple[str, str], RateLimiter] = {}
+        self._gates: dict[str, _PriorityGate] = {}
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.prompt_cache = {"read_tokens": 0, "write_tokens": 0, "uncached_input_tokens": 0}
+
+    # ------------------------------------------------------------------
+    # Clientes
+    # ------------------------------------------------------------------
+
+    def client(self, provider: str):
+        """Cliente async do provedor (lazy, compartilhado)."""
+        if provider not in self._clients:
+            self._clients[provider] = self._build_client(provider)
+        return self._clients[provider]
+
+    def _build_client(self, provider: str):
+        try:
+            if provider == "gemini":
+                from google import genai
+
+                return genai.Client(api_key=self.settings.gemini_api_key)
+            if provider == "anthropic":
+                import anthropic
+
+                return anthropic.AsyncAnthropic(
+                    api_key=self.settings.anthropic_api_key,
+                    max_retries=0,  # retry é do gateway
+                )
+            if provider == "openai":
+                import openai
+
+                return openai.AsyncOpenAI(api_key=self.settings.openai_api_key, max_retries=0)
+        except ImportError as e:
+            logger.error("%s SDK not installed: %s", provider, e)
+            raise RuntimeError(f"{provider} library not available") from e
+        raise ValueError(f"Unknown LLM provider: {provider}")
+
+    # ------------------------------------------------------------------
+    # Limites
+    # ------------------------------------------------------------------
+
+    def _limits(self, provider: str, model: str) -> tuple[int, int]:
+        overrides = self.settings.llm_model_limits.get(model, {})
+        rpm = overrides.get("rpm", getattr(self.settings, f"llm_{provider}_rpm"))
+        if rpm is None and provider == "gemini":
+            rpm = self.settings.gemini_rate_limit
+        tpm = overrides.get("tpm", getattr(self.settings, f"llm_{provider}_tpm"))
+        return rpm, tpm
+
+    def limiter(self, provider: str, model: str) -> RateLimiter:
+        key = (provider, model)
+        if key not in self._limiters:
+            rpm, tpm = self._limits(provider, model)
+            self._limiters[key] = RateLimiter(rpm, tpm or None)
+        return self._limiters[key]
+
+    def gate(self, provider: str) -> _PriorityGate:
+        if provider not in self._gates:
+            self._gates[provider] = _PriorityGate(
+                self.settings.llm_max_concurrency, self.settings.llm_batch_max_concurrency
+            )
+        return self._gates[provider]
+
+    # ------------------------------------------------------------------
+    # Execução
+    # ------------------------------------------------------------------
+
+    async def call(
+        self,
+        provider: str,
+        model: str,
+        request: Callable[[Any], Awaitable[Any]],
+        estimated_tokens: int = 0,
+        priority: Optional[Priority] = None,
+        usage: Optional[Callable[[Any], int]] = None,
+    ) -> Any:
+        """
+        Executa `request(client)` sob o gate de concorrência e o rate limit
+        do modelo, com retry em erros transitórios.
+        """
+        priority = current_priority() if priority is None else priority
+        gate = self.gate(provider)
+        limiter = self.limiter(provider, model)
+        max_retries = max(1, self.settings.llm_max_retries)
+
+        with get_llm_telemetry().track(provider, model) as record:
+            await gate.acquire(priority)
+            try:
+                for attempt in range(1, max_retries + 1):
+                    await limiter.acquire(estimated_tokens)
+                    self.calls += 1
+                    # Latência só da requisição (sem fila do gate, rate limit e backoff)
+                    sent = time.perf_counter()
+                    try:
+                        response = await request(self.client(provider))
+                    except Exception as e:
+                        record.latency_ms = _elapsed_ms(sent)
+                        limiter.refund(estimated_tokens)
+                        if attempt >= max_retries or not is_retryable(e):
+                            self.failures += 1
+                            raise
+                        self.retries += 1
+                        record.retries += 1
+                        delay = self._backoff(attempt, e)
+                        logger.warning(
+                            "%s/%s transient error (attempt %d/%d, retry in %.1fs): %s",
+                            provider, model, attempt, max_retries, delay, e,
+                        )
+                        await self._sleep(delay)
+                        continue
+                    record.latency_ms = _elapsed_ms(sent)
+                    if usage is not None:
+                        try:
+                            limiter.settle(estimated_tokens, usage(response))
+                        except Exception:
+                            pass
+                    record.set_usage(response)
+                    return response
+            finally:
+                gate.release(priority)
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        """Full jitter: uniforme em [0, min(max, base * 2^attempt)]; Retry-After tem precedência."""
+        retry_after = _retry_after(exc)
+        if retry_after is not None:
+            return min(retry_after, self.settings.llm_retry_max_seconds)
+        ceiling = min(
+            self.settings.llm_retry_max_seconds,
+            self.settings.llm_retry_base_seconds * (2 ** attempt),
+        )
+        return random.uniform(0, ceiling)
+
+    # ------------------------------------------------------------------
+    # Atalhos por provedor
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _anthropic_estimate(kwargs: dict) -> int:
+        prompt = _anthropic_content_tokens(kwargs.get("system", ""))
+        for message in kwargs.get("messages") or []:
+            prompt += _anthropic_content_tokens(message.get("content"))
+        return prompt + 1 + kwargs.get("max_tokens", 0)
+
+    @staticmethod
+    def _anthropic_usage(response: Any) -> int:
+        # Leituras do cache não contam no limite de input tokens/minuto
+        return (
+            response.usage.input_tokens
+            + response.usage.output_tokens
+            + (getattr(response.usage, "cache_creation_input_tokens", 0) or 0)
+        )
+
+    async def anthropic_messages(self, priority: Optional[Priority] = None, **kwargs) -> Any:
+        """client.messages.create(**kwargs) via gateway."""
+        response = await self.call(
+            "anthropic",
+            kwargs["model"],
+            lambda client: client.messages.create(**kwargs),
+            estimated_tokens=self._anthropic_estimate(kwargs),
+            priority=priority,
+            usage=self._anthropic_usage,
+        )
+        self._record_prompt_cache(kwargs["model"], getattr(response, "usage", None))
+        return response
+
+    async def anthropic_stream(
+        self, priority: Optional[Priority] = None, prompt_id: Optional[str] = None, **kwargs
+    ) -> AsyncIterator[str]:
+        """
+        client.messages.stream(**kwargs) via gateway: gera os trechos de texto
+        conforme chegam. O retry só vale antes do primeiro trecho — depois
+        disso o consumidor já recebeu parte da resposta e o erro sobe.
+
+        `prompt_id` rotula a chamada na telemetria: um `with llm_prompt()`
+        em volta do consumo não serve, porque o bloco atravessaria os
+        `yield` do gerador.
+        """
+        provider, model = "anthropic", kwargs["model"]
+        priority = current_priority() if priority is None else priority
+        gate = self.gate(provider)
+        limiter = self.limiter(provider, model)
+        estimated = self._anthropic_estimate(kwargs)
+        max_retries = max(1, self.settings.llm_max_retries)
+
+        with get_llm_telemetry().track(provider, model, prompt_id=prompt_id) as record:
+            await gate.acquire(priority)
+            try:
+                for attempt in range(1, max_retries + 1):
+                    await limiter.acquire(estimated)
+                    self.calls += 1
+                    started_stream = False
+                    sent = time.perf_counter()
+                    try:
+                        async with self.client(provider).messages.stream(**kwargs) as stream:
+                            async for text in stream.text_stream:
+                                if not started_stream:
+                                    started_stream = True
+                                    record.ttft_ms = _elapsed_ms(sent)
+                                yield text
+                            message = await stream.get_final_message()
+                    except Exception as e:
+                        record.latency_ms = _elapsed_ms(sent)
+                        limiter.refund(estimated)
+                        if started_stream or attempt >= max_retries or not is_retryable(e):
+                            self.failures += 1
+                            raise
+                        self.retries += 1
+                        record.retries += 1
+                        delay = self._backoff(attempt, e)
+                        logger.warning(
+                            "%s/%s transient stream error (attempt %d/%d, retry in %.1fs): %s",
+                            provider, model, attempt, max_retries, delay, e,
+                        )
+                        await self._sleep(delay)
+                        continue
+                    record.latency_ms = _elapsed_ms(sent)
+                    try:
+                        limiter.settle(estimated, self._anthropic_usage(message))
+                    except Exception:
+                        pass
+                    record.set_usage(message)
+                    self._record_prompt_cache(model, getattr(message, "usage", None))
+                    return
+            finally:
+                gate.release(priority)
+
+    def _record_prompt_cache(self, model: str, usage: Any) -> None:
+        if usage is None:
+            return
+        read = getattr(usage, "cache_read_input_tokens", 0) or 0
+        write = getattr(usage, "cache_creation_input_tokens", 0) or 0
+        if not isinstance(read, int) or not isinstance(write, int):
+            return
+        self.prompt_cache["read_tokens"] += read
+        self.prompt_cache["write_tokens"] += write
+        self.prompt_cache["uncached_input_tokens"] += getattr(usage, "input_tokens", 0) or 0
+        if read or write:
+            logger.info(
+                "Anthropic prompt cache | model=%s cache_read=%d cache_write=%d input=%d",
+                model, read, write, usage.input_tokens,
+            )
+
+    async def gemini_generate(
+        self, model: str, contents: Any, config: Any = None, priority: Optional[Priority] = None
+    ) -> Any:
+        """client.aio.models.generate_content via gateway."""
+        max_output = getattr(config, "max_output_tokens", None) or 0
+        return await self.call(
+            "gemini",
+            model,
+            lambda client: client.aio.models.generate_content(
+                model=model, contents=contents, config=config
+            ),
+            estimated_tokens=estimate_tokens(str(contents)) + max_output,
+            priority=priority,
+            usage=lambda r: r.usage_metadata.total_token_count or 0,
+        )
+
+    async def openai_chat(self, priority: Optional[Priority] = None, **kwargs) -> Any:
+        """client.chat.completions.create(**kwargs) via gateway."""
+        estimated = estimate_tokens(str(kwargs.get("messages", ""))) + (kwargs.get("max_tokens") or 0)
+        return await self.call(
+            "openai",
+            kwargs["model"],
+            lambda client: client.chat.completions.create(**kwargs),
+            estimated_tokens=estimated,
+            priority=priority,
+            usage=lambda r: r.usage.total_tokens,
+        )
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "anthropic_prompt_cache": dict(self.prompt_cache),
+            "gates": {
+                provider: {"active": g.active, "active_batch": g.active_batch, "waiting": g.waiting}
+                for provider, g in self._gates.items()
+            },
+            "throttled_seconds": {
+                f"{provider}/{model}": round(lim.waited_seconds, 2)
+                for (provider, model), lim in self._limiters.items()
+            },
+        }
+
+
+# Singleton
+_llm_gateway: LLMGateway | None = None
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Retorna singleton do LLMGateway."""
+    global _llm_gateway
+    if _llm_gateway is None:
+        _llm_gateway = LLMGateway()
+    return _llm_gateway
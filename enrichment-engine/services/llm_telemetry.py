@@ -0,0 +1,384 @@
+"""
+LLM Telemetry — Latência, tokens e custo de cada chamada de LLM.
+
+Cada chamada que passa pelo LLMGateway (e as que ainda saem direto, como
+Whisper e o upload de áudio do Gemini) vira um LLMCallRecord:
+provedor, modelo, prompt, rota HTTP de origem, tokens de entrada/saída,
+tokens de prompt cache, time-to-first-token (streaming), latência total,
+retries e custo estimado. Hits do cache de respostas também entram, com
+status "cache_hit".
+
+Destinos:
+- ring buffer em memória (últimas `llm_telemetry_buffer` chamadas),
+  exposto em GET /metrics/llm
+- ledger SQLite opcional (`llm_ledger_path`), agregado por
+  scripts/llm_report.py — gravado por uma thread própria, em lotes, fora
+  do event loop
+
+Rótulos vêm do contexto, como `batch_priority()` no gateway:
+- `llm_route(path)` — aplicado por middleware a cada request HTTP
+- `llm_prompt(prompt_id)` — aplicado pelos serviços; o rótulo mais externo
+  vence, então o orquestrador pode nomear ("enrichment.denuncia") uma
+  chamada que o GeminiService rotularia só como "gemini.extract"
+"""
+from __future__ import annotations
+
+import contextvars
+import functools
+import logging
+import queue
+import sqlite3
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
+
+from config import get_settings
+
+logger = logging.getLogger("enrichment-engine.llm-telemetry")
+
+# USD por milhão de tokens (input, output). Estimativas de tabela pública;
+# `llm_model_prices` nas settings sobrescreve. Prefixo mais longo vence.
+MODEL_PRICES: dict[str, tuple[float, float]] = {
+    "claude-opus-4-5": (5.0, 25.0),
+    "claude-opus-4": (15.0, 75.0),
+    "claude-sonnet-4": (3.0, 15.0),
+    "claude-haiku-4": (1.0, 5.0),
+    "gemini-2.5-pro": (1.25, 10.0),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.0),
+}
+# Prompt cache da Anthropic: leitura a 10% do input, escrita a 125%
+CACHE_READ_FACTOR = 0.1
+CACHE_WRITE_FACTOR = 1.25
+
+_route: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("llm_route", default=None)
+_prompt_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("llm_prompt_id", default=None)
+
+
+@contextmanager
+def llm_route(route: str):
+    """Marca as chamadas feitas dentro do bloco com a rota HTTP de origem."""
+    token = _route.set(route)
+    try:
+        yield
+    finally:
+        _route.reset(token)
+
+
+class llm_prompt:
+    """
+    Marca as chamadas com um prompt id, se nenhum rótulo externo já marcou.
+    Serve como `with llm_prompt("x"):` ou como decorador de funções async.
+    """
+
+    def __init__(self, prompt_id: str):
+        self.prompt_id = prompt_id
+        self._tokens: list[Optional[contextvars.Token]] = []
+
+    def __enter__(self):
+        outer = _prompt_id.get() is not None
+        self._tokens.append(None if outer else _prompt_id.set(self.prompt_id))
+        return self
+
+    def __exit__(self, *exc):
+        token = self._tokens.pop()
+        if token is not None:
+            _prompt_id.reset(token)
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with llm_prompt(self.prompt_id):
+                return await func(*args, **kwargs)
+        return wrapper
+
+
+def current_route() -> Optional[str]:
+    return _route.get()
+
+
+def current_prompt_id() -> Optional[str]:
+    return _prompt_id.get()
+
+
+@dataclass
+class LLMCallRecord:
+    """Uma chamada de LLM (ou hit de cache)."""
+    provider: str
+    model: str
+    prompt_id: Optional[str] = None
+    route: Optional[str] = None
+    status: str = "ok"  # ok | error | cache_hit
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+    ttft_ms: Optional[float] = None
+    latency_ms: float = 0.0
+    retries: int = 0
+    cost_usd: Optional[float] = None
+    error: Optional[str] = None
+    ts: float = 0.0
+
+    def __post_init__(self):
+        if not self.ts:
+            self.ts = time.time()
+        if self.prompt_id is None:
+            self.prompt_id = current_prompt_id()
+        if self.route is None:
+            self.route = current_route()
+
+    def set_usage(self, response: Any) -> None:
+        """Preenche tokens a partir da resposta (Anthropic, Gemini ou OpenAI)."""
+        usage = getattr(response, "usage", None)
+        if usage is not None and hasattr(usage, "input_tokens"):  # Anthropic
+            self.input_tokens = _int(usage.input_tokens)
+            self.output_tokens = _int(getattr(usage, "output_tokens", 0))
+            self.cache_read_tokens = _int(getattr(usage, "cache_read_input_tokens", 0))
+            self.cache_write_tokens = _int(getattr(usage, "cache_creation_input_tokens", 0))
+        elif usage is not None and hasattr(usage, "prompt_tokens"):  # OpenAI
+            self.input_tokens = _int(usage.prompt_tokens)
+            self.output_tokens = _int(getattr(usage, "completion_tokens", 0))
+        else:
+            meta = getattr(response, "usage_metadata", None)  # Gemini
+            if meta is not None:
+                self.input_tokens = _int(getattr(meta, "prompt_token_count", 0))
+                self.output_tokens = _int(getattr(meta, "candidates_token_count", 0))
+                self.cache_read_tokens = _int(getattr(meta, "cached_content_token_count", 0))
+
+
+def _int(value: Any) -> int:
+    return value if isinstance(value, int) else 0
+
+
+def estimate_cost(record: LLMCallRecord, prices: Optional[dict] = None) -> Optional[float]:
+    """Custo em USD pela tabela de preços; None para modelos sem preço."""
+    table = {**MODEL_PRICES, **(prices or {})}
+    match = max((p for p in table if record.model.startswith(p)), key=len, default=None)
+    if match is None:
+        return None
+    price_in, price_out = table[match]
+    input_cost = record.input_tokens * price_in
+    if record.provider == "anthropic":
+        input_cost += record.cache_read_tokens * price_in * CACHE_READ_FACTOR
+        input_cost += record.cache_write_tokens * price_in * CACHE_WRITE_FACTOR
+    return round((input_cost + record.output_tokens * price_out) / 1_000_000, 6)
+
+
+def _percentile(values: list[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    if len(values) == 1:
+        return round(values[0], 1)
+    return round(statistics.quantiles(values, n=100, method="inclusive")[int(pct) - 1], 1)
+
+
+def summarize(records: Iterable[dict], by: str = "prompt_id") -> list[dict]:
+    """Agrega registros por um campo (prompt_id, route, model...), mais caros primeiro."""
+    groups: dict[str, list[dict]] = {}
+    for rec in records:
+        groups.setdefault(rec.get(by) or "(sem rótulo)", []).append(rec)
+
+    rows = []
+    for key, recs in groups.items():
+        calls = [r for r in recs if r["status"] != "cache_hit"]
+        latencies = [r["latency_ms"] for r in calls if r["status"] == "ok"]
+        ttfts = [r["ttft_ms"] for r in calls if r.get("ttft_ms") is not None]
+        costs = [r["cost_usd"] for r in calls if r.get("cost_usd") is not None]
+        rows.append({
+            by: key,
+            "calls": len(calls),
+            "errors": sum(1 for r in calls if r["status"] == "error"),
+            "cache_hits": len(recs) - len(calls),
+            "retries": sum(r["retries"] for r in calls),
+            "input_tokens": sum(r["input_tokens"] for r in calls),
+            "output_tokens": sum(r["output_tokens"] for r in calls),
+            "cache_read_tokens": sum(r["cache_read_tokens"] for r in calls),
+            "latency_p50_ms": _percentile(latencies, 50),
+            "latency_p95_ms": _percentile(latencies, 95),
+            "latency_total_s": round(sum(latencies) / 1000, 1),
+            "ttft_p50_ms": _percentile(ttfts, 50),
+            "cost_usd": round(sum(costs), 4),
+        })
+    rows.sort(key=lambda r: (r["cost_usd"], r["latency_total_s"]), reverse=True)
+    return rows
+
+
+class LLMLedger:
+    """
+    Ledger SQLite local (WAL, sem fsync por commit). `write` só enfileira; uma
+    thread dedicada grava o que acumulou num único INSERT em lote + commit.
+    """
+
+    _COLUMNS = [f.name for f in fields(LLMCallRecord)]
+    _STOP = object()
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_calls ("
+            "provider TEXT, model TEXT, prompt_id TEXT, route TEXT, status TEXT, "
+            "input_tokens INTEGER, output_tokens INTEGER, cache_read_tokens INTEGER, "
+            "cache_write_tokens INTEGER, ttft_ms REAL, latency_ms REAL, retries INTEGER, "
+            "cost_usd REAL, error TEXT, ts REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_calls_ts ON llm_calls (ts)")
+        self._conn.commit()
+        self._queue: queue.Queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="llm-ledger", daemon=True)
+        self._writer.start()
+
+    def write(self, record: LLMCallRecord) -> None:
+        """Enfileira o registro (não bloqueia o event loop)."""
+        row = asdict(record)
+        self._queue.put([row[c] for c in self._COLUMNS])
+
+    def _write_loop(self) -> None:
+        placeholders = ", ".join("?" for _ in self._COLUMNS)
+        sql = f"INSERT INTO llm_calls ({', '.join(self._COLUMNS)}) VALUES ({placeholders})"
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [item for item in batch if item is not self._STOP]
+            stop = len(rows) != len(batch)
+            try:
+                if rows:
+                    with self._lock:
+                        self._conn.executemany(sql, rows)
+                        self._conn.commit()
+            except Exception as e:
+                logger.warning("LLM ledger write failed (%d records): %s", len(rows), e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self) -> None:
+        """Espera a thread gravar tudo que já foi enfileirado."""
+        if self._writer.is_alive():
+            self._queue.join()
+
+    def read(self, since: float = 0.0) -> list[dict]:
+        self.flush()
+        with self._lock:
+            cursor = self._conn.execute(
+                f"SELECT {', '.join(self._COLUMNS)} FROM llm_calls WHERE ts >= ? ORDER BY ts", (since,)
+            )
+            return [dict(zip(self._COLUMNS, row)) for row in cursor.fetchall()]
+
+    def close(self) -> None:
+        if self._writer.is_alive():
+            self._queue.put(self._STOP)
+            self._writer.join(timeout=10)
+        with self._lock:
+            self._conn.close()
+
+
+class LLMTelemetry:
+    """Ring buffer em memória + ledger SQLite opcional."""
+
+    def __init__(
+        self,
+        buffer_size: int = 2000,
+        ledger: Optional[LLMLedger] = None,
+        prices: Optional[dict[str, tuple[float, float]]] = None,
+    ):
+        self.records: deque[LLMCallRecord] = deque(maxlen=buffer_size)
+        self.ledger = ledger
+        self.prices = prices or {}
+        self.recorded = 0
+
+    def record(self, record: LLMCallRecord) -> None:
+        if record.cost_usd is None and record.status != "cache_hit":
+            record.cost_usd = estimate_cost(record, self.prices)
+        self.records.append(record)
+        self.recorded += 1
+        if self.ledger is not None:
+            try:
+                self.ledger.write(record)
+            except Exception as e:
+                logger.warning("LLM ledger write failed: %s", e)
+
+    def record_cache_hit(self, provider: str = "cache", model: str = "") -> None:
+        self.record(LLMCallRecord(provider=provider, model=model, status="cache_hit"))
+
+    @contextmanager
+    def track(
+        self, provider: str, model: str, prompt_id: Optional[str] = None
+    ) -> Iterator[LLMCallRecord]:
+        """
+        Mede a latência do bloco, a menos que o chamador já tenha medido só
+        a requisição ao provedor (`latency_ms`); o chamador preenche
+        tokens/ttft no registro. `prompt_id` vale se nenhum `llm_prompt`
+        externo rotulou o contexto. Exceções marcam status "error" e sobem.
+        """
+        record = LLMCallRecord(provider=provider, model=model, prompt_id=current_prompt_id() or prompt_id)
+        started = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record.status = "error"
+            record.error = f"{type(e).__name__}: {e}"[:300]
+            raise
+        finally:
+            if not record.latency_ms:
+                record.latency_ms = round((time.perf_counter() - started) * 1000, 1)
+            self.record(record)
+
+    def recent(self, limit: int = 100) -> list[dict]:
+        return [asdict(r) for r in list(self.records)[-limit:]]
+
+    def summary(self, by: str = "prompt_id") -> list[dict]:
+        return summarize((asdict(r) for r in self.records), by=by)
+
+    def stats(self) -> dict:
+        return {
+            "recorded": self.recorded,
+            "buffered": len(self.records),
+            "ledger": str(self.ledger.path) if self.ledger is not None else None,
+        }
+
+
+# Singleton
+_llm_telemetry: LLMTelemetry | None = None
+
+
+def close_llm_telemetry() -> None:
+    """Grava o que falta no ledger e fecha o SQLite (shutdown do app)."""
+    if _llm_telemetry is not None and _llm_telemetry.ledger is not None:
+        _llm_telemetry.ledger.close()
+
+
+def get_llm_telemetry() -> LLMTelemetry:
+    """Retorna singleton do LLMTelemetry (ledger só com llm_ledger_path)."""
+    global _llm_telemetry
+    if _llm_telemetry is None:
+        settings = get_settings()
+        ledger = None
+        if settings.llm_ledger_path:
+            try:
+                ledger = LLMLedger(settings.llm_ledger_path)
+            except Exception as e:
+                logger.warning("LLM ledger disabled (%s): %s", settings.llm_ledger_path, e)
+        _llm_telemetry = LLMTelemetry(
+            buffer_size=settings.llm_telemetry_buffer,
+            ledger=ledger,
+            prices={k: tuple(v) for k, v in settings.llm_model_prices.items()},
+        )
+    return _llm_telemetry
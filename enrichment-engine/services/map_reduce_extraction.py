@@ -0,0 +1,80 @@
+"""
+Map-Reduce Extraction — Extração de documentos maiores que a janela do prompt.
+
+Em vez de truncar em max_text_length, o documento é dividido nos headings
+Markdown do Docling (split_sections), cada trecho é extraído em paralelo com
+o mesmo prompt (a concorrência e o rate limit são do LLMGateway) e os JSONs
+parciais são fundidos sob o mesmo schema:
+
+- dict: campo a campo, recursivamente
+- list: concatenação sem duplicatas, na ordem dos trechos
+- escalar: valor não-nulo mais frequente; empate fica com o primeiro trecho
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections import Counter
+from typing import Any, Awaitable, Callable
+
+from services.chunking import split_sections
+
+logger = logging.getLogger("enrichment-engine.map-reduce")
+
+SECTION_HEADER = (
+    "[Trecho {index} de {total} de um documento longo. "
+    "Extraia apenas o que consta neste trecho; use null para o que não aparecer.]\n\n"
+)
+
+ExtractFn = Callable[[str], Awaitable[Any]]
+
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, ensure_ascii=False)
+
+
+def merge_extractions(results: list[Any]) -> Any:
+    """Funde resultados parciais de mesmo schema em um único resultado."""
+    present = [r for r in results if r is not None and r != "" and r != [] and r != {}]
+    if not present:
+        return results[0] if results else None
+
+    if all(isinstance(r, dict) for r in present):
+        keys: list[str] = []
+        for r in present:
+            keys.extend(k for k in r if k not in keys)
+        return {k: merge_extractions([r.get(k) for r in present]) for k in keys}
+
+    if all(isinstance(r, list) for r in present):
+        merged: list[Any] = []
+        seen: set[str] = set()
+        for r in present:
+            for item in r:
+                key = _canonical(item)
+                if key not in seen:
+                    seen.add(key)
+                    merged.append(item)
+        return merged
+
+    counts = Counter(_canonical(r) for r in present)
+    best = max(counts.values())
+    return next(r for r in present if counts[_canonical(r)] == best)
+
+
+async def map_reduce_extract(extract: ExtractFn, context: str, max_chars: int) -> Any:
+    """
+    Divide `context` em trechos de até `max_chars`, chama `extract(trecho)`
+    em paralelo e funde os resultados. Falha de qualquer trecho propaga:
+    cobertura parcial não é devolvida como se fosse completa.
+    """
+    budget = max_chars - len(SECTION_HEADER) - 16
+    sections = split_sections(context, budget)
+    total = len(sections)
+    logger.info("Map-reduce extraction | chars=%d sections=%d", len(context), total)
+
+    results = await asyncio.gather(*(
+        extract(SECTION_HEADER.format(index=i, total=total) + section)
+        for i, section in enumerate(sections, 1)
+    ))
+    return merge_extractions(list(results))
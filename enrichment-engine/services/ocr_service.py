@@ -3,6 +3,7 @@ import time
 import asyncio
 import logging
 from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
@@ -22,19 +23,20 @@ def _ocr_single_page(image, language: str) -> dict:
 
 
 async def extract_text_with_ocr(
-    pdf_bytes: bytes,
+    pdf: bytes | Path,
     language: str = "por",
     dpi: int = 200,
 ) -> dict:
     """
     Converts each PDF page to image and applies Tesseract OCR.
     Features: parallel processing (4 concurrent), adaptive DPI, quality metrics.
+    `pdf` may be the file bytes or a path on disk (read page by page by poppler).
     """
     start_time = time.time()
 
     try:
         import pytesseract
-        from pdf2image import convert_from_bytes
+        from pdf2image import convert_from_bytes, convert_from_path
     except ImportError as e:
         logger.warning(f"OCR dependencies not installed: {e}. Returning empty result.")
         return {
@@ -46,9 +48,14 @@ async def extract_text_with_ocr(
             "error": f"Missing dependency: {e}",
         }
 
+    def _render(render_dpi: int):
+        if isinstance(pdf, Path):
+            return convert_from_path(pdf, dpi=render_dpi)
+        return convert_from_bytes(pdf, dpi=render_dpi)
+
     # Convert PDF pages to images
     try:
-        images = convert_from_bytes(pdf_bytes, dpi=dpi)
+        images = _render(dpi)
     except Exception as e:
         logger.error(f"Failed to convert PDF to images: {e}")
         return {
@@ -108,7 +115,7 @@ async def extract_text_with_ocr(
             len(retry_indices),
         )
         try:
-            high_dpi_images = convert_from_bytes(pdf_bytes, dpi=400)
+            high_dpi_images = _render(400)
 
             retry_tasks = [
                 ocr_page(idx, high_dpi_images[idx])
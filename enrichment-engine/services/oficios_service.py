@@ -11,6 +11,8 @@ import logging
 from typing import Any
 
 from config import get_settings
+from services.llm_gateway import get_llm_gateway
+from services.llm_telemetry import llm_prompt
 
 logger = logging.getLogger("enrichment-engine.oficios")
 
@@ -30,19 +32,8 @@ class OficiosService:
 
     def __init__(self):
         self.settings = get_settings()
-        self._client = None
-
-    def _get_client(self):
-        if self._client is None:
-            try:
-                from google import genai
-                self._client = genai.Client(api_key=self.settings.gemini_api_key)
-                logger.info("Gemini client initialized for oficios")
-            except ImportError as e:
-                logger.error("google-genai not installed: %s", e)
-                raise RuntimeError("Google GenAI not available") from e
-        return self._client
 
+    @llm_prompt("oficios.minuta")
     async def gerar_minuta(
         self,
         tipo_oficio: str,
@@ -56,7 +47,7 @@ class OficiosService:
         Gera corpo de ofício com Gemini 2.5 Pro.
         Se template_base fornecido, usa como base. Senão, gera do zero.
         """
-        client = self._get_client()
+        gateway = get_llm_gateway()
 
         assistido_info = "\n".join(f"- {k}: {v}" for k, v in dados_assistido.items() if v)
         processo_info = "\n".join(f"- {k}: {v}" for k, v in dados_processo.items() if v)
@@ -87,7 +78,7 @@ Redija um ofício do tipo "{tipo_oficio}" com os dados abaixo.
 
 Retorne APENAS o texto do ofício, pronto para uso. Sem explicações extras."""
 
-        result = client.models.generate_content(
+        result = await gateway.gemini_generate(
             model=self.settings.gemini_pro_model,
             contents=prompt,
         )
@@ -102,12 +93,13 @@ Retorne APENAS o texto do ofício, pronto para uso. Sem explicações extras."""
             "tokens_saida": getattr(tokens, "candidates_token_count", 0) if tokens else 0,
         }
 
+    @llm_prompt("oficios.classificar")
     async def classificar_oficio(self, conteudo_markdown: str) -> dict[str, Any]:
         """
         Classifica um ofício existente com Gemini Flash (rápido, barato).
         Retorna: tipo, destinatário, assunto, variáveis, score.
         """
-        client = self._get_client()
+        gateway = get_llm_gateway()
 
         prompt = f"""Analise o ofício abaixo e classifique.
 
@@ -129,7 +121,7 @@ Retorne APENAS o texto do ofício, pronto para uso. Sem explicações extras."""
   }}
 }}"""
 
-        result = client.models.generate_content(
+        result = await gateway.gemini_generate(
             model=self.settings.gemini_model,  # Flash for speed
             contents=prompt,
         )
@@ -15,6 +15,8 @@ import httpx
 from pydantic import BaseModel, Field, field_validator
 
 from config import get_settings
+from services.llm_gateway import batch_priority
+from services.llm_telemetry import llm_prompt
 
 logger = logging.getLogger("enrichment-engine.radar-extraction")
 
@@ -145,6 +147,7 @@ class RadarExtractionService:
     def __init__(self):
         self.settings = get_settings()
 
+    @llm_prompt("radar.extraction")
     async def extract_from_noticia(self, noticia: dict[str, Any]) -> dict[str, Any]:
         """
         Extrai dados estruturados de uma notícia usando Gemini Flash.
@@ -157,102 +160,11 @@ class RadarExtractionService:
             raise RuntimeError("ANTHROPIC_API_KEY not configured — cannot extract")
 
         claude = get_claude_service()
-
-        # Montar texto para extração
-        text = f"TÍTULO: {noticia.get('titulo', '')}\n\n"
-        corpo = noticia.get("corpo", "") or ""
-        if corpo:
-            # Limitar corpo para não exceder limite do Gemini
-            text += f"TEXTO DA NOTÍCIA:\n{corpo[:15000]}"
+        text = self._noticia_text(noticia)
 
         try:
             result = await claude.extract(RADAR_NEWS_EXTRACTION_PROMPT, text)
-
-            if not isinstance(result, dict):
-                logger.warning("Gemini retornou tipo inesperado: %s", type(result))
-                return {"enrichment_status": "extracted"}
-
-            # Mapear resultado para campos da tabela
-            update_data: dict[str, Any] = {
-                "enrichment_status": "extracted",
-                "updated_at": datetime.now(timezone.utc).isoformat(),
-            }
-
-            # Tipo de crime
-            tipo_crime = result.get("tipo_crime")
-            if tipo_crime and tipo_crime in [
-                "homicidio", "tentativa_homicidio", "trafico", "roubo", "furto",
-                "violencia_domestica", "sexual", "lesao_corporal", "porte_arma",
-                "estelionato", "outros",
-            ]:
-                update_data["tipo_crime"] = tipo_crime
-
-            # Localização
-            bairro = result.get("bairro")
-            if bairro:
-                update_data["bairro"] = self._normalize_bairro(bairro)
-
-            logradouro = result.get("logradouro")
-            if logradouro:
-                update_data["logradouro"] = logradouro
-
-            delegacia = result.get("delegacia")
-            if delegacia:
-                update_data["delegacia"] = delegacia
-
-            # Circunstância
-            circ = result.get("circunstancia")
-            if circ and circ in [
-                "flagrante", "mandado", "denuncia", "operacao", "investigacao", "julgamento"
-            ]:
-                update_data["circunstancia"] = circ
-
-            # Artigos penais
-            artigos = result.get("artigos_penais")
-            if artigos and isinstance(artigos, list):
-                update_data["artigos_penais"] = json.dumps(artigos)
-
-            # Arma/meio
-            arma = result.get("arma_meio")
-            if arma:
-                update_data["arma_meio"] = arma
-
-            # Data do fato
-            data_fato = result.get("data_fato")
-            if data_fato:
-                update_data["data_fato"] = data_fato
-
-            # Resumo IA
-            resumo = result.get("resumo")
-            if resumo:
-                update_data["resumo_ia"] = resumo[:1000]
-
-            # Envolvidos — validar com Pydantic antes de persistir
-            envolvidos_raw = result.get("envolvidos") or []
-            envolvidos = []
-            for env in envolvidos_raw:
-                if not isinstance(env, dict):
-                    continue
-                try:
-                    validated = EnvolvidoModel.model_validate(env)
-                    envolvidos.append(validated.model_dump(exclude_none=True))
-                except Exception as e:
-                    logger.debug("Envolvido inválido ignorado: %s — %s", env, e)
-                    continue
-            if envolvidos:
-                update_data["envolvidos"] = envolvidos
-
-            # Campo de relevância (usado apenas localmente — não salvo no banco)
-            relevante = result.get("relevante", True)  # default True = não deletar por padrão
-            confianca_local = result.get("confianca_local", 50)
-            update_data["relevante"] = relevante
-            if confianca_local is not None:
-                update_data["confianca_local"] = int(confianca_local)
-
-            # Calcular relevancia_score após extração completa
-            update_data["relevancia_score"] = self._calculate_relevancia_score(update_data)
-
-            return update_data
+            return self._to_update_data(result)
 
         except Exception as e:
             logger.error("Falha na extração Gemini: %s", str(e))
@@ -261,6 +173,104 @@ class RadarExtractionService:
                 raise
             return {"enrichment_status": "pending", "_extraction_error": str(e)}  # Retry later with error info
 
+    @staticmethod
+    def _noticia_text(noticia: dict[str, Any]) -> str:
+        """Texto enviado para extração: título + corpo limitado."""
+        text = f"TÍTULO: {noticia.get('titulo', '')}\n\n"
+        corpo = noticia.get("corpo", "") or ""
+        if corpo:
+            # Limitar corpo para não exceder limite do Gemini
+            text += f"TEXTO DA NOTÍCIA:\n{corpo[:15000]}"
+        return text
+
+    def _to_update_data(self, result: Any) -> dict[str, Any]:
+        """Mapeia o JSON extraído para os campos de radar_noticias."""
+        if not isinstance(result, dict):
+            logger.warning("Gemini retornou tipo inesperado: %s", type(result))
+            return {"enrichment_status": "extracted"}
+
+        # Mapear resultado para campos da tabela
+        update_data: dict[str, Any] = {
+            "enrichment_status": "extracted",
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+        # Tipo de crime
+        tipo_crime = result.get("tipo_crime")
+        if tipo_crime and tipo_crime in [
+            "homicidio", "tentativa_homicidio", "trafico", "roubo", "furto",
+            "violencia_domestica", "sexual", "lesao_corporal", "porte_arma",
+            "estelionato", "outros",
+        ]:
+            update_data["tipo_crime"] = tipo_crime
+
+        # Localização
+        bairro = result.get("bairro")
+        if bairro:
+            update_data["bairro"] = self._normalize_bairro(bairro)
+
+        logradouro = result.get("logradouro")
+        if logradouro:
+            update_data["logradouro"] = logradouro
+
+        delegacia = result.get("delegacia")
+        if delegacia:
+            update_data["delegacia"] = delegacia
+
+        # Circunstância
+        circ = result.get("circunstancia")
+        if circ and circ in [
+            "flagrante", "mandado", "denuncia", "operacao", "investigacao", "julgamento"
+        ]:
+            update_data["circunstancia"] = circ
+
+        # Artigos penais
+        artigos = result.get("artigos_penais")
+        if artigos and isinstance(artigos, list):
+            update_data["artigos_penais"] = json.dumps(artigos)
+
+        # Arma/meio
+        arma = result.get("arma_meio")
+        if arma:
+            update_data["arma_meio"] = arma
+
+        # Data do fato
+        data_fato = result.get("data_fato")
+        if data_fato:
+            update_data["data_fato"] = data_fato
+
+        # Resumo IA
+        resumo = result.get("resumo")
+        if resumo:
+            update_data["resumo_ia"] = resumo[:1000]
+
+        # Envolvidos — validar com Pydantic antes de persistir
+        envolvidos_raw = result.get("envolvidos") or []
+        envolvidos = []
+        for env in envolvidos_raw:
+            if not isinstance(env, dict):
+                continue
+            try:
+                validated = EnvolvidoModel.model_validate(env)
+                envolvidos.append(validated.model_dump(exclude_none=True))
+            except Exception as e:
+                logger.debug("Envolvido inválido ignorado: %s — %s", env, e)
+                continue
+        if envolvidos:
+            update_data["envolvidos"] = envolvidos
+
+        # Campo de relevância (usado apenas localmente — não salvo no banco)
+        relevante = result.get("relevante", True)  # default True = não deletar por padrão
+        confianca_local = result.get("confianca_local", 50)
+        update_data["relevante"] = relevante
+        if confianca_local is not None:
+            update_data["confianca_local"] = int(confianca_local)
+
+        # Calcular relevancia_score após extração completa
+        update_data["relevancia_score"] = self._calculate_relevancia_score(update_data)
+
+        return update_data
+
     def _calculate_relevancia_score(self, update_data: dict[str, Any]) -> int:
         """
         Calcula relevancia_score (0–100) com base nos dados extraídos.
@@ -325,8 +335,13 @@ class RadarExtractionService:
 
         return max(0, min(100, score))
 
-    def _increment_error_count(self, noticia_id: int, error_msg: str, client_db) -> None:
-        """Incrementa error_count e seta last_error. Se atingir 3 erros, marca como 'failed'."""
+    def _increment_error_count(
+        self, noticia_id: int, error_msg: str, client_db, retry_status: str | None = None
+    ) -> None:
+        """
+        Incrementa error_count e seta last_error. Se atingir 3 erros, marca como 'failed';
+        senão, com `retry_status`, devolve a notícia a esse status (ex.: 'pending').
+        """
         try:
             # Buscar error_count atual
             result = (
@@ -352,6 +367,8 @@ class RadarExtractionService:
                     noticia_id, new_count, error_msg[:100],
                 )
             else:
+                if retry_status:
+                    update_payload["enrichment_status"] = retry_status
                 logger.info(
                     "DLQ | id=%d erro %d/3: %s",
                     noticia_id, new_count, error_msg[:100],
@@ -365,70 +382,73 @@ class RadarExtractionService:
         """Extrai e salva uma notícia. Retorna True se processou com sucesso."""
         try:
             update_data = await self.extract_from_noticia(noticia)
+            return self._save_extraction(noticia, update_data, client_db)
+        except Exception as e:
+            logger.error("Erro extraindo notícia id=%d: %s", noticia["id"], str(e))
+            self._increment_error_count(noticia["id"], str(e), client_db)
+            return False
 
-            # Se a extração retornou com erro transitório, registrar no DLQ e retornar False
-            extraction_error = update_data.pop("_extraction_error", None)
-            if extraction_error and update_data.get("enrichment_status") == "pending":
-                self._increment_error_count(noticia["id"], extraction_error, client_db)
-                return False
-
-            # Se Gemini diz que notícia não é da região → deletar do banco
-            if update_data.get("relevante") is False:
-                logger.info(
-                    "Gemini marcou como irrelevante id=%d: '%s'",
-                    noticia["id"],
-                    noticia.get("titulo", "")[:60],
-                )
-                client_db.table("radar_noticias").delete().eq("id", noticia["id"]).execute()
-                return True
-
-            # Se a extração não produziu nenhum dado útil → notícia provavelmente irrelevante
-            tipo_crime = update_data.get("tipo_crime")
-            envolvidos = update_data.get("envolvidos")
-            bairro = update_data.get("bairro")
-
-            if not tipo_crime and not envolvidos and not bairro:
-                # Sem crime classificado, sem pessoas, sem localidade → deletar
-                logger.info(
-                    "Descartando notícia irrelevante id=%d titulo='%s'",
-                    noticia["id"],
-                    noticia.get("titulo", "")[:60],
-                )
-                client_db.table("radar_noticias").delete().eq("id", noticia["id"]).execute()
-                return True  # Processado com sucesso (descartado)
+    def _save_extraction(self, noticia: dict[str, Any], update_data: dict[str, Any], client_db) -> bool:
+        """Aplica o resultado da extração em radar_noticias (atualiza, descarta ou DLQ)."""
+        # Se a extração retornou com erro transitório, registrar no DLQ e retornar False
+        extraction_error = update_data.pop("_extraction_error", None)
+        if extraction_error and update_data.get("enrichment_status") == "pending":
+            self._increment_error_count(noticia["id"], extraction_error, client_db)
+            return False
 
-            # Blocklist de bairros de Salvador e municípios vizinhos — se Claude extraiu bairro fora de Camaçari, deletar
-            if bairro and bairro.lower().strip() in BAIRROS_SALVADOR_BLOCKLIST | MUNICIPIOS_VIZINHOS_BLOCKLIST:
-                logger.info(
-                    "Descartando notícia com bairro de Salvador '%s' id=%d: '%s'",
-                    bairro,
-                    noticia["id"],
-                    noticia.get("titulo", "")[:60],
-                )
-                client_db.table("radar_noticias").delete().eq("id", noticia["id"]).execute()
-                return True
+        # Se Gemini diz que notícia não é da região → deletar do banco
+        if update_data.get("relevante") is False:
+            logger.info(
+                "Gemini marcou como irrelevante id=%d: '%s'",
+                noticia["id"],
+                noticia.get("titulo", "")[:60],
+            )
+            client_db.table("radar_noticias").delete().eq("id", noticia["id"]).execute()
+            return True
 
-            # Remover campos de relevância antes de salvar — não existem na tabela
-            update_data.pop("relevante", None)
-            update_data.pop("confianca_local", None)
+        # Se a extração não produziu nenhum dado útil → notícia provavelmente irrelevante
+        tipo_crime = update_data.get("tipo_crime")
+        envolvidos = update_data.get("envolvidos")
+        bairro = update_data.get("bairro")
 
-            # Atualizar no banco
-            client_db.table("radar_noticias").update(
-                update_data
-            ).eq("id", noticia["id"]).execute()
+        if not tipo_crime and not envolvidos and not bairro:
+            # Sem crime classificado, sem pessoas, sem localidade → deletar
+            logger.info(
+                "Descartando notícia irrelevante id=%d titulo='%s'",
+                noticia["id"],
+                noticia.get("titulo", "")[:60],
+            )
+            client_db.table("radar_noticias").delete().eq("id", noticia["id"]).execute()
+            return True  # Processado com sucesso (descartado)
 
+        # Blocklist de bairros de Salvador e municípios vizinhos — se Claude extraiu bairro fora de Camaçari, deletar
+        if bairro and bairro.lower().strip() in BAIRROS_SALVADOR_BLOCKLIST | MUNICIPIOS_VIZINHOS_BLOCKLIST:
             logger.info(
-                "Extraído | id=%d tipo=%s bairro=%s envolvidos=%s",
+                "Descartando notícia com bairro de Salvador '%s' id=%d: '%s'",
+                bairro,
                 noticia["id"],
-                update_data.get("tipo_crime", "?"),
-                update_data.get("bairro", "?"),
-                "sim" if update_data.get("envolvidos") else "não",
+                noticia.get("titulo", "")[:60],
             )
+            client_db.table("radar_noticias").delete().eq("id", noticia["id"]).execute()
             return True
-        except Exception as e:
-            logger.error("Erro extraindo notícia id=%d: %s", noticia["id"], str(e))
-            self._increment_error_count(noticia["id"], str(e), client_db)
-            return False
+
+        # Remover campos de relevância antes de salvar — não existem na tabela
+        update_data.pop("relevante", None)
+        update_data.pop("confianca_local", None)
+
+        # Atualizar no banco
+        client_db.table("radar_noticias").update(
+            update_data
+        ).eq("id", noticia["id"]).execute()
+
+        logger.info(
+            "Extraído | id=%d tipo=%s bairro=%s envolvidos=%s",
+            noticia["id"],
+            update_data.get("tipo_crime", "?"),
+            update_data.get("bairro", "?"),
+            "sim" if update_data.get("envolvidos") else "não",
+        )
+        return True
 
     async def extract_batch(self, limit: int = 20) -> int:
         """Processa um batch de notícias pendentes com concorrência controlada."""
@@ -463,10 +483,12 @@ class RadarExtractionService:
             async with semaphore:
                 return await self._extract_and_save_one(noticia, client_db)
 
-        results = await asyncio.gather(
-            *[_with_semaphore(n) for n in noticias],
-            return_exceptions=True,
-        )
+        # Lote em segundo plano: cede vez às chamadas interativas no gateway
+        with batch_priority():
+            results = await asyncio.gather(
+                *[_with_semaphore(n) for n in noticias],
+                return_exceptions=True,
+            )
 
         processed = sum(1 for r in results if r is True)
         failed = len(noticias) - processed
@@ -475,6 +497,94 @@ class RadarExtractionService:
 
         return processed
 
+    async def extract_batch_offline(
+        self,
+        limit: int = 1000,
+        job_id: str = "radar-extraction",
+        max_wait_seconds: float | None = None,
+    ) -> dict[str, Any]:
+        """
+        Extração em massa via Message Batches (sem disputar o rate limit
+        interativo). Submete as notícias pendentes, espera o lote e aplica
+        cada resultado com o mesmo fluxo de extract_batch. Chamar de novo com
+        o mesmo job_id retoma um lote em andamento.
+
+        As notícias submetidas ficam em 'batch_submitted' (extract_batch só
+        pega 'pending') e voltam para 'pending' se o envio falhar, se o
+        pedido der erro/expirar ou se o lote terminar sem resultado para elas.
+        """
+        from prompts.radar_extraction import RADAR_NEWS_EXTRACTION_PROMPT
+        from services.batch_jobs import BatchItem, BatchOutcome, get_batch_runner
+        from services.claude_service import ClaudeService, get_claude_service
+        from services.supabase_service import get_supabase_service
+
+        if not ClaudeService.is_configured():
+            raise RuntimeError("ANTHROPIC_API_KEY not configured — cannot extract")
+
+        client_db = get_supabase_service()._get_client()
+        runner = get_batch_runner("anthropic")
+
+        def _set_status(ids: list[int], status: str, current: str) -> None:
+            if ids:
+                client_db.table("radar_noticias").update({
+                    "enrichment_status": status,
+                    "updated_at": datetime.now(timezone.utc).isoformat(),
+                }).in_("id", ids).eq("enrichment_status", current).execute()
+
+        items: list[BatchItem] = []
+        if runner.idle(job_id):
+            result = (
+                client_db.table("radar_noticias")
+                .select("id, titulo, corpo")
+                .eq("enrichment_status", "pending")
+                .order("created_at", desc=False)
+                .limit(limit)
+                .execute()
+            )
+            claude = get_claude_service()
+            items = [
+                BatchItem(
+                    custom_id=f"noticia-{n['id']}",
+                    params=claude.request_params(RADAR_NEWS_EXTRACTION_PROMPT, self._noticia_text(n)),
+                )
+                for n in result.data or []
+            ]
+        submitted_ids = [int(item.custom_id.removeprefix("noticia-")) for item in items]
+        _set_status(submitted_ids, "batch_submitted", "pending")
+
+        async def _apply(outcome: BatchOutcome) -> None:
+            noticia = {"id": int(outcome.custom_id.removeprefix("noticia-"))}
+            if not outcome.ok:
+                if (outcome.error or "").startswith(("expired", "canceled")):
+                    # Não é falha da notícia: volta para a fila sem contar erro
+                    _set_status([noticia["id"]], "pending", "batch_submitted")
+                else:
+                    self._increment_error_count(
+                        noticia["id"], outcome.error or "batch error", client_db, retry_status="pending"
+                    )
+                return
+            try:
+                update_data = self._to_update_data(ClaudeService.parse_json_text(outcome.text or ""))
+            except Exception as e:
+                self._increment_error_count(
+                    noticia["id"], f"invalid batch response: {e}", client_db, retry_status="pending"
+                )
+                return
+            self._save_extraction(noticia, update_data, client_db)
+
+        try:
+            report = await runner.run(job_id, items, _apply, max_wait_seconds=max_wait_seconds)
+        except Exception:
+            if submitted_ids and runner.idle(job_id):
+                _set_status(submitted_ids, "pending", "batch_submitted")  # envio falhou
+            raise
+
+        if report["status"] == "done":
+            # Pedidos sem resultado (lote expirado, handler que falhou) voltam à fila
+            job_ids = [int(c.removeprefix("noticia-")) for c in runner.state(job_id).data.get("custom_ids", [])]
+            _set_status(job_ids, "pending", "batch_submitted")
+        return report
+
     async def geocode_batch(self, limit: int = 50) -> int:
         """
         Geocodifica notícias sem coordenadas.
@@ -16,6 +16,7 @@ import httpx
 from bs4 import BeautifulSoup
 
 from config import get_settings
+from services.llm_telemetry import llm_prompt
 
 logger = logging.getLogger("enrichment-engine.radar-scraper")
 
@@ -863,16 +864,18 @@ class RadarScraperService:
 
         return min(score, 100)
 
+    @llm_prompt("radar.pretriagem")
     async def _pretriagem_ia(self, titulo: str, trecho: str) -> int:
         """Pré-triagem IA para notícias na zona cinzenta (score 35-59).
         Retorna ajuste de score: -10 a +10.
         """
         try:
-            import anthropic
             import json as _json
 
-            client = anthropic.Anthropic()
-            msg = client.messages.create(
+            from services.llm_gateway import Priority, get_llm_gateway
+
+            msg = await get_llm_gateway().anthropic_messages(
+                priority=Priority.BATCH,
                 model="claude-haiku-4-5-20251001",
                 max_tokens=64,
                 timeout=5.0,
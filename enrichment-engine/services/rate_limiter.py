@@ -0,0 +1,87 @@
+"""
+Rate Limiter — Token buckets async para chamadas a APIs externas.
+
+Um RateLimiter combina dois buckets: requisições/minuto e tokens/minuto.
+acquire() espera até os dois terem saldo, então vários workers concorrentes
+compartilham o mesmo orçamento global sem estourar a cota do provedor.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Callable, Optional
+
+
+class TokenBucket:
+    """Bucket com reposição contínua de `rate_per_minute` unidades."""
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        capacity: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive")
+        self.rate = rate_per_minute / 60.0  # unidades por segundo
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """
+        Debita `amount` (pode ficar negativo) e retorna quantos segundos o
+        chamador deve esperar. Pedidos maiores que a capacidade são limitados
+        à capacidade para não travarem para sempre.
+        """
+        amount = min(amount, self.capacity)
+        self._refill()
+        self._tokens -= amount
+        return max(0.0, -self._tokens / self.rate)
+
+    def credit(self, amount: float) -> None:
+        """Devolve (ou, se negativo, cobra a mais) unidades já reservadas."""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class RateLimiter:
+    """Limite global de requisições e tokens por minuto (async-safe)."""
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.requests = TokenBucket(requests_per_minute, clock=clock)
+        self.tokens = TokenBucket(tokens_per_minute, clock=clock) if tokens_per_minute else None
+        self._lock = asyncio.Lock()
+        self.waited_seconds = 0.0
+
+    async def acquire(self, tokens: float = 0.0) -> float:
+        """Reserva 1 requisição + `tokens`; dorme o necessário. Retorna a espera."""
+        async with self._lock:
+            wait = self.requests.reserve(1)
+            if self.tokens is not None and tokens > 0:
+                wait = max(wait, self.tokens.reserve(tokens))
+        if wait > 0:
+            self.waited_seconds += wait
+            await asyncio.sleep(wait)
+        return wait
+
+    def settle(self, reserved_tokens: float, actual_tokens: float) -> None:
+        """Acerta o bucket de tokens com o uso real reportado pela API."""
+        if self.tokens is not None and actual_tokens:
+            self.tokens.credit(reserved_tokens - actual_tokens)
+
+    def refund(self, reserved_tokens: float) -> None:
+        """Devolve a reserva de tokens de uma chamada que falhou sem consumir cota."""
+        if self.tokens is not None and reserved_tokens > 0:
+            self.tokens.credit(min(reserved_tokens, self.tokens.capacity))
@@ -0,0 +1,128 @@
+"""
+Speaker Merge — Atribui os turnos do pyannote aos segmentos do Whisper.
+
+Varredura ordenada (dois ponteiros): segmentos e turnos percorridos uma vez
+por ordem de início, mantendo só os turnos ativos — O((S + T) log) em vez de
+comparar cada segmento com cada turno. Numa audiência de 3h (milhares de
+cada) a atribuição cai de segundos para milissegundos.
+
+- Speaker dominante: maior tempo total de sobreposição com o segmento
+  (empate → o que começou a falar primeiro)
+- Troca de speaker dentro do segmento (opcional, desligado por padrão): se
+  cada lado dura pelo menos `split_min_seconds`, o segmento é dividido. Sem
+  timestamps por palavra, as palavras são distribuídas proporcionalmente ao
+  tempo — o corte pode cair no meio de uma frase.
+
+Benchmark: scripts/bench_speaker_merge.py
+"""
+from __future__ import annotations
+
+from bisect import bisect_right
+
+DEFAULT_SPEAKER = "SPEAKER_0"
+
+
+def _speaker_runs(
+    pieces: list[tuple[float, float, str]], split_min_seconds: float
+) -> list[list]:
+    """
+    Trechos contíguos [speaker, início, fim] dentro do segmento. Em fala
+    sobreposta quem já estava falando mantém a vez; trechos curtos demais
+    são absorvidos pelos vizinhos.
+    """
+    runs: list[list] = []
+    for start, end, speaker in pieces:  # ordenados por início
+        if runs and runs[-1][0] == speaker:
+            runs[-1][2] = max(runs[-1][2], end)
+            continue
+        if runs:
+            start = max(start, runs[-1][2])
+        if end > start:
+            runs.append([speaker, start, end])
+
+    runs = [r for r in runs if r[2] - r[1] >= split_min_seconds]
+    merged: list[list] = []
+    for run in runs:
+        if merged and merged[-1][0] == run[0]:
+            merged[-1][2] = run[2]
+        else:
+            merged.append(run)
+    return merged
+
+
+def _split_segment(seg: dict, runs: list[list]) -> list[dict]:
+    """Divide o texto do segmento entre os trechos, proporcional ao tempo."""
+    words = seg.get("text", "").split()
+    seg_start, seg_end = seg["start"], seg["end"]
+    # Corte entre dois trechos: meio da pausa (ou da sobreposição) entre eles
+    cuts = [(a[2] + b[1]) / 2 for a, b in zip(runs, runs[1:])]
+
+    groups: list[list[str]] = [[] for _ in runs]
+    step = (seg_end - seg_start) / len(words)
+    for i, word in enumerate(words):
+        groups[bisect_right(cuts, seg_start + (i + 0.5) * step)].append(word)
+
+    bounds = [seg_start, *cuts, seg_end]
+    parts = []
+    for k, (run, group) in enumerate(zip(runs, groups)):
+        if not group:
+            continue
+        if parts and parts[-1]["speaker"] == run[0]:
+            parts[-1]["text"] += " " + " ".join(group)
+            parts[-1]["end"] = bounds[k + 1]
+            continue
+        parts.append({**seg, "start": bounds[k], "end": bounds[k + 1], "text": " ".join(group), "speaker": run[0]})
+    if parts:
+        parts[0]["start"], parts[-1]["end"] = seg_start, seg_end
+    return parts
+
+
+def assign_speakers(
+    segments: list[dict],
+    turns: list[dict],
+    split_min_seconds: float = 0.0,
+) -> list[dict]:
+    """
+    Devolve os segmentos (na ordem original) com "speaker" preenchido; com
+    `split_min_seconds` > 0, segmentos com troca de speaker viram vários.
+    Segmentos sem sobreposição com nenhum turno ficam com DEFAULT_SPEAKER.
+    """
+    ordered_turns = sorted(
+        ((t["start"], t["end"], t["speaker"]) for t in turns if t["end"] > t["start"]),
+        key=lambda t: t[0],
+    )
+    order = sorted(range(len(segments)), key=lambda i: segments[i]["start"])
+    results: list[list[dict]] = [[] for _ in segments]
+
+    active: list[tuple[float, float, str]] = []
+    next_turn = 0
+    for i in order:
+        seg = segments[i]
+        seg_start, seg_end = seg["start"], seg["end"]
+        # Turnos que começam antes do fim do segmento entram; os já encerrados
+        # saem (segmentos em ordem de início: não voltam a sobrepor)
+        while next_turn < len(ordered_turns) and ordered_turns[next_turn][0] < seg_end:
+            active.append(ordered_turns[next_turn])
+            next_turn += 1
+        active = [t for t in active if t[1] > seg_start]
+
+        pieces = [
+            (max(start, seg_start), min(end, seg_end), speaker)
+            for start, end, speaker in active
+            if start < seg_end and seg_start < seg_end
+        ]
+        totals: dict[str, float] = {}
+        for start, end, speaker in pieces:
+            totals[speaker] = totals.get(speaker, 0.0) + (end - start)
+        dominant = max(totals, key=totals.__getitem__) if totals else DEFAULT_SPEAKER
+
+        if split_min_seconds > 0 and len(totals) > 1 and len(seg.get("text", "").split()) > 1:
+            runs = _speaker_runs(pieces, split_min_seconds)
+            if len(runs) > 1:
+                parts = _split_segment(seg, runs)
+                if len(parts) > 1:
+                    results[i] = parts
+                    continue
+        results[i] = [{**seg, "speaker": dominant}]
+
+    return [part for parts in results for part in parts]
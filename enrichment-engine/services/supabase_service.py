@@ -37,6 +37,11 @@ class SupabaseService:
 
         return self._client
 
+    @property
+    def client(self):
+        """Client Supabase bruto (para scripts que montam as próprias queries)."""
+        return self._get_client()
+
     # === Enrichment Status ===
 
     async def update_enrichment_status(
@@ -304,6 +309,71 @@ class SupabaseService:
             logger.error("Failed to find processo %s: %s", numero, e)
             return None
 
+    async def get_case_context(self, drive_file_id: int, max_facts: int = 50) -> str | None:
+        """
+        Dossiê do caso vinculado a um drive_file: dados do processo + fatos
+        ativos (case_facts). Texto determinístico (ordenado por id) para que
+        depoimentos do mesmo processo compartilhem o prefixo em cache.
+
+        Returns:
+            Texto do dossiê ou None se o arquivo não tem processo/dados
+        """
+        client = self._get_client()
+        try:
+            file_row = (
+                client.table("drive_files")
+                .select("processo_id")
+                .eq("id", drive_file_id)
+                .limit(1)
+                .execute()
+            )
+            processo_id = file_row.data[0].get("processo_id") if file_row.data else None
+            if not processo_id:
+                return None
+
+            processo = (
+                client.table("processos")
+                .select("numero_autos, classe_processual, assunto, vara")
+                .eq("id", processo_id)
+                .limit(1)
+                .execute()
+            )
+            facts = (
+                client.table("case_facts")
+                .select("titulo, descricao, tipo")
+                .eq("processo_id", processo_id)
+                .eq("status", "ativo")
+                .order("id")
+                .limit(max_facts)
+                .execute()
+            )
+        except Exception as e:
+            logger.error("Failed to load case context for drive_file %d: %s", drive_file_id, e)
+            return None
+
+        lines: list[str] = []
+        if processo.data:
+            row = processo.data[0]
+            header = [
+                f"{label}: {row[key]}"
+                for label, key in (
+                    ("Processo", "numero_autos"),
+                    ("Classe", "classe_processual"),
+                    ("Vara", "vara"),
+                    ("Assunto", "assunto"),
+                )
+                if row.get(key)
+            ]
+            lines.extend(header)
+        if facts.data:
+            lines.append("")
+            lines.append("Fatos do caso:")
+            for fact in facts.data:
+                tipo = f"[{fact['tipo']}] " if fact.get("tipo") else ""
+                descricao = f": {fact['descricao']}" if fact.get("descricao") else ""
+                lines.append(f"- {tipo}{fact['titulo']}{descricao}")
+        return "\n".join(lines).strip() or None
+
     # === Solar-specific Helpers ===
 
     async def get_last_movimentacao_date(self, processo_id: int) -> str | None:
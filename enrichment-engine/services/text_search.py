@@ -0,0 +1,126 @@
+"""
+Text Search — BM25 com tokenização jurídica em português + fusão RRF.
+
+Complementa a busca vetorial em consultas com números CNJ, citações de
+artigos ("art. 157 §2º") e nomes próprios, onde o ranking só por embedding
+perde recall. Acentos são removidos ("legítima" == "legitima"), ordinais
+normalizados ("2º" == "2") e plurais simples reduzidos.
+"""
+from __future__ import annotations
+
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Hashable, Sequence
+
+import numpy as np
+
+_CNJ_RE = re.compile(r"\b(\d{7})-?(\d{2})\.?(\d{4})\.?(\d)\.?(\d{2})\.?(\d{4})\b")
+_ARTICLE_RE = re.compile(r"\bart(?:igo)?s?\.?\s*(\d+)")
+_PARAGRAPH_RE = re.compile(r"§\s*(\d+)")
+_ORDINAL_RE = re.compile(r"\b(\d+)[oa]\b")
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+_STOPWORDS = frozenset(
+    """
+    a ao aos as com da das de do dos e ela ele em entre era essa esse esta
+    este foi ha isso mais mas na nas nao no nos o os ou para pela pelas pelo
+    pelos por qual que se sem ser seu sua sao tem um uma umas uns
+    """.split()
+)
+
+
+def fold_accents(text: str) -> str:
+    """Minúsculas sem diacríticos; NFKD também converte º/ª em o/a."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _stem(token: str) -> str:
+    """Redução de plural leve (decisões -> decisao, crimes -> crime)."""
+    if token.isdigit() or len(token) <= 3:
+        return token
+    if token.endswith(("oes", "aes")):
+        return token[:-3] + "ao"
+    if token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize_pt(text: str) -> list[str]:
+    """
+    Tokens para BM25. Além das palavras, emite tokens compostos para
+    números CNJ (20 dígitos), artigos (art157) e parágrafos (§2).
+    """
+    if not text:
+        return []
+    folded = fold_accents(text)
+    tokens: list[str] = ["".join(m.groups()) for m in _CNJ_RE.finditer(folded)]
+    folded = _CNJ_RE.sub(" ", folded)
+    folded = _ORDINAL_RE.sub(r"\1", folded)
+    tokens += [f"art{m.group(1)}" for m in _ARTICLE_RE.finditer(folded)]
+    tokens += [f"§{m.group(1)}" for m in _PARAGRAPH_RE.finditer(folded)]
+    tokens += [
+        _stem(tok) for tok in _TOKEN_RE.findall(folded)
+        if tok not in _STOPWORDS and (len(tok) > 1 or tok.isdigit())
+    ]
+    return tokens
+
+
+def term_frequencies(text: str) -> dict[str, int]:
+    return dict(Counter(tokenize_pt(text)))
+
+
+class BM25Index:
+    """Índice invertido BM25 sobre documentos numerados 0..n-1."""
+
+    def __init__(self, term_freqs: Sequence[dict[str, int]], k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.size = len(term_freqs)
+        self.doc_len = np.array([sum(tf.values()) for tf in term_freqs], dtype=np.float32)
+        self.avgdl = float(self.doc_len.mean()) if self.size and self.doc_len.sum() else 1.0
+
+        postings: dict[str, tuple[list[int], list[int]]] = {}
+        for pos, tf in enumerate(term_freqs):
+            for term, count in tf.items():
+                docs, counts = postings.setdefault(term, ([], []))
+                docs.append(pos)
+                counts.append(count)
+        self._postings = {
+            term: (np.array(docs, dtype=np.int64), np.array(counts, dtype=np.float32))
+            for term, (docs, counts) in postings.items()
+        }
+
+    def scores(self, query: str) -> np.ndarray:
+        """Score BM25 de cada documento para a consulta (0 = sem termo em comum)."""
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize_pt(query)):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            docs, tf = posting
+            idf = math.log(1 + (self.size - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_len[docs] / self.avgdl)
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Hashable]],
+    weights: Sequence[float] | None = None,
+    k: int = 60,
+) -> list[tuple[Hashable, float]]:
+    """
+    Funde rankings pela soma ponderada de 1 / (k + posição).
+    Retorna (item, score) em ordem decrescente.
+    """
+    weights = weights or [1.0] * len(rankings)
+    fused: dict[Hashable, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        if weight <= 0:
+            continue
+        for rank, item in enumerate(ranking, start=1):
+            fused[item] = fused.get(item, 0.0) + weight / (k + rank)
+    return sorted(fused.items(), key=lambda kv: kv[1], reverse=True)
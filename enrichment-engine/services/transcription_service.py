@@ -8,24 +8,32 @@ Fluxo:
 2. Baixa o arquivo (se URL)
 3. Tenta transcrever com Whisper (se OPENAI_API_KEY configurada e arquivo <= 25MB)
 4. Fallback: Gemini 2.5 Flash (suporta arquivos até 2GB, inclui diarização nativa)
-5. Opcionalmente: diariza speakers com pyannote (apenas Whisper path)
+5. Opcionalmente: diariza speakers com pyannote (apenas Whisper path), em
+   paralelo ao Whisper — pool de processos com a pipeline pré-carregada
 6. Combina transcrição + speakers em output formatado
 """
 from __future__ import annotations
 
 import asyncio
+import contextvars
 import json
 import logging
 import os
 import re
+import shutil
 import tempfile
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, Callable
 
 import httpx
 
 from config import get_settings
+from services import audio_segmenter
+from services.diarization_pool import DiarizationWorkerPool, diarize_with, load_pipeline
+from services.speaker_merge import DEFAULT_SPEAKER, assign_speakers
+from services.llm_telemetry import get_llm_telemetry, llm_prompt
 
 try:
     from openai import OpenAI
@@ -53,6 +61,12 @@ def get_transcription_service() -> "TranscriptionService":
     return _transcription_service
 
 
+def shutdown_transcription_service() -> None:
+    """Encerra o pool de diarização se o singleton já foi criado."""
+    if _transcription_service is not None:
+        _transcription_service.shutdown()
+
+
 class TranscriptionService:
     """Serviço de transcrição com Whisper + pyannote, fallback Gemini."""
 
@@ -67,14 +81,30 @@ class TranscriptionService:
             if OpenAI is None:
                 logger.warning("openai package not installed, Whisper unavailable")
             else:
-                self.openai_client = OpenAI(api_key=settings.openai_api_key)
+                # Retry fica em _whisper_with_retry: sem retries do SDK por baixo
+                self.openai_client = OpenAI(api_key=settings.openai_api_key, max_retries=0)
 
         self.whisper_model = settings.whisper_model
         self.max_file_size_mb = settings.whisper_max_file_size_mb
+        self.whisper_concurrency = settings.whisper_max_concurrency
+        self.whisper_rpm = settings.whisper_rpm
+        self.chunk_min_seconds = settings.whisper_chunk_min_seconds
+        self.chunk_max_seconds = settings.whisper_chunk_max_seconds
+        self.chunk_overlap_seconds = settings.whisper_chunk_overlap_seconds
+        self.whisper_timeout = settings.whisper_timeout_seconds
+        # O SDK da OpenAI é síncrono: chamadas rodam aqui, fora do event loop
+        self._whisper_executor = ThreadPoolExecutor(
+            max_workers=self.whisper_concurrency, thread_name_prefix="whisper",
+        )
         self.language = settings.transcription_language
         self.diarization_enabled = settings.diarization_enabled
         self.hf_token = settings.hf_token
         self._diarization_pipeline = None
+        self.diarization_pool_size = settings.diarization_pool_size
+        self.split_min_seconds = settings.diarization_split_min_seconds
+        self.diarization_timeout = settings.diarization_job_timeout
+        self.diarization_timeout_per_second = settings.diarization_timeout_per_audio_second
+        self._diarization_pool: DiarizationWorkerPool | None = None
 
         # Gemini (fallback)
         self.gemini_api_key = settings.gemini_api_key
@@ -143,7 +173,7 @@ class TranscriptionService:
                     tmp_path.stat().st_size / (1024 * 1024),
                 )
             else:
-                audio_path = self._extract_compressed_audio(tmp_path)
+                audio_path = await asyncio.to_thread(self._extract_compressed_audio, tmp_path)
                 if audio_path != tmp_path:
                     tmp_path.unlink(missing_ok=True)
 
@@ -232,7 +262,7 @@ class TranscriptionService:
     ) -> dict[str, Any]:
         """Transcrição via Whisper + pyannote."""
         # Converter para formato compatível
-        audio_path = self._ensure_compatible_format(tmp_path)
+        audio_path = await asyncio.to_thread(self._ensure_compatible_format, tmp_path)
 
         try:
             # Verificar tamanho
@@ -243,21 +273,21 @@ class TranscriptionService:
                     f"(máximo: {self.max_file_size_mb}MB)"
                 )
 
+            # Diarizar speakers (se habilitado) em paralelo ao Whisper
+            diarization = self._start_diarization(audio_path, diarize, expected_speakers)
+
             # Transcrever com Whisper
             logger.info(
                 "Transcrevendo com Whisper | file=%s | size=%.1fMB | lang=%s",
                 file_name, file_size_mb, lang,
             )
-            whisper_result = self._transcribe_whisper(audio_path, lang)
-
-            # Diarizar speakers (se habilitado)
-            speakers_result = None
-            if diarize and self.diarization_enabled and self.hf_token:
-                logger.info("Diarizando speakers com pyannote | expected=%s", expected_speakers)
-                try:
-                    speakers_result = self._diarize_speakers(audio_path, expected_speakers)
-                except Exception as e:
-                    logger.warning("Diarização falhou (continuando sem speakers): %s", e)
+            try:
+                whisper_result = await self._run_whisper(audio_path, lang)
+            except BaseException:
+                if diarization is not None:
+                    diarization.cancel()
+                raise
+            speakers_result = await self._collect_diarization(diarization)
 
             # Combinar transcrição + speakers
             return self._merge_transcription_and_speakers(whisper_result, speakers_result)
@@ -275,7 +305,7 @@ class TranscriptionService:
         expected_speakers: int | None,
     ) -> dict[str, Any]:
         """Whisper direto com retry — para arquivos ≤ max_file_size_mb."""
-        audio_compat = self._ensure_compatible_format(audio_path)
+        audio_compat = await asyncio.to_thread(self._ensure_compatible_format, audio_path)
         try:
             file_size_mb = audio_compat.stat().st_size / (1024 * 1024)
             if file_size_mb > self.max_file_size_mb:
@@ -283,18 +313,18 @@ class TranscriptionService:
                     f"Arquivo ainda grande após extração: {file_size_mb:.1f}MB"
                 )
 
+            diarization = self._start_diarization(audio_compat, diarize, expected_speakers)
             logger.info(
                 "Transcrevendo com Whisper | file=%s | size=%.1fMB | lang=%s",
                 file_name, file_size_mb, lang,
             )
-            whisper_result = await self._whisper_with_retry(audio_compat, lang)
-
-            speakers_result = None
-            if diarize and self.diarization_enabled and self.hf_token:
-                try:
-                    speakers_result = self._diarize_speakers(audio_compat, expected_speakers)
-                except Exception as e:
-                    logger.warning("Diarização falhou (continuando sem speakers): %s", e)
+            try:
+                whisper_result = await self._whisper_with_retry(audio_compat, lang)
+            except BaseException:
+                if diarization is not None:
+                    diarization.cancel()
+                raise
+            speakers_result = await self._collect_diarization(diarization)
 
             return self._merge_transcription_and_speakers(whisper_result, speakers_result)
         finally:
@@ -315,98 +345,127 @@ class TranscriptionService:
         progress_callback: "Callable[[int, int], None] | None" = None,
     ) -> dict[str, Any]:
         """
-        Transcrição via Whisper em chunks PARALELOS (máx 3 simultâneos).
-        Divide o áudio em pedaços de ~20min, processa em paralelo,
-        recombina com timestamps ajustados.
+        Transcrição via Whisper em chunks PARALELOS (whisper_max_concurrency).
+        O tamanho dos chunks se adapta à duração e ao rate limit (5–20min),
+        os cortes caem em silêncios e, onde não há silêncio, os chunks se
+        sobrepõem e a costura descarta os segmentos duplicados.
         Chunks que falham após retry inserem placeholder no output.
-        """
-        from pydub import AudioSegment
 
-        audio = AudioSegment.from_file(str(audio_path))
-        duration_seconds = len(audio) / 1000.0
-        chunk_duration_ms = 20 * 60 * 1000  # 20 min
-
-        chunks: list[tuple[float, AudioSegment]] = []
-        for start_ms in range(0, len(audio), chunk_duration_ms):
-            end_ms = min(start_ms + chunk_duration_ms, len(audio))
-            chunks.append((start_ms / 1000.0, audio[start_ms:end_ms]))
+        A segmentação é uma única passada do ffmpeg para um diretório
+        temporário — a gravação nunca é decodificada inteira em memória.
+        """
+        # Diarização do arquivo completo começa já, em paralelo à segmentação + Whisper
+        diarization = self._start_diarization(audio_path, diarize, expected_speakers)
+        chunk_dir = Path(tempfile.mkdtemp(prefix="chunks_"))
+        try:
+            info = await asyncio.to_thread(audio_segmenter.probe, audio_path)
+            chunk_seconds = audio_segmenter.chunk_seconds_for(
+                info.duration,
+                self.whisper_concurrency,
+                self.whisper_rpm,
+                self.chunk_min_seconds,
+                self.chunk_max_seconds,
+            )
+            plans = await asyncio.to_thread(
+                audio_segmenter.plan_chunks,
+                audio_path, info.duration, chunk_seconds, self.chunk_overlap_seconds,
+            )
+            chunks = await asyncio.to_thread(
+                audio_segmenter.segment_audio, audio_path, chunk_dir, plans, info
+            )
+            return await self._transcribe_chunks(
+                chunks, info.duration, file_name, lang, diarization, progress_callback,
+            )
+        finally:
+            if diarization is not None and not diarization.done():
+                diarization.cancel()
+            shutil.rmtree(chunk_dir, ignore_errors=True)
 
+    async def _transcribe_chunks(
+        self,
+        chunks: list[audio_segmenter.AudioChunk],
+        duration_seconds: float,
+        file_name: str,
+        lang: str,
+        diarization: "asyncio.Task[list[dict]] | None" = None,
+        progress_callback: "Callable[[int, int], None] | None" = None,
+    ) -> dict[str, Any]:
+        """
+        Transcreve os chunks já segmentados e recombina com timestamps ajustados.
+        `diarization` é o job do arquivo completo, já em andamento (ver
+        `_start_diarization`) — aguardado só depois do último chunk.
+        """
         total = len(chunks)
         logger.info(
             "Chunked Whisper PARALELO | file=%s | duration=%.0fs | chunks=%d",
             file_name, duration_seconds, total,
         )
 
-        semaphore = asyncio.Semaphore(3)
+        semaphore = asyncio.Semaphore(self.whisper_concurrency)
         completed_count = 0
 
         async def _process_chunk(
-            i: int, offset_s: float, chunk: AudioSegment
-        ) -> tuple[float, dict | None, Exception | None]:
+            chunk: audio_segmenter.AudioChunk,
+        ) -> tuple[audio_segmenter.AudioChunk, dict | None, Exception | None]:
             nonlocal completed_count
-            _fd, _chunk_path_str = tempfile.mkstemp(suffix=".mp3")
-            os.close(_fd)
-            chunk_path = Path(_chunk_path_str)
+            offset_s = chunk.offset
             async with semaphore:
                 try:
-                    chunk.export(str(chunk_path), format="mp3", bitrate="32k")
-                    chunk_size_mb = chunk_path.stat().st_size / (1024 * 1024)
+                    chunk_size_mb = chunk.path.stat().st_size / (1024 * 1024)
                     logger.info(
                         "Chunk %d/%d | offset=%.0fs | size=%.1fMB",
-                        i + 1, total, offset_s, chunk_size_mb,
+                        chunk.index + 1, total, offset_s, chunk_size_mb,
                     )
-                    result = await self._whisper_with_retry(chunk_path, lang)
+                    result = await self._whisper_with_retry(chunk.path, lang)
                     for seg in result.get("segments", []):
                         seg["start"] += offset_s
                         seg["end"] += offset_s
                     completed_count += 1
                     if progress_callback:
                         progress_callback(completed_count, total)
-                    return (offset_s, result, None)
+                    return (chunk, result, None)
                 except Exception as e:
-                    logger.error("Chunk %d/%d falhou: %s", i + 1, total, str(e))
+                    logger.error("Chunk %d/%d falhou: %s", chunk.index + 1, total, str(e))
                     completed_count += 1
                     if progress_callback:
                         progress_callback(completed_count, total)
-                    return (offset_s, None, e)
+                    return (chunk, None, e)
                 finally:
-                    chunk_path.unlink(missing_ok=True)
+                    chunk.path.unlink(missing_ok=True)
 
-        tasks = [
-            _process_chunk(i, offset_s, chunk)
-            for i, (offset_s, chunk) in enumerate(chunks)
-        ]
-        raw_results: list[tuple[float, dict | None, Exception | None]] = (
+        tasks = [_process_chunk(chunk) for chunk in chunks]
+        raw_results: list[tuple[audio_segmenter.AudioChunk, dict | None, Exception | None]] = (
             await asyncio.gather(*tasks)
         )
 
         # Ordenar por offset
-        raw_results.sort(key=lambda x: x[0])
+        raw_results.sort(key=lambda x: x[0].offset)
 
         all_segments: list[dict] = []
         full_text_parts: list[str] = []
         failed_chunks: list[float] = []
-        chunk_duration_s = chunk_duration_ms / 1000.0
 
-        for offset_s, result, error in raw_results:
+        for chunk, result, error in raw_results:
             if error is not None:
-                failed_chunks.append(offset_s)
-                end_s = min(offset_s + chunk_duration_s, duration_seconds)
+                failed_chunks.append(chunk.offset)
+                end_s = min(chunk.own_end, duration_seconds or chunk.own_end)
                 placeholder = (
                     f"⚠️ [Segmento não transcrito — falha de API no intervalo "
-                    f"{self._format_timestamp(offset_s)}–{self._format_timestamp(end_s)}]"
+                    f"{self._format_timestamp(chunk.own_start)}–{self._format_timestamp(end_s)}]"
                 )
                 all_segments.append({
-                    "start": offset_s,
+                    "start": chunk.own_start,
                     "end": end_s,
                     "text": placeholder,
                     "speaker": "SISTEMA",
                 })
                 full_text_parts.append(placeholder)
             else:
-                for seg in result.get("segments", []):
-                    all_segments.append(seg)
-                full_text_parts.append(result.get("text", ""))
+                kept = self._stitch_chunk_segments(all_segments, result.get("segments", []), chunk)
+                if kept:
+                    full_text_parts.append(" ".join(seg["text"] for seg in kept))
+                elif not result.get("segments"):
+                    full_text_parts.append(result.get("text", ""))
 
         successful = [r for _, r, e in raw_results if r is not None]
         if not successful:
@@ -416,13 +475,8 @@ class TranscriptionService:
 
         full_text = " ".join(p for p in full_text_parts if p)
 
-        # Diarização no arquivo completo
-        speakers_result = None
-        if diarize and self.diarization_enabled and self.hf_token:
-            try:
-                speakers_result = self._diarize_speakers(audio_path, expected_speakers)
-            except Exception as e:
-                logger.warning("Diarização falhou (continuando): %s", e)
+        # Diarização no arquivo completo (rodando desde antes da segmentação)
+        speakers_result = await self._collect_diarization(diarization)
 
         whisper_result = {
             "text": full_text,
@@ -438,6 +492,39 @@ class TranscriptionService:
 
         return merged
 
+    @staticmethod
+    def _stitch_chunk_segments(
+        stitched: list[dict],
+        segments: list[dict],
+        chunk: audio_segmenter.AudioChunk,
+    ) -> list[dict]:
+        """
+        Costura os segmentos (já em tempo absoluto) de um chunk ao resultado.
+        Na sobreposição de um corte forçado, cada segmento fica com o chunk
+        que "possui" seu ponto médio; se ainda assim repetir o texto do
+        último segmento costurado (mesma fala nos dois lados), é descartado.
+        Antes do teste, start/end são limitados ao áudio do chunk: o Whisper
+        às vezes estende o último segmento além do fim do arquivo, o que
+        jogaria o ponto médio para fora da faixa e perderia a fala.
+        """
+        audio_end = chunk.offset + chunk.duration
+        kept = []
+        for seg in segments:
+            start = min(max(seg["start"], chunk.offset), audio_end)
+            end = min(max(seg["end"], start), audio_end)
+            if (start, end) != (seg["start"], seg["end"]):
+                seg = {**seg, "start": start, "end": end}
+            midpoint = (start + end) / 2
+            if not chunk.own_start <= midpoint < chunk.own_end:
+                continue
+            if stitched and seg["start"] < stitched[-1]["end"] + 1.0:
+                previous = " ".join(stitched[-1].get("text", "").casefold().split())
+                if previous and previous == " ".join(seg.get("text", "").casefold().split()):
+                    continue
+            stitched.append(seg)
+            kept.append(seg)
+        return kept
+
     # ==========================================
     # GEMINI PATH
     # ==========================================
@@ -549,25 +636,28 @@ Regras para segments:
 - Quando o áudio acabar, PARE IMEDIATAMENTE. Não gere texto adicional."""
 
             # 4. Chamar Gemini
-            response = client.models.generate_content(
-                model=self.gemini_model,
-                contents=[
-                    types.Content(
-                        parts=[
-                            types.Part.from_uri(
-                                file_uri=uploaded_file.uri,
-                                mime_type=uploaded_file.mime_type or "video/mp4",
-                            ),
-                            types.Part.from_text(text=prompt),
-                        ]
-                    )
-                ],
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    temperature=0.1,
-                    max_output_tokens=65536,  # Transcrições longas
-                ),
-            )
+            with llm_prompt("transcription.gemini"), \
+                    get_llm_telemetry().track("gemini", self.gemini_model) as call:
+                response = client.models.generate_content(
+                    model=self.gemini_model,
+                    contents=[
+                        types.Content(
+                            parts=[
+                                types.Part.from_uri(
+                                    file_uri=uploaded_file.uri,
+                                    mime_type=uploaded_file.mime_type or "video/mp4",
+                                ),
+                                types.Part.from_text(text=prompt),
+                            ]
+                        )
+                    ],
+                    config=types.GenerateContentConfig(
+                        response_mime_type="application/json",
+                        temperature=0.1,
+                        max_output_tokens=65536,  # Transcrições longas
+                    ),
+                )
+                call.set_usage(response)
 
             # 5. Verificar se output foi truncado por limite de tokens
             try:
@@ -797,7 +887,7 @@ Regras para segments:
             tmp.close()
 
     def _ensure_compatible_format(self, path: Path) -> Path:
-        """Converte vídeo/formatos exóticos para MP3 usando pydub."""
+        """Converte vídeo/formatos exóticos para MP3 via ffmpeg."""
         suffix = path.suffix.lower()
         compatible = {".mp3", ".wav", ".flac", ".m4a", ".ogg", ".webm", ".mp4", ".mpeg", ".mpga"}
 
@@ -807,12 +897,7 @@ Regras para segments:
         # Converter para MP3 (baixo bitrate para speech — economiza tamanho)
         logger.info("Convertendo %s para MP3 (32kbps mono speech)", suffix)
         try:
-            from pydub import AudioSegment
-            audio = AudioSegment.from_file(str(path))
-            # Mono + 32kbps é suficiente para voz (reduz ~60% vs 64kbps stereo)
-            audio = audio.set_channels(1)
-            mp3_path = path.with_suffix(".mp3")
-            audio.export(str(mp3_path), format="mp3", bitrate="32k")
+            mp3_path = audio_segmenter.extract_audio(path, path.with_suffix(".mp3"))
             mp3_size = mp3_path.stat().st_size / (1024 * 1024)
             logger.info("Conversão concluída: %.1fMB → %.1fMB (MP3 32kbps mono)",
                         path.stat().st_size / (1024 * 1024), mp3_size)
@@ -824,7 +909,7 @@ Regras para segments:
     def _extract_compressed_audio(self, path: Path) -> Path:
         """
         Extrai áudio comprimido de qualquer arquivo (vídeo ou áudio).
-        SEMPRE converte para MP3 mono 32kbps — ideal para speech.
+        SEMPRE converte para MP3 mono 16kHz 32kbps — ideal para speech.
         Diferente de _ensure_compatible_format que retorna MP4/MP3 como estão,
         este método FORÇA a conversão para reduzir tamanho ao máximo.
         Usado antes do chunked Whisper para remover stream de vídeo.
@@ -834,15 +919,11 @@ Regras para segments:
             "Extraindo áudio comprimido de %s (%.1fMB)",
             path.name, original_size,
         )
+        _fd, _mp3_path_str = tempfile.mkstemp(suffix=".mp3")
+        os.close(_fd)
+        mp3_path = Path(_mp3_path_str)
         try:
-            from pydub import AudioSegment
-
-            audio = AudioSegment.from_file(str(path))
-            audio = audio.set_channels(1)  # Mono
-            _fd, _mp3_path_str = tempfile.mkstemp(suffix=".mp3")
-            os.close(_fd)
-            mp3_path = Path(_mp3_path_str)
-            audio.export(str(mp3_path), format="mp3", bitrate="32k")
+            audio_segmenter.extract_audio(path, mp3_path)
             mp3_size = mp3_path.stat().st_size / (1024 * 1024)
             logger.info(
                 "Áudio extraído: %.1fMB → %.1fMB (MP3 mono 32kbps, redução %.0f%%)",
@@ -851,6 +932,7 @@ Regras para segments:
             )
             return mp3_path
         except Exception as e:
+            mp3_path.unlink(missing_ok=True)
             logger.warning("Extração de áudio falhou, tentando original: %s", e)
             return path
 
@@ -860,13 +942,16 @@ Regras para segments:
 
     def _transcribe_whisper(self, audio_path: Path, language: str) -> dict:
         """Transcreve com OpenAI Whisper API (verbose JSON com timestamps)."""
-        with open(audio_path, "rb") as f:
+        with llm_prompt("transcription.whisper"), \
+                get_llm_telemetry().track("openai", self.whisper_model), \
+                open(audio_path, "rb") as f:
             response = self.openai_client.audio.transcriptions.create(
                 model=self.whisper_model,
                 file=f,
                 language=language,
                 response_format="verbose_json",
                 timestamp_granularities=["segment"],
+                timeout=self.whisper_timeout,
             )
 
         # Extrair dados relevantes
@@ -889,10 +974,39 @@ Regras para segments:
             "duration": response.duration if hasattr(response, "duration") else 0,
         }
 
+    async def _run_whisper(self, audio_path: Path, language: str) -> dict:
+        """
+        Executa _transcribe_whisper no executor dedicado, sem bloquear o event
+        loop (chunks sobem de fato em paralelo). Timeout por chamada, contado
+        a partir do início do job (o tempo na fila do executor, com todas as
+        threads ocupadas, não conta): o await é cancelado em whisper_timeout
+        e o próprio request HTTP também expira, liberando a thread. Rótulos
+        de telemetria (contextvars) são preservados.
+        """
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        transcribe = self._transcribe_whisper
+        started = asyncio.Event()
+
+        def _job() -> dict:
+            loop.call_soon_threadsafe(started.set)
+            return ctx.run(transcribe, audio_path, language)
+
+        future = loop.run_in_executor(self._whisper_executor, _job)
+        waiter = asyncio.ensure_future(started.wait())
+        try:
+            await asyncio.wait({waiter, future}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            future.cancel()  # ainda na fila: nem chega a rodar
+            raise
+        finally:
+            waiter.cancel()
+        return await asyncio.wait_for(future, timeout=self.whisper_timeout)
+
     async def _whisper_with_retry(self, audio_path: Path, language: str) -> dict:
         """
         Transcreve com Whisper, com retry em erros transientes.
-        - RateLimitError / 5xx → retry com backoff: 0s, 5s, 15s
+        - RateLimitError / 5xx / timeout / conexão → retry com backoff: 0s, 5s, 15s
         - 4xx (input inválido) → falha imediata, sem retry
         """
         import openai
@@ -904,7 +1018,7 @@ Regras para segments:
             if delay:
                 await asyncio.sleep(delay)
             try:
-                return self._transcribe_whisper(audio_path, language)
+                return await self._run_whisper(audio_path, language)
             except openai.RateLimitError as e:
                 last_exc = e
                 next_delay_msg = (
@@ -926,6 +1040,12 @@ Regras para segments:
                     )
                 else:
                     raise  # 4xx = bug de input, não vale retry
+            except (asyncio.TimeoutError, openai.APIConnectionError) as e:
+                last_exc = e
+                logger.warning(
+                    "Whisper timeout/conexão (tentativa %d/3): %s",
+                    attempt + 1, str(e)[:100] or type(e).__name__,
+                )
             except Exception:
                 raise  # erros inesperados propagam direto
 
@@ -938,15 +1058,10 @@ Regras para segments:
     # ==========================================
 
     def _get_diarization_pipeline(self):
-        """Lazy-load pyannote pipeline (heavy, ~1GB model)."""
+        """Lazy-load pyannote pipeline no processo (fallback sem pool, ~1GB model)."""
         if self._diarization_pipeline is None:
             try:
-                from pyannote.audio import Pipeline
-
-                self._diarization_pipeline = Pipeline.from_pretrained(
-                    "pyannote/speaker-diarization-3.1",
-                    use_auth_token=self.hf_token,
-                )
+                self._diarization_pipeline = load_pipeline(self.hf_token)
                 logger.info("pyannote pipeline carregado com sucesso")
             except ImportError:
                 logger.error("pyannote.audio não instalado — pip install pyannote.audio")
@@ -959,26 +1074,83 @@ Regras para segments:
     def _diarize_speakers(
         self, audio_path: Path, expected_speakers: int | None = None
     ) -> list[dict]:
-        """Identifica speakers com pyannote.audio."""
-        pipeline = self._get_diarization_pipeline()
-
-        # Parâmetros opcionais
-        kwargs = {}
-        if expected_speakers:
-            kwargs["num_speakers"] = expected_speakers
+        """Identifica speakers com pyannote.audio (síncrono, no processo)."""
+        return diarize_with(self._get_diarization_pipeline(), str(audio_path), expected_speakers)
+
+    def _get_diarization_pool(self) -> DiarizationWorkerPool | None:
+        """Lazy init do pool de diarização (None quando diarization_pool_size=0)."""
+        if self.diarization_pool_size <= 0:
+            return None
+        if self._diarization_pool is None:
+            settings = get_settings()
+            self._diarization_pool = DiarizationWorkerPool(
+                size=self.diarization_pool_size,
+                queue_size=settings.diarization_pool_queue_size,
+                job_timeout=self.diarization_timeout,
+                factory_args=(self.hf_token, self.diarization_pool_size),
+            )
+        return self._diarization_pool
 
-        diarization = pipeline(str(audio_path), **kwargs)
+    async def _diarize_async(
+        self, audio_path: Path, expected_speakers: int | None = None
+    ) -> list[dict]:
+        """Diarização fora do event loop: pool de processos ou, sem pool, uma thread."""
+        pool = self._get_diarization_pool()
+        if pool is None:
+            return await asyncio.to_thread(self._diarize_speakers, audio_path, expected_speakers)
+        timeout = await self._diarization_timeout(audio_path)
+        logger.info(
+            "Diarizando no pool | file=%s | busy=%d waiting=%d | timeout=%.0fs",
+            audio_path.name, pool.busy, pool.waiting, timeout,
+        )
+        return await pool.diarize(audio_path, expected_speakers, timeout=timeout)
 
-        # Extrair segmentos por speaker
-        speaker_segments = []
-        for turn, _, speaker in diarization.itertracks(yield_label=True):
-            speaker_segments.append({
-                "start": turn.start,
-                "end": turn.end,
-                "speaker": speaker,
-            })
+    async def _diarization_timeout(self, audio_path: Path) -> float:
+        """Timeout base + fator por segundo de áudio (audiências longas levam mais)."""
+        try:
+            info = await asyncio.to_thread(audio_segmenter.probe, audio_path)
+            duration = info.duration
+        except Exception as e:  # noqa: BLE001 — sem ffprobe/duração: só a base
+            logger.warning("Duração do áudio indisponível para o timeout da diarização: %s", e)
+            duration = 0.0
+        return self.diarization_timeout + self.diarization_timeout_per_second * duration
+
+    def _start_diarization(
+        self, audio_path: Path, diarize: bool, expected_speakers: int | None
+    ) -> "asyncio.Task[list[dict]] | None":
+        """
+        Dispara a diarização em paralelo à transcrição (None se desabilitada).
+        O arquivo precisa existir até `_collect_diarization` (ou o cancelamento).
+        """
+        if not (diarize and self.diarization_enabled and self.hf_token):
+            return None
+        logger.info("Diarizando speakers com pyannote | expected=%s", expected_speakers)
+        return asyncio.create_task(self._diarize_async(audio_path, expected_speakers))
 
-        return speaker_segments
+    @staticmethod
+    async def _collect_diarization(task: "asyncio.Task[list[dict]] | None") -> list[dict] | None:
+        """Aguarda a diarização; falha, timeout ou fila cheia → segue sem speakers."""
+        if task is None:
+            return None
+        try:
+            return await task
+        except Exception as e:
+            logger.warning("Diarização falhou (continuando sem speakers): %s", e)
+            return None
+
+    def warm_up_diarization(self) -> None:
+        """Sobe os workers de diarização (carregam o pyannote) antes do 1º job."""
+        if self.diarization_enabled and self.hf_token:
+            pool = self._get_diarization_pool()
+            if pool is not None:
+                pool.start()
+
+    def shutdown(self) -> None:
+        """Encerra o pool de diarização e o executor do Whisper."""
+        if self._diarization_pool is not None:
+            self._diarization_pool.shutdown()
+            self._diarization_pool = None
+        self._whisper_executor.shutdown(wait=False, cancel_futures=True)
 
     # ==========================================
     # INTERNAL: Merge transcription + speakers
@@ -994,35 +1166,16 @@ Regras para segments:
         Resultado: cada segmento tem texto + speaker identificado.
         """
         segments = whisper_result.get("segments", [])
-        unique_speakers = set()
 
         if speakers_result and segments:
-            # Para cada segmento Whisper, encontrar o speaker dominante
-            for seg in segments:
-                seg_start = seg["start"]
-                seg_end = seg["end"]
-
-                # Encontrar speaker ativo no ponto médio do segmento
-                best_speaker = "SPEAKER_0"
-                best_overlap = 0
-
-                for sp in speakers_result:
-                    # Calcular overlap entre segmento e speaker turn
-                    overlap_start = max(seg_start, sp["start"])
-                    overlap_end = min(seg_end, sp["end"])
-                    overlap = max(0, overlap_end - overlap_start)
-
-                    if overlap > best_overlap:
-                        best_overlap = overlap
-                        best_speaker = sp["speaker"]
-
-                seg["speaker"] = best_speaker
-                unique_speakers.add(best_speaker)
+            # Speaker dominante por segmento (varredura ordenada), dividindo
+            # segmentos com troca de speaker no meio
+            segments = assign_speakers(segments, speakers_result, self.split_min_seconds)
         else:
             # Sem diarização — todos os segmentos são SPEAKER_0
             for seg in segments:
-                seg["speaker"] = "SPEAKER_0"
-                unique_speakers.add("SPEAKER_0")
+                seg["speaker"] = DEFAULT_SPEAKER
+        unique_speakers = {seg["speaker"] for seg in segments}
 
         # Formatar transcrição completa com speakers
         formatted_lines = []
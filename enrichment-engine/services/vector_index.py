@@ -0,0 +1,445 @@
+"""
+Vector Index — Índice ANN local (NumPy) particionado por assistido_id.
+
+Fast path da busca semântica "dentro do dossiê": cada partição mantém em
+memória os vetores normalizados de um assistido e responde top-k filtrado
+sem round trip ao pgvector. Partições pequenas usam busca exata (um matmul);
+a partir de vector_index_ivf_min_rows, um IVF (centróides k-means + nprobe
+listas) restringe os candidatos. Cada partição também mantém um índice BM25
+do texto dos chunks para busca híbrida (vetor + texto fundidos por RRF).
+
+Sincronização incremental com a tabela embeddings: cada refresh relê só os
+metadados leves da partição; vetores e textos são buscados apenas para ids
+novos e ids que sumiram saem da partição.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from config import get_settings
+from services.text_search import BM25Index, reciprocal_rank_fusion, term_frequencies
+
+logger = logging.getLogger("enrichment-engine.vector-index")
+
+_PAGE_SIZE = 1000
+_LIGHT_COLUMNS = "id, entity_type, entity_id, assistido_id, processo_id, chunk_index, metadata"
+_ROW_KEYS = (
+    "id", "entity_type", "entity_id", "assistido_id",
+    "processo_id", "chunk_index", "content_text", "metadata",
+)
+
+
+def _parse_vector(value) -> np.ndarray:
+    """pgvector chega via PostgREST como string '[0.1,...]' ou lista."""
+    if isinstance(value, str):
+        value = json.loads(value)
+    return np.asarray(value, dtype=np.float32)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _train_ivf(
+    vectors: np.ndarray, nlist: int, iterations: int = 8, seed: int = 0
+) -> tuple[np.ndarray, np.ndarray]:
+    """K-means esférico: retorna (centróides, lista de cada vetor)."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        filled = np.bincount(assignments, minlength=nlist) > 0
+        centroids[filled] = _normalize(sums[filled])
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+
+@dataclass
+class _Partition:
+    """Vetores + metadados de um assistido (linhas alinhadas por posição)."""
+    ids: np.ndarray  # int64 (n,)
+    vectors: np.ndarray  # float32 (n, d), normalizados
+    rows: list[dict]  # colunas de _ROW_KEYS, sem embedding
+    processo_ids: np.ndarray  # int64, -1 = sem processo
+    entity_types: np.ndarray  # object (n,)
+    term_freqs: list[dict[str, int]]  # tokens BM25 por linha (reaproveitados no sync)
+    bm25: BM25Index
+    centroids: Optional[np.ndarray] = None
+    assignments: Optional[np.ndarray] = None
+    text_bytes: int = 0
+    synced_at: float = 0.0
+    stale: bool = False
+
+    @classmethod
+    def build(
+        cls,
+        rows: list[dict],
+        vectors: list[np.ndarray],
+        dimensions: int,
+        ivf_min_rows: int,
+        term_freqs: Optional[list[dict[str, int]]] = None,
+    ) -> "_Partition":
+        matrix = (
+            _normalize(np.vstack(vectors).astype(np.float32))
+            if vectors else np.zeros((0, dimensions), dtype=np.float32)
+        )
+        if term_freqs is None:
+            term_freqs = [term_frequencies(r.get("content_text") or "") for r in rows]
+        partition = cls(
+            ids=np.array([r["id"] for r in rows], dtype=np.int64),
+            vectors=matrix,
+            rows=rows,
+            processo_ids=np.array(
+                [r["processo_id"] if r.get("processo_id") is not None else -1 for r in rows],
+                dtype=np.int64,
+            ),
+            entity_types=np.array([r.get("entity_type") for r in rows], dtype=object),
+            term_freqs=term_freqs,
+            bm25=BM25Index(term_freqs),
+            text_bytes=sum(len(r.get("content_text") or "") for r in rows),
+            synced_at=time.monotonic(),
+        )
+        if len(rows) >= ivf_min_rows:
+            nlist = max(1, int(np.sqrt(len(rows))))
+            partition.centroids, partition.assignments = _train_ivf(matrix, nlist)
+        return partition
+
+    @property
+    def nbytes(self) -> int:
+        """Estimativa do tamanho em memória (vetores + arrays + texto dos chunks)."""
+        arrays = self.vectors.nbytes + self.ids.nbytes + self.processo_ids.nbytes
+        return int(arrays + self.text_bytes)
+
+
+class VectorIndex:
+    """Índice vetorial em memória, uma partição por assistido (LRU)."""
+
+    def __init__(
+        self,
+        dimensions: int = 768,
+        max_partitions: int = 256,
+        max_bytes: int = 1024 * 1024 * 1024,
+        refresh_seconds: float = 60.0,
+        ivf_min_rows: int = 20_000,
+        nprobe: int = 8,
+    ):
+        self.dimensions = dimensions
+        self.max_partitions = max_partitions
+        self.max_bytes = max_bytes
+        self.refresh_seconds = refresh_seconds
+        self.ivf_min_rows = ivf_min_rows
+        self.nprobe = nprobe
+        # Lido e escrito só no event loop; as threads de sync só constroem partições
+        self._partitions: OrderedDict[int, _Partition] = OrderedDict()
+        self._bytes = 0
+        self._oversized: dict[int, float] = {}  # assistido → monotonic da última recusa
+        self._locks: dict[int, asyncio.Lock] = {}
+        self.searches = 0
+        self.syncs = 0
+
+    # ------------------------------------------------------------------
+    # Carga / sincronização
+    # ------------------------------------------------------------------
+
+    def load(self, assistido_id: int, rows: list[dict]) -> None:
+        """Substitui a partição a partir de linhas completas (com embedding)."""
+        kept_rows, vectors = [], []
+        for row in rows:
+            vector = _parse_vector(row["embedding"])
+            if vector.shape != (self.dimensions,):
+                continue
+            kept_rows.append({k: row.get(k) for k in _ROW_KEYS})
+            vectors.append(vector)
+        self._store(assistido_id, _Partition.build(kept_rows, vectors, self.dimensions, self.ivf_min_rows))
+
+    def _store(self, assistido_id: int, partition: _Partition) -> None:
+        """Guarda a partição (LRU por quantidade e por bytes). Só no event loop."""
+        previous = self._partitions.pop(assistido_id, None)
+        if previous is not None:
+            self._bytes -= previous.nbytes
+        if partition.nbytes > self.max_bytes:
+            self._reject_oversized(assistido_id, partition.nbytes)
+            return
+        self._partitions[assistido_id] = partition
+        self._bytes += partition.nbytes
+        while len(self._partitions) > self.max_partitions or self._bytes > self.max_bytes:
+            evicted, evicted_partition = self._partitions.popitem(last=False)
+            self._bytes -= evicted_partition.nbytes
+            self._locks.pop(evicted, None)
+
+    def _reject_oversized(self, assistido_id: int, nbytes: int) -> None:
+        """Partição maior que o cache inteiro: fica no RPC até o próximo refresh."""
+        self._oversized[assistido_id] = time.monotonic()
+        logger.warning(
+            "Vector index partition for assistido %d too large (%.0fMB > %.0fMB) — using RPC",
+            assistido_id, nbytes / 1024 / 1024, self.max_bytes / 1024 / 1024,
+        )
+
+    def mark_stale(self, assistido_id: Optional[int]) -> None:
+        """Força resync na próxima busca (chamado após escrita de embeddings)."""
+        partition = self._partitions.get(assistido_id) if assistido_id is not None else None
+        if partition is not None:
+            partition.stale = True
+
+    def is_fresh(self, assistido_id: int) -> bool:
+        partition = self._partitions.get(assistido_id)
+        return (
+            partition is not None
+            and not partition.stale
+            and time.monotonic() - partition.synced_at < self.refresh_seconds
+        )
+
+    async def ensure_partition(self, supabase, assistido_id: int) -> None:
+        """Carrega ou atualiza incrementalmente a partição do assistido."""
+        if self.is_fresh(assistido_id):
+            self._partitions.move_to_end(assistido_id)
+            return
+        rejected_at = self._oversized.get(assistido_id)
+        if rejected_at is not None and time.monotonic() - rejected_at < self.refresh_seconds:
+            return
+        lock = self._locks.setdefault(assistido_id, asyncio.Lock())
+        async with lock:
+            if self.is_fresh(assistido_id):
+                return
+            # A thread recebe a partição atual e devolve a nova; o OrderedDict
+            # só é alterado aqui, no event loop
+            current = self._partitions.get(assistido_id)
+            partition = await asyncio.to_thread(self._sync_partition, supabase, assistido_id, current)
+            self.syncs += 1
+            if partition is None:  # grande demais para o cache
+                removed = self._partitions.pop(assistido_id, None)
+                if removed is not None:
+                    self._bytes -= removed.nbytes
+                self._oversized[assistido_id] = time.monotonic()
+                return
+            self._oversized.pop(assistido_id, None)
+            self._store(assistido_id, partition)
+
+    def _sync_partition(
+        self, supabase, assistido_id: int, current: Optional[_Partition]
+    ) -> Optional[_Partition]:
+        """Monta a partição atualizada (roda numa thread; não toca em self._partitions)."""
+        light = self._fetch_light_rows(supabase, assistido_id)
+        # Estimativa pelos vetores antes de baixá-los: partição grande demais nem é buscada
+        estimated = len(light) * self.dimensions * 4
+        if estimated > self.max_bytes:
+            logger.warning(
+                "Vector index partition for assistido %d too large (%d rows, ~%.0fMB) — using RPC",
+                assistido_id, len(light), estimated / 1024 / 1024,
+            )
+            return None
+        known: dict[int, int] = (
+            {int(row_id): pos for pos, row_id in enumerate(current.ids)} if current else {}
+        )
+
+        new_ids = [r["id"] for r in light if r["id"] not in known]
+        fetched = self._fetch_full_rows(supabase, new_ids)
+
+        rows, vectors, term_freqs = [], [], []
+        for row in light:
+            if row["id"] in known:
+                pos = known[row["id"]]
+                content_text = current.rows[pos]["content_text"]
+                vector = current.vectors[pos]
+                tf = current.term_freqs[pos]
+            elif row["id"] in fetched:
+                full = fetched[row["id"]]
+                content_text = full.get("content_text")
+                vector = _parse_vector(full["embedding"])
+                if vector.shape != (self.dimensions,):
+                    continue
+                tf = term_frequencies(content_text or "")
+            else:
+                continue  # removida entre as duas leituras
+            rows.append({**{k: row.get(k) for k in _ROW_KEYS}, "content_text": content_text})
+            vectors.append(vector)
+            term_freqs.append(tf)
+
+        partition = _Partition.build(rows, vectors, self.dimensions, self.ivf_min_rows, term_freqs)
+        logger.info(
+            "Vector index sync assistido %d | rows=%d fetched=%d removed=%d",
+            assistido_id,
+            len(rows),
+            len(fetched),
+            len(known) - (len(rows) - len(fetched)),
+        )
+        return partition
+
+    @staticmethod
+    def _fetch_light_rows(supabase, assistido_id: int) -> list[dict]:
+        rows: list[dict] = []
+        start = 0
+        while True:
+            page = (
+                supabase.table("embeddings")
+                .select(_LIGHT_COLUMNS)
+                .eq("assistido_id", assistido_id)
+                .order("id")
+                .range(start, start + _PAGE_SIZE - 1)
+                .execute()
+            ).data or []
+            rows.extend(page)
+            if len(page) < _PAGE_SIZE:
+                return rows
+            start += _PAGE_SIZE
+
+    @staticmethod
+    def _fetch_full_rows(supabase, ids: list[int]) -> dict[int, dict]:
+        fetched: dict[int, dict] = {}
+        for start in range(0, len(ids), _PAGE_SIZE):
+            page = (
+                supabase.table("embeddings")
+                .select("id, content_text, embedding")
+                .in_("id", ids[start:start + _PAGE_SIZE])
+                .execute()
+            ).data or []
+            fetched.update({r["id"]: r for r in page})
+        return fetched
+
+    # ------------------------------------------------------------------
+    # Busca
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _filter_mask(
+        partition: _Partition, processo_id: Optional[int], entity_types: Optional[list[str]]
+    ) -> np.ndarray:
+        mask = np.ones(len(partition.ids), dtype=bool)
+        if processo_id is not None:
+            mask &= partition.processo_ids == processo_id
+        if entity_types:
+            mask &= np.isin(partition.entity_types, list(entity_types))
+        return mask
+
+    def _vector_rank(
+        self, partition: _Partition, mask: np.ndarray, query: np.ndarray, k: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Top-k (posições, scores de cosseno) entre as linhas do mask."""
+        # IVF só quando o filtro ainda deixa muitos candidatos
+        if partition.centroids is not None and mask.sum() >= self.ivf_min_rows:
+            probe = np.argsort(-(partition.centroids @ query))[: self.nprobe]
+            mask = mask & np.isin(partition.assignments, probe)
+
+        candidates = np.flatnonzero(mask)
+        if len(candidates) == 0 or k <= 0:
+            return candidates, np.zeros(0, dtype=np.float32)
+        scores = partition.vectors[candidates] @ query
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return candidates[top], scores[top]
+
+    def search(
+        self,
+        assistido_id: int,
+        query_embedding: list[float],
+        limit: int = 20,
+        processo_id: Optional[int] = None,
+        entity_types: Optional[list[str]] = None,
+    ) -> Optional[list[dict]]:
+        """
+        Top-k por similaridade de cosseno dentro da partição.
+        Retorna None se a partição não está carregada (caller usa o RPC).
+        """
+        partition = self._partitions.get(assistido_id)
+        if partition is None:
+            return None
+        self.searches += 1
+
+        mask = self._filter_mask(partition, processo_id, entity_types)
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        positions, scores = self._vector_rank(partition, mask, query, limit)
+        return [
+            {**partition.rows[pos], "score": float(score)}
+            for pos, score in zip(positions, scores)
+        ]
+
+    def hybrid_search(
+        self,
+        assistido_id: int,
+        query_text: str,
+        query_embedding: list[float],
+        limit: int = 20,
+        processo_id: Optional[int] = None,
+        entity_types: Optional[list[str]] = None,
+        vector_weight: float = 1.0,
+        text_weight: float = 1.0,
+        rrf_k: int = 60,
+        depth: int = 50,
+    ) -> Optional[list[dict]]:
+        """
+        Busca híbrida: top-`depth` vetorial e top-`depth` BM25 (mesmos filtros)
+        fundidos por reciprocal rank fusion. `score` é o score RRF; os scores
+        de origem vêm em vector_score / text_score.
+        """
+        partition = self._partitions.get(assistido_id)
+        if partition is None:
+            return None
+        self.searches += 1
+
+        depth = max(depth, limit)
+        mask = self._filter_mask(partition, processo_id, entity_types)
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        vec_positions, vec_scores = self._vector_rank(partition, mask, query, depth)
+
+        bm25 = np.where(mask, partition.bm25.scores(query_text), 0.0)
+        matched = np.flatnonzero(bm25 > 0)
+        text_positions = matched[np.argsort(-bm25[matched], kind="stable")][:depth]
+
+        fused = reciprocal_rank_fusion(
+            [vec_positions.tolist(), text_positions.tolist()],
+            weights=[vector_weight, text_weight],
+            k=rrf_k,
+        )[:limit]
+        vector_scores = dict(zip(vec_positions.tolist(), vec_scores.tolist()))
+        return [
+            {
+                **partition.rows[pos],
+                "score": score,
+                "vector_score": vector_scores.get(pos),
+                "text_score": float(bm25[pos]),
+            }
+            for pos, score in fused
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "partitions": len(self._partitions),
+            "rows": sum(len(p.ids) for p in self._partitions.values()),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ivf_partitions": sum(1 for p in self._partitions.values() if p.centroids is not None),
+            "searches": self.searches,
+            "syncs": self.syncs,
+        }
+
+
+# Singleton
+_vector_index: VectorIndex | None = None
+
+
+def get_vector_index() -> VectorIndex:
+    """Retorna singleton do VectorIndex."""
+    global _vector_index
+    if _vector_index is None:
+        settings = get_settings()
+        _vector_index = VectorIndex(
+            dimensions=settings.embedding_dimensions,
+            max_partitions=settings.vector_index_max_partitions,
+            max_bytes=settings.vector_index_max_mb * 1024 * 1024,
+            refresh_seconds=settings.vector_index_refresh_seconds,
+            ivf_min_rows=settings.vector_index_ivf_min_rows,
+            nprobe=settings.vector_index_nprobe,
+        )
+    return _vector_index
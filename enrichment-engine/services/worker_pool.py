@@ -0,0 +1,230 @@
+"""
+Worker Pool — Processos dedicados com modelos pré-carregados, fora do event loop.
+
+Cada worker é um processo (spawn) que chama a factory uma única vez — o
+modelo pesado fica quente — e recebe jobs por um Pipe próprio. Um worker que
+estoura o timeout (ou cujo job é cancelado) é morto e substituído sem afetar
+os demais. Fila limitada: com todos ocupados e a fila cheia, `admit` falha
+rápido em vez de acumular trabalho. A espera pela resposta (Pipe.recv,
+bloqueante) roda num executor próprio do pool, com uma thread por worker —
+jobs longos não seguram threads do executor padrão do loop.
+
+Usado pelo parsing Docling (services.docling_pool) e pela diarização pyannote
+(services.diarization_pool).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+logger = logging.getLogger("enrichment-engine.worker-pool")
+
+HandlerFactory = Callable[..., Callable[..., Any]]
+
+
+class WorkerPoolFullError(RuntimeError):
+    """Fila do pool cheia — o chamador deve tentar novamente mais tarde."""
+
+
+def _worker_main(conn, handler_factory: HandlerFactory, factory_args: tuple) -> None:
+    """Loop do processo worker: recebe a tupla de args do job, devolve ("ok"|"error", payload)."""
+    handler = None
+    init_error = ""
+    try:
+        handler = handler_factory(*factory_args)
+    except Exception as e:  # noqa: BLE001 — reportado a cada job
+        init_error = f"worker init failed: {type(e).__name__}: {e}"
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+        if handler is None:
+            conn.send(("error", init_error))
+            continue
+        try:
+            conn.send(("ok", handler(*job)))
+        except Exception as e:  # noqa: BLE001
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+@dataclass
+class _Worker:
+    process: Any
+    conn: Any
+    jobs_done: int = field(default=0)
+
+
+class ProcessWorkerPool:
+    """Pool de processos com handlers pré-carregados, timeout e backpressure."""
+
+    name = "worker"
+    job_label = "Job"  # prefixo das mensagens de erro
+    full_error: type[WorkerPoolFullError] = WorkerPoolFullError
+
+    def __init__(
+        self,
+        size: int,
+        queue_size: int,
+        job_timeout: float,
+        handler_factory: HandlerFactory,
+        factory_args: tuple = (),
+    ):
+        self.size = max(1, size)
+        self.queue_size = max(0, queue_size)
+        self.job_timeout = job_timeout
+        self._handler_factory = handler_factory
+        self._factory_args = factory_args
+        # spawn: torch/docling/pyannote não são fork-safe
+        self._ctx = mp.get_context("spawn")
+        self._workers: list[_Worker] = []
+        self._idle: asyncio.Queue[_Worker] | None = None
+        self._recv_executor: ThreadPoolExecutor | None = None
+        self._waiting = 0
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = self._ctx.Pipe(duplex=True)
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self._handler_factory, self._factory_args),
+            daemon=True,
+            name=f"{self.name}-worker",
+        )
+        process.start()
+        child_conn.close()
+        worker = _Worker(process=process, conn=parent_conn)
+        self._workers.append(worker)
+        logger.info("%s worker started | pid=%s", self.name, process.pid)
+        return worker
+
+    def start(self) -> None:
+        """Sobe os workers (idempotente) — cada um já carrega o modelo ao iniciar."""
+        if self._idle is not None:
+            return
+        self._idle = asyncio.Queue()
+        # Um recv em andamento por worker ocupado, no máximo
+        self._recv_executor = ThreadPoolExecutor(
+            max_workers=self.size, thread_name_prefix=f"{self.name}-recv",
+        )
+        for _ in range(self.size):
+            self._idle.put_nowait(self._spawn())
+
+    def _kill(self, worker: _Worker) -> None:
+        """Remove o worker e manda SIGKILL (não bloqueia)."""
+        if worker in self._workers:
+            self._workers.remove(worker)
+        if worker.process.is_alive():
+            worker.process.kill()
+
+    @staticmethod
+    def _reap(worker: _Worker) -> None:
+        """Aguarda o processo morto e fecha o Pipe (bloqueante — fora do event loop)."""
+        worker.process.join(timeout=5)
+        worker.conn.close()
+
+    async def _replace(self, worker: _Worker) -> None:
+        """Mata um worker travado/morto e coloca um novo no lugar."""
+        self._kill(worker)
+        if self._idle is not None:
+            self._idle.put_nowait(self._spawn())
+        # O substituto já está na fila: um novo cancelamento aqui não encolhe o pool
+        await asyncio.to_thread(self._reap, worker)
+
+    @property
+    def busy(self) -> int:
+        idle = self._idle.qsize() if self._idle is not None else 0
+        return len(self._workers) - idle
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    def admit(self) -> None:
+        """Backpressure: falha rápido se todos os workers estão ocupados e a fila cheia."""
+        self.start()
+        assert self._idle is not None
+        if self._idle.empty() and self._waiting >= self.queue_size:
+            raise self.full_error(
+                f"{self.name} pool saturated: {self.busy} busy, {self._waiting} waiting"
+            )
+
+    async def submit(
+        self, job: tuple, admitted: bool = False, timeout: float | None = None
+    ) -> Any:
+        """
+        Envia `job` (args do handler) para um worker livre e aguarda o resultado.
+        `admitted=True` pula a checagem de fila (job já admitido pelo chamador);
+        `timeout` substitui `job_timeout` neste job (conta só após o envio).
+
+        Raises:
+            WorkerPoolFullError: todos os workers ocupados e fila cheia.
+            RuntimeError: timeout, worker morto ou falha do handler.
+        """
+        if not admitted:
+            self.admit()
+        assert self._idle is not None
+
+        self._waiting += 1
+        try:
+            worker = await self._idle.get()
+        finally:
+            self._waiting -= 1
+
+        loop = asyncio.get_running_loop()
+        job_timeout = self.job_timeout if timeout is None else timeout
+        try:
+            worker.conn.send(job)
+            status, payload = await asyncio.wait_for(
+                loop.run_in_executor(self._recv_executor, worker.conn.recv),
+                timeout=job_timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.error(
+                "%s job timed out after %ss — killing worker pid=%s",
+                self.name,
+                job_timeout,
+                worker.process.pid,
+            )
+            await self._replace(worker)
+            raise RuntimeError(
+                f"{self.job_label} timed out after {job_timeout:g}s"
+            ) from None
+        except asyncio.CancelledError:
+            await self._replace(worker)
+            raise
+        except (EOFError, OSError) as e:
+            logger.error("%s worker pid=%s died: %s", self.name, worker.process.pid, e)
+            await self._replace(worker)
+            raise RuntimeError(f"{self.job_label} worker crashed: {e}") from e
+
+        worker.jobs_done += 1
+        self._idle.put_nowait(worker)
+
+        if status != "ok":
+            raise RuntimeError(f"{self.job_label} failed: {payload}")
+        return payload
+
+    def shutdown(self) -> None:
+        """Encerra todos os workers (graceful, com kill após timeout)."""
+        for worker in list(self._workers):
+            try:
+                worker.conn.send(None)
+            except (OSError, ValueError):
+                pass
+        for worker in list(self._workers):
+            worker.process.join(timeout=5)
+            self._kill(worker)
+            self._reap(worker)
+        self._workers.clear()
+        self._idle = None
+        if self._recv_executor is not None:
+            self._recv_executor.shutdown(wait=False, cancel_futures=True)
+            self._recv_executor = None
+        logger.info("%s worker pool shut down", self.name)
@@ -0,0 +1,140 @@
+"""
+Testes do segmentador de áudio via ffmpeg.
+Comandos verificados com subprocess mockado; o teste de ponta a ponta só
+roda onde o ffmpeg está instalado (imagem Docker).
+"""
+import json
+import shutil
+import subprocess
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from services import audio_segmenter
+from services.audio_segmenter import (
+    FRAME_SECONDS,
+    AudioInfo,
+    ChunkPlan,
+    chunk_seconds_for,
+    find_silences,
+    plan_chunks,
+    probe,
+    segment_audio,
+)
+
+PROBE_JSON = {
+    "streams": [{"codec_name": "aac", "channels": 2, "sample_rate": "48000", "bit_rate": "128000"}],
+    "format": {"duration": "14400.52", "bit_rate": "2500000"},
+}
+
+
+def _done(cmd, stdout=""):
+    return subprocess.CompletedProcess(cmd, 0, stdout=stdout, stderr="")
+
+
+def test_probe_reads_container_metadata():
+    with patch("services.audio_segmenter.subprocess.run", return_value=_done([], json.dumps(PROBE_JSON))) as run:
+        info = probe(Path("audiencia.mp4"))
+
+    assert info == AudioInfo(duration=14400.52, codec="aac", channels=2, sample_rate=48000, bit_rate=128000)
+    assert run.call_args.args[0][0] == "ffprobe"
+
+
+@pytest.mark.parametrize("info,copy", [
+    (AudioInfo(3000.0, "mp3", 1, 16000, 32000), True),
+    (AudioInfo(3000.0, "aac", 2, 48000, 128000), False),
+])
+def test_segment_writes_overlapping_chunks_in_one_pass(tmp_path, info, copy):
+    plans = [ChunkPlan(0, 0.0, 1502.0, 0.0, 1500.0), ChunkPlan(1, 1498.0, 3000.0, 1500.0, 3000.0)]
+    with patch("services.audio_segmenter.subprocess.run", return_value=_done([])) as run:
+        chunks = segment_audio(tmp_path / "in.mp3", tmp_path / "out", plans, info)
+
+    [call] = run.call_args_list
+    cmd = call.args[0]
+    assert cmd.count("-i") == 1 and cmd.count("-ss") == 2
+    assert cmd[cmd.index("-ss") + 1: cmd.index("-ss") + 4] == ["0.000", "-t", "1502.000"]
+    assert ("copy" in cmd) is copy
+    if not copy:
+        assert cmd[cmd.index("-ar") + 1] == "16000" and cmd[cmd.index("-b:a") + 1] == "32k"
+    assert [(c.offset, c.own_start, c.own_end) for c in chunks] == [(0.0, 0.0, 1500.0), (1498.0, 1500.0, 3000.0)]
+    assert chunks[1].path == tmp_path / "out" / "chunk_0001.mp3"
+
+
+def _speech_with_pause(seconds, pause_at, pause_len=0.6):
+    """Energia sintética: fala ~60dB com ruído, pausa ~20dB."""
+    rng = np.random.default_rng(0)
+    frames = int(seconds / FRAME_SECONDS)
+    energies = 60 + rng.normal(0, 3, frames)
+    start = round(pause_at / FRAME_SECONDS)
+    energies[start:start + round(pause_len / FRAME_SECONDS)] = 20
+    return energies
+
+
+def test_find_silences_locates_pauses():
+    silences = find_silences(_speech_with_pause(120, pause_at=70.0))
+    assert len(silences) == 1
+    assert silences[0] == pytest.approx((70.0, 70.6))
+
+
+def test_chunk_size_adapts_to_duration_and_rate_limit():
+    # 3h com 12 requisições simultâneas: uma leva de 15min
+    assert chunk_seconds_for(10800, 12, 50, 300, 1200) == 900
+    # Pouca concorrência: limitado a 20min
+    assert chunk_seconds_for(10800, 3, 50, 300, 1200) == 1200
+    # RPM baixo: no máximo rpm/2 chunks
+    assert chunk_seconds_for(3000, 50, 10, 60, 1200) == 600
+    assert chunk_seconds_for(600, 12, 50, 300, 1200) == 300
+
+
+def test_plan_snaps_cuts_to_silence_and_overlaps_forced_ones():
+    windows = []
+
+    def energies(src, start, duration):
+        windows.append(start)
+        if len(windows) == 1:
+            return _speech_with_pause(duration, pause_at=1000.0 - start)  # pausa perto de 1000s
+        return 60 + np.zeros(int(duration / FRAME_SECONDS))  # fala contínua, sem pausa
+
+    with patch("services.audio_segmenter.frame_energies", side_effect=energies):
+        plans = plan_chunks(Path("a.mp3"), 3000.0, 1000.0, overlap=2.0, window=60.0)
+
+    assert windows == [940.0, 1940.0]
+    first, second, third = plans
+    assert first.own_end == pytest.approx(1000.3) and first.end == first.own_end  # silêncio: sem sobreposição
+    assert second.start == second.own_start == first.own_end
+    assert (second.own_end, second.end) == (2000.0, 2002.0)  # corte forçado
+    assert (third.start, third.own_start, third.end) == (1998.0, 2000.0, 3000.0)
+
+
+def test_ffmpeg_errors_surface_as_runtime_error(tmp_path):
+    failed = subprocess.CompletedProcess([], 1, stdout="", stderr="in.mkv: Invalid data found")
+    with patch("services.audio_segmenter.subprocess.run", return_value=failed):
+        with pytest.raises(RuntimeError, match="Invalid data found"):
+            audio_segmenter.extract_audio(tmp_path / "in.mkv", tmp_path / "out.mp3")
+    with patch("services.audio_segmenter.subprocess.run", side_effect=FileNotFoundError):
+        with pytest.raises(RuntimeError, match="não encontrado"):
+            probe(tmp_path / "in.mkv")
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg não instalado")
+def test_extract_plan_and_segment_end_to_end(tmp_path):
+    # 12s de tom, 1s de silêncio, 12s de tom
+    src = tmp_path / "tone.wav"
+    subprocess.run([
+        "ffmpeg", "-v", "error",
+        "-f", "lavfi", "-i", "sine=frequency=440:duration=12",
+        "-f", "lavfi", "-i", "anullsrc=r=44100:cl=mono:d=1",
+        "-f", "lavfi", "-i", "sine=frequency=440:duration=12",
+        "-filter_complex", "[0][1][2]concat=n=3:v=0:a=1", "-ac", "2", str(src),
+    ], check=True)
+    mp3 = audio_segmenter.extract_audio(src, tmp_path / "tone.mp3")
+    info = probe(mp3)
+    assert (info.codec, info.channels, info.sample_rate) == ("mp3", 1, 16000)
+    assert info.duration == pytest.approx(25, abs=0.2)
+
+    plans = plan_chunks(mp3, info.duration, 14.0, overlap=1.0, window=3.0)
+    assert len(plans) == 2 and plans[0].own_end == pytest.approx(12.5, abs=0.3)
+    chunks = segment_audio(mp3, tmp_path / "chunks", plans, info)
+    assert all(c.path.stat().st_size > 0 for c in chunks)
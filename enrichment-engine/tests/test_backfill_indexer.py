@@ -0,0 +1,240 @@
+"""
+Testes do BackfillIndexer e do RateLimiter — Supabase em memória, embeddings fake.
+"""
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from services.backfill_indexer import BackfillCheckpoint, BackfillIndexer, backfill_scope
+from services.embedding_cache import EmbeddingCache
+from services.rate_limiter import RateLimiter, TokenBucket
+
+
+class _FakeQuery:
+    def __init__(self, rows):
+        self._rows = rows
+        self._limit = None
+
+    def select(self, _columns):
+        return self
+
+    def gt(self, column, value):
+        self._rows = [r for r in self._rows if r[column] > value]
+        return self
+
+    @property
+    def not_(self):
+        return self
+
+    def is_(self, column, _null):
+        self._rows = [r for r in self._rows if r.get(column) is not None]
+        return self
+
+    def in_(self, column, values):
+        self._rows = [r for r in self._rows if r[column] in values]
+        return self
+
+    def eq(self, column, value):
+        self._rows = [r for r in self._rows if r.get(column) == value]
+        return self
+
+    def order(self, column):
+        self._rows = sorted(self._rows, key=lambda r: r[column])
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def execute(self):
+        return MagicMock(data=self._rows[: self._limit])
+
+
+class _FakeSupabase:
+    def __init__(self, tables, fail_rpc_on_call=None):
+        self.tables = tables
+        self.rpc_calls = []
+        self._fail_on = fail_rpc_on_call
+
+    def table(self, name):
+        return _FakeQuery(list(self.tables.get(name, [])))
+
+    def rpc(self, name, params):
+        self.rpc_calls.append((name, params))
+        if self._fail_on is not None and len(self.rpc_calls) == self._fail_on:
+            raise RuntimeError("connection reset")
+        return MagicMock(execute=MagicMock(return_value=MagicMock(data=len(params["p_rows"]))))
+
+
+@pytest.fixture(autouse=True)
+def memory_only_cache():
+    with patch(
+        "services.backfill_indexer.get_embedding_cache",
+        return_value=EmbeddingCache(disk=None, memory_items=10_000),
+    ):
+        yield
+
+
+def _embedding_service():
+    svc = MagicMock()
+    svc._embed_uncached = AsyncMock(side_effect=lambda texts: [[float(len(t)), 1.0] for t in texts])
+    return svc
+
+
+def _indexer(supabase, tmp_path, embedding_service, **kwargs):
+    scope = backfill_scope(kwargs.get("assistido_id"))
+    return BackfillIndexer(
+        supabase=supabase,
+        embedding_service=embedding_service,
+        checkpoint=BackfillCheckpoint(tmp_path / "checkpoint.json", scope=scope),
+        limiter=RateLimiter(requests_per_minute=100_000, tokens_per_minute=10_000_000),
+        page_size=2,
+        batch_size=3,
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+async def test_backfill_pages_bulk_writes_and_reports(tmp_path):
+    supabase = _FakeSupabase({
+        "anotacoes": [
+            {"id": i, "assistido_id": 1, "processo_id": 2, "conteudo": f"Anotação número {i} do caso"}
+            for i in range(1, 6)
+        ] + [{"id": 6, "assistido_id": 1, "processo_id": 2, "conteudo": "curta"}],
+        "case_facts": [
+            {"id": 1, "assistido_id": 1, "processo_id": 2, "titulo": "Fato", "descricao": "Réu estava no trabalho"},
+        ],
+    })
+    embedder = _embedding_service()
+    indexer = _indexer(supabase, tmp_path, embedder)
+
+    report = await indexer.run(["anotacoes", "case_facts"])
+
+    names = [name for name, _ in supabase.rpc_calls]
+    assert names == ["replace_embeddings_bulk"] * 4  # 3 páginas de anotações + 1 de fatos
+    first = supabase.rpc_calls[0][1]
+    assert first["p_entity_type"] == "anotacao"
+    assert first["p_entity_ids"] == [1, 2]
+    assert {r["entity_id"] for r in first["p_rows"]} == {1, 2}
+    assert all(r["content_hash"] for r in first["p_rows"])
+
+    assert report["sources"]["anotacoes"]["entities"] == 5
+    assert report["sources"]["anotacoes"]["skipped"] == 1
+    assert report["total"]["chunks"] == 6
+    assert report["total"]["api_errors"] == 0
+    assert report["total"]["chunks_per_s"] > 0
+
+    state = BackfillCheckpoint(tmp_path / "checkpoint.json").state
+    assert state["anotacoes"] == {"last_id": 6, "done": True, "failed_ids": []}
+
+
+@pytest.mark.asyncio
+async def test_backfill_resumes_from_checkpoint_after_crash(tmp_path):
+    tables = {
+        "documentos": [
+            {"id": i, "assistido_id": 1, "processo_id": None, "conteudo_completo": f"Documento {i}\n\nSegundo parágrafo."}
+            for i in range(1, 7)
+        ] + [{"id": 7, "assistido_id": 1, "processo_id": None, "conteudo_completo": None}],
+    }
+    crashing = _FakeSupabase(tables, fail_rpc_on_call=2)
+    with pytest.raises(RuntimeError):
+        await _indexer(crashing, tmp_path, _embedding_service()).run(["documentos"])
+
+    checkpoint = BackfillCheckpoint(tmp_path / "checkpoint.json")
+    assert checkpoint.source("documentos")["last_id"] == 2
+    assert checkpoint.source("documentos")["done"] is False
+
+    resumed = _FakeSupabase(tables)
+    report = await _indexer(resumed, tmp_path, _embedding_service()).run(["documentos"])
+    assert [p["p_entity_ids"] for _, p in resumed.rpc_calls] == [[3, 4], [5, 6]]
+    assert report["sources"]["documentos"]["entities"] == 4
+
+    # Execução seguinte: fonte já concluída no checkpoint
+    again = _FakeSupabase(tables)
+    await _indexer(again, tmp_path, _embedding_service()).run(["documentos"])
+    assert again.rpc_calls == []
+
+
+@pytest.mark.asyncio
+async def test_failed_batches_leave_entity_out_and_are_recorded(tmp_path):
+    supabase = _FakeSupabase({
+        "anotacoes": [
+            {"id": 1, "assistido_id": 1, "processo_id": 2, "conteudo": "Texto que vai falhar no embed"},
+            {"id": 2, "assistido_id": 1, "processo_id": 2, "conteudo": "Texto que funciona normalmente"},
+        ],
+    })
+    embedder = _embedding_service()
+    embedder._embed_uncached = AsyncMock(side_effect=RuntimeError("quota"))
+    indexer = _indexer(supabase, tmp_path, embedder)
+
+    report = await indexer.run(["anotacoes"])
+
+    assert supabase.rpc_calls == []
+    assert report["total"]["api_errors"] == 1
+    assert report["total"]["failed"] == 2
+    assert indexer.checkpoint.source("anotacoes")["failed_ids"] == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_failed_ids_are_retried_on_next_run(tmp_path):
+    tables = {
+        "anotacoes": [
+            {"id": i, "assistido_id": 1, "processo_id": 2, "conteudo": f"Anotação número {i} do caso"}
+            for i in range(1, 5)
+        ],
+    }
+    failing = _embedding_service()
+    failing._embed_uncached = AsyncMock(side_effect=RuntimeError("quota"))
+    await _indexer(_FakeSupabase(tables), tmp_path, failing).run(["anotacoes"])
+    assert BackfillCheckpoint(tmp_path / "checkpoint.json").source("anotacoes")["failed_ids"] == [1, 2, 3, 4]
+
+    # Id 4 foi apagado da tabela entre as execuções
+    tables["anotacoes"] = tables["anotacoes"][:3]
+    supabase = _FakeSupabase(tables)
+    indexer = _indexer(supabase, tmp_path, _embedding_service())
+    report = await indexer.run(["anotacoes"])
+
+    assert [p["p_entity_ids"] for _, p in supabase.rpc_calls] == [[1, 2], [3]]
+    assert report["sources"]["anotacoes"]["entities"] == 3
+    assert indexer.checkpoint.source("anotacoes") == {"last_id": 4, "done": True, "failed_ids": []}
+
+
+def test_token_bucket_reports_wait_for_deficit():
+    now = [0.0]
+    bucket = TokenBucket(rate_per_minute=60, clock=lambda: now[0])  # 1/s, capacidade 60
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(2) == pytest.approx(2.0)
+    now[0] = 5.0
+    assert bucket.reserve(1) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_waits_on_token_budget():
+    now = [0.0]
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=60, clock=lambda: now[0])
+    with patch("services.rate_limiter.asyncio.sleep", new_callable=AsyncMock) as sleep:
+        await limiter.acquire(tokens=60)
+        await limiter.acquire(tokens=30)
+    sleep.assert_awaited_once()
+    assert sleep.await_args.args[0] == pytest.approx(30.0)
+
+
+@pytest.mark.asyncio
+async def test_scoped_checkpoint_is_not_reused_by_full_backfill(tmp_path):
+    tables = {
+        "anotacoes": [
+            {"id": 1, "assistido_id": 42, "processo_id": 2, "conteudo": "Anotação do assistido 42"},
+        ],
+    }
+    await _indexer(_FakeSupabase(tables), tmp_path, _embedding_service(), assistido_id=42).run(["anotacoes"])
+    assert BackfillCheckpoint(tmp_path / "checkpoint.json", scope="assistido-42").state["scope"] == "assistido-42"
+
+    with pytest.raises(ValueError, match="assistido-42"):
+        _indexer(_FakeSupabase(tables), tmp_path, _embedding_service())
+    with pytest.raises(ValueError):
+        BackfillIndexer(
+            supabase=_FakeSupabase(tables),
+            embedding_service=_embedding_service(),
+            checkpoint=BackfillCheckpoint(tmp_path / "full.json"),
+            assistido_id=42,
+        )
@@ -0,0 +1,237 @@
+"""
+Testes do BatchRunner contra um servidor local que imita a Message Batches API.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import anthropic
+import pytest
+
+from services.batch_jobs import AnthropicBatchBackend, BatchItem, BatchRunner
+
+
+class _FakeBatchServer:
+    """POST/GET /v1/messages/batches[/{id}[/results]] em memória."""
+
+    def __init__(self, polls_until_done=2):
+        self.batches: dict[str, dict] = {}
+        self.created = 0
+        self.polls_until_done = polls_until_done
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, payload, content_type="application/json"):
+                body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("content-type", content_type)
+                self.send_header("content-length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["content-length"])))
+                server.created += 1
+                batch_id = f"msgbatch_{server.created}"
+                server.batches[batch_id] = {"requests": body["requests"], "polls": 0}
+                self._send(server.batch_json(batch_id))
+
+            def do_GET(self):
+                parts = self.path.split("?")[0].strip("/").split("/")
+                batch_id = parts[3]
+                if parts[-1] == "results":
+                    self._send(server.results_jsonl(batch_id), "application/binary")
+                else:
+                    server.batches[batch_id]["polls"] += 1
+                    self._send(server.batch_json(batch_id))
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def batch_json(self, batch_id):
+        batch = self.batches[batch_id]
+        ended = batch["polls"] >= self.polls_until_done
+        n = len(batch["requests"])
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0 if ended else n, "succeeded": n if ended else 0,
+                "errored": 0, "canceled": 0, "expired": 0,
+            },
+            "created_at": "2026-10-18T00:00:00Z",
+            "expires_at": "2026-10-19T00:00:00Z",
+            "ended_at": "2026-10-18T01:00:00Z" if ended else None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"{self.base_url}/v1/messages/batches/{batch_id}/results" if ended else None,
+        }
+
+    def results_jsonl(self, batch_id):
+        lines = []
+        for req in self.batches[batch_id]["requests"]:
+            if "bad" in req["custom_id"]:
+                result = {"type": "errored", "error": {"type": "error", "error": {
+                    "type": "invalid_request_error", "message": "prompt too long"}}}
+            else:
+                prompt = req["params"]["messages"][0]["content"]
+                result = {"type": "succeeded", "message": {
+                    "id": "msg_1", "type": "message", "role": "assistant", "model": req["params"]["model"],
+                    "content": [{"type": "text", "text": json.dumps({"echo": prompt})}],
+                    "stop_reason": "end_turn", "stop_sequence": None,
+                    "usage": {"input_tokens": 10, "output_tokens": 5},
+                }}
+            lines.append(json.dumps({"custom_id": req["custom_id"], "result": result}))
+        return ("\n".join(lines) + "\n").encode()
+
+    def close(self):
+        self.httpd.shutdown()
+
+
+@pytest.fixture
+def fake_server():
+    server = _FakeBatchServer()
+    yield server
+    server.close()
+
+
+def _runner(server, tmp_path, **kwargs):
+    client = anthropic.AsyncAnthropic(api_key="test", base_url=server.base_url, max_retries=0)
+    return BatchRunner(AnthropicBatchBackend(client), tmp_path, poll_seconds=0, sleep=AsyncMock(), **kwargs)
+
+
+def _items(*ids):
+    return [
+        BatchItem(i, {"model": "claude-test", "max_tokens": 100, "messages": [{"role": "user", "content": f"texto {i}"}]})
+        for i in ids
+    ]
+
+
+@pytest.mark.asyncio
+async def test_submit_then_resume_polling_and_collect(fake_server, tmp_path):
+    received = []
+
+    async def handler(outcome):
+        received.append((outcome.custom_id, outcome.text, outcome.error))
+
+    first = await _runner(fake_server, tmp_path).run("job", _items("a", "b", "bad-c"), handler, max_wait_seconds=0)
+    assert first["status"] == "in_progress"
+    assert received == []
+
+    # Novo processo: retoma o mesmo lote, sem re-submeter
+    report = await _runner(fake_server, tmp_path).run("job", _items("x"), handler)
+
+    assert fake_server.created == 1
+    assert report["status"] == "done"
+    assert (report["requests"], report["handled"], report["failed"]) == (3, 3, 1)
+    assert received[0] == ("a", json.dumps({"echo": "texto a"}), None)
+    assert received[2][0] == "bad-c" and "prompt too long" in received[2][2]
+
+
+@pytest.mark.asyncio
+async def test_crash_while_collecting_does_not_repeat_handled_results(fake_server, tmp_path):
+    class _Crash(BaseException):
+        pass
+
+    calls = []
+
+    async def crashing(outcome):
+        calls.append(outcome.custom_id)
+        if outcome.custom_id == "b":
+            raise _Crash()
+
+    with pytest.raises(_Crash):
+        await _runner(fake_server, tmp_path).run("job", _items("a", "b", "c"), crashing)
+
+    async def handler(outcome):
+        calls.append(outcome.custom_id)
+
+    report = await _runner(fake_server, tmp_path).run("job", [], handler)
+    assert calls == ["a", "b", "b", "c"]
+    assert report["handled"] == 3
+
+    # Job concluído: a próxima run com itens novos abre outro lote
+    await _runner(fake_server, tmp_path).run("job", _items("d"), handler, max_wait_seconds=0)
+    assert fake_server.created == 2
+
+
+@pytest.mark.asyncio
+async def test_radar_offline_extraction_applies_results(fake_server, tmp_path):
+    from services.radar_extraction_service import RadarExtractionService
+
+    svc = RadarExtractionService()
+    client_db = MagicMock()
+    client_db.table.return_value.select.return_value.eq.return_value.order.return_value.limit.return_value.execute.return_value.data = [
+        {"id": 7, "titulo": "Homem preso", "corpo": "Prisão em flagrante na Gleba A"},
+    ]
+    runner = _runner(fake_server, tmp_path)
+    extracted = {"tipo_crime": "trafico", "bairro": "Gleba A", "circunstancia": "flagrante"}
+
+    with patch("services.claude_service.ClaudeService.is_configured", return_value=True), \
+         patch("services.supabase_service.get_supabase_service") as supa, \
+         patch("services.batch_jobs.get_batch_runner", return_value=runner), \
+         patch("services.claude_service.ClaudeService.parse_json_text", return_value=extracted), \
+         patch.object(svc, "_save_extraction") as save:
+        supa.return_value._get_client.return_value = client_db
+        report = await svc.extract_batch_offline(limit=10)
+
+    assert report["handled"] == 1
+    submitted = fake_server.batches["msgbatch_1"]["requests"][0]
+    assert submitted["custom_id"] == "noticia-7"
+    assert "Gleba A" in submitted["params"]["messages"][0]["content"]
+    noticia, update_data, _ = save.call_args.args
+    assert noticia == {"id": 7}
+    assert update_data["tipo_crime"] == "trafico"
+    assert update_data["circunstancia"] == "flagrante"
+
+    # Marcada como 'batch_submitted' ao submeter; sobras voltam a 'pending' no fim
+    updates = client_db.table.return_value.update
+    statuses = [c.args[0]["enrichment_status"] for c in updates.call_args_list]
+    assert statuses == ["batch_submitted", "pending"]
+    assert updates.return_value.in_.call_args_list[0].args == ("id", [7])
+    assert updates.return_value.in_.return_value.eq.call_args_list[1].args == ("enrichment_status", "batch_submitted")
+
+
+@pytest.mark.asyncio
+async def test_radar_offline_extraction_releases_rows_when_submit_fails(tmp_path):
+    from services.radar_extraction_service import RadarExtractionService
+
+    svc = RadarExtractionService()
+    client_db = MagicMock()
+    client_db.table.return_value.select.return_value.eq.return_value.order.return_value.limit.return_value.execute.return_value.data = [
+        {"id": 7, "titulo": "Homem preso", "corpo": "Prisão em flagrante"},
+    ]
+    backend = MagicMock(provider="anthropic")
+    backend.submit = AsyncMock(side_effect=RuntimeError("overloaded"))
+    runner = BatchRunner(backend, tmp_path, poll_seconds=0, sleep=AsyncMock())
+
+    with patch("services.claude_service.ClaudeService.is_configured", return_value=True), \
+         patch("services.supabase_service.get_supabase_service") as supa, \
+         patch("services.batch_jobs.get_batch_runner", return_value=runner):
+        supa.return_value._get_client.return_value = client_db
+        with pytest.raises(RuntimeError, match="overloaded"):
+            await svc.extract_batch_offline(limit=10)
+
+    updates = client_db.table.return_value.update
+    assert [c.args[0]["enrichment_status"] for c in updates.call_args_list] == ["batch_submitted", "pending"]
+
+
+def test_radar_batch_error_puts_row_back_in_queue():
+    from services.radar_extraction_service import RadarExtractionService
+
+    client_db = MagicMock()
+    client_db.table.return_value.select.return_value.eq.return_value.single.return_value.execute.return_value.data = {
+        "error_count": 0,
+    }
+
+    RadarExtractionService()._increment_error_count(7, "errored: overloaded", client_db, retry_status="pending")
+
+    payload = client_db.table.return_value.update.call_args.args[0]
+    assert payload["enrichment_status"] == "pending"
+    assert payload["error_count"] == 1
@@ -0,0 +1,137 @@
+"""
+Testes do orçamento de contexto da consolidação do caso.
+"""
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services.context_budget import (
+    ContextSection,
+    TokenCounter,
+    build_case_sections,
+    compact_json,
+    fit_sections,
+)
+
+
+class _Counter:
+    """Conta 1 token por caractere, deterministicamente."""
+    exact = False
+
+    def count(self, text):
+        return len(text)
+
+
+DOCUMENTS = [
+    {
+        "nome": "certidao.pdf",
+        "document_type": "certidao",
+        "extracted_data": {"numero_processo": "0001", "observacao": None, "anexos": []},
+        "markdown_preview": "x" * 300,
+    },
+    {
+        "nome": "denuncia.pdf",
+        "document_type": "denuncia",
+        "extracted_data": {
+            "reus": [{"nome": "José da Silva", "qualificacao": "pedreiro"}],
+            "vitimas": ["Maria Souza"],
+            "fatos": ["Furto de celular na Rua A"],
+            "data_documento": "2024-03-01",
+        },
+    },
+    {
+        "nome": "sentenca.pdf",
+        "document_type": "sentenca",
+        "extracted_data": {
+            "reus": [{"nome": "JOSE DA SILVA"}],
+            "fatos": ["furto de celular na rua A.", "Réu confessou em juízo"],
+            "data_sentenca": "2024-09-10",
+        },
+    },
+]
+
+
+def test_compact_json_drops_empty_values_without_indentation():
+    data = {"a": None, "b": "", "c": [], "d": {"e": None}, "f": 0, "g": False, "h": ["", "ok"]}
+    assert compact_json(data) == '{"f":0,"g":false,"h":["ok"]}'
+
+
+def test_persons_and_facts_are_deduplicated_across_documents():
+    sections, stats = build_case_sections(DOCUMENTS, [{"persons_mentioned": ["Maria  Souza"]}], [])
+
+    [pessoas] = [s for s in sections if s.kind == "pessoas"]
+    by_name = {p["nome"]: p for p in pessoas.data}
+    assert set(by_name) == {"José da Silva", "Maria Souza"}
+    assert by_name["José da Silva"]["papeis"] == ["reu"]
+    assert by_name["José da Silva"]["qualificacao"] == "pedreiro"
+    assert by_name["José da Silva"]["fontes"] == ["Documento #2", "Documento #3"]
+    assert by_name["Maria Souza"]["fontes"] == ["Documento #2", "Atendimento #1"]
+
+    # Fato repetido fica só na seção de maior prioridade (denúncia)
+    denuncia, sentenca = sections[-3], sections[-2]
+    assert denuncia.data["fatos"] == ["Furto de celular na Rua A"]
+    assert sentenca.data["fatos"] == ["Réu confessou em juízo"]
+    assert "reus" not in sentenca.data
+    assert stats == {"persons": 2, "duplicate_facts": 1}
+
+
+def test_budget_keeps_ranked_sections_and_reports_omissions():
+    sections, _ = build_case_sections(DOCUMENTS, [], [{"tipo": "intimacao", "prazo": "2024-10-01"}])
+    full = fit_sections(sections, 100_000, _Counter())
+    assert not full.omitted and len(full.included) == len(sections)
+    assert full.text.index("=== DOCUMENTOS ENRIQUECIDOS ===") < full.text.index("=== DEMANDAS/INTIMACOES ===")
+    assert "\n  " not in full.text  # sem indentação
+
+    # Orçamento apertado: certidão (menor prioridade) perde o preview e depois sai
+    without_preview = full.tokens - 300 - len("\nPreview:\n")
+    trimmed = fit_sections(sections, without_preview, _Counter())
+    assert trimmed.trimmed == ["Documento #1: certidao.pdf"] and not trimmed.omitted
+    assert "xxx" not in trimmed.text
+
+    tight = fit_sections(sections, without_preview - 60, _Counter())
+    assert tight.omitted == ["Documento #1: certidao.pdf (certidao)"]
+    assert "[Omitidos por limite de contexto: Documento #1: certidao.pdf (certidao)]" in tight.text
+    assert "Documento #2: denuncia.pdf" in tight.text
+
+
+def test_recency_breaks_ties_within_the_same_type():
+    old = ContextSection("G", "antigo", "laudo", data={"a": 1}, date="2023-01-01", order=0)
+    new = ContextSection("G", "novo", "laudo", data={"a": 1}, date="2024-06-01", order=1)
+    undated = ContextSection("G", "sem data", "laudo", data={"a": 1}, order=2)
+    one_section = len(new.render()) + len("G")
+    result = fit_sections([old, new, undated], one_section, _Counter())
+    assert result.included == ["novo"]
+
+
+def test_token_counter_falls_back_to_estimate_without_local_tokenizer():
+    with patch.dict("sys.modules", {"google.genai.local_tokenizer": None}):
+        counter = TokenCounter("gemini-2.5-flash")
+    assert not counter.exact
+    assert counter.count("a" * 400) == 101
+
+    counter._tokenizer = MagicMock()
+    counter._tokenizer.count_tokens.return_value = SimpleNamespace(total_tokens=7)
+    assert counter.exact and counter.count("abc") == 7
+
+
+def test_consolidate_endpoint_sends_budgeted_context():
+    from routers import consolidation
+
+    app = FastAPI()
+    app.include_router(consolidation.router)
+    gemini = SimpleNamespace(extract=AsyncMock(return_value={"resumo": "ok", "confidence": 0.8}))
+    settings = SimpleNamespace(consolidation_context_tokens=100_000, gemini_model="gemini-2.5-flash")
+
+    with patch("routers.consolidation.get_gemini_service", return_value=gemini), \
+         patch("routers.consolidation.get_settings", return_value=settings), \
+         patch("routers.consolidation.get_token_counter", return_value=_Counter()):
+        body = TestClient(app).post("/consolidate", json={"assistido_id": 1, "documents": DOCUMENTS}).json()
+
+    assert body["resumo"] == "ok" and body["total_documentos"] == 3
+    context = gemini.extract.call_args.args[1]
+    assert "=== PESSOAS DO CASO (consolidado) ===" in context
+    pessoas = json.loads(context.split("--- Pessoas ---\n")[1].split("\n")[0])
+    assert len(pessoas) == 2
@@ -0,0 +1,164 @@
+"""
+Testes da cross-analysis incremental/hierárquica.
+"""
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from services.cross_analysis_service import (
+    CrossAnalysisService,
+    fact_digest,
+    merge_cross_results,
+)
+
+
+def _analysis(n):
+    return {
+        "file_id": n,
+        "file_name": f"dep{n}.mp3",
+        "depoente": f"Testemunha {n}",
+        "analysis": {
+            "resumo_defesa": f"Resumo {n}",
+            "percepcao": {"viu_diretamente": [{"fato": f"viu fato {n}", "timestamp_ref": "01:00"}]},
+            "entidades": {"pessoas": [{"nome": "José", "papel": "réu", "caracteristicas": []}]},
+            "highlights": [{"texto": "x" * 200}],
+        },
+    }
+
+
+BASE = {
+    "contradiction_matrix": [
+        {"fato": "Horário da abordagem", "depoimentos": [{"source_file_id": 1, "afirmacao": "22h"}],
+         "tipo": "corroboracao", "analise": "ok"},
+    ],
+    "tese_consolidada": {"tese_principal": "negativa de autoria"},
+    "timeline_fatos": [{"fato": "abordagem", "fontes": [{"file_id": 1}]}],
+    "mapa_atores": [{"nome": "José", "papel": "réu", "mencionado_por": [{"file_id": 1}]}],
+    "providencias_agregadas": ["ouvir vizinho"],
+}
+DELTA = {
+    "contradiction_matrix": [
+        {"fato": "horário da  abordagem", "depoimentos": [{"source_file_id": 3, "afirmacao": "23h"}],
+         "tipo": "contradicao", "analise": "divergência de 1h"},
+        {"fato": "arma", "depoimentos": [{"source_file_id": 3, "afirmacao": "não viu arma"}], "tipo": "lacuna"},
+    ],
+    "tese_consolidada": None,
+    "mapa_atores": [{"nome": "José", "mencionado_por": [{"file_id": 3}], "relacoes": []}],
+    "providencias_agregadas": ["ouvir vizinho", "requisitar câmeras"],
+}
+
+
+class _FakeGateway:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    async def anthropic_stream(self, **kwargs):
+        self.calls.append(kwargs)
+        text = json.dumps(self.responses.pop(0), ensure_ascii=False)
+        for i in range(0, len(text), 50):
+            yield text[i:i + 50]
+
+
+def _service(max_input_chars=150_000):
+    settings = SimpleNamespace(
+        anthropic_api_key="k", claude_sonnet_model="claude-sonnet-4-6",
+        claude_timeout=120, cross_analysis_max_input_chars=max_input_chars,
+    )
+    with patch("services.cross_analysis_service.get_settings", return_value=settings):
+        return CrossAnalysisService()
+
+
+def test_merge_updates_matching_items_and_appends_new_ones():
+    merged = merge_cross_results(BASE, DELTA)
+
+    horario, arma = merged["contradiction_matrix"]
+    assert horario["fato"] == "Horário da abordagem"
+    assert [d["source_file_id"] for d in horario["depoimentos"]] == [1, 3]
+    assert (horario["tipo"], horario["analise"]) == ("contradicao", "divergência de 1h")
+    assert arma["fato"] == "arma"
+    assert merged["mapa_atores"][0]["mencionado_por"] == [{"file_id": 1}, {"file_id": 3}]
+    assert merged["tese_consolidada"] == BASE["tese_consolidada"]  # delta sem tese
+    assert merged["providencias_agregadas"] == ["ouvir vizinho", "requisitar câmeras"]
+    assert BASE["contradiction_matrix"][0]["depoimentos"] == [{"source_file_id": 1, "afirmacao": "22h"}]
+
+
+def test_fact_digest_is_compact():
+    digest = fact_digest(_analysis(1))
+    assert digest == {
+        "source_file_id": 1,
+        "depoente": "Testemunha 1",
+        "resumo": "Resumo 1",
+        "viu": ["viu fato 1 | 01:00"],
+        "pessoas": ["José | réu"],
+    }
+
+
+@pytest.mark.asyncio
+async def test_incremental_sends_only_the_new_deposition_in_full():
+    svc = _service()
+    gateway = _FakeGateway([DELTA])
+    previous = {**BASE, "id": 7, "source_file_ids": [1, 2]}
+
+    with patch("services.cross_analysis_service.get_llm_gateway", return_value=gateway):
+        result = await svc.cross_analyze([_analysis(1), _analysis(2), _analysis(3)], "José", previous)
+
+    [call] = gateway.calls
+    content = call["messages"][0]["content"]
+    assert "Incorporar os NOVOS depoimentos" in call["system"][0]["text"]
+    assert content.count("--- DEPOIMENTO") == 1 and "source_file_id: 3" in content
+    assert '"resumo":"Resumo 1"' in content and "x" * 200 not in content.split("NOVOS DEPOIMENTOS")[0]
+    assert result["source_file_ids"] == [1, 2, 3]
+    assert len(result["contradiction_matrix"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_up_to_date_previous_makes_no_call():
+    svc = _service()
+    gateway = _FakeGateway([])
+    previous = {**BASE, "source_file_ids": [1, 2]}
+
+    with patch("services.cross_analysis_service.get_llm_gateway", return_value=gateway):
+        result = await svc.cross_analyze([_analysis(1), _analysis(2)], None, previous)
+
+    assert gateway.calls == []
+    assert result["contradiction_matrix"] == BASE["contradiction_matrix"]
+
+
+class _TextGateway(_FakeGateway):
+    async def anthropic_stream(self, **kwargs):
+        self.calls.append(kwargs)
+        yield self.responses.pop(0)
+
+
+@pytest.mark.asyncio
+async def test_large_case_is_analysed_in_steps():
+    block = len(CrossAnalysisService._analysis_block(1, _analysis(1)))
+    svc = _service(max_input_chars=block * 2 + 10)  # 2 depoimentos na 1ª chamada, 1 por etapa depois
+    gateway = _FakeGateway([BASE, DELTA, {}, {}])
+    analyses = [_analysis(n) for n in range(1, 6)]
+
+    with patch("services.cross_analysis_service.get_llm_gateway", return_value=gateway):
+        events = [e async for e in svc.cross_analyze_stream(analyses)]
+
+    assert [e["event"] for e in events] == ["progress"] * 4 + ["result"]
+    assert [e["covered"] for e in events[:4]] == [2, 3, 4, 5]
+    assert events[-1]["source_file_ids"] == [1, 2, 3, 4, 5]
+    assert events[-1]["data"] == merge_cross_results(BASE, DELTA)
+    assert gateway.calls[0]["messages"][0]["content"].count("--- DEPOIMENTO") == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_step_leaves_pending_depositions_uncovered():
+    svc = _service()
+    gateway = _TextGateway(["Não foi possível comparar."])
+    previous = {**BASE, "source_file_ids": [1, 2]}
+
+    with patch("services.cross_analysis_service.get_llm_gateway", return_value=gateway):
+        events = [e async for e in svc.cross_analyze_stream([_analysis(1), _analysis(2), _analysis(3)], None, previous)]
+
+    result = events[-1]
+    assert result["source_file_ids"] == [1, 2] and result["truncated"] is True
+    assert result["data"]["contradiction_matrix"] == BASE["contradiction_matrix"]
@@ -0,0 +1,92 @@
+"""
+Testes do DiarizationWorkerPool — workers reais (spawn) com diarizador fake.
+Sem pyannote: a factory abaixo é importada pelo processo filho.
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.diarization_pool import DiarizationPoolFullError, DiarizationWorkerPool
+
+
+def _fake_diarizer(turn_seconds: float = 5.0):
+    """Diarizador fake: 'sleep:N' dorme N s; senão alterna 2 speakers a cada turno."""
+    def diarize(path: str, num_speakers=None) -> list[dict]:
+        with open(path, encoding="utf-8") as f:
+            content = f.read()
+        if content.startswith("sleep:"):
+            time.sleep(float(content.split(":", 1)[1]))
+        speakers = num_speakers or 2
+        return [
+            {"start": i * turn_seconds, "end": (i + 1) * turn_seconds, "speaker": f"SPEAKER_{i % speakers:02d}"}
+            for i in range(3)
+        ]
+    return diarize
+
+
+@pytest.fixture
+def make_file(tmp_path):
+    def _make(name: str, content: str):
+        path = tmp_path / name
+        path.write_text(content, encoding="utf-8")
+        return path
+    return _make
+
+
+@pytest.mark.asyncio
+async def test_pool_diarizes_in_warm_worker(make_file):
+    pool = DiarizationWorkerPool(
+        size=1, queue_size=2, job_timeout=30, diarizer_factory=_fake_diarizer, factory_args=(10.0,),
+    )
+    try:
+        pool.start()
+        turns = await pool.diarize(make_file("a.mp3", "audio"), num_speakers=1)
+        assert [(t["start"], t["speaker"]) for t in turns] == [
+            (0.0, "SPEAKER_00"), (10.0, "SPEAKER_00"), (20.0, "SPEAKER_00"),
+        ]
+        assert pool._workers[0].jobs_done == 1
+        # recv bloqueante roda no executor do pool, não no padrão do loop
+        assert any(t.name.startswith("diarization-recv") for t in threading.enumerate())
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_pool_times_out_and_replaces_worker(make_file):
+    pool = DiarizationWorkerPool(size=1, queue_size=1, job_timeout=2, diarizer_factory=_fake_diarizer)
+    try:
+        pool.start()
+        old_pid = pool._workers[0].process.pid
+        with pytest.raises(RuntimeError, match="Diarization timed out"):
+            await pool.diarize(make_file("slow.mp3", "sleep:30"))
+        assert pool._workers[0].process.pid != old_pid
+        assert len(await pool.diarize(make_file("after.mp3", "after"))) == 3
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_pool_rejects_when_queue_full(make_file):
+    pool = DiarizationWorkerPool(size=1, queue_size=0, job_timeout=30, diarizer_factory=_fake_diarizer)
+    try:
+        slow = asyncio.create_task(pool.diarize(make_file("slow.mp3", "sleep:1")))
+        await asyncio.sleep(0.1)
+        with pytest.raises(DiarizationPoolFullError):
+            await pool.diarize(make_file("extra.mp3", "extra"))
+        assert len(await slow) == 3
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_per_job_timeout_overrides_pool_default(make_file):
+    pool = DiarizationWorkerPool(size=1, queue_size=1, job_timeout=60, diarizer_factory=_fake_diarizer)
+    try:
+        pool.start()
+        with pytest.raises(RuntimeError, match="timed out after 1s"):
+            await pool.diarize(make_file("long.mp3", "sleep:30"), timeout=1)
+        assert len(await pool.diarize(make_file("after.mp3", "after"), timeout=30)) == 3
+    finally:
+        pool.shutdown()
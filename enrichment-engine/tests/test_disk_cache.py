@@ -0,0 +1,45 @@
+"""
+Testes do DiskCache — persistência, LRU, TTL e métricas.
+"""
+import os
+import time
+
+import pytest
+
+from services.disk_cache import DiskCache
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_roundtrip_and_counters(tmp_path, compress):
+    cache = DiskCache(tmp_path, max_bytes=1024 * 1024, compress=compress)
+    assert cache.get("ab" * 32) is None
+    cache.set_text("ab" * 32, "# Sentença\n\nConteúdo")
+    assert cache.get_text("ab" * 32) == "# Sentença\n\nConteúdo"
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+
+
+def test_lru_eviction_keeps_recently_read(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=3500)
+    for i, key in enumerate(["aa" * 32, "bb" * 32, "cc" * 32]):
+        cache.set(key, b"x" * 1000)
+        path = cache._find(key)
+        os.utime(path, (time.time() - 100 + i, time.time()))
+    # "aa" seria o mais antigo, mas é lido e vira o mais recente
+    assert cache.get("aa" * 32) is not None
+    cache.set("dd" * 32, b"x" * 1000)
+
+    assert cache.get("aa" * 32) is not None
+    assert cache.get("bb" * 32) is None
+    assert cache.stats()["bytes"] <= 3500
+
+
+def test_ttl_expires_entries(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=1024, ttl_seconds=60)
+    cache.set("ee" * 32, b"value")
+    path = cache._find("ee" * 32)
+    os.utime(path, (time.time(), time.time() - 120))
+    assert cache.get("ee" * 32) is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,85 @@
+"""
+Testes do DoclingWorkerPool — workers reais (spawn) com parser fake.
+Sem Docling: a factory abaixo é importada pelo processo filho.
+"""
+import asyncio
+import time
+
+import pytest
+
+from services.docling_pool import DoclingPoolFullError, DoclingWorkerPool
+
+
+def _fake_parser():
+    """Parser fake: lê o arquivo; 'sleep:N' dorme N s, 'boom' levanta erro."""
+    def parse(path: str, page_range=None) -> str:
+        with open(path, encoding="utf-8") as f:
+            content = f.read()
+        if page_range is not None:
+            return f"pages {page_range[0]}-{page_range[1]}"
+        if content.startswith("sleep:"):
+            time.sleep(float(content.split(":", 1)[1]))
+        if content == "boom":
+            raise ValueError("bad pdf")
+        return f"# {content}"
+    return parse
+
+
+@pytest.fixture
+def make_file(tmp_path):
+    def _make(name: str, content: str):
+        path = tmp_path / name
+        path.write_text(content, encoding="utf-8")
+        return path
+    return _make
+
+
+@pytest.mark.asyncio
+async def test_pool_parses_in_worker(make_file):
+    pool = DoclingWorkerPool(size=2, queue_size=4, job_timeout=30, parser_factory=_fake_parser)
+    try:
+        results = await asyncio.gather(*[
+            pool.parse(make_file(f"doc{i}.pdf", f"doc {i}")) for i in range(4)
+        ])
+        assert results == ["# doc 0", "# doc 1", "# doc 2", "# doc 3"]
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_pool_propagates_parser_error(make_file):
+    pool = DoclingWorkerPool(size=1, queue_size=1, job_timeout=30, parser_factory=_fake_parser)
+    try:
+        with pytest.raises(RuntimeError, match="bad pdf"):
+            await pool.parse(make_file("bad.pdf", "boom"))
+        # Worker continua saudável após erro do parser
+        assert await pool.parse(make_file("ok.pdf", "ok")) == "# ok"
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_pool_kills_and_replaces_on_timeout(make_file):
+    pool = DoclingWorkerPool(size=1, queue_size=1, job_timeout=2, parser_factory=_fake_parser)
+    try:
+        await pool.parse(make_file("warm.pdf", "warm"))
+        old_pid = pool._workers[0].process.pid
+        with pytest.raises(RuntimeError, match="timed out"):
+            await pool.parse(make_file("slow.pdf", "sleep:30"))
+        assert pool._workers[0].process.pid != old_pid
+        assert await pool.parse(make_file("after.pdf", "after")) == "# after"
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_pool_rejects_when_queue_full(make_file):
+    pool = DoclingWorkerPool(size=1, queue_size=0, job_timeout=30, parser_factory=_fake_parser)
+    try:
+        slow = asyncio.create_task(pool.parse(make_file("slow.pdf", "sleep:1")))
+        await asyncio.sleep(0.1)
+        with pytest.raises(DoclingPoolFullError):
+            await pool.parse(make_file("extra.pdf", "extra"))
+        assert await slow == "# sleep:1"
+    finally:
+        pool.shutdown()
@@ -0,0 +1,83 @@
+"""
+Testes do DoclingService — cache de parsing e conversão em shards.
+Sem Docling: conversões são mockadas ou feitas por um pool com parser fake.
+"""
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from services.docling_pool import DoclingWorkerPool
+from services.docling_service import DoclingService, plan_shards
+from tests.test_docling_pool import _fake_parser
+
+
+def _make_service(tmp_path, **overrides) -> DoclingService:
+    settings = MagicMock(
+        docling_cache_enabled=True,
+        docling_cache_max_mb=10,
+        docling_cache_compress=True,
+        docling_ocr_enabled=True,
+        docling_ocr_lang="por",
+        docling_pool_size=2,
+        docling_pool_queue_size=8,
+        docling_job_timeout=30,
+        docling_shard_pages=50,
+        docling_shard_min_pages=100,
+        cache_dir=str(tmp_path / "cache"),
+    )
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    with patch("services.docling_service.get_settings", return_value=settings):
+        return DoclingService()
+
+
+def test_docling_parse_uses_content_cache(tmp_path):
+    svc = _make_service(tmp_path)
+
+    pdf_a = tmp_path / "a.pdf"
+    pdf_b = tmp_path / "copia.pdf"
+    pdf_a.write_bytes(b"%PDF-1.4 autos")
+    pdf_b.write_bytes(b"%PDF-1.4 autos")
+
+    with patch.object(svc, "_convert", return_value="# Autos") as mock_convert:
+        assert svc.parse_to_markdown(pdf_a) == "# Autos"
+        assert svc.parse_to_markdown(pdf_b) == "# Autos"  # mesmo conteúdo, outro nome
+        mock_convert.assert_called_once()
+
+    key_por = svc.cache_key(pdf_a)
+    svc.settings.docling_ocr_lang = "eng"
+    assert svc.cache_key(pdf_a) != key_por
+    with patch.object(svc, "_convert", return_value="# Autos (eng)") as mock_convert:
+        assert svc.parse_to_markdown(pdf_a) == "# Autos (eng)"
+        mock_convert.assert_called_once()
+    assert svc.cache_stats()["hits"] == 1
+
+
+def test_plan_shards_covers_all_pages():
+    assert plan_shards(120, 50) == [(1, 50), (51, 100), (101, 120)]
+    assert plan_shards(50, 50) == [(1, 50)]
+
+
+def test_small_pdf_is_not_sharded(tmp_path):
+    svc = _make_service(tmp_path)
+    pdf = tmp_path / "curto.pdf"
+    pdf.write_bytes(b"%PDF")
+    with patch("services.docling_service.count_pdf_pages", return_value=12):
+        assert svc.shard_plan(pdf) == []
+
+
+@pytest.mark.asyncio
+async def test_sharded_parse_stitches_in_page_order(tmp_path):
+    svc = _make_service(tmp_path, docling_cache_enabled=False)
+    svc._pool = DoclingWorkerPool(size=2, queue_size=0, job_timeout=30, parser_factory=_fake_parser)
+    pdf = tmp_path / "autos.pdf"
+    pdf.write_bytes(b"%PDF autos")
+    try:
+        with patch("services.docling_service.count_pdf_pages", return_value=120):
+            shards = [shard async for shard in svc.iter_shards(pdf)]
+            markdown = await svc.parse_to_markdown_async(pdf)
+    finally:
+        svc.shutdown()
+
+    assert sorted((s.first_page, s.last_page) for s in shards) == [(1, 50), (51, 100), (101, 120)]
+    assert markdown == "pages 1-50\n\npages 51-100\n\npages 101-120"
@@ -0,0 +1,141 @@
+"""
+Testes do pré-classificador local e do fluxo single-pass do orquestrador.
+"""
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from services.document_classifier import classify_document_locally
+
+DENUNCIA = """# EXCELENTÍSSIMO SENHOR JUIZ DE DIREITO DA VARA CRIME
+
+O MINISTÉRIO PÚBLICO DO ESTADO DA BAHIA vem oferecer DENÚNCIA contra
+JOÃO DA SILVA, pelos fatos a seguir expostos.
+
+## DOS FATOS
+
+No dia 10 de março, o denunciado subtraiu, mediante grave ameaça...
+
+## DO PEDIDO
+
+Assim agindo, está o denunciado incurso nas penas do art. 157, §2º, do CP.
+Requer o recebimento da presente denúncia.
+
+ROL DE TESTEMUNHAS
+"""
+
+SENTENCA = """# SENTENÇA
+
+Vistos etc. Trata-se de ação penal.
+
+## DOSIMETRIA
+
+Ante o exposto, JULGO PROCEDENTE a pretensão punitiva e CONDENO o réu.
+Publique-se. Registre-se. Intimem-se.
+"""
+
+TERMO = """TERMO DE DEPOIMENTO
+
+Aos costumes disse nada. Testemunha compromissada. Inquirida, a depoente
+respondeu que estava em casa no dia dos fatos. Processo de violência doméstica.
+"""
+
+
+def test_local_classifier_recognizes_common_documents():
+    denuncia = classify_document_locally(DENUNCIA)
+    assert denuncia.document_type == "denuncia"
+    assert denuncia.confidence >= 0.75
+
+    sentenca = classify_document_locally(SENTENCA)
+    assert sentenca.document_type == "sentenca"
+    assert sentenca.confidence >= 0.75
+    assert sentenca.as_dict()["sub_type"] == "condenatória"
+    assert sentenca.as_dict()["relevancia"] == "critico"
+
+    termo = classify_document_locally(TERMO)
+    assert termo.document_type == "depoimento"
+    assert termo.area == "VD"
+    assert not termo.single_pass
+
+
+def test_local_classifier_abstains_without_markers():
+    result = classify_document_locally("Comprovante de residência em nome de Maria.")
+    assert result.document_type == "outro"
+    assert result.confidence == 0.0
+
+
+CERTIDAO_PRAZO = """CERTIDÃO
+
+Certifico que decorreu o prazo legal sem manifestação da defesa.
+Dou fé.
+"""
+
+PRONUNCIA = """# DECISÃO DE PRONÚNCIA
+
+Vistos etc. O Ministério Público ofereceu denúncia contra o réu.
+
+Ante o exposto, com fundamento no art. 413 do CPP, decido PRONUNCIAR o réu
+para que seja submetido a julgamento pelo Tribunal do Júri.
+"""
+
+
+@pytest.mark.parametrize("markdown", [CERTIDAO_PRAZO, PRONUNCIA])
+def test_local_classifier_leaves_other_taxonomy_types_to_llm(markdown):
+    assert not classify_document_locally(markdown).single_pass
+
+
+def _orchestrator(markdown, min_confidence=0.75):
+    from config import get_settings
+    from services.enrichment_orchestrator import EnrichmentOrchestrator
+
+    with patch("services.enrichment_orchestrator.get_docling_service"), \
+         patch("services.enrichment_orchestrator.get_gemini_service"), \
+         patch("services.enrichment_orchestrator.get_supabase_service"):
+        orch = EnrichmentOrchestrator()
+    orch.settings = get_settings().model_copy(update={"local_classifier_min_confidence": min_confidence})
+    tmp = MagicMock(spec=Path)
+    orch.docling.download_file = AsyncMock(return_value=(tmp, "application/pdf"))
+    orch.docling.parse_to_markdown_async = AsyncMock(return_value=markdown)
+    orch.gemini.extract = AsyncMock(return_value={"confidence": 0.9})
+    return orch
+
+
+@pytest.mark.asyncio
+async def test_single_pass_skips_llm_classifier_when_confident():
+    from prompts.document_denuncia import DENUNCIA_PROMPT
+
+    orch = _orchestrator(DENUNCIA)
+    result = await orch.enrich_document("https://x/doc.pdf", "application/pdf")
+
+    orch.gemini.extract.assert_awaited_once()
+    assert orch.gemini.extract.await_args.args[0] == DENUNCIA_PROMPT
+    assert result["document_type"] == "denuncia"
+
+
+@pytest.mark.asyncio
+async def test_low_confidence_falls_back_to_two_calls():
+    from prompts.document_classifier import CLASSIFIER_PROMPT
+
+    orch = _orchestrator(DENUNCIA, min_confidence=1.01)
+    orch.gemini.extract = AsyncMock(side_effect=[
+        {"document_type": "denuncia", "confidence": 0.95},
+        {"confidence": 0.9},
+    ])
+    result = await orch.enrich_document("https://x/doc.pdf", "application/pdf")
+
+    assert orch.gemini.extract.await_count == 2
+    assert orch.gemini.extract.await_args_list[0].args[0] == CLASSIFIER_PROMPT
+    assert result["document_type"] == "denuncia"
+
+
+@pytest.mark.asyncio
+async def test_single_pass_sends_pronuncia_to_llm_classifier():
+    from prompts.document_classifier import CLASSIFIER_PROMPT
+
+    orch = _orchestrator(PRONUNCIA, min_confidence=0.5)
+    orch.gemini.extract = AsyncMock(return_value={"document_type": "pronuncia", "confidence": 0.95})
+    result = await orch.enrich_document("https://x/doc.pdf", "application/pdf")
+
+    assert orch.gemini.extract.await_args_list[0].args[0] == CLASSIFIER_PROMPT
+    assert result["document_type"] == "pronuncia"
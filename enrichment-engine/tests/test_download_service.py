@@ -0,0 +1,75 @@
+"""
+Testes do download em streaming — httpx.MockTransport, sem rede.
+"""
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from services.download_service import download_to_tempfile, sniff_mime_type
+
+
+def _client(handler) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.mark.parametrize("head,declared,expected", [
+    (b"%PDF-1.7\n", "application/octet-stream", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n0000", "", "image/png"),
+    (b"\xff\xd8\xff\xe0", "application/pdf", "image/jpeg"),
+    (b"RIFF\x00\x00\x00\x00WEBPVP8 ", "", "image/webp"),
+    (b"PK\x03\x04", "", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    (b"plain text", "text/plain; charset=utf-8", "text/plain"),
+])
+def test_sniff_mime_type(head, declared, expected):
+    assert sniff_mime_type(head, declared) == expected
+
+
+@pytest.mark.asyncio
+async def test_download_streams_to_disk_with_sniffed_extension():
+    body = b"%PDF-1.4\n" + b"x" * 200_000
+
+    def handler(request):
+        return httpx.Response(200, content=body, headers={"content-type": "binary/octet-stream"})
+
+    async with _client(handler) as client:
+        with patch("services.download_service.get_http_client", return_value=client):
+            result = await download_to_tempfile("https://storage/doc", max_bytes=1024 * 1024)
+
+    try:
+        assert result.content_type == "application/pdf"
+        assert result.path.suffix == ".pdf"
+        assert result.size == len(body)
+        assert result.path.read_bytes() == body
+    finally:
+        result.path.unlink(missing_ok=True)
+
+
+@pytest.mark.asyncio
+async def test_download_rejects_declared_content_length():
+    def handler(request):
+        return httpx.Response(200, content=b"%PDF" + b"x" * 2048)
+
+    async with _client(handler) as client:
+        with patch("services.download_service.get_http_client", return_value=client):
+            with pytest.raises(ValueError, match="File too large"):
+                await download_to_tempfile("https://storage/big.pdf", max_bytes=1024)
+
+
+@pytest.mark.asyncio
+async def test_download_enforces_limit_while_streaming(tmp_path):
+    async def body():
+        for _ in range(10):
+            yield b"x" * 1024
+
+    def handler(request):
+        # Sem Content-Length: limite só pode ser aplicado durante o streaming
+        return httpx.Response(200, content=body())
+
+    with patch("tempfile.tempdir", str(tmp_path)):
+        async with _client(handler) as client:
+            with patch("services.download_service.get_http_client", return_value=client):
+                with pytest.raises(ValueError, match="while streaming"):
+                    await download_to_tempfile("https://storage/chunked", max_bytes=4096)
+
+    assert list(tmp_path.iterdir()) == []  # temp removido
@@ -0,0 +1,219 @@
+"""
+Testes do EmbeddingService — Gemini e Supabase mockados.
+"""
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from services.embedding_cache import EmbeddingCache
+from services.embedding_service import EmbeddingService
+
+
+def _fake_embed_response(contents):
+    return SimpleNamespace(
+        embeddings=[SimpleNamespace(values=[float(len(c)), 0.0]) for c in contents]
+    )
+
+
+@pytest.fixture(autouse=True)
+def memory_only_cache():
+    cache = EmbeddingCache(disk=None, memory_items=10_000)
+    with patch("services.embedding_service.get_embedding_cache", return_value=cache):
+        yield cache
+
+
+@pytest.fixture
+def service():
+    supabase = MagicMock()
+    supabase.rpc.return_value.execute.return_value = MagicMock(data=None)
+    supabase.table.return_value.select.return_value.match.return_value.execute.return_value = (
+        MagicMock(data=[])
+    )
+    svc = EmbeddingService(supabase)
+
+    client = MagicMock()
+    client.aio.models.embed_content = AsyncMock(
+        side_effect=lambda model, contents: _fake_embed_response(contents)
+    )
+    svc._client = client
+    return svc
+
+
+@pytest.mark.asyncio
+async def test_full_reindex_batches_and_swaps_atomically(service):
+    markdown = "\n\n".join(f"Parágrafo {i} " + "palavra " * 600 for i in range(250))
+
+    with patch("services.embedding_service.settings") as mock_settings:
+        mock_settings.embedding_batch_size = 100
+        mock_settings.embedding_concurrency = 2
+        mock_settings.embedding_model = "text-embedding-004"
+        mock_settings.gemini_max_retries = 3
+        count = await service.index_document(
+            doc_id=7, markdown=markdown, assistido_id=3, incremental=False
+        )
+
+    assert count == 250
+    embed_calls = service._client.aio.models.embed_content.await_args_list
+    assert [len(c.kwargs["contents"]) for c in embed_calls] == [100, 100, 50]
+
+    # Um único RPC de troca (sem delete + N inserts)
+    service.supabase.rpc.assert_called_once()
+    name, params = service.supabase.rpc.call_args.args
+    assert name == "replace_entity_embeddings"
+    assert params["p_entity_type"] == "documento"
+    assert params["p_entity_id"] == 7
+    assert [r["chunk_index"] for r in params["p_rows"]] == list(range(250))
+    service.supabase.table.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_failed_batches_keep_previous_index(service):
+    service._client.aio.models.embed_content = AsyncMock(side_effect=RuntimeError("quota"))
+
+    with patch("services.embedding_service.settings") as mock_settings, \
+            patch("asyncio.sleep", new_callable=AsyncMock):
+        mock_settings.embedding_batch_size = 100
+        mock_settings.embedding_concurrency = 2
+        mock_settings.gemini_max_retries = 2
+        count = await service.index_document(doc_id=7, markdown="Texto do documento " * 10)
+
+    assert count == 0
+    service.supabase.rpc.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_partial_embedding_failure_keeps_previous_index(service):
+    calls = 0
+
+    async def flaky_embed(model, contents):
+        nonlocal calls
+        calls += 1
+        if calls == 2:
+            raise RuntimeError("quota")
+        return _fake_embed_response(contents)
+
+    service._client.aio.models.embed_content = AsyncMock(side_effect=flaky_embed)
+    markdown = "\n\n".join(f"Parágrafo {i} " + "palavra " * 600 for i in range(4))
+
+    with patch("services.embedding_service.settings") as mock_settings, \
+            patch("asyncio.sleep", new_callable=AsyncMock):
+        mock_settings.embedding_batch_size = 2
+        mock_settings.embedding_concurrency = 1
+        mock_settings.gemini_max_retries = 1
+        count = await service.index_document(doc_id=7, markdown=markdown, incremental=False)
+
+    assert count == 0
+    service.supabase.rpc.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_reindex_and_repeated_queries_hit_cache(service, memory_only_cache, tmp_path):
+    from services.disk_cache import DiskCache
+
+    memory_only_cache.disk = DiskCache(tmp_path, max_bytes=1024 * 1024)
+    markdown = "Primeiro parágrafo do laudo.\n\nSegundo parágrafo do laudo."
+
+    with patch("services.embedding_service.settings") as mock_settings:
+        mock_settings.embedding_batch_size = 100
+        mock_settings.embedding_concurrency = 2
+        mock_settings.embedding_model = "text-embedding-004"
+        mock_settings.embedding_dimensions = 768
+        mock_settings.gemini_max_retries = 3
+        await service.index_document(doc_id=1, markdown=markdown, incremental=False)
+        await service.index_document(doc_id=1, markdown=markdown, incremental=False)
+        first = await service.generate_embedding("legítima  defesa")
+        second = await service.generate_embedding("legítima defesa")
+
+    assert first == second
+    assert service._client.aio.models.embed_content.await_count == 2  # doc + 1 query
+    stats = memory_only_cache.stats()
+    assert stats["misses"] == 2
+    assert stats["memory_hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_disk_layer_survives_new_process(tmp_path):
+    from services.disk_cache import DiskCache
+
+    embed_fn = AsyncMock(side_effect=lambda texts: [[0.5, 0.25] for _ in texts])
+    warm = EmbeddingCache(DiskCache(tmp_path, max_bytes=1024 * 1024))
+    await warm.get_or_embed("m", 2, ["chunk a", "chunk b", "chunk a"], embed_fn)
+    assert embed_fn.await_args.args[0] == ["chunk a", "chunk b"]  # duplicata embedada uma vez
+
+    cold = EmbeddingCache(DiskCache(tmp_path, max_bytes=1024 * 1024))
+    vectors = await cold.get_or_embed("m", 2, ["chunk b"], embed_fn)
+    assert vectors == [[0.5, 0.25]]
+    assert cold.stats()["disk_hits"] == 1
+    assert embed_fn.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_incremental_reindex_embeds_only_changed_chunks(service):
+    from services.chunking import chunk_fingerprint
+
+    para_a = "Parágrafo A " + "a " * 600
+    para_b = "Parágrafo B " + "b " * 600
+    para_b2 = "Parágrafo B2 " + "c " * 600
+    old_chunks = service._chunk_text(f"{para_a}\n\n{para_b}")  # [A], [A+B]
+    existing = [
+        {"id": 10, "chunk_index": 0, "content_hash": chunk_fingerprint(old_chunks[0])},
+        {"id": 11, "chunk_index": 1, "content_hash": chunk_fingerprint(old_chunks[1])},
+        {"id": 12, "chunk_index": 2, "content_hash": None},  # linha legada sem hash
+    ]
+    service.supabase.table.return_value.select.return_value.match.return_value.execute.return_value = (
+        MagicMock(data=existing)
+    )
+    service.supabase.rpc.return_value.execute.return_value = MagicMock(data=2)
+
+    with patch("services.embedding_service.settings") as mock_settings:
+        mock_settings.embedding_batch_size = 100
+        mock_settings.embedding_concurrency = 2
+        mock_settings.gemini_max_retries = 3
+        # Novos chunks: [A], [A+B2], [B2+B]
+        count = await service.index_document(
+            doc_id=7, markdown=f"{para_a}\n\n{para_b2}\n\n{para_b}", processo_id=5
+        )
+
+    assert count == 3
+    name, params = service.supabase.rpc.call_args.args
+    assert name == "sync_entity_embeddings"
+    assert params["p_keep"] == [{"id": 10, "chunk_index": 0}]
+    assert [r["chunk_index"] for r in params["p_rows"]] == [1, 2]
+    assert sorted(params["p_delete_ids"]) == [11, 12]
+    assert params["p_processo_id"] == 5
+    (call,) = service._client.aio.models.embed_content.await_args_list
+    assert len(call.kwargs["contents"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_incremental_sync_skips_deletes_when_embedding_fails(service):
+    from services.chunking import chunk_fingerprint
+
+    old_chunks = service._chunk_text("Parágrafo antigo " + "a " * 600)
+    service.supabase.table.return_value.select.return_value.match.return_value.execute.return_value = (
+        MagicMock(data=[{"id": 10, "chunk_index": 0, "content_hash": chunk_fingerprint(old_chunks[0])}])
+    )
+    service._client.aio.models.embed_content = AsyncMock(side_effect=RuntimeError("quota"))
+
+    with patch("services.embedding_service.settings") as mock_settings, \
+            patch("asyncio.sleep", new_callable=AsyncMock):
+        mock_settings.embedding_batch_size = 100
+        mock_settings.embedding_concurrency = 2
+        mock_settings.gemini_max_retries = 1
+        count = await service.index_document(doc_id=7, markdown="Parágrafo novo " + "b " * 600)
+
+    assert count == 0
+    service.supabase.rpc.assert_not_called()  # linha 10 continua no índice
+
+
+@pytest.mark.asyncio
+async def test_incremental_sync_checks_rpc_result(service):
+    service.supabase.rpc.return_value.execute.return_value = MagicMock(data=0)
+
+    with patch("services.embedding_service.settings") as mock_settings:
+        mock_settings.embedding_batch_size = 100
+        mock_settings.embedding_concurrency = 2
+        mock_settings.gemini_max_retries = 3
+        with pytest.raises(RuntimeError, match="expected 1"):
+            await service.index_document(doc_id=7, markdown="Texto do documento " * 10)
@@ -24,3 +24,21 @@ def test_health_shows_configured_services(client: TestClient):
     # Com test settings, ambos devem estar configurados
     assert data["gemini_configured"] is True
     assert data["supabase_configured"] is True
+
+
+def test_health_does_not_open_disk_caches():
+    """/health só reporta caches já abertos — não cria DiskCache no event loop."""
+    import asyncio
+    from unittest.mock import patch
+
+    from routers.health import health_check
+
+    with patch("routers.health.peek_docling_service", return_value=None), \
+         patch("routers.health.peek_embedding_cache", return_value=None), \
+         patch("routers.health.peek_llm_cache", return_value=None), \
+         patch("services.disk_cache.DiskCache.__init__", side_effect=AssertionError("opened")):
+        response = asyncio.run(health_check())
+
+    assert response.docling_cache is None
+    assert response.embedding_cache is None
+    assert response.llm_cache is None
@@ -0,0 +1,142 @@
+"""
+Testes do parser JSON incremental e do streaming da cross-analysis.
+"""
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services.json_stream import JSONStreamParser, parse_json_lenient
+
+CROSS = {
+    "contradiction_matrix": [
+        {"fato": "horário da abordagem", "depoentes": [{"nome": "PM João", "afirmacao": "22h, \"no bar\"}"}]},
+        {"fato": "arma", "depoentes": []},
+    ],
+    "tese_consolidada": {"tese_principal": "negativa de autoria", "forca": 0.7},
+    "timeline_fatos": [],
+    "total": 2,
+    "revisado": False,
+}
+RESPONSE = "Segue a análise:\n```json\n" + json.dumps(CROSS, ensure_ascii=False, indent=2) + "\n```\nFim."
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, len(RESPONSE)])
+def test_items_are_emitted_as_they_complete_for_any_chunking(size):
+    parser = JSONStreamParser(root="{")
+    events = []
+    for i in range(0, len(RESPONSE), size):
+        events.extend(parser.feed(RESPONSE[i:i + size]))
+
+    assert [e.path for e in events] == [
+        ("contradiction_matrix", 0),
+        ("contradiction_matrix", 1),
+        ("tese_consolidada",),
+        ("total",),
+        ("revisado",),
+    ]
+    assert events[0].value == CROSS["contradiction_matrix"][0]
+    assert parser.done and not parser.truncated
+    assert parser.result() == CROSS
+
+
+def test_first_item_arrives_before_the_response_ends():
+    parser = JSONStreamParser(root="{")
+    cut = RESPONSE.index('"arma"')
+    assert [e.path for e in parser.feed(RESPONSE[:cut])] == [("contradiction_matrix", 0)]
+
+
+def test_truncated_response_keeps_completed_items():
+    cut = RESPONSE.index('"forca"')
+    result = parse_json_lenient(RESPONSE[:cut])
+    assert result == {"contradiction_matrix": CROSS["contradiction_matrix"]}
+
+    speakers = parse_json_lenient('[{"speaker_key": "Speaker 1"}, {"speaker_key": "Speaker 2", "lab', root="[")
+    assert speakers == [{"speaker_key": "Speaker 1"}]
+
+
+def test_malformed_item_is_skipped_and_no_json_returns_none():
+    parser = JSONStreamParser(root="[")
+    parser.feed('[{"a": 1}, {"a": 2,}, {"a": 3}]')
+    assert parser.result() == [{"a": 1}, {"a": 3}]
+    assert parser.malformed == 1
+    assert parse_json_lenient("Não consegui analisar.") is None
+
+
+class _FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def __aenter__(self):
+        async def text():
+            for chunk in self.chunks:
+                yield chunk
+        self.text_stream = text()
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def get_final_message(self):
+        return SimpleNamespace(usage=SimpleNamespace(input_tokens=100, output_tokens=50))
+
+
+def _cross_service(chunks):
+    from services.cross_analysis_service import CrossAnalysisService
+    from services.llm_gateway import LLMGateway
+
+    gateway = LLMGateway()
+    gateway._clients["anthropic"] = MagicMock()
+    gateway._clients["anthropic"].messages.stream = MagicMock(return_value=_FakeStream(chunks))
+    svc = CrossAnalysisService()
+    svc.api_key = "test"
+    return svc, gateway
+
+
+ANALYSES = [
+    {"file_id": 1, "file_name": "a.mp3", "depoente": "PM João", "analysis": {"resumo": "x"}},
+    {"file_id": 2, "file_name": "b.mp3", "depoente": "Maria", "analysis": {"resumo": "y"}},
+]
+
+
+@pytest.mark.asyncio
+async def test_cross_analysis_stream_yields_items_then_result():
+    chunks = [RESPONSE[i:i + 40] for i in range(0, len(RESPONSE), 40)]
+    svc, gateway = _cross_service(chunks)
+
+    with patch("services.cross_analysis_service.get_llm_gateway", return_value=gateway):
+        events = [e async for e in svc.cross_analyze_stream(ANALYSES, "Réu")]
+
+    assert [e["event"] for e in events] == ["item"] * 5 + ["result"]
+    assert events[0]["path"] == ["contradiction_matrix", 0]
+    assert events[-1]["data"] == CROSS and events[-1]["truncated"] is False
+    kwargs = gateway._clients["anthropic"].messages.stream.call_args.kwargs
+    assert "Depoente: Maria" in kwargs["messages"][0]["content"]
+
+
+def test_sse_endpoint_forwards_items_and_saves_result():
+    from routers import cross_analysis
+
+    cut = RESPONSE.index('"forca"')  # resposta cortada: salva o que completou
+    svc, gateway = _cross_service([RESPONSE[:cut]])
+    app = FastAPI()
+    app.include_router(cross_analysis.router, prefix="/api")
+
+    with patch("services.cross_analysis_service.get_llm_gateway", return_value=gateway), \
+         patch("routers.cross_analysis.get_cross_analysis_service", return_value=svc), \
+         patch("routers.cross_analysis._save_cross_analysis") as save:
+        response = TestClient(app).post("/api/cross-analyze/stream", json={
+            "assistido_id": 9,
+            "analyses": [{"file_id": a["file_id"], "analysis": a["analysis"]} for a in ANALYSES],
+        })
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    assert [e[0] for e in events] == ["event: item", "event: item", "event: result"]
+    final = json.loads(events[-1][1][len("data: "):])
+    assert final["truncated"] is True
+    assert final["data"] == {"contradiction_matrix": CROSS["contradiction_matrix"]}
+    assert save.call_args.args[1] == final["data"]
@@ -0,0 +1,119 @@
+"""
+Testes do LLMResponseCache e da integração com os serviços de extração.
+"""
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from services.disk_cache import DiskCache
+from services.llm_cache import LLMResponseCache
+
+
+@pytest.fixture
+def llm_cache(tmp_path):
+    cache = LLMResponseCache(DiskCache(tmp_path / "llm", max_bytes=1024 * 1024, compress=True))
+    with patch("services.gemini_service.get_llm_cache", return_value=cache), \
+         patch("services.claude_service.get_llm_cache", return_value=cache), \
+         patch("services.anthropic_service.get_llm_cache", return_value=cache):
+        yield cache
+
+
+def _gemini_gateway(payload):
+    gateway = MagicMock()
+    gateway.gemini_generate = AsyncMock(return_value=SimpleNamespace(text=json.dumps(payload)))
+    return gateway
+
+
+def _anthropic_gateway(text):
+    gateway = MagicMock()
+    gateway.anthropic_messages = AsyncMock(return_value=SimpleNamespace(
+        content=[SimpleNamespace(text=text)],
+        usage=SimpleNamespace(input_tokens=100, output_tokens=20),
+    ))
+    return gateway
+
+
+def test_key_depends_on_every_component():
+    base = LLMResponseCache.key("gemini", "flash", "prompt", "ctx", {"temperature": 0.1})
+    assert base == LLMResponseCache.key("gemini", "flash", "prompt", "ctx", {"temperature": 0.1})
+    assert base != LLMResponseCache.key("gemini", "pro", "prompt", "ctx", {"temperature": 0.1})
+    assert base != LLMResponseCache.key("gemini", "flash", "prompt v2", "ctx", {"temperature": 0.1})
+    assert base != LLMResponseCache.key("gemini", "flash", "prompt", "ctx2", {"temperature": 0.1})
+    assert base != LLMResponseCache.key("gemini", "flash", "prompt", "ctx", {"temperature": 0.7})
+
+
+@pytest.mark.asyncio
+async def test_gemini_extract_hits_cache_on_identical_input(llm_cache):
+    from services.gemini_service import GeminiService
+
+    gateway = _gemini_gateway({"tipo": "denuncia"})
+    with patch("services.gemini_service.get_llm_gateway", return_value=gateway):
+        svc = GeminiService()
+        first = await svc.extract("Classifique", "Texto do documento")
+        second = await svc.extract("Classifique", "Texto do documento")
+        await svc.extract("Classifique", "Outro documento")
+
+    assert first == second == {"tipo": "denuncia"}
+    assert gateway.gemini_generate.await_count == 2
+    stats = llm_cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+    assert stats["disk"]["entries"] == 2
+
+
+@pytest.mark.asyncio
+async def test_bypass_forces_call_and_refreshes_entry(llm_cache):
+    from services.claude_service import ClaudeService
+
+    gateway = _anthropic_gateway('{"versao": 1}')
+    with patch("services.claude_service.get_llm_gateway", return_value=gateway):
+        svc = ClaudeService()
+        await svc.extract("system", "ctx")
+        gateway.anthropic_messages.return_value.content[0].text = '{"versao": 2}'
+        forced = await svc.extract("system", "ctx", bypass_cache=True)
+        again = await svc.extract("system", "ctx")
+
+    assert forced == again == {"versao": 2}
+    assert gateway.anthropic_messages.await_count == 2
+    assert llm_cache.stats()["bypassed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_unparseable_review_is_not_cached(llm_cache):
+    from services.anthropic_service import AnthropicService
+
+    gateway = _anthropic_gateway("Não consegui avaliar.")
+    with patch("services.anthropic_service.get_llm_gateway", return_value=gateway):
+        svc = AnthropicService()
+        await svc.revisar_oficio("conteúdo", "requisicao", "Delegacia")
+        gateway.anthropic_messages.return_value.content[0].text = '{"score": 90, "sugestoes": []}'
+        review = await svc.revisar_oficio("conteúdo", "requisicao", "Delegacia")
+        cached = await svc.revisar_oficio("conteúdo", "requisicao", "Delegacia")
+
+    assert review["score"] == cached["score"] == 90
+    assert cached["tokens_entrada"] == 100
+    assert gateway.anthropic_messages.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_expired_entries_are_misses(tmp_path):
+    cache = LLMResponseCache(DiskCache(tmp_path, max_bytes=1024 * 1024, ttl_seconds=0))
+    call = AsyncMock(return_value={"ok": True})
+
+    await cache.get_or_call("ab" * 32, call)
+    with patch("services.disk_cache.time.time", return_value=10**12):
+        await cache.get_or_call("ab" * 32, call)
+
+    assert call.await_count == 2
+    assert cache.stats()["hits"] == 0
+
+
+@pytest.mark.asyncio
+async def test_disabled_cache_always_calls():
+    cache = LLMResponseCache(disk=None)
+    call = AsyncMock(return_value={"ok": True})
+    await cache.get_or_call("k", call)
+    await cache.get_or_call("k", call)
+    assert call.await_count == 2
+    assert cache.stats()["enabled"] is False
@@ -0,0 +1,294 @@
+"""
+Testes do LLMGateway — clientes fake, sem rede.
+"""
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from services.llm_cache import LLMResponseCache
+from services.llm_gateway import (
+    LLMGateway,
+    Priority,
+    batch_priority,
+    cache_block,
+    current_priority,
+    is_retryable,
+)
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(headers=headers)
+
+
+def _settings(**overrides):
+    base = dict(
+        gemini_api_key="g", anthropic_api_key="a", openai_api_key="o",
+        gemini_rate_limit=60, llm_gemini_rpm=None, llm_gemini_tpm=1_000_000,
+        llm_anthropic_rpm=10_000, llm_anthropic_tpm=10_000_000,
+        llm_openai_rpm=10_000, llm_openai_tpm=10_000_000,
+        llm_model_limits={}, llm_max_concurrency=2, llm_batch_max_concurrency=1,
+        llm_max_retries=3, llm_retry_base_seconds=1.0, llm_retry_max_seconds=30.0,
+    )
+    base.update(overrides)
+    return SimpleNamespace(**base)
+
+
+def _gateway(**overrides):
+    gateway = LLMGateway(settings=_settings(**overrides), sleep=AsyncMock())
+    gateway._clients["anthropic"] = MagicMock()
+    return gateway
+
+
+def _message(text="{}", tokens_in=10, tokens_out=5):
+    return SimpleNamespace(
+        content=[SimpleNamespace(text=text)],
+        usage=SimpleNamespace(input_tokens=tokens_in, output_tokens=tokens_out),
+    )
+
+
+def test_retryable_classification():
+    assert is_retryable(_StatusError(429))
+    assert is_retryable(_StatusError(529))
+    assert is_retryable(asyncio.TimeoutError())
+    assert not is_retryable(_StatusError(400))
+    assert not is_retryable(ValueError("bad prompt"))
+
+
+@pytest.mark.asyncio
+async def test_retries_transient_errors_with_retry_after():
+    gateway = _gateway()
+    create = AsyncMock(side_effect=[_StatusError(429, retry_after=7), _StatusError(503), _message()])
+    gateway._clients["anthropic"].messages.create = create
+
+    response = await gateway.anthropic_messages(
+        model="claude-sonnet-4-6", max_tokens=100, messages=[{"role": "user", "content": "oi"}]
+    )
+
+    assert response.usage.output_tokens == 5
+    assert create.await_count == 3
+    delays = [c.args[0] for c in gateway._sleep.await_args_list]
+    assert delays[0] == 7.0  # Retry-After respeitado
+    assert 0 <= delays[1] <= 4.0  # jitter em [0, base * 2^2]
+    assert gateway.stats()["retries"] == 2
+
+
+@pytest.mark.asyncio
+async def test_non_retryable_errors_raise_immediately():
+    gateway = _gateway()
+    gateway._clients["anthropic"].messages.create = AsyncMock(side_effect=_StatusError(400))
+
+    with pytest.raises(_StatusError):
+        await gateway.anthropic_messages(model="m", max_tokens=10, messages=[])
+
+    gateway._sleep.assert_not_awaited()
+    assert gateway.stats()["failures"] == 1
+    assert gateway.gate("anthropic").active == 0
+
+
+@pytest.mark.asyncio
+async def test_token_budget_is_settled_with_real_usage():
+    gateway = _gateway(llm_anthropic_tpm=10_000)
+    gateway._clients["anthropic"].messages.create = AsyncMock(return_value=_message(tokens_in=50, tokens_out=50))
+
+    await gateway.anthropic_messages(model="m", max_tokens=4000, messages=[{"role": "user", "content": "x"}])
+
+    bucket = gateway.limiter("anthropic", "m").tokens
+    bucket._refill()
+    assert bucket._tokens == pytest.approx(10_000 - 100, abs=1)
+
+
+@pytest.mark.asyncio
+async def test_failed_call_refunds_token_reservation():
+    gateway = _gateway(llm_anthropic_tpm=10_000, llm_max_retries=1)
+    gateway._clients["anthropic"].messages.create = AsyncMock(side_effect=_StatusError(400))
+
+    with pytest.raises(_StatusError):
+        await gateway.anthropic_messages(model="m", max_tokens=4000, messages=[{"role": "user", "content": "x"}])
+
+    bucket = gateway.limiter("anthropic", "m").tokens
+    bucket._refill()
+    assert bucket._tokens == pytest.approx(10_000, abs=1)
+
+
+def test_anthropic_estimate_counts_text_and_fixed_image_cost():
+    image = {"type": "image", "source": {"type": "base64", "media_type": "image/png", "data": "A" * 400_000}}
+    estimate = LLMGateway._anthropic_estimate({
+        "system": [cache_block("s" * 400)],
+        "messages": [{"role": "user", "content": [image, {"type": "text", "text": "t" * 800}]}],
+        "max_tokens": 1000,
+    })
+
+    assert estimate == 100 + 1600 + 200 + 1 + 1000
+
+
+@pytest.mark.asyncio
+async def test_interactive_jumps_batch_queue_and_keeps_reserved_slot():
+    gateway = _gateway()  # 2 vagas, no máximo 1 para BATCH
+    order = []
+    release = asyncio.Event()
+
+    async def create(**kwargs):
+        order.append(kwargs["model"])
+        await release.wait()
+        return _message()
+
+    gateway._clients["anthropic"].messages.create = create
+
+    with batch_priority():
+        assert current_priority() == Priority.BATCH
+        batch = [
+            asyncio.create_task(gateway.anthropic_messages(model=f"batch-{i}", max_tokens=1, messages=[]))
+            for i in range(3)
+        ]
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(gateway.anthropic_messages(model="interactive", max_tokens=1, messages=[]))
+    await asyncio.sleep(0.01)
+
+    # Um lote em voo; a segunda vaga ficou para a chamada interativa
+    assert order == ["batch-0", "interactive"]
+    assert gateway.gate("anthropic").waiting == 2
+
+    release.set()
+    await asyncio.gather(*batch, interactive)
+    assert sorted(order) == ["batch-0", "batch-1", "batch-2", "interactive"]
+    assert gateway.gate("anthropic").active == 0
+
+
+@pytest.mark.asyncio
+async def test_claude_service_goes_through_gateway():
+    from services.claude_service import ClaudeService
+
+    gateway = _gateway()
+    gateway._clients["anthropic"].messages.create = AsyncMock(
+        return_value=_message(text='```json\n{"tipo_crime": "roubo"}\n```')
+    )
+    with patch("services.claude_service.get_llm_gateway", return_value=gateway), \
+         patch("services.claude_service.get_llm_cache", return_value=LLMResponseCache(disk=None)):
+        result = await ClaudeService().extract("system", "texto")
+
+    assert result == {"tipo_crime": "roubo"}
+    assert gateway.stats()["calls"] == 1
+
+
+@pytest.mark.asyncio
+async def test_prompt_cache_usage_is_tracked():
+    gateway = _gateway()
+    response = _message(tokens_in=200, tokens_out=50)
+    response.usage.cache_read_input_tokens = 3000
+    response.usage.cache_creation_input_tokens = 0
+    gateway._clients["anthropic"].messages.create = AsyncMock(return_value=response)
+
+    await gateway.anthropic_messages(
+        model="m", max_tokens=100, system=[cache_block("prompt estático")], messages=[]
+    )
+
+    assert gateway.stats()["anthropic_prompt_cache"] == {
+        "read_tokens": 3000, "write_tokens": 0, "uncached_input_tokens": 200,
+    }
+
+
+@pytest.mark.asyncio
+async def test_deposition_analysis_marks_static_prefixes_for_caching():
+    from services.analysis_service import DEPOSITION_ANALYSIS_PROMPT, AnalysisService
+
+    gateway = MagicMock()
+    gateway.anthropic_messages = AsyncMock(return_value=_message(text='{"highlights": []}'))
+    svc = AnalysisService()
+    svc.api_key = "a"
+
+    with patch("services.analysis_service.get_llm_gateway", return_value=gateway):
+        await svc.analyze_deposition("transcrição " * 20, case_context="Dossiê: réu João, art. 121")
+
+    kwargs = gateway.anthropic_messages.await_args.kwargs
+    assert kwargs["system"] == [cache_block(DEPOSITION_ANALYSIS_PROMPT)]
+    dossier, transcript = kwargs["messages"][0]["content"]
+    assert dossier["cache_control"] == {"type": "ephemeral"}
+    assert "Dossiê: réu João" in dossier["text"]
+    assert "cache_control" not in transcript
+
+
+@pytest.mark.asyncio
+async def test_case_context_is_built_from_drive_file_processo():
+    from services.supabase_service import SupabaseService
+
+    rows = {
+        "drive_files": [{"processo_id": 9}],
+        "processos": [{"numero_autos": "0001234-56.2024.8.05.0001", "classe_processual": "Ação Penal", "vara": None}],
+        "case_facts": [
+            {"titulo": "Álibi", "descricao": "Réu estava no trabalho", "tipo": "defesa"},
+            {"titulo": "Arma não periciada", "descricao": None, "tipo": None},
+        ],
+    }
+    client = MagicMock()
+    client.table.side_effect = lambda name: MagicMock(**{
+        "select.return_value.eq.return_value.limit.return_value.execute.return_value.data": rows[name],
+        "select.return_value.eq.return_value.eq.return_value.order.return_value"
+        ".limit.return_value.execute.return_value.data": rows[name],
+    })
+    svc = SupabaseService()
+    svc._client = client
+
+    context = await svc.get_case_context(42)
+
+    assert context == (
+        "Processo: 0001234-56.2024.8.05.0001\n"
+        "Classe: Ação Penal\n"
+        "\n"
+        "Fatos do caso:\n"
+        "- [defesa] Álibi: Réu estava no trabalho\n"
+        "- Arma não periciada"
+    )
+    rows["drive_files"] = [{"processo_id": None}]
+    assert await svc.get_case_context(42) is None
+
+
+class _Stream:
+    def __init__(self, chunks, fail_after=None):
+        self.chunks, self.fail_after = chunks, fail_after
+
+    async def __aenter__(self):
+        if self.fail_after == 0:
+            raise self.error
+
+        async def text():
+            for i, chunk in enumerate(self.chunks):
+                if self.fail_after is not None and i == self.fail_after:
+                    raise self.error
+                yield chunk
+        self.text_stream = text()
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def get_final_message(self):
+        return _message(tokens_in=20, tokens_out=30)
+
+
+@pytest.mark.asyncio
+async def test_stream_retries_only_before_first_chunk():
+    gateway = _gateway()
+    failing = _Stream([], fail_after=0)
+    failing.error = _StatusError(529)
+    gateway._clients["anthropic"].messages.stream = MagicMock(side_effect=[failing, _Stream(["{\"a\"", ": 1}"])])
+
+    chunks = [c async for c in gateway.anthropic_stream(model="m", max_tokens=100, messages=[])]
+    assert chunks == ['{"a"', ": 1}"]
+    assert gateway.stats()["retries"] == 1
+
+    broken = _Stream(["{", "x"], fail_after=1)
+    broken.error = _StatusError(529)
+    gateway._clients["anthropic"].messages.stream = MagicMock(return_value=broken)
+    received = []
+    with pytest.raises(_StatusError):
+        async for chunk in gateway.anthropic_stream(model="m", max_tokens=100, messages=[]):
+            received.append(chunk)
+    assert received == ["{"]
+    assert gateway.stats()["failures"] == 1
+    assert gateway.gate("anthropic").active == 0
@@ -0,0 +1,228 @@
+"""
+Testes da telemetria de LLM — registros do gateway, rótulos, ledger e relatório.
+"""
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services.llm_gateway import LLMGateway
+from services.llm_telemetry import (
+    LLMCallRecord,
+    LLMLedger,
+    LLMTelemetry,
+    estimate_cost,
+    llm_prompt,
+    llm_route,
+    summarize,
+)
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers={})
+
+
+def _gateway():
+    settings = SimpleNamespace(
+        gemini_api_key="g", anthropic_api_key="a", openai_api_key="o",
+        gemini_rate_limit=60, llm_gemini_rpm=None, llm_gemini_tpm=1_000_000,
+        llm_anthropic_rpm=10_000, llm_anthropic_tpm=10_000_000,
+        llm_openai_rpm=10_000, llm_openai_tpm=10_000_000,
+        llm_model_limits={}, llm_max_concurrency=2, llm_batch_max_concurrency=1,
+        llm_max_retries=3, llm_retry_base_seconds=1.0, llm_retry_max_seconds=30.0,
+    )
+    gateway = LLMGateway(settings=settings, sleep=AsyncMock())
+    gateway._clients["anthropic"] = MagicMock()
+    return gateway
+
+
+def _message(tokens_in=1000, tokens_out=200, cache_read=0):
+    return SimpleNamespace(
+        content=[SimpleNamespace(text="{}")],
+        usage=SimpleNamespace(
+            input_tokens=tokens_in, output_tokens=tokens_out,
+            cache_read_input_tokens=cache_read, cache_creation_input_tokens=0,
+        ),
+    )
+
+
+@pytest.mark.asyncio
+async def test_gateway_records_labels_tokens_retries_and_cost():
+    telemetry = LLMTelemetry()
+    gateway = _gateway()
+    gateway._clients["anthropic"].messages.create = AsyncMock(
+        side_effect=[_StatusError(529), _message(cache_read=5000)]
+    )
+
+    @llm_prompt("cross_analysis")
+    async def run():
+        # Rótulo interno não sobrescreve o externo
+        with llm_prompt("claude.extract"):
+            return await gateway.anthropic_messages(model="claude-sonnet-4-6", max_tokens=10, messages=[])
+
+    with patch("services.llm_gateway.get_llm_telemetry", return_value=telemetry), \
+         llm_route("POST /api/cross-analyze"):
+        await run()
+
+    [record] = telemetry.records
+    assert (record.provider, record.model, record.status) == ("anthropic", "claude-sonnet-4-6", "ok")
+    assert (record.prompt_id, record.route) == ("cross_analysis", "POST /api/cross-analyze")
+    assert (record.input_tokens, record.output_tokens, record.cache_read_tokens) == (1000, 200, 5000)
+    assert record.retries == 1
+    # 1000 * $3 + 5000 * $0.30 + 200 * $15 por milhão
+    assert record.cost_usd == pytest.approx(0.0075)
+
+
+@pytest.mark.asyncio
+async def test_failures_and_stream_ttft_are_recorded():
+    telemetry = LLMTelemetry()
+    gateway = _gateway()
+    gateway._clients["anthropic"].messages.create = AsyncMock(side_effect=_StatusError(400))
+
+    class _Stream:
+        async def __aenter__(self):
+            async def text():
+                yield '{"a": '
+                await asyncio.sleep(0.02)
+                yield "1}"
+            self.text_stream = text()
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def get_final_message(self):
+            return _message(tokens_in=10, tokens_out=5)
+
+    gateway._clients["anthropic"].messages.stream = MagicMock(return_value=_Stream())
+
+    with patch("services.llm_gateway.get_llm_telemetry", return_value=telemetry):
+        with pytest.raises(_StatusError):
+            await gateway.anthropic_messages(model="m", max_tokens=10, messages=[])
+        _ = [c async for c in gateway.anthropic_stream(model="m", max_tokens=10, messages=[])]
+
+    failed, streamed = telemetry.records
+    assert failed.status == "error" and "HTTP 400" in failed.error
+    assert streamed.status == "ok" and streamed.output_tokens == 5
+    assert streamed.ttft_ms is not None and streamed.latency_ms >= streamed.ttft_ms + 15
+    assert streamed.cost_usd is None  # modelo sem preço
+
+
+@pytest.mark.asyncio
+async def test_latency_covers_only_the_provider_request():
+    telemetry = LLMTelemetry()
+    gateway = _gateway()
+    gateway._sleep = lambda _delay: asyncio.sleep(0.2)  # backoff real
+    gateway._clients["anthropic"].messages.create = AsyncMock(side_effect=[_StatusError(529), _message()])
+
+    with patch("services.llm_gateway.get_llm_telemetry", return_value=telemetry):
+        await gateway.anthropic_messages(model="m", max_tokens=10, messages=[])
+
+    [record] = telemetry.records
+    assert record.retries == 1
+    assert record.latency_ms < 100
+
+
+@pytest.mark.asyncio
+async def test_stream_prompt_id_is_set_by_the_gateway_call():
+    telemetry = LLMTelemetry()
+    gateway = _gateway()
+
+    class _Stream:
+        async def __aenter__(self):
+            async def text():
+                yield "{}"
+            self.text_stream = text()
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def get_final_message(self):
+            return _message()
+
+    gateway._clients["anthropic"].messages.stream = MagicMock(side_effect=lambda **_: _Stream())
+
+    with patch("services.llm_gateway.get_llm_telemetry", return_value=telemetry):
+        _ = [c async for c in gateway.anthropic_stream(prompt_id="cross_analysis", model="m", max_tokens=10, messages=[])]
+        with llm_prompt("enrichment.cross"):
+            _ = [c async for c in gateway.anthropic_stream(prompt_id="cross_analysis", model="m", max_tokens=10, messages=[])]
+
+    assert [r.prompt_id for r in telemetry.records] == ["cross_analysis", "enrichment.cross"]
+
+
+def test_cost_uses_longest_prefix_and_overrides():
+    opus = LLMCallRecord("anthropic", "claude-opus-4-20250514", input_tokens=1_000_000)
+    assert estimate_cost(opus) == 15.0
+    assert estimate_cost(opus, {"claude-opus-4-2025": (1.0, 1.0)}) == 1.0
+    flash = LLMCallRecord("gemini", "gemini-2.5-flash", output_tokens=1_000_000, cache_read_tokens=10**6)
+    assert estimate_cost(flash) == 2.5  # cache só é cobrado à parte na Anthropic
+
+
+def _records():
+    telemetry = LLMTelemetry(buffer_size=3)
+    with llm_prompt("radar.extraction"):
+        for latency in (100, 200, 300, 400):
+            telemetry.record(LLMCallRecord("anthropic", "claude-sonnet-4-6", latency_ms=latency, input_tokens=10))
+        telemetry.record_cache_hit()
+    return telemetry
+
+
+def test_ring_buffer_and_summary():
+    telemetry = _records()
+    assert telemetry.recorded == 5
+    assert len(telemetry.records) == 3  # ring buffer
+
+    [row] = telemetry.summary(by="prompt_id")
+    assert row["prompt_id"] == "radar.extraction"
+    assert (row["calls"], row["cache_hits"], row["input_tokens"]) == (2, 1, 20)
+    assert row["latency_p50_ms"] == 350.0
+
+
+def test_ledger_roundtrip_and_cli_report(tmp_path, capsys):
+    from scripts import llm_report
+
+    ledger = LLMLedger(tmp_path / "ledger.db")
+    telemetry = LLMTelemetry(ledger=ledger)
+    with llm_route("POST /api/juri/extrair"):
+        telemetry.record(LLMCallRecord("anthropic", "claude-sonnet-4-6", latency_ms=1200, output_tokens=100))
+        telemetry.record(LLMCallRecord("anthropic", "claude-sonnet-4-6", status="error", latency_ms=50))
+    ledger.close()
+
+    rows = summarize(LLMLedger(tmp_path / "ledger.db").read(), by="route")
+    assert rows[0]["route"] == "POST /api/juri/extrair"
+    assert (rows[0]["calls"], rows[0]["errors"]) == (2, 1)
+
+    with patch("sys.argv", ["llm_report.py", "--ledger", str(tmp_path / "ledger.db"), "--by", "route"]):
+        assert llm_report.main() == 0
+    out = capsys.readouterr().out
+    assert "2 records" in out and "POST /api/juri/extrair" in out
+
+
+def test_ledger_writes_off_thread_in_batches(tmp_path):
+    ledger = LLMLedger(tmp_path / "ledger.db")
+    for i in range(50):
+        ledger.write(LLMCallRecord("openai", "gpt-4o", input_tokens=i))
+
+    rows = ledger.read()  # espera a thread gravadora
+    assert [r["input_tokens"] for r in rows] == list(range(50))
+    ledger.close()
+
+
+def test_metrics_endpoint():
+    from routers import metrics
+
+    app = FastAPI()
+    app.include_router(metrics.router)
+    with patch("routers.metrics.get_llm_telemetry", return_value=_records()):
+        body = TestClient(app).get("/metrics/llm", params={"by": "model", "recent": 2}).json()
+
+    assert body["summary"][0]["model"] == "claude-sonnet-4-6"
+    assert len(body["recent"]) == 2
+    assert body["telemetry"]["recorded"] == 5
@@ -0,0 +1,81 @@
+"""
+Testes da extração map-reduce — divisão por headings e fusão de JSON.
+"""
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from services.chunking import split_sections
+from services.llm_cache import LLMResponseCache
+from services.map_reduce_extraction import merge_extractions
+
+
+def _document():
+    return (
+        "# DENÚNCIA\n\nO Ministério Público oferece denúncia contra JOÃO.\n\n"
+        "## DOS FATOS\n\n" + "Fato narrado em detalhe. " * 20 + "\n\n"
+        "## DO DIREITO\n\n" + "Fundamentação jurídica. " * 20 + "\n\n"
+        "## DOS PEDIDOS\n\nRequer a condenação."
+    )
+
+
+def test_split_sections_cuts_on_headings_without_losing_text():
+    doc = _document()
+    sections = split_sections(doc, max_chars=600)
+
+    assert len(sections) == 2
+    assert sections[0].startswith("# DENÚNCIA") and "## DOS FATOS" in sections[0]
+    assert sections[1].startswith("## DO DIREITO") and "## DOS PEDIDOS" in sections[1]
+    assert all(len(s) <= 600 for s in sections)
+    assert "".join(doc.split()) == "".join("".join(sections).split())
+
+
+def test_split_sections_falls_back_to_paragraphs_and_hard_cut():
+    text = "\n\n".join(["parágrafo " * 10] * 5) + "\n\n" + "x" * 250
+    sections = split_sections(text, max_chars=120)
+    assert all(len(s) <= 120 for s in sections)
+    assert "".join(text.split()) == "".join("".join(sections).split())
+    assert split_sections("curto", max_chars=120) == ["curto"]
+
+
+def test_merge_extractions_preserves_schema():
+    partials = [
+        {"tipo": "denuncia", "reu": {"nome": "JOÃO", "cpf": None}, "testemunhas": ["Ana", "Bruno"], "confidence": 0.9},
+        {"tipo": "denuncia", "reu": {"nome": None, "cpf": "123"}, "testemunhas": ["Bruno", "Carla"], "confidence": 0.7},
+        {"tipo": "sentenca", "reu": None, "testemunhas": [], "confidence": 0.7},
+    ]
+    merged = merge_extractions(partials)
+    assert merged == {
+        "tipo": "denuncia",
+        "reu": {"nome": "JOÃO", "cpf": "123"},
+        "testemunhas": ["Ana", "Bruno", "Carla"],
+        "confidence": 0.7,
+    }
+
+
+@pytest.mark.asyncio
+async def test_long_context_is_extracted_per_section_and_merged():
+    from services.gemini_service import GeminiService
+
+    replies = iter([
+        {"fatos": ["fato A", "fato B"], "crime": "roubo"},
+        {"fatos": ["fato A", "fato C"], "crime": None},
+    ])
+    gateway = MagicMock()
+    gateway.gemini_generate = AsyncMock(
+        side_effect=lambda **kwargs: SimpleNamespace(text=json.dumps(next(replies)))
+    )
+    svc = GeminiService()
+    svc.settings = svc.settings.model_copy(update={"max_text_length": 800})
+
+    with patch("services.gemini_service.get_llm_gateway", return_value=gateway), \
+         patch("services.gemini_service.get_llm_cache", return_value=LLMResponseCache(disk=None)):
+        result = await svc.extract("Extraia os fatos.", _document())
+
+    assert gateway.gemini_generate.await_count == 2
+    prompts = [c.kwargs["contents"] for c in gateway.gemini_generate.await_args_list]
+    assert all(len(p) <= 800 for p in prompts)
+    assert "[Trecho 1 de 2" in prompts[0]
+    assert result == {"fatos": ["fato A", "fato B", "fato C"], "crime": "roubo"}
@@ -0,0 +1,68 @@
+"""
+Testes da atribuição de speakers por varredura ordenada.
+"""
+import random
+
+import pytest
+
+from services.speaker_merge import DEFAULT_SPEAKER, assign_speakers
+
+
+def _brute_force(segments, turns):
+    """Referência quadrática: maior sobreposição total por speaker."""
+    out = []
+    for seg in segments:
+        totals = {}
+        for t in sorted(turns, key=lambda t: t["start"]):
+            overlap = min(seg["end"], t["end"]) - max(seg["start"], t["start"])
+            if overlap > 0:
+                totals[t["speaker"]] = totals.get(t["speaker"], 0.0) + overlap
+        out.append(max(totals, key=totals.__getitem__) if totals else DEFAULT_SPEAKER)
+    return out
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_sweep_matches_brute_force(seed):
+    rng = random.Random(seed)
+    segments = []
+    for _ in range(300):
+        start = rng.uniform(0, 1800)
+        segments.append({"start": start, "end": start + rng.uniform(0, 12), "text": "a b"})
+    turns = []
+    for _ in range(120):
+        start = rng.uniform(0, 1800)
+        turns.append({"start": start, "end": start + rng.uniform(0.5, 60), "speaker": f"S{rng.randrange(4)}"})
+
+    result = assign_speakers(segments, turns)
+
+    assert [s["text"] for s in result] == ["a b"] * 300
+    assert [s["start"] for s in result] == [s["start"] for s in segments]  # ordem original
+    assert [s["speaker"] for s in result] == _brute_force(segments, turns)
+
+
+def test_segment_is_split_at_speaker_change():
+    segments = [{"start": 10.0, "end": 20.0, "text": "um dois três quatro cinco seis sete oito nove dez", "id": 7}]
+    turns = [
+        {"start": 0.0, "end": 14.0, "speaker": "JUIZ"},
+        {"start": 14.2, "end": 14.6, "speaker": "REU"},  # interjeição curta: não divide
+        {"start": 14.6, "end": 30.0, "speaker": "DEFESA"},
+    ]
+
+    parts = assign_speakers(segments, turns, split_min_seconds=1.0)
+
+    assert [(p["speaker"], p["start"], p["end"]) for p in parts] == [
+        ("JUIZ", 10.0, pytest.approx(14.3)), ("DEFESA", pytest.approx(14.3), 20.0),
+    ]
+    assert parts[0]["text"] == "um dois três quatro"
+    assert parts[1]["text"] == "cinco seis sete oito nove dez"
+    assert all(p["id"] == 7 for p in parts)
+    # Sem divisão: speaker dominante
+    [whole] = assign_speakers(segments, turns)
+    assert whole["speaker"] == "DEFESA"
+
+
+def test_segments_without_overlap_get_default_speaker():
+    segments = [{"start": 5.0, "end": 6.0, "text": "oi"}, {"start": 50.0, "end": 51.0, "text": "tchau"}]
+    turns = [{"start": 0.0, "end": 5.5, "speaker": "A"}]
+
+    assert [s["speaker"] for s in assign_speakers(segments, turns, 1.0)] == ["A", DEFAULT_SPEAKER]
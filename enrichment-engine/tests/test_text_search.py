@@ -0,0 +1,82 @@
+"""
+Testes da busca textual (BM25 + RRF) e da busca híbrida no VectorIndex.
+"""
+import numpy as np
+
+from services.text_search import BM25Index, reciprocal_rank_fusion, term_frequencies, tokenize_pt
+from services.vector_index import VectorIndex
+
+
+def test_tokenizer_folds_accents_and_keeps_legal_citations():
+    tokens = tokenize_pt("Roubo majorado (art. 157, §2º) — proc. 8001234-56.2024.8.05.0001. Decisões")
+    assert "80012345620248050001" in tokens
+    assert "art157" in tokens
+    assert "§2" in tokens
+    assert "decisao" in tokens
+
+    assert set(tokenize_pt("artigo 157 § 2o")) >= {"art157", "§2"}
+    assert tokenize_pt("Legítima DEFESA") == tokenize_pt("legitima defesa")
+    assert "de" not in tokenize_pt("legítima de defesa")
+
+
+def test_bm25_ranks_rare_terms_higher():
+    docs = [
+        "O réu nega a autoria do roubo.",
+        "Testemunha confirma o roubo na praça.",
+        "Processo 8001234-56.2024.8.05.0001 trata de roubo majorado.",
+    ]
+    index = BM25Index([term_frequencies(d) for d in docs])
+
+    scores = index.scores("8001234-56.2024.8.05.0001")
+    assert int(np.argmax(scores)) == 2
+    assert scores[0] == scores[1] == 0
+
+    assert (index.scores("roubo") > 0).all()
+    assert not index.scores("inexistente").any()
+
+
+def test_reciprocal_rank_fusion_weights():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "c"]], k=60)
+    assert fused[0][0] == "b"  # bem posicionado nas duas listas
+
+    text_only = reciprocal_rank_fusion([["a", "b"], ["b", "a"]], weights=[0.0, 1.0])
+    assert [item for item, _ in text_only] == ["b", "a"]
+
+
+def test_hybrid_search_recovers_exact_citation_missed_by_vectors():
+    rng = np.random.default_rng(0)
+    query_vec = rng.normal(size=8)
+    rows = []
+    for i in range(30):
+        # Vetores próximos da query, mas sem a citação
+        rows.append({
+            "id": i, "entity_type": "documento", "processo_id": 1,
+            "content_text": "Trecho genérico sobre o caso",
+            "embedding": (query_vec + rng.normal(scale=0.1, size=8)).tolist(),
+        })
+    rows.append({
+        "id": 99, "entity_type": "anotacao", "processo_id": 2,
+        "content_text": "Incidência do art. 157 § 2º, II do Código Penal",
+        "embedding": (-query_vec).tolist(),
+    })
+    index = VectorIndex(dimensions=8)
+    index.load(3, rows)
+
+    vector_only = index.search(3, query_vec.tolist(), limit=5)
+    assert 99 not in {h["id"] for h in vector_only}
+
+    hybrid = index.hybrid_search(3, "artigo 157 §2", query_vec.tolist(), limit=5, depth=10)
+    assert 99 in {h["id"] for h in hybrid}
+    cited = next(h for h in hybrid if h["id"] == 99)
+    assert cited["text_score"] > 0 and cited["vector_score"] is None
+
+    text_weighted = index.hybrid_search(
+        3, "artigo 157 §2", query_vec.tolist(), limit=5, vector_weight=0.2, text_weight=1.0
+    )
+    assert text_weighted[0]["id"] == 99
+
+    filtered = index.hybrid_search(
+        3, "artigo 157 §2", query_vec.tolist(), limit=5, processo_id=1
+    )
+    assert 99 not in {h["id"] for h in filtered}
+    assert len(filtered) == 5
@@ -9,22 +9,39 @@ import pytest
 from services.transcription_service import TranscriptionService
 
 
+def _settings(**overrides):
+    """Settings mínimos do TranscriptionService."""
+    base = dict(
+        openai_api_key="test-key",
+        whisper_model="whisper-1",
+        whisper_max_file_size_mb=23,
+        whisper_max_concurrency=4,
+        whisper_rpm=50,
+        whisper_chunk_min_seconds=300,
+        whisper_chunk_max_seconds=1200,
+        whisper_chunk_overlap_seconds=2.0,
+        whisper_timeout_seconds=300,
+        transcription_language="pt",
+        diarization_enabled=False,
+        diarization_pool_size=0,
+        diarization_pool_queue_size=4,
+        diarization_job_timeout=1800,
+        diarization_timeout_per_audio_second=0.5,
+        diarization_split_min_seconds=0.0,
+        hf_token=None,
+        gemini_api_key="test-gemini-key",
+        gemini_model="gemini-2.5-flash",
+    )
+    base.update(overrides)
+    return MagicMock(**base)
+
+
 @pytest.fixture
 def service():
     """TranscriptionService com settings mínimos."""
-    with patch("services.transcription_service.get_settings") as mock_settings:
-        mock_settings.return_value = MagicMock(
-            openai_api_key="test-key",
-            whisper_model="whisper-1",
-            whisper_max_file_size_mb=23,
-            transcription_language="pt",
-            diarization_enabled=False,
-            hf_token=None,
-            gemini_api_key="test-gemini-key",
-            gemini_model="gemini-2.5-flash",
-        )
-        with patch("services.transcription_service.OpenAI"):
-            svc = TranscriptionService()
+    with patch("services.transcription_service.get_settings", return_value=_settings()), \
+         patch("services.transcription_service.OpenAI"):
+        svc = TranscriptionService()
     return svc
 
 
@@ -220,3 +237,272 @@ async def test_whisper_no_retry_on_client_error(service, tmp_path):
             await service._whisper_with_retry(audio, "pt")
 
     assert call_count == 1  # sem retry para 4xx
+
+
+# ── Chunked Whisper com segmentação via ffmpeg ───────────────────
+
+@pytest.mark.asyncio
+async def test_chunked_plans_adaptive_chunks_and_cleans_up(service, tmp_path):
+    from services.audio_segmenter import AudioChunk, AudioInfo, ChunkPlan
+
+    audio = tmp_path / "audiencia.mp3"
+    audio.write_bytes(b"fake")
+    created = {}
+    plans = [ChunkPlan(0, 0.0, 1200.03, 0.0, 1200.03), ChunkPlan(1, 1200.03, 2000.0, 1200.03, 2000.0)]
+
+    def fake_segment(src, out_dir, chunk_plans, info):
+        created["dir"] = out_dir
+        chunks = []
+        for p in chunk_plans:
+            path = out_dir / f"chunk_{p.index:04d}.mp3"
+            path.write_bytes(b"mp3")
+            chunks.append(AudioChunk(p.index, path, p.start, p.end - p.start, p.own_start, p.own_end))
+        return chunks
+
+    async def fake_whisper(path, lang):
+        if path.name == "chunk_0001.mp3":
+            raise RuntimeError("timeout")
+        return {"text": "olá", "segments": [{"start": 1.0, "end": 2.0, "text": "olá"}]}
+
+    with patch("services.transcription_service.audio_segmenter.probe", return_value=AudioInfo(2000.0)), \
+         patch("services.transcription_service.audio_segmenter.plan_chunks", return_value=plans) as plan, \
+         patch("services.transcription_service.audio_segmenter.segment_audio", side_effect=fake_segment), \
+         patch.object(service, "_whisper_with_retry", side_effect=fake_whisper):
+        result = await service._transcribe_chunked_parallel(audio, "audiencia.mp3", "pt", False, None)
+
+    # 2000s com 4 requisições simultâneas → chunks de 500s
+    assert plan.call_args.args[2] == 500
+    assert result["chunks_total"] == 2 and result["integrity"] == "partial"
+    first, placeholder = result["segments"]
+    assert first["start"] == 1.0
+    assert (placeholder["start"], placeholder["end"]) == (1200.03, 2000.0)
+    assert not created["dir"].exists()
+
+
+def test_stitching_dedupes_segments_in_the_overlap(service):
+    from services.audio_segmenter import AudioChunk
+
+    # Corte forçado em 600s com 2s de sobreposição
+    left = AudioChunk(0, Path("a.mp3"), 0.0, 602.0, 0.0, 600.0)
+    right = AudioChunk(1, Path("b.mp3"), 598.0, 402.0, 600.0, 1000.0)
+    stitched = []
+    service._stitch_chunk_segments(stitched, [
+        {"start": 590.0, "end": 597.0, "text": "o réu chegou"},
+        {"start": 597.5, "end": 601.5, "text": "às dez horas"},  # meio em 599.5 → esquerda
+    ], left)
+    kept = service._stitch_chunk_segments(stitched, [
+        {"start": 598.0, "end": 601.0, "text": "Às dez  horas"},  # meio em 599.5 → já é da esquerda
+        {"start": 600.4, "end": 602.0, "text": "às dez horas"},  # repetição na costura
+        {"start": 602.0, "end": 606.0, "text": "e saiu"},
+    ], right)
+
+    assert [s["text"] for s in stitched] == ["o réu chegou", "às dez horas", "e saiu"]
+    assert [s["text"] for s in kept] == ["e saiu"]
+
+
+def test_stitching_clamps_segments_that_run_past_the_chunk(service):
+    from services.audio_segmenter import AudioChunk
+
+    # Corte em silêncio (snap) em 600s, sem sobreposição
+    left = AudioChunk(0, Path("a.mp3"), 0.0, 600.0, 0.0, 600.0)
+    right = AudioChunk(1, Path("b.mp3"), 600.0, 400.0, 600.0, 1000.0)
+    stitched = []
+    # Whisper esticou o último segmento além do fim do arquivo: meio em 601.5
+    kept = service._stitch_chunk_segments(stitched, [
+        {"start": 596.0, "end": 607.0, "text": "confirmo o que disse"},
+    ], left)
+    service._stitch_chunk_segments(stitched, [
+        {"start": 598.0, "end": 603.0, "text": "e nada mais"},  # começa antes do chunk
+    ], right)
+
+    assert [(s["text"], s["start"], s["end"]) for s in stitched] == [
+        ("confirmo o que disse", 596.0, 600.0), ("e nada mais", 600.0, 603.0),
+    ]
+    assert kept[0]["end"] == 600.0
+
+
+# ── Whisper fora do event loop ───────────────────────────────────
+
+@pytest.mark.asyncio
+async def test_whisper_chunks_run_in_parallel_without_blocking_the_loop(service, tmp_path):
+    import asyncio
+    import time
+
+    from services.llm_telemetry import _prompt_id, llm_prompt
+
+    audio = tmp_path / "audio.mp3"
+    audio.write_bytes(b"fake")
+    labels = []
+
+    def slow_transcribe(path, lang):
+        labels.append(_prompt_id.get())
+        time.sleep(0.3)  # upload + transcrição síncronos do SDK
+        return {"text": "ok", "segments": []}
+
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    tick_task = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    with patch.object(service, "_transcribe_whisper", side_effect=slow_transcribe), llm_prompt("job.test"):
+        results = await asyncio.gather(*(service._whisper_with_retry(audio, "pt") for _ in range(4)))
+    elapsed = time.perf_counter() - start
+    tick_task.cancel()
+
+    assert [r["text"] for r in results] == ["ok"] * 4
+    assert elapsed < 0.9  # 4 × 0.3s em paralelo, não 1.2s em série
+    assert ticks >= 10  # event loop seguiu respondendo
+    assert labels == ["job.test"] * 4
+
+
+@pytest.mark.asyncio
+async def test_whisper_timeout_is_retried_then_raised(service, tmp_path):
+    import asyncio
+    import time
+
+    audio = tmp_path / "audio.mp3"
+    audio.write_bytes(b"fake")
+    service.whisper_timeout = 0.05
+    calls = 0
+
+    def hung_transcribe(path, lang):
+        nonlocal calls
+        calls += 1
+        time.sleep(0.2)
+
+    with patch.object(service, "_transcribe_whisper", side_effect=hung_transcribe), \
+         patch("services.transcription_service.asyncio.sleep", new_callable=AsyncMock):
+        with pytest.raises(asyncio.TimeoutError):
+            await service._whisper_with_retry(audio, "pt")
+
+    assert calls == 3
+
+
+@pytest.mark.asyncio
+async def test_whisper_timeout_does_not_count_time_queued_in_the_executor(service, tmp_path):
+    import asyncio
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    audio = tmp_path / "audio.mp3"
+    audio.write_bytes(b"fake")
+    service._whisper_executor = ThreadPoolExecutor(max_workers=1)
+    service.whisper_timeout = 0.25
+
+    def transcribe(path, lang):
+        time.sleep(0.15)
+        return {"text": "ok", "segments": []}
+
+    with patch.object(service, "_transcribe_whisper", side_effect=transcribe):
+        # 3 jobs numa thread: o último espera 0.3s na fila, mas roda em 0.15s
+        results = await asyncio.gather(*(service._run_whisper(audio, "pt") for _ in range(3)))
+
+    assert [r["text"] for r in results] == ["ok"] * 3
+    service._whisper_executor.shutdown()
+
+
+def test_whisper_client_has_no_sdk_retries():
+    with patch("services.transcription_service.get_settings", return_value=_settings(openai_api_key="sk-test")), \
+         patch("services.transcription_service.OpenAI") as client_cls:
+        TranscriptionService()
+
+    assert client_cls.call_args.kwargs == {"api_key": "sk-test", "max_retries": 0}
+
+
+def test_whisper_request_carries_timeout(service, tmp_path):
+    audio = tmp_path / "audio.mp3"
+    audio.write_bytes(b"fake")
+    create = service.openai_client.audio.transcriptions.create
+    create.return_value = MagicMock(text="oi", segments=[], language="pt", duration=1.0)
+
+    assert service._transcribe_whisper(audio, "pt")["text"] == "oi"
+    assert create.call_args.kwargs["timeout"] == 300
+
+
+# ── Diarização em paralelo ao Whisper ────────────────────────────
+
+@pytest.mark.asyncio
+async def test_diarization_runs_concurrently_with_whisper(service, tmp_path):
+    import asyncio
+    import time
+
+    audio = tmp_path / "audio.mp3"
+    audio.write_bytes(b"fake")
+    service.diarization_enabled, service.hf_token = True, "hf"
+
+    async def slow_whisper(path, lang):
+        await asyncio.sleep(0.3)
+        return {"text": "bom dia", "segments": [{"start": 0.0, "end": 2.0, "text": "bom dia"}]}
+
+    async def slow_diarize(path, expected):
+        await asyncio.sleep(0.3)
+        return [{"start": 0.0, "end": 2.0, "speaker": "SPEAKER_01"}]
+
+    start = time.perf_counter()
+    with patch.object(service, "_whisper_with_retry", side_effect=slow_whisper), \
+         patch.object(service, "_diarize_async", side_effect=slow_diarize):
+        result = await service._transcribe_with_whisper_retry(audio, "audio.mp3", "pt", True, 2)
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.5  # max(Whisper, diarização), não a soma
+    assert result["speakers"] == ["SPEAKER_01"] and result["diarization_applied"] is True
+
+
+@pytest.mark.asyncio
+async def test_diarization_failure_keeps_transcript_and_whisper_failure_cancels_it(service, tmp_path):
+    import asyncio
+
+    audio = tmp_path / "audio.mp3"
+    audio.write_bytes(b"fake")
+    service.diarization_enabled, service.hf_token = True, "hf"
+    whisper_ok = AsyncMock(return_value={"text": "oi", "segments": [{"start": 0.0, "end": 1.0, "text": "oi"}]})
+
+    with patch.object(service, "_whisper_with_retry", whisper_ok), \
+         patch.object(service, "_diarize_async", side_effect=RuntimeError("Diarization timed out after 1800s")):
+        result = await service._transcribe_with_whisper_retry(audio, "audio.mp3", "pt", True, None)
+    assert result["diarization_applied"] is False and result["speakers"] == ["SPEAKER_0"]
+
+    cancelled = asyncio.Event()
+
+    async def hung_diarize(path, expected):
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def failing_whisper(path, lang):
+        await asyncio.sleep(0.05)
+        raise RuntimeError("whisper down")
+
+    with patch.object(service, "_whisper_with_retry", side_effect=failing_whisper), \
+         patch.object(service, "_diarize_async", side_effect=hung_diarize):
+        with pytest.raises(RuntimeError, match="whisper down"):
+            await service._transcribe_with_whisper_retry(audio, "audio.mp3", "pt", True, None)
+        await asyncio.sleep(0)
+    assert cancelled.is_set()
+
+
+@pytest.mark.asyncio
+async def test_pool_diarization_timeout_scales_with_audio_duration(service, tmp_path):
+    from services.audio_segmenter import AudioInfo
+
+    audio = tmp_path / "audio.mp3"
+    audio.write_bytes(b"fake")
+    pool = MagicMock(busy=0, waiting=0)
+    pool.diarize = AsyncMock(return_value=[])
+
+    with patch.object(service, "_get_diarization_pool", return_value=pool), \
+         patch("services.transcription_service.audio_segmenter.probe", return_value=AudioInfo(duration=6 * 3600)):
+        await service._diarize_async(audio, 3)
+    assert pool.diarize.call_args.kwargs["timeout"] == 1800 + 0.5 * 6 * 3600
+
+    with patch.object(service, "_get_diarization_pool", return_value=pool), \
+         patch("services.transcription_service.audio_segmenter.probe", side_effect=RuntimeError("ffprobe")):
+        await service._diarize_async(audio, 3)
+    assert pool.diarize.call_args.kwargs["timeout"] == 1800
@@ -0,0 +1,162 @@
+"""
+Testes do VectorIndex — NumPy puro, Supabase mockado.
+"""
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import numpy as np
+import pytest
+
+from services.embedding_service import EmbeddingService
+from services.vector_index import VectorIndex
+
+DIMS = 16
+
+
+def _rows(n, seed=0, start_id=1):
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            "id": start_id + i,
+            "entity_type": "documento" if i % 2 else "anotacao",
+            "entity_id": 100 + i,
+            "assistido_id": 3,
+            "processo_id": 7 if i % 3 == 0 else 8,
+            "chunk_index": 0,
+            "content_text": f"chunk {start_id + i}",
+            "metadata": {},
+            "embedding": rng.normal(size=DIMS).tolist(),
+        }
+        for i in range(n)
+    ]
+
+
+def _brute_force(rows, query, limit, predicate=lambda r: True):
+    q = np.asarray(query) / np.linalg.norm(query)
+    scored = [
+        (float(np.dot(np.asarray(r["embedding"]) / np.linalg.norm(r["embedding"]), q)), r["id"])
+        for r in rows if predicate(r)
+    ]
+    return [row_id for _, row_id in sorted(scored, reverse=True)[:limit]]
+
+
+def test_exact_search_matches_brute_force_with_filters():
+    rows = _rows(300)
+    index = VectorIndex(dimensions=DIMS)
+    index.load(3, rows)
+    query = np.random.default_rng(1).normal(size=DIMS).tolist()
+
+    hits = index.search(3, query, limit=10)
+    assert [h["id"] for h in hits] == _brute_force(rows, query, 10)
+    assert hits[0]["score"] >= hits[-1]["score"]
+    assert "embedding" not in hits[0]
+
+    filtered = index.search(3, query, limit=5, processo_id=7, entity_types=["documento"])
+    expected = _brute_force(
+        rows, query, 5,
+        lambda r: r["processo_id"] == 7 and r["entity_type"] == "documento",
+    )
+    assert [h["id"] for h in filtered] == expected
+
+
+def test_ivf_partition_keeps_high_recall():
+    rows = _rows(4000, seed=2)
+    index = VectorIndex(dimensions=DIMS, ivf_min_rows=1000, nprobe=16)
+    index.load(3, rows)
+    assert index.stats()["ivf_partitions"] == 1
+
+    rng = np.random.default_rng(3)
+    recall = []
+    for _ in range(20):
+        query = rng.normal(size=DIMS).tolist()
+        got = {h["id"] for h in index.search(3, query, limit=10)}
+        recall.append(len(got & set(_brute_force(rows, query, 10))) / 10)
+    assert np.mean(recall) >= 0.9
+
+
+def test_unknown_partition_returns_none():
+    assert VectorIndex(dimensions=DIMS).search(99, [0.0] * DIMS) is None
+
+
+def _supabase_with(light_pages, full_rows):
+    supabase = MagicMock()
+    query = supabase.table.return_value.select.return_value
+    query.eq.return_value.order.return_value.range.return_value.execute.side_effect = [
+        MagicMock(data=page) for page in light_pages
+    ]
+    query.in_.return_value.execute.side_effect = [MagicMock(data=rows) for rows in full_rows]
+    return supabase
+
+
+def _light(rows):
+    return [{k: v for k, v in r.items() if k not in ("embedding", "content_text")} for r in rows]
+
+
+@pytest.mark.asyncio
+async def test_incremental_sync_fetches_only_new_vectors():
+    first = _rows(3)
+    added = _rows(1, seed=9, start_id=50)
+    supabase = _supabase_with(
+        light_pages=[_light(first), _light(first[1:] + added)],
+        full_rows=[first, added],
+    )
+    index = VectorIndex(dimensions=DIMS, refresh_seconds=3600)
+
+    await index.ensure_partition(supabase, 3)
+    await index.ensure_partition(supabase, 3)  # fresca: sem nova leitura
+    assert index.stats()["syncs"] == 1
+
+    index.mark_stale(3)
+    await index.ensure_partition(supabase, 3)
+
+    in_calls = supabase.table.return_value.select.return_value.in_.call_args_list
+    assert [c.args[1] for c in in_calls] == [[1, 2, 3], [50]]
+    hits = index.search(3, added[0]["embedding"], limit=10)
+    assert hits[0]["id"] == 50
+    assert {h["id"] for h in hits} == {2, 3, 50}
+
+
+@pytest.mark.asyncio
+async def test_embedding_service_uses_fast_path_and_falls_back():
+    rows = _rows(20)
+    supabase = _supabase_with(light_pages=[_light(rows)], full_rows=[rows])
+    supabase.rpc.return_value.execute.return_value = MagicMock(data=[{"id": "rpc"}])
+    svc = EmbeddingService(supabase)
+    svc.generate_embedding = AsyncMock(return_value=rows[4]["embedding"])
+    index = VectorIndex(dimensions=DIMS)
+
+    with patch("services.embedding_service.get_vector_index", return_value=index), \
+            patch("services.embedding_service.settings") as mock_settings:
+        mock_settings.vector_index_enabled = True
+        local = await svc.search("tese", filters={"assistido_id": 3}, limit=3)
+        unfiltered = await svc.search("tese", filters={}, limit=3)
+
+        index.search = MagicMock(side_effect=RuntimeError("boom"))
+        fallback = await svc.search("tese", filters={"assistido_id": 3}, limit=3)
+
+    assert local[0]["id"] == 5
+    assert unfiltered == [{"id": "rpc"}]
+    assert fallback == [{"id": "rpc"}]
+    assert supabase.rpc.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_byte_cap_evicts_lru_and_skips_oversized_partitions():
+    small = _rows(10)
+    big = _rows(200, seed=4, start_id=1000)
+    index = VectorIndex(dimensions=DIMS, refresh_seconds=3600)
+    index.load(1, small)
+    index.load(2, small)
+    one = index._partitions[1].nbytes
+    index.max_bytes = one * 2 + 1
+
+    index.load(3, small)  # excede o teto: sai o menos recente (1)
+    assert list(index._partitions) == [2, 3]
+    assert index.stats()["bytes"] == one * 2
+
+    supabase = _supabase_with(light_pages=[_light(big)], full_rows=[])
+    await index.ensure_partition(supabase, 4)
+    await index.ensure_partition(supabase, 4)  # recusada há pouco: nem relê
+    assert index.search(4, big[0]["embedding"]) is None
+    supabase.table.return_value.select.return_value.in_.assert_not_called()
+    assert supabase.table.return_value.select.return_value.eq.call_count == 1
+    assert list(index._partitions) == [2, 3]
@@ -528,8 +528,16 @@ IMPORTANTE:
 # GEMINI ANALYSIS
 # ==========================================
 
+# Tokens de prompt caching acumulados no lote (impressos no resumo)
+PROMPT_CACHE_USAGE = {"cache_read": 0, "cache_write": 0, "input": 0}
+
+
 def _call_anthropic(model: str, system: str, user: str, max_tokens: int = 8192, temperature: float = 0.2) -> str:
-    """Chama API Anthropic e retorna texto da resposta."""
+    """
+    Chama API Anthropic e retorna texto da resposta.
+    O system prompt (igual para todos os processos do lote) vai com
+    cache_control: a partir da 2ª chamada é lido do cache do provedor.
+    """
     resp = httpx.post(
         "https://api.anthropic.com/v1/messages",
         headers={
@@ -541,13 +549,22 @@ def _call_anthropic(model: str, system: str, user: str, max_tokens: int = 8192,
             "model": model,
             "max_tokens": max_tokens,
             "temperature": temperature,
-            "system": system,
+            "system": [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}],
             "messages": [{"role": "user", "content": user}],
         },
         timeout=600,
     )
     resp.raise_for_status()
-    return resp.json()["content"][0]["text"]
+    data = resp.json()
+    usage = data.get("usage") or {}
+    cache_read = usage.get("cache_read_input_tokens") or 0
+    cache_write = usage.get("cache_creation_input_tokens") or 0
+    PROMPT_CACHE_USAGE["cache_read"] += cache_read
+    PROMPT_CACHE_USAGE["cache_write"] += cache_write
+    PROMPT_CACHE_USAGE["input"] += usage.get("input_tokens") or 0
+    log.info("  🧮 Tokens %s: in=%s out=%s cache_read=%d cache_write=%d",
+             model, usage.get("input_tokens"), usage.get("output_tokens"), cache_read, cache_write)
+    return data["content"][0]["text"]
 
 
 def _parse_json(text: str) -> dict:
@@ -1496,6 +1513,8 @@ def main():
     log.info("❌ Erros: %d", len(errors))
     if skipped:
         log.info("⏭️  Dry run: %d", len(skipped))
+    log.info("🧮 Prompt cache: lidos=%d gravados=%d input sem cache=%d",
+             PROMPT_CACHE_USAGE["cache_read"], PROMPT_CACHE_USAGE["cache_write"], PROMPT_CACHE_USAGE["input"])
 
     if success:
         log.info("")
@@ -522,6 +522,7 @@ export const radarEnrichmentStatusEnum = pgEnum("radar_enrichment_status", [
   "analyzed",
   "failed",
   "duplicate",
+  "batch_submitted",
 ]);
 
 export const radarFonteTipoEnum = pgEnum("radar_fonte_tipo", [
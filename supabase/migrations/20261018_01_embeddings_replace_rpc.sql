@@ -0,0 +1,37 @@
+-- Troca atômica dos chunks de uma entidade na tabela embeddings.
+-- DELETE + INSERT na mesma transação: a busca nunca vê a entidade sem chunks.
+-- p_rows: array JSON de {assistido_id, processo_id, chunk_index, content_text, embedding, metadata}
+
+CREATE OR REPLACE FUNCTION replace_entity_embeddings(
+  p_entity_type TEXT,
+  p_entity_id INTEGER,
+  p_rows JSONB
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  inserted INTEGER;
+BEGIN
+  DELETE FROM embeddings
+  WHERE entity_type = p_entity_type AND entity_id = p_entity_id;
+
+  INSERT INTO embeddings (
+    entity_type, entity_id, assistido_id, processo_id,
+    chunk_index, content_text, embedding, metadata
+  )
+  SELECT
+    p_entity_type,
+    p_entity_id,
+    (r->>'assistido_id')::INTEGER,
+    (r->>'processo_id')::INTEGER,
+    COALESCE((r->>'chunk_index')::INTEGER, 0),
+    r->>'content_text',
+    (r->>'embedding')::vector,
+    COALESCE(r->'metadata', '{}'::jsonb)
+  FROM jsonb_array_elements(p_rows) AS r;
+
+  GET DIAGNOSTICS inserted = ROW_COUNT;
+  RETURN inserted;
+END;
+$$;
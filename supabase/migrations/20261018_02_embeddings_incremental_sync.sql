@@ -0,0 +1,138 @@
+-- Re-indexação incremental: fingerprint por chunk + sincronização atômica.
+-- Só chunks novos/alterados são embedados; os demais têm apenas o chunk_index
+-- atualizado e as linhas obsoletas são removidas na mesma transação.
+
+ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS content_hash TEXT;
+ALTER TABLE document_embeddings ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+-- replace_entity_embeddings passa a gravar content_hash
+CREATE OR REPLACE FUNCTION replace_entity_embeddings(
+  p_entity_type TEXT,
+  p_entity_id INTEGER,
+  p_rows JSONB
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  inserted INTEGER;
+BEGIN
+  DELETE FROM embeddings
+  WHERE entity_type = p_entity_type AND entity_id = p_entity_id;
+
+  INSERT INTO embeddings (
+    entity_type, entity_id, assistido_id, processo_id,
+    chunk_index, content_text, content_hash, embedding, metadata
+  )
+  SELECT
+    p_entity_type,
+    p_entity_id,
+    (r->>'assistido_id')::INTEGER,
+    (r->>'processo_id')::INTEGER,
+    COALESCE((r->>'chunk_index')::INTEGER, 0),
+    r->>'content_text',
+    r->>'content_hash',
+    (r->>'embedding')::vector,
+    COALESCE(r->'metadata', '{}'::jsonb)
+  FROM jsonb_array_elements(p_rows) AS r;
+
+  GET DIAGNOSTICS inserted = ROW_COUNT;
+  RETURN inserted;
+END;
+$$;
+
+-- p_keep: [{id, chunk_index}] — linhas reaproveitadas (índice pode mudar)
+-- p_rows: chunks novos (mesmo formato de replace_entity_embeddings)
+-- p_delete_ids: linhas obsoletas
+CREATE OR REPLACE FUNCTION sync_entity_embeddings(
+  p_entity_type TEXT,
+  p_entity_id INTEGER,
+  p_assistido_id INTEGER,
+  p_processo_id INTEGER,
+  p_metadata JSONB,
+  p_keep JSONB,
+  p_rows JSONB,
+  p_delete_ids INTEGER[]
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  inserted INTEGER;
+BEGIN
+  DELETE FROM embeddings
+  WHERE id = ANY(p_delete_ids)
+    AND entity_type = p_entity_type AND entity_id = p_entity_id;
+
+  UPDATE embeddings e
+  SET chunk_index = (k->>'chunk_index')::INTEGER,
+      assistido_id = p_assistido_id,
+      processo_id = p_processo_id,
+      metadata = COALESCE(p_metadata, '{}'::jsonb)
+  FROM jsonb_array_elements(p_keep) AS k
+  WHERE e.id = (k->>'id')::INTEGER
+    AND e.entity_type = p_entity_type AND e.entity_id = p_entity_id;
+
+  INSERT INTO embeddings (
+    entity_type, entity_id, assistido_id, processo_id,
+    chunk_index, content_text, content_hash, embedding, metadata
+  )
+  SELECT
+    p_entity_type,
+    p_entity_id,
+    p_assistido_id,
+    p_processo_id,
+    (r->>'chunk_index')::INTEGER,
+    r->>'content_text',
+    r->>'content_hash',
+    (r->>'embedding')::vector,
+    COALESCE(p_metadata, '{}'::jsonb)
+  FROM jsonb_array_elements(p_rows) AS r;
+
+  GET DIAGNOSTICS inserted = ROW_COUNT;
+  RETURN inserted;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION sync_document_embeddings(
+  p_file_id INTEGER,
+  p_assistido_id INTEGER,
+  p_metadata JSONB,
+  p_keep JSONB,
+  p_rows JSONB,
+  p_delete_ids INTEGER[]
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  inserted INTEGER;
+BEGIN
+  DELETE FROM document_embeddings
+  WHERE id = ANY(p_delete_ids) AND file_id = p_file_id;
+
+  UPDATE document_embeddings de
+  SET chunk_index = (k->>'chunk_index')::INTEGER,
+      assistido_id = p_assistido_id,
+      metadata = COALESCE(p_metadata, '{}'::jsonb),
+      updated_at = NOW()
+  FROM jsonb_array_elements(p_keep) AS k
+  WHERE de.id = (k->>'id')::INTEGER AND de.file_id = p_file_id;
+
+  INSERT INTO document_embeddings (
+    file_id, assistido_id, chunk_index, chunk_text, content_hash, embedding, metadata
+  )
+  SELECT
+    p_file_id,
+    p_assistido_id,
+    (r->>'chunk_index')::INTEGER,
+    r->>'chunk_text',
+    r->>'content_hash',
+    (r->>'embedding')::vector,
+    COALESCE(p_metadata, '{}'::jsonb)
+  FROM jsonb_array_elements(p_rows) AS r;
+
+  GET DIAGNOSTICS inserted = ROW_COUNT;
+  RETURN inserted;
+END;
+$$;
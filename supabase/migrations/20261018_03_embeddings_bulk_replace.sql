@@ -0,0 +1,39 @@
+-- Troca atômica em lote para o backfill: todos os chunks de várias entidades
+-- do mesmo tipo numa única transação (uma chamada por página de entidades).
+-- p_rows: array JSON de {entity_id, assistido_id, processo_id, chunk_index,
+--         content_text, content_hash, embedding, metadata}
+
+CREATE OR REPLACE FUNCTION replace_embeddings_bulk(
+  p_entity_type TEXT,
+  p_entity_ids INTEGER[],
+  p_rows JSONB
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  inserted INTEGER;
+BEGIN
+  DELETE FROM embeddings
+  WHERE entity_type = p_entity_type AND entity_id = ANY(p_entity_ids);
+
+  INSERT INTO embeddings (
+    entity_type, entity_id, assistido_id, processo_id,
+    chunk_index, content_text, content_hash, embedding, metadata
+  )
+  SELECT
+    p_entity_type,
+    (r->>'entity_id')::INTEGER,
+    (r->>'assistido_id')::INTEGER,
+    (r->>'processo_id')::INTEGER,
+    COALESCE((r->>'chunk_index')::INTEGER, 0),
+    r->>'content_text',
+    r->>'content_hash',
+    (r->>'embedding')::vector,
+    COALESCE(r->'metadata', '{}'::jsonb)
+  FROM jsonb_array_elements(p_rows) AS r;
+
+  GET DIAGNOSTICS inserted = ROW_COUNT;
+  RETURN inserted;
+END;
+$$;
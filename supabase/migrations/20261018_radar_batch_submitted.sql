@@ -0,0 +1,17 @@
+-- ============================================================
+-- Radar Criminal — status 'batch_submitted'
+-- Notícias enviadas num lote offline (Message Batches) saem de 'pending'
+-- para que extract_batch não as processe de novo enquanto o lote roda.
+-- ============================================================
+
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_enum
+    WHERE enumtypid = 'radar_enrichment_status'::regtype
+      AND enumlabel = 'batch_submitted'
+  ) THEN
+    ALTER TYPE radar_enrichment_status ADD VALUE 'batch_submitted';
+  END IF;
+END
+$$;